@@ -232,6 +232,28 @@ CHANNEL_LAYERS = {
 }
 
 
+# Cache (per-user dashboard responses)
+# Local memory by default; set CACHE_REDIS_URL (e.g. redis://127.0.0.1:6379/1) in production
+CACHE_REDIS_URL = config('CACHE_REDIS_URL', default='')
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'blockchain-backend',
+        },
+    }
+
+# Seconds a cached dashboard response may be served (invalidated earlier on writes)
+DASHBOARD_CACHE_TIMEOUT = int(config('DASHBOARD_CACHE_TIMEOUT', default='300'))
+
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
@@ -319,4 +341,54 @@ TWILIO_PHONE_NUMBER = config('TWILIO_PHONE_NUMBER')
 STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY', default='sk_test_your_test_key')
 STRIPE_PUBLISHABLE_KEY = config('STRIPE_PUBLISHABLE_KEY', default='pk_test_your_test_key')
 STRIPE_WEBHOOK_SECRET = config('STRIPE_WEBHOOK_SECRET', default='whsec_your_webhook_secret')
-PLATFORM_FEE_PERCENTAGE = float(config('PLATFORM_FEE_PERCENTAGE', default='2.0'))
\ No newline at end of file
+PLATFORM_FEE_PERCENTAGE = float(config('PLATFORM_FEE_PERCENTAGE', default='2.0'))
+
+# Hours an approved, unpaid investment holds SPV allocation before it expires
+INVESTMENT_RESERVATION_TTL_HOURS = int(config('INVESTMENT_RESERVATION_TTL_HOURS', default='48'))
+
+# Notification delivery (WebSocket push / email): 'deferred' runs it on a
+# background worker after commit, 'sync' inline after commit, 'off' skips it
+NOTIFICATION_DELIVERY_MODE = config('NOTIFICATION_DELIVERY_MODE', default='deferred')
+
+
+# Ownership ledger entries between stored cap table snapshots
+CAP_TABLE_CHECKPOINT_INTERVAL = int(config('CAP_TABLE_CHECKPOINT_INTERVAL', default='50'))
+
+
+# Transfer agreement PDFs: 'process' hands them to the PDF renderer after commit and
+# stores them in the background, 'sync' waits for them after commit
+# (DOCUMENT_RENDER_WORKERS sizes the host's renderer pool, default: CPU count, at most 4)
+DOCUMENT_RENDER_MODE = config('DOCUMENT_RENDER_MODE', default='process')
+DOCUMENT_RENDER_WORKERS = config('DOCUMENT_RENDER_WORKERS', default=min(4, os.cpu_count() or 1), cast=int)
+
+# Rows per flush of streamed XLSX exports (transfers/export_utils.py)
+EXPORT_XLSX_CHUNK_ROWS = config('EXPORT_XLSX_CHUNK_ROWS', default=1000, cast=int)
+
+# Identifier values each process reserves per trip to the sequence table (config/identifier_utils.py)
+IDENTIFIER_BLOCK_SIZE = config('IDENTIFIER_BLOCK_SIZE', default=100, cast=int)
+# Alias blocks are reserved on. On a database with concurrent writers, add a second alias of
+# it (DATABASES['identifiers'] = {**DATABASES['default']}) so reservations commit on their
+# own connection instead of inside the caller's transaction; SQLite has a single writer.
+IDENTIFIER_DATABASE = config('IDENTIFIER_DATABASE', default='default')
+
+# Compiled document templates kept per process (documents/template_utils.py)
+DOCUMENT_TEMPLATE_CACHE_SIZE = config('DOCUMENT_TEMPLATE_CACHE_SIZE', default=256, cast=int)
+
+# Bulk document generation jobs: 'thread' runs them on a background thread
+# (rendering on the PDF renderer), 'sync' inline after commit
+DOCUMENT_GENERATION_MODE = config('DOCUMENT_GENERATION_MODE', default='thread')
+DOCUMENT_GENERATION_BATCH_SIZE = config('DOCUMENT_GENERATION_BATCH_SIZE', default=50, cast=int)
+
+# Unreferenced cached PDFs older than this are deleted by `manage.py prune_render_cache`
+PDF_RENDER_CACHE_MAX_AGE_DAYS = config('PDF_RENDER_CACHE_MAX_AGE_DAYS', default=30, cast=int)
+
+# PDF renderer (config/renderer_utils.py): 'pool' renders on a warm pool of the calling
+# process, 'service' on the host's warm pool run by `manage.py run_pdf_renderer` at
+# PDF_RENDERER_ADDRESS (host:port or a Unix socket path; `manage.py deploy` restarts
+# PDF_RENDERER_SERVICE_UNIT), 'inline' in the calling process
+PDF_RENDERER_MODE = config('PDF_RENDERER_MODE', default='pool')
+PDF_RENDERER_ADDRESS = config('PDF_RENDERER_ADDRESS', default='127.0.0.1:8765')
+PDF_RENDERER_SERVICE_UNIT = config('PDF_RENDERER_SERVICE_UNIT', default='pdf_renderer_blockchain.service')
+# Seconds a render may run, and MB a worker may grow past its warmed-up size (0: no cap)
+PDF_RENDER_TIMEOUT = config('PDF_RENDER_TIMEOUT', default=60, cast=int)
+PDF_RENDER_MEMORY_LIMIT_MB = config('PDF_RENDER_MEMORY_LIMIT_MB', default=1024, cast=int)
@@ -1,3 +1,17 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import CachedPDF, IdentifierSequence
+
+
+@admin.register(IdentifierSequence)
+class IdentifierSequenceAdmin(admin.ModelAdmin):
+    list_display = ('name', 'next_value', 'updated_at')
+    readonly_fields = ('updated_at',)
+
+
+@admin.register(CachedPDF)
+class CachedPDFAdmin(admin.ModelAdmin):
+    list_display = ('key', 'renderer', 'file_size', 'ref_count', 'hit_count', 'render_count', 'last_used_at')
+    list_filter = ('renderer',)
+    search_fields = ('key', 'file')
+    readonly_fields = ('key', 'renderer', 'file', 'file_size', 'ref_count', 'hit_count', 'render_count', 'created_at', 'last_used_at')
@@ -0,0 +1,120 @@
+"""
+Identifier allocation.
+
+Human-readable identifiers (TXN-00000042, PAY-0000000007, ...) are numbered
+from IdentifierSequence counters, one per identifier family, so they are
+unique by construction instead of relying on random hex and the unique
+constraint.
+
+Each process reserves IDENTIFIER_BLOCK_SIZE values per trip to the counter
+(one UPDATE) and hands them out from memory, so concurrent writers touch the
+counter row once per block rather than once per identifier. Values left in
+a block when a process exits are skipped; identifiers are unique and
+increasing per process, not gapless.
+
+Blocks are reserved on the IDENTIFIER_DATABASE connection in a transaction
+of their own. Pointed at a second alias of the database, a reservation
+commits at once and the counter row is not held locked until the caller's
+transaction ends; values of a rolled-back caller are skipped. On the
+caller's own connection ('default', e.g. SQLite, which has one writer
+anyway) a reservation made inside an open transaction rolls back with it,
+so it covers exactly the values asked for and is not shared.
+
+Numbers are zero-padded to a width longer than the random hex the families
+used before (SEQUENCES), so new identifiers cannot collide with existing ones.
+"""
+
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F
+
+from .models import IdentifierSequence
+
+
+# Identifier family -> zero-padded width of its numbers
+SEQUENCES = {
+    'transfer': 8,            # TXN-...; previously 6 hex chars
+    'transfer_request': 8,    # Request.request_id; previously 6 hex chars
+    'agreement_document': 6,  # REQ/ACC/AGR-<transfer>-...; previously 4 hex chars
+    'document': 8,            # Document.document_id; previously 6 hex chars
+    'payment': 10,            # PAY-...; previously 8 hex chars
+}
+
+_lock = threading.Lock()
+# name -> [next, end) of the block shared by the process's threads
+_blocks = {}
+
+
+def get_block_size():
+    return max(getattr(settings, 'IDENTIFIER_BLOCK_SIZE', 100), 1)
+
+
+def get_database():
+    """Alias of the connection blocks are reserved on"""
+    return getattr(settings, 'IDENTIFIER_DATABASE', DEFAULT_DB_ALIAS)
+
+
+def _reserve(name, size, using):
+    """First value of a newly reserved block of `size` values"""
+    sequences = IdentifierSequence.objects.using(using)
+    with transaction.atomic(using=using):
+        if not sequences.filter(name=name).update(next_value=F('next_value') + size):
+            sequences.get_or_create(name=name)
+            sequences.filter(name=name).update(next_value=F('next_value') + size)
+        end = sequences.values_list('next_value', flat=True).get(name=name)
+    return end - size
+
+
+def _take(block, count):
+    start = block[0]
+    block[0] = min(block[0] + count, block[1])
+    return range(start, block[0])
+
+
+def next_values(name, count):
+    """`count` unused values of the `name` sequence, increasing"""
+    values = []
+    while len(values) < count:
+        wanted = count - len(values)
+
+        with _lock:
+            block = _blocks.get(name)
+            if block is not None and block[0] < block[1]:
+                values.extend(_take(block, wanted))
+                continue
+
+        using = get_database()
+        if connections[using].in_atomic_block:
+            # Reserved in the caller's transaction: may still roll back, keep it to ourselves
+            start = _reserve(name, wanted, using)
+            values.extend(range(start, start + wanted))
+            continue
+
+        size = max(get_block_size(), wanted)
+        start = _reserve(name, size, using)
+        block = [start, start + size]
+        with _lock:
+            values.extend(_take(block, wanted))
+            _blocks[name] = block
+    return values
+
+
+def next_value(name):
+    """One unused value of the `name` sequence"""
+    return next_values(name, 1)[0]
+
+
+def format_identifier(name, prefix, value):
+    return f"{prefix}-{value:0{SEQUENCES[name]}d}"
+
+
+def next_identifier(name, prefix):
+    """A new identifier of the `name` family, e.g. next_identifier('transfer', 'TXN') -> 'TXN-00000042'"""
+    return format_identifier(name, prefix, next_value(name))
+
+
+def next_identifiers(name, prefix, count):
+    """`count` new identifiers of the `name` family (bulk writers)"""
+    return [format_identifier(name, prefix, value) for value in next_values(name, count)]
@@ -0,0 +1,52 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test.utils import override_settings
+
+from config.identifier_utils import format_identifier, get_block_size, next_value
+from config.models import IdentifierSequence
+
+
+class Command(BaseCommand):
+    help = 'Allocate identifiers from concurrent threads and check they are unique'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1_000_000, help='Identifiers to allocate')
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent allocating threads')
+        parser.add_argument('--block-size', type=int, help='Values reserved per trip to the counter (default: IDENTIFIER_BLOCK_SIZE)')
+
+    def handle(self, *args, **options):
+        total = options['count']
+        threads = options['threads']
+        name = f'benchmark-{uuid.uuid4().hex[:8]}'
+        block_size = options['block_size'] or get_block_size()
+
+        def allocate(count):
+            try:
+                return [format_identifier('transfer', 'TXN', next_value(name)) for _ in range(count)]
+            finally:
+                connections.close_all()
+
+        shares = [total // threads + (1 if i < total % threads else 0) for i in range(threads)]
+        self.stdout.write(f'Allocating {total:,} identifiers from {threads} threads, blocks of {block_size}...')
+        with override_settings(IDENTIFIER_BLOCK_SIZE=block_size):
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                began = time.perf_counter()
+                batches = list(pool.map(allocate, shares))
+                elapsed = time.perf_counter() - began
+
+        identifiers = [identifier for batch in batches for identifier in batch]
+        reserved = IdentifierSequence.objects.get(name=name).next_value - 1
+        IdentifierSequence.objects.filter(name=name).delete()
+
+        self.stdout.write(f'Identifiers: {len(identifiers):,} in {elapsed:.2f}s ({len(identifiers) / elapsed:,.0f}/s)')
+        self.stdout.write(f'Reserved:    {reserved:,} values in {reserved // block_size:,} counter updates')
+        self.stdout.write(f'Range:       {min(identifiers)} .. {max(identifiers)}')
+
+        if len(set(identifiers)) != len(identifiers):
+            self.stdout.write(self.style.ERROR(f'{len(identifiers) - len(set(identifiers))} duplicate identifier(s)'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All identifiers unique'))
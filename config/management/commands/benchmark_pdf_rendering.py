@@ -0,0 +1,61 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from config.renderer_utils import get_backend, get_backend_paths, get_worker_count, result, shutdown, start_pool, submit
+
+
+def cold_render(backend, args):
+    """Render in a fresh interpreter: Django, the PDF libraries and fonts load first"""
+    import django
+    django.setup()
+    return len(get_backend(backend).render(*args))
+
+
+class Command(BaseCommand):
+    help = 'Compare PDF renders per second from cold processes and from the warm renderer pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backend', default='html', help='Renderer backend (default: html)')
+        parser.add_argument('--renders', type=int, default=200, help='Renders on the warm pool')
+        parser.add_argument('--cold-renders', type=int, default=5, help='Renders in fresh processes')
+        parser.add_argument('--workers', type=int, help='Warm pool size (default: DOCUMENT_RENDER_WORKERS)')
+
+    def handle(self, *args, **options):
+        name = options['backend']
+        if name not in get_backend_paths():
+            self.stderr.write(f"Unknown backend {name}; choose from {', '.join(get_backend_paths())}")
+            return
+        sample = get_backend(name).sample()
+
+        self.stdout.write(f"Cold: {options['cold_renders']} renders, each in a new process...")
+        context = multiprocessing.get_context('spawn')
+        began = time.perf_counter()
+        for _ in range(options['cold_renders']):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                pool.submit(cold_render, name, sample).result()
+        cold = options['cold_renders'] / (time.perf_counter() - began)
+
+        settings_override = {'PDF_RENDERER_MODE': 'pool'}
+        if options['workers']:
+            settings_override['DOCUMENT_RENDER_WORKERS'] = options['workers']
+        with override_settings(**settings_override):
+            shutdown()
+            try:
+                start_pool()
+                workers = get_worker_count()
+                self.stdout.write(f"Warm: {options['renders']} renders on {workers} warm workers...")
+                began = time.perf_counter()
+                futures = [submit(name, *sample) for _ in range(options['renders'])]
+                for future in futures:
+                    result(future)
+                warm = options['renders'] / (time.perf_counter() - began)
+            finally:
+                shutdown()
+
+        self.stdout.write(f"  cold: {cold:,.1f} renders/s ({1000 / cold:,.0f} ms per render)")
+        self.stdout.write(f"  warm: {warm:,.1f} renders/s ({1000 / warm:,.0f} ms per render, {workers} workers)")
+        self.stdout.write(self.style.SUCCESS(f'Warm pool is {warm / cold:,.1f}x faster'))
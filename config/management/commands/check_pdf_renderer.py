@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from config.renderer_utils import health_check, shutdown
+
+
+class Command(BaseCommand):
+    help = 'Render a sample with every PDF renderer backend and fail if any cannot render'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--timeout', type=int, default=30, help='Seconds to wait for each sample render')
+
+    def handle(self, *args, **options):
+        try:
+            report = health_check(timeout=options['timeout'])
+        finally:
+            shutdown(wait=False)
+
+        self.stdout.write(f"Mode: {report['mode']}, workers: {report['workers']}")
+        for name, backend in report['backends'].items():
+            if backend['ok']:
+                self.stdout.write(f"  {name} ({backend['version']}): {backend['bytes']:,} bytes in {backend['latency_ms']} ms")
+            else:
+                self.stdout.write(f"  {name}: {backend['error']}")
+        if not report['ok']:
+            raise CommandError('PDF renderer is unhealthy')
+        self.stdout.write(self.style.SUCCESS('PDF renderer is healthy'))
@@ -1,4 +1,5 @@
 import subprocess
+from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.core.management import call_command
 import sys
@@ -45,7 +46,12 @@ class Command(BaseCommand):
         self.stdout.write("⚙️  Running System Check...")
         call_command('check')
  
-        # 5. RESTART GUNICORN
+        # 5. RESTART PDF RENDERER
+        # The renderer service runs the app's code too: restart it with the web processes
+        if settings.PDF_RENDERER_MODE == 'service':
+            self.run_shell_command(["sudo", "systemctl", "restart", settings.PDF_RENDERER_SERVICE_UNIT], "Restarting PDF renderer")
+ 
+        # 6. RESTART GUNICORN
         # Note: Ensure sudo permissions are set correctly
         self.run_shell_command(["sudo", "systemctl", "restart", "gunicorn_blockchain.service"], "Restarting Gunicorn")
  
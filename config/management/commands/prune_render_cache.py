@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from config.render_cache_utils import get_cache_stats, prune_cache
+
+
+class Command(BaseCommand):
+    help = 'Delete unreferenced PDF render cache entries and report the cache hit rate'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age-days', type=int,
+            help='Delete unreferenced entries unused for this many days (default: PDF_RENDER_CACHE_MAX_AGE_DAYS)',
+        )
+        parser.add_argument('--stats-only', action='store_true', help='Report the hit rate without deleting anything')
+
+    def handle(self, *args, **options):
+        if not options['stats_only']:
+            max_age_days = options['max_age_days']
+            if max_age_days is None:
+                max_age_days = getattr(settings, 'PDF_RENDER_CACHE_MAX_AGE_DAYS', 30)
+            deleted = prune_cache(max_age_days)
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} unreferenced cached PDF(s)'))
+
+        stats = get_cache_stats()
+        hit_rate = f"{stats['hit_rate']:.1%}" if stats['hit_rate'] is not None else 'n/a'
+        self.stdout.write(
+            f"{stats['entries']} cached PDF(s), {stats['total_bytes']:,} bytes, {stats['references']} reference(s); "
+            f"{stats['hits']} hit(s), {stats['renders']} render(s), hit rate {hit_rate}"
+        )
+        for renderer, figures in stats['renderers'].items():
+            rate = f"{figures['hit_rate']:.1%}" if figures['hit_rate'] is not None else 'n/a'
+            self.stdout.write(f"  {renderer}: {figures['entries']} entries, {figures['hits']} hits, {figures['renders']} renders, hit rate {rate}")
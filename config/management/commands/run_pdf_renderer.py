@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from config.renderer_utils import get_worker_count, serve, shutdown
+
+
+class Command(BaseCommand):
+    help = "Run this host's PDF renderer service: one warm worker pool shared by every web process"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--address', help='host:port or Unix socket path to listen on (default: PDF_RENDERER_ADDRESS)')
+        parser.add_argument('--workers', type=int, help='Renderer processes (default: DOCUMENT_RENDER_WORKERS)')
+
+    def handle(self, *args, **options):
+        settings_override = {}
+        if options['address']:
+            settings_override['PDF_RENDERER_ADDRESS'] = options['address']
+        if options['workers']:
+            settings_override['DOCUMENT_RENDER_WORKERS'] = options['workers']
+
+        with override_settings(**settings_override):
+            self.stdout.write(f'Warming up {get_worker_count()} renderer worker(s)...')
+            try:
+                serve(ready=lambda address: self.stdout.write(self.style.SUCCESS(f'PDF renderer listening on {address}')))
+            except KeyboardInterrupt:
+                pass
+            finally:
+                shutdown(wait=False)
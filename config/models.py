@@ -1,3 +1,53 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class IdentifierSequence(models.Model):
+    """
+    Counter behind one family of human-readable identifiers (transfer IDs,
+    document numbers, payment IDs...).
+    
+    Processes reserve blocks of values at a time (see config/identifier_utils.py),
+    so next_value is the first value no process has reserved yet.
+    """
+    
+    name = models.CharField(max_length=50, primary_key=True)
+    next_value = models.BigIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'identifier sequence'
+        verbose_name_plural = 'identifier sequences'
+    
+    def __str__(self):
+        return f"{self.name} ({self.next_value})"
+
+
+class CachedPDF(models.Model):
+    """
+    A rendered PDF stored once and shared by every row that rendered the same
+    content (see config/render_cache_utils.py).
+    
+    key is the SHA-256 of the renderer version and the render input.
+    ref_count is the number of rows whose file field points at the file.
+    """
+    
+    key = models.CharField(max_length=64, primary_key=True)
+    renderer = models.CharField(max_length=100)
+    file = models.FileField(upload_to='render_cache/', max_length=255)
+    file_size = models.PositiveIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    hit_count = models.PositiveBigIntegerField(default=0)
+    render_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+    
+    class Meta:
+        verbose_name = 'cached PDF'
+        verbose_name_plural = 'cached PDFs'
+        indexes = [
+            models.Index(fields=['file']),
+        ]
+    
+    def __str__(self):
+        return f"{self.key[:12]} ({self.renderer}, {self.ref_count} refs)"
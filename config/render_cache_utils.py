@@ -0,0 +1,151 @@
+"""
+Content-addressed PDF render cache.
+
+A rendered PDF is keyed by the SHA-256 of its renderer version and its input
+(the final HTML of a template document, the type and data of a transfer
+agreement) and stored once under MEDIA_ROOT/render_cache/. Rendering the
+same input again is a lookup instead of seconds of CPU, and the rows that
+hold the PDF (Document.file, DocumentGeneration.generated_pdf,
+TransferAgreementDocument.file) point at the one cached file rather than a
+copy each.
+
+CachedPDF.ref_count counts those rows: attach_pdf() and acquire_pdf() take
+references, release_pdf() (post_delete of the holding rows) drops them. A
+renderer version is part of the key, so upgrading the PDF library or
+changing a layout renders afresh instead of serving stale files.
+
+Hits and renders are counted per entry; get_cache_stats() sums them into a
+hit rate, shown by GET /api/documents/render-cache-stats/ (admins) and
+`manage.py prune_render_cache`, which also deletes unreferenced entries
+unused for PDF_RENDER_CACHE_MAX_AGE_DAYS.
+"""
+
+import hashlib
+import json
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import CachedPDF
+
+
+CACHE_DIR = 'render_cache/'
+
+
+def cache_key(renderer, *content):
+    """SHA-256 of a renderer version and render input (strings or JSON-serialisable data)"""
+    payload = json.dumps([renderer, *content], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _file_exists(entry):
+    return bool(entry.file) and entry.file.storage.exists(entry.file.name)
+
+
+def lookup_pdfs(keys):
+    """{key: CachedPDF} of the given keys that are cached, counting a hit for each"""
+    entries = {entry.key: entry for entry in CachedPDF.objects.filter(key__in=set(keys)) if _file_exists(entry)}
+    if entries:
+        CachedPDF.objects.filter(key__in=entries).update(hit_count=F('hit_count') + 1, last_used_at=timezone.now())
+    return entries
+
+
+def lookup_pdf(key):
+    """The CachedPDF of `key`, counting the hit, or None"""
+    return lookup_pdfs([key]).get(key)
+
+
+def store_pdf(key, renderer, pdf_content):
+    """Cache a freshly rendered PDF under `key` and return its entry"""
+    entry = CachedPDF.objects.filter(key=key).first()
+    if entry is not None and _file_exists(entry):
+        # Rendered concurrently by another process; keep the first file
+        CachedPDF.objects.filter(key=key).update(render_count=F('render_count') + 1, last_used_at=timezone.now())
+        return entry
+
+    if entry is None:
+        entry = CachedPDF(key=key)
+    entry.renderer = renderer
+    entry.file.save(f"{key[:2]}/{key}.pdf", ContentFile(pdf_content), save=False)
+    entry.file_size = len(pdf_content)
+    entry.render_count += 1
+    entry.last_used_at = timezone.now()
+    try:
+        with transaction.atomic():
+            entry.save()
+    except IntegrityError:
+        entry.file.delete(save=False)
+        return CachedPDF.objects.get(key=key)
+    return entry
+
+
+def cached_pdf(key, renderer, render, *args):
+    """The CachedPDF of `key`, calling render(*args) for the PDF bytes on a miss"""
+    entry = lookup_pdf(key)
+    if entry is None:
+        entry = store_pdf(key, renderer, render(*args))
+    return entry
+
+
+def acquire_pdf(entry, count=1):
+    """Count `count` more rows pointing at a cached PDF"""
+    CachedPDF.objects.filter(key=entry.key).update(ref_count=F('ref_count') + count)
+
+
+def release_pdf(name):
+    """Drop one reference to the cached PDF stored at `name` (no-op for other files)"""
+    if name and name.startswith(CACHE_DIR):
+        CachedPDF.objects.filter(file=name, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+
+
+def attach_pdf(field_file, entry):
+    """Point a row's file field at a cached PDF and take a reference; the caller saves the row"""
+    if field_file.name == entry.file.name:
+        return
+    release_pdf(field_file.name)
+    field_file.name = entry.file.name
+    acquire_pdf(entry)
+
+
+def prune_cache(max_age_days):
+    """Delete unreferenced entries not used for `max_age_days`. Returns the number deleted."""
+    cutoff = timezone.now() - timedelta(days=max_age_days)
+    deleted = 0
+    for key, name in CachedPDF.objects.filter(ref_count=0, last_used_at__lt=cutoff).values_list('key', 'file'):
+        # Re-checked in the DELETE so an entry used or referenced meanwhile is kept
+        if CachedPDF.objects.filter(key=key, ref_count=0, last_used_at__lt=cutoff).delete()[0]:
+            CachedPDF.file.field.storage.delete(name)
+            deleted += 1
+    return deleted
+
+
+def get_cache_stats():
+    """Entry, size, reference and hit-rate figures, overall and per renderer"""
+    def summarise(totals):
+        hits = totals['hits'] or 0
+        renders = totals['renders'] or 0
+        return {
+            'entries': totals['entries'],
+            'total_bytes': totals['total_bytes'] or 0,
+            'references': totals['references'] or 0,
+            'hits': hits,
+            'renders': renders,
+            'hit_rate': round(hits / (hits + renders), 4) if hits + renders else None,
+        }
+
+    aggregates = {
+        'entries': Count('key'),
+        'total_bytes': Sum('file_size'),
+        'references': Sum('ref_count'),
+        'hits': Sum('hit_count'),
+        'renders': Sum('render_count'),
+    }
+    stats = summarise(CachedPDF.objects.aggregate(**aggregates))
+    stats['renderers'] = {
+        row['renderer']: summarise(row)
+        for row in CachedPDF.objects.values('renderer').annotate(**aggregates).order_by('renderer')
+    }
+    return stats
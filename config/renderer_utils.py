@@ -0,0 +1,417 @@
+"""
+PDF renderer service.
+
+PDFs are rendered by named backends, PDFBackend subclasses that live with
+their app:
+
+    html                documents.pdf_render_utils.HTMLBackend (template documents)
+    transfer_agreement  transfers.document_utils.TransferAgreementBackend
+
+PDF_RENDER_BACKENDS adds backends or replaces these. A backend's render()
+returns the PDF bytes, its version identifies its output in render cache
+keys, and sample() is a small render used to warm workers up and to check
+health.
+
+PDF_RENDERER_MODE selects where renders run:
+
+    pool     on a warm pool of this process (default; the service itself,
+             scripts)
+    service  on the host's renderer service: one warm pool of
+             DOCUMENT_RENDER_WORKERS processes, run by `manage.py
+             run_pdf_renderer` and listening on PDF_RENDERER_ADDRESS, shared
+             by every web process on the host. Opt-in, since the service has
+             to run next to the web processes; `manage.py deploy` restarts
+             it with them. A render fails with RendererUnavailable when the
+             service cannot be reached.
+    inline   in the calling process (tests)
+
+DOCUMENT_RENDER_WORKERS sizes a pool, at most DEFAULT_MAX_WORKERS unless
+set. With 'service' it is a per-host figure, so adding web processes does
+not add renderer processes; with 'pool' every process that renders starts
+one.
+
+A pool is started and warmed up eagerly (start_pool(); the service does so
+before it accepts connections): every backend renders its sample in the
+parent, whose imported PDF libraries and loaded fonts the forked workers
+inherit, and again in each worker, so no request pays for a cold start.
+Inside a worker a render is interrupted after PDF_RENDER_TIMEOUT seconds
+(RenderTimeout), and the worker's address space may grow at most
+PDF_RENDER_MEMORY_LIMIT_MB past its warmed-up size, so a runaway document
+fails with MemoryError instead of exhausting the host. If a worker dies
+anyway, the pool is replaced and the renders it held fail with RenderError.
+
+Web processes only wait: submit() hands the render to the service on a
+client thread and returns a Future, so several renders stay in flight (bulk
+generation, the transfer agreement collector) while the request thread is
+free; render() waits for one. health_check() renders every backend's
+sample through the configured mode.
+"""
+
+import hashlib
+import logging
+import os
+import signal
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+try:
+    import resource
+except ImportError:  # Windows: no memory cap
+    resource = None
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKENDS = {
+    'html': 'documents.pdf_render_utils.HTMLBackend',
+    'transfer_agreement': 'transfers.document_utils.TransferAgreementBackend',
+}
+
+# Renderer processes per host when DOCUMENT_RENDER_WORKERS is not set
+DEFAULT_MAX_WORKERS = 4
+
+DEFAULT_ADDRESS = '127.0.0.1:8765'
+
+# backend class path -> instance, per process
+_backends = {}
+_pool = None
+# Client threads holding renders in flight on the service, and their connections
+_calls = None
+_client = threading.local()
+_lock = threading.Lock()
+
+
+class RenderError(Exception):
+    """A render could not be completed by the service"""
+
+
+class RendererUnavailable(RenderError):
+    """The renderer service cannot be reached"""
+
+
+class RenderTimeout(RenderError):
+    """A render ran longer than PDF_RENDER_TIMEOUT"""
+
+
+class _Interrupted(BaseException):
+    # Raised by the timer; a BaseException so backends' `except Exception` fallbacks don't swallow it
+    pass
+
+
+class PDFBackend:
+    """A way of rendering some input to PDF; subclasses implement render() and sample()"""
+
+    version = ''
+
+    def sample(self):
+        """Arguments of a small representative render"""
+        return ()
+
+    def render(self, *args, **kwargs):
+        """PDF bytes"""
+        raise NotImplementedError
+
+    def warm_up(self):
+        """Import libraries and load fonts ahead of the first render"""
+        self.render(*self.sample())
+
+
+def get_renderer_mode():
+    return getattr(settings, 'PDF_RENDERER_MODE', 'pool')
+
+
+def get_worker_count():
+    """Renderer processes on this host"""
+    return getattr(settings, 'DOCUMENT_RENDER_WORKERS', None) or min(DEFAULT_MAX_WORKERS, os.cpu_count() or 1)
+
+
+def get_service_address():
+    """PDF_RENDERER_ADDRESS as a (host, port) pair, or a Unix socket path"""
+    address = getattr(settings, 'PDF_RENDERER_ADDRESS', DEFAULT_ADDRESS)
+    if isinstance(address, str) and not address.startswith('/'):
+        host, port = address.rsplit(':', 1)
+        return host, int(port)
+    return address
+
+
+def _get_authkey():
+    return hashlib.sha256(f'pdf-renderer:{settings.SECRET_KEY}'.encode()).digest()
+
+
+def get_backend_paths():
+    return {**DEFAULT_BACKENDS, **getattr(settings, 'PDF_RENDER_BACKENDS', {})}
+
+
+def get_backend(name):
+    """The backend registered as `name` (one instance per process)"""
+    path = get_backend_paths().get(name)
+    if path is None:
+        raise RenderError(f'Unknown PDF backend: {name}')
+    backend = _backends.get(path)
+    if backend is None:
+        backend = _backends[path] = import_string(path)()
+    return backend
+
+
+def _address_space():
+    """Bytes of address space this process uses, or None where unknown"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _init_worker():
+    from django.apps import apps
+    if not apps.ready:
+        # Workers started with 'spawn' (macOS, Windows) import Django afresh
+        import django
+        django.setup()
+
+    for name in get_backend_paths():
+        try:
+            get_backend(name).warm_up()
+        except Exception:
+            logger.exception('PDF backend %s could not be warmed up', name)
+
+    limit_mb = getattr(settings, 'PDF_RENDER_MEMORY_LIMIT_MB', 1024)
+    size = _address_space()
+    if limit_mb and resource is not None and size is not None:
+        hard = resource.getrlimit(resource.RLIMIT_AS)[1]
+        soft = size + limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (soft if hard == resource.RLIM_INFINITY else min(soft, hard), hard))
+
+
+def _run(name, args, kwargs, timeout):
+    """Render with backend `name` in a pool worker, interrupted after `timeout` seconds"""
+    backend = get_backend(name)
+    if not timeout or not hasattr(signal, 'setitimer'):
+        return backend.render(*args, **kwargs)
+
+    def interrupt(signum, frame):
+        raise _Interrupted
+
+    previous = signal.signal(signal.SIGALRM, interrupt)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return backend.render(*args, **kwargs)
+    except _Interrupted:
+        raise RenderTimeout(f'{name} render took longer than {timeout}s') from None
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _get_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=get_worker_count(), initializer=_init_worker)
+    return _pool
+
+
+def start_pool():
+    """Start this process's worker pool now and wait until its workers are warm"""
+    # Warmed here first, forked workers inherit the loaded libraries and fonts
+    for name in get_backend_paths():
+        try:
+            get_backend(name).warm_up()
+        except Exception:
+            logger.exception('PDF backend %s could not be warmed up', name)
+
+    pool = _get_pool()
+    # Workers run _init_worker before their first task
+    for future in [pool.submit(os.getpid) for _ in range(get_worker_count())]:
+        future.result()
+    return pool
+
+
+def _discard_pool(pool):
+    global _pool
+    with _lock:
+        if _pool is pool:
+            _pool = None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit_to_pool(backend, args, kwargs):
+    timeout = getattr(settings, 'PDF_RENDER_TIMEOUT', 60)
+    pool = _get_pool()
+    try:
+        future = pool.submit(_run, backend, args, kwargs, timeout)
+    except RuntimeError:
+        # Broken (BrokenProcessPool) or shut down by a failed render since it was fetched
+        _discard_pool(pool)
+        pool = _get_pool()
+        future = pool.submit(_run, backend, args, kwargs, timeout)
+    future.pool = pool
+    return future
+
+
+def _connect():
+    address = get_service_address()
+    try:
+        return Client(address, authkey=_get_authkey())
+    except OSError as e:
+        raise RendererUnavailable(f'PDF renderer service is not reachable at {address} (manage.py run_pdf_renderer)') from e
+
+
+def _call_service(backend, args, kwargs):
+    """Render on the host's renderer service over this client thread's connection"""
+    conn = getattr(_client, 'conn', None)
+    fresh = conn is None
+    while True:
+        if conn is None:
+            conn = _client.conn = _connect()
+            fresh = True
+        try:
+            conn.send((backend, args, kwargs))
+            outcome, payload = conn.recv()
+            break
+        except (OSError, EOFError) as e:
+            _client.conn = None
+            conn.close()
+            conn = None
+            # A kept connection may just have been closed by a service restart: reconnect once
+            if fresh:
+                raise RendererUnavailable('Lost the connection to the PDF renderer service') from e
+    if outcome == 'ok':
+        return payload
+    raise {'timeout': RenderTimeout, 'memory': MemoryError}.get(outcome, RenderError)(payload)
+
+
+def _get_calls():
+    global _calls
+    with _lock:
+        if _calls is None:
+            _calls = ThreadPoolExecutor(max_workers=get_worker_count() * 2, thread_name_prefix='pdf-renderer-client')
+    return _calls
+
+
+def submit(backend, /, *args, **kwargs):
+    """Start a render with `backend`; returns a Future for result()"""
+    mode = get_renderer_mode()
+    if mode == 'inline':
+        future = Future()
+        try:
+            future.set_result(get_backend(backend).render(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    if mode == 'pool':
+        return _submit_to_pool(backend, args, kwargs)
+    return _get_calls().submit(_call_service, backend, args, kwargs)
+
+
+def result(future, timeout=None):
+    """PDF bytes of a submitted render"""
+    try:
+        return future.result(timeout=timeout)
+    except BrokenProcessPool as e:
+        _discard_pool(getattr(future, 'pool', None))
+        raise RenderError('A PDF renderer worker died (memory limit or crash); the pool was restarted') from e
+
+
+def render(backend, /, *args, **kwargs):
+    """PDF bytes of a render with `backend`, waiting for it"""
+    return result(submit(backend, *args, **kwargs))
+
+
+def health_check(timeout=30):
+    """Render every backend's sample; {'ok', 'mode', 'workers', 'backends': {name: {...}}}"""
+    backends = {}
+    pending = {}
+    for name in get_backend_paths():
+        try:
+            backend = get_backend(name)
+            pending[name] = (backend, time.perf_counter(), submit(name, *backend.sample()))
+        except Exception as e:
+            backends[name] = {'ok': False, 'error': str(e)}
+
+    for name, (backend, began, future) in pending.items():
+        try:
+            pdf = result(future, timeout=timeout)
+        except TimeoutError:
+            backends[name] = {'ok': False, 'version': backend.version, 'error': f'No render within {timeout}s'}
+        except Exception as e:
+            backends[name] = {'ok': False, 'version': backend.version, 'error': str(e) or e.__class__.__name__}
+        else:
+            backends[name] = {
+                'ok': bool(pdf),
+                'version': backend.version,
+                'bytes': len(pdf),
+                'latency_ms': round((time.perf_counter() - began) * 1000, 1),
+            }
+
+    mode = get_renderer_mode()
+    return {
+        'ok': all(report['ok'] for report in backends.values()),
+        'mode': mode,
+        'workers': 0 if mode == 'inline' else get_worker_count(),
+        'backends': backends,
+    }
+
+
+def _serve_connection(conn):
+    """Answer one web process's renders until it disconnects"""
+    with conn:
+        while True:
+            try:
+                backend, args, kwargs = conn.recv()
+            except (OSError, EOFError):
+                return
+            try:
+                reply = ('ok', result(_submit_to_pool(backend, args, kwargs)))
+            except RenderTimeout as e:
+                reply = ('timeout', str(e))
+            except MemoryError as e:
+                reply = ('memory', str(e) or 'PDF render exceeded PDF_RENDER_MEMORY_LIMIT_MB')
+            except Exception as e:
+                reply = ('error', str(e) or e.__class__.__name__)
+            try:
+                conn.send(reply)
+            except OSError:
+                return
+
+
+def serve(address=None, ready=None):
+    """
+    Run the host's renderer service: warm the pool, then render for every
+    web process that connects. `ready` is called with the bound address.
+    Blocks until interrupted.
+    """
+    start_pool()
+    with Listener(address or get_service_address(), authkey=_get_authkey()) as listener:
+        if ready is not None:
+            ready(listener.address)
+        while True:
+            try:
+                conn = listener.accept()
+            except (AuthenticationError, EOFError, ConnectionError):
+                # A client that failed the handshake; keep serving the others
+                continue
+            except OSError:
+                # Listener closed
+                return
+            threading.Thread(target=_serve_connection, args=(conn,), name='pdf-renderer-connection', daemon=True).start()
+
+
+def shutdown(wait=True):
+    """Stop the worker pool and service clients; the next render starts them again"""
+    global _pool, _calls
+    with _lock:
+        pool, _pool = _pool, None
+        calls, _calls = _calls, None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=True)
+    if calls is not None:
+        calls.shutdown(wait=wait, cancel_futures=True)
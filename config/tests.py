@@ -1,3 +1,165 @@
-from django.test import TestCase
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
 
-# Create your tests here.
+from unittest import mock
+
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from . import identifier_utils
+from .identifier_utils import next_identifier, next_value, next_values
+from .models import CachedPDF, IdentifierSequence
+from .render_cache_utils import acquire_pdf, cache_key, cached_pdf, get_cache_stats, prune_cache, release_pdf
+from .renderer_utils import PDFBackend, RenderError, RendererUnavailable, RenderTimeout, health_check, render, serve, shutdown
+
+
+@override_settings(IDENTIFIER_BLOCK_SIZE=10)
+class IdentifierAllocationTests(TransactionTestCase):
+    """Runs outside a test transaction: blocks are only shared when reserved in autocommit"""
+
+    def setUp(self):
+        blocks = mock.patch.dict(identifier_utils._blocks, clear=True)
+        blocks.start()
+        self.addCleanup(blocks.stop)
+
+    def test_block_is_reserved_once(self):
+        values = next_values('test', 25)
+        values.append(next_value('test'))
+        self.assertEqual(values, list(range(1, 27)))
+        # one block of 25 for the bulk request, one of 10 for the single value
+        self.assertEqual(IdentifierSequence.objects.get(name='test').next_value, 36)
+        self.assertEqual(next_identifier('transfer', 'TXN'), 'TXN-00000001')
+
+    def test_reservation_in_open_transaction_is_not_shared(self):
+        try:
+            with transaction.atomic():
+                self.assertEqual(next_values('test', 2), [1, 2])
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        # the counter was rolled back with the caller, and nothing was cached
+        self.assertEqual(identifier_utils._blocks, {})
+        self.assertEqual(next_value('test'), 1)
+
+        with transaction.atomic():
+            # values of a committed block are safe to hand out in any transaction
+            self.assertEqual(next_value('test'), 2)
+        self.assertEqual(IdentifierSequence.objects.get(name='test').next_value, 11)
+
+
+class RenderCacheTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.renders = []
+
+    def render(self, content):
+        self.renders.append(content)
+        return f'%PDF {content}'.encode()
+
+    def test_identical_renders_share_one_file(self):
+        first = cached_pdf(cache_key('test-1', '<p>a</p>'), 'test-1', self.render, 'a')
+        again = cached_pdf(cache_key('test-1', '<p>a</p>'), 'test-1', self.render, 'a')
+        upgraded = cached_pdf(cache_key('test-2', '<p>a</p>'), 'test-2', self.render, 'a')
+
+        self.assertEqual(self.renders, ['a', 'a'])
+        self.assertEqual(again.file.name, first.file.name)
+        self.assertNotEqual(upgraded.file.name, first.file.name)
+        self.assertEqual(first.file.read(), b'%PDF a')
+
+        stats = get_cache_stats()
+        self.assertEqual((stats['entries'], stats['hits'], stats['renders']), (2, 1, 2))
+        self.assertEqual(stats['renderers']['test-1']['hit_rate'], 0.5)
+
+    def test_prune_keeps_referenced_entries(self):
+        kept = cached_pdf(cache_key('test', 'kept'), 'test', self.render, 'kept')
+        dropped = cached_pdf(cache_key('test', 'dropped'), 'test', self.render, 'dropped')
+        acquire_pdf(kept, 2)
+        acquire_pdf(dropped)
+        release_pdf(kept.file.name)
+        release_pdf(dropped.file.name)
+        release_pdf('documents/other.pdf')
+
+        self.assertEqual(prune_cache(max_age_days=-1), 1)
+        self.assertEqual(CachedPDF.objects.get().ref_count, 1)
+        self.assertTrue(kept.file.storage.exists(kept.file.name))
+        self.assertFalse(dropped.file.storage.exists(dropped.file.name))
+
+
+class SlowBackend(PDFBackend):
+    """Sleeps, exits or allocates on request, to exercise the renderer pool"""
+
+    version = 'slow-1'
+
+    def sample(self):
+        return (0,)
+
+    def render(self, seconds, exit=False, allocate_mb=0):
+        if exit:
+            os._exit(1)
+        bytearray(allocate_mb * 1024 * 1024)
+        time.sleep(seconds)
+        return b'%PDF slow'
+
+
+@override_settings(
+    PDF_RENDERER_MODE='pool', DOCUMENT_RENDER_WORKERS=1, PDF_RENDER_TIMEOUT=1, PDF_RENDER_MEMORY_LIMIT_MB=256,
+    PDF_RENDER_BACKENDS={'slow': 'config.tests.SlowBackend'},
+)
+class RendererServiceTests(TestCase):
+    def setUp(self):
+        shutdown()
+        self.addCleanup(shutdown)
+
+    def test_limits_leave_the_pool_usable(self):
+        self.assertEqual(render('slow', 0), b'%PDF slow')
+
+        with self.assertRaises(RenderTimeout):
+            render('slow', 5)
+        with self.assertRaises(MemoryError):
+            render('slow', 0, allocate_mb=1024)
+        with self.assertRaises(RenderError):
+            render('slow', 0, exit=True)
+
+        # A new pool replaces the one whose worker died
+        self.assertEqual(render('slow', 0), b'%PDF slow')
+
+    def test_health_check_renders_every_backend(self):
+        report = health_check()
+        self.assertTrue(report['ok'])
+        self.assertEqual(set(report['backends']), {'html', 'transfer_agreement', 'slow'})
+        self.assertEqual(report['backends']['slow']['version'], 'slow-1')
+
+
+@override_settings(
+    PDF_RENDERER_MODE='service', DOCUMENT_RENDER_WORKERS=1, PDF_RENDER_TIMEOUT=1,
+    PDF_RENDER_BACKENDS={'slow': 'config.tests.SlowBackend'},
+)
+class RendererServiceModeTests(TestCase):
+    def setUp(self):
+        shutdown()
+        self.addCleanup(shutdown)
+
+    def test_web_process_renders_on_the_host_service(self):
+        with override_settings(PDF_RENDERER_ADDRESS='127.0.0.1:1'):
+            with self.assertRaises(RendererUnavailable):
+                render('slow', 0)
+
+        bound = queue.Queue()
+        threading.Thread(target=serve, kwargs={'address': ('127.0.0.1', 0), 'ready': bound.put}, daemon=True).start()
+        host, port = bound.get(timeout=60)
+
+        with override_settings(PDF_RENDERER_ADDRESS=f'{host}:{port}'):
+            self.assertEqual(render('slow', 0), b'%PDF slow')
+            with self.assertRaises(RenderTimeout):
+                render('slow', 5)
+            report = health_check()
+        self.assertTrue(report['ok'])
+        self.assertEqual((report['mode'], report['workers']), ('service', 1))
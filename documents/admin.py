@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
-from .models import Document, DocumentSignatory, DocumentTemplate, DocumentGeneration, SyndicateDocumentDefaults
+from .models import Document, DocumentSignatory, DocumentTemplate, DocumentGeneration, SyndicateDocumentDefaults, DocumentGenerationJob, DocumentGenerationJobItem
 
 
 @admin.register(Document)
@@ -325,9 +325,11 @@ class DocumentGenerationAdmin(admin.ModelAdmin):
         'generated_document__title',
         'generated_by__username',
         'generated_by__email',
+        'investor__username',
     )
     readonly_fields = ('generated_at', 'pdf_file_size')
     autocomplete_fields = ['template', 'generated_document', 'generated_by']
+    raw_id_fields = ('investor',)
     
     fieldsets = (
         ('Generation Information', {
@@ -335,6 +337,7 @@ class DocumentGenerationAdmin(admin.ModelAdmin):
                 'template',
                 'generated_document',
                 'generated_by',
+                'investor',
                 'generated_at',
             )
         }),
@@ -419,3 +422,48 @@ class SyndicateDocumentDefaultsAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+
+@admin.register(DocumentGenerationJob)
+class DocumentGenerationJobAdmin(admin.ModelAdmin):
+    list_display = (
+        'id',
+        'template',
+        'spv',
+        'status',
+        'total_items',
+        'generated_count',
+        'failed_count',
+        'created_by',
+        'created_at',
+    )
+    list_filter = (
+        'status',
+    )
+    search_fields = (
+        'template__name',
+        'spv__display_name',
+        'created_by__username',
+    )
+    readonly_fields = ('total_items', 'generated_count', 'failed_count', 'error', 'created_at', 'started_at', 'finished_at')
+    raw_id_fields = ('template', 'spv', 'syndicate', 'created_by')
+
+
+@admin.register(DocumentGenerationJobItem)
+class DocumentGenerationJobItemAdmin(admin.ModelAdmin):
+    list_display = (
+        'job',
+        'investor',
+        'status',
+        'document',
+        'attempts',
+        'updated_at',
+    )
+    list_filter = (
+        'status',
+    )
+    search_fields = (
+        'investor__username',
+        'document__document_id',
+    )
+    raw_id_fields = ('job', 'investor', 'document')
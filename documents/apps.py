@@ -5,3 +5,5 @@ class DocumentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'documents'
 
+    def ready(self):
+        from . import signals  # noqa: F401
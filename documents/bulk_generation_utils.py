@@ -0,0 +1,431 @@
+"""
+Bulk document generation.
+
+A DocumentGenerationJob generates one document from a template for each
+investor of an SPV (an explicit list of the SPV's investors, or every
+investor with an investment in INVESTED_STATUSES). create_job() writes one DocumentGenerationJobItem per
+investor, unique per job, and the job runs once the transaction commits:
+
+    1. take the next DOCUMENT_GENERATION_BATCH_SIZE pending items
+    2. fill each investor's fields (saved defaults, job field data, investor
+       and SPV names, investment amount) into the compiled template and turn
+       the HTML into a PDF on the PDF renderer service (config/renderer_utils.py),
+       unless the PDF render cache already has it
+    3. in one transaction, bulk-create the batch's Document,
+       DocumentGeneration and DocumentSignatory rows pointing at the cached
+       PDFs, and mark the items generated (or failed, with the error)
+
+An item only becomes 'generated' in the transaction that creates its
+document, and items already generated are skipped under a row lock, so a job
+interrupted by a crash or restart is resumed by running it again
+(`manage.py run_document_generation_jobs`) without duplicate documents.
+retry_failed_items() puts failed items back in the queue.
+
+After every batch the job's counters are updated and a
+`generation_job_progress` message is pushed to the creator's
+`notifications_<user_id>` channel group.
+
+DOCUMENT_GENERATION_MODE selects how jobs run:
+
+    thread  background thread per process (default)
+    sync    inline after commit (tests, management commands)
+"""
+
+import json
+import logging
+import queue
+import threading
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from config.identifier_utils import next_identifiers
+from config.models import CachedPDF
+from config.render_cache_utils import acquire_pdf, cache_key, lookup_pdfs, store_pdf
+from config.renderer_utils import get_backend, result, submit
+from investors.dashboard_models import Investment
+from investors.fundraising_utils import INVESTED_STATUSES
+from investors.notification_utils import get_notification_group
+from .models import (
+    Document, DocumentGeneration, DocumentGenerationJob, DocumentGenerationJobItem,
+    DocumentSignatory, SyndicateDocumentDefaults,
+)
+from .template_utils import compile_template, create_default_template, get_compiled_template
+
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ('completed', 'completed_with_errors')
+
+_queue = None
+_lock = threading.Lock()
+
+
+class GenerationJobError(Exception):
+    """A job that cannot be started (no investors, missing required fields...)"""
+
+
+def get_generation_mode():
+    return getattr(settings, 'DOCUMENT_GENERATION_MODE', 'thread')
+
+
+def _normalize(name):
+    return str(name or '').lower().replace(' ', '_').replace('-', '_')
+
+
+def _field_definitions(fields):
+    if isinstance(fields, str):
+        try:
+            fields = json.loads(fields)
+        except json.JSONDecodeError:
+            return []
+    return [field for field in fields or [] if isinstance(field, dict)]
+
+
+def _filled(value):
+    return value is not None and not (isinstance(value, str) and not value.strip())
+
+
+def missing_required_fields(template, field_data, saved_defaults):
+    """
+    Labels of the template's required fields with no value in `field_data`,
+    with the same rules as generate_document_from_template: a configurable
+    field is covered by a saved default.
+    """
+    provided = {_normalize(key) for key, value in field_data.items() if _filled(value)}
+    defaults = {_normalize(key) for key, value in saved_defaults.items() if _filled(value)}
+    configurable = {_normalize(field.get('name')) for field in _field_definitions(template.configurable_fields)}
+
+    missing = []
+    for field in _field_definitions(template.required_fields):
+        if not field.get('required', False):
+            continue
+        name = _normalize(field.get('name'))
+        if name in provided or (name in configurable and name in defaults):
+            continue
+        missing.append(field.get('label', field.get('name')))
+    return missing
+
+
+def get_saved_defaults(syndicate_id, template_id):
+    if not syndicate_id:
+        return {}
+    defaults = SyndicateDocumentDefaults.objects.filter(syndicate_id=syndicate_id, template_id=template_id).first()
+    return (defaults.default_values or {}) if defaults else {}
+
+
+def investor_field_data(job, saved_defaults, investor, amount=None):
+    """Field values of one investor's document"""
+    data = {**saved_defaults, **job.field_data}
+    data['investor_id'] = investor.id
+    data['investor_name'] = investor.get_full_name() or investor.username
+    data.setdefault('investor_email', investor.email)
+    data.setdefault('spv_id', job.spv_id)
+    data.setdefault('spv_name', job.spv.display_name)
+    if amount is not None:
+        data.setdefault('investment_amount', str(amount))
+    return data
+
+
+def _investment_amounts(spv_id, investor_ids):
+    amounts = {}
+    for investor_id, amount in Investment.objects.filter(
+        spv_id=spv_id, investor_id__in=investor_ids, status__in=INVESTED_STATUSES
+    ).values_list('investor_id', 'invested_amount'):
+        amounts[investor_id] = amounts.get(investor_id, 0) + amount
+    return amounts
+
+
+def create_job(template, spv, user, investor_ids=None, field_data=None, title='', description='', enable_digital_signature=False):
+    """
+    Create a job for `investor_ids` (default: the SPV's investors) and run it
+    after commit. Raises GenerationJobError.
+    """
+    field_data = field_data or {}
+    syndicate = getattr(user, 'syndicateprofile', None)
+
+    if investor_ids:
+        investor_ids = list(dict.fromkeys(investor_ids))
+        # Only investors of this SPV: documents carry the SPV's and the investment's details
+        eligible = set(
+            Investment.objects.filter(
+                spv=spv, investor_id__in=investor_ids, investor__role='investor', status__in=INVESTED_STATUSES
+            ).values_list('investor_id', flat=True)
+        )
+        rejected = [investor_id for investor_id in investor_ids if investor_id not in eligible]
+        if rejected:
+            raise GenerationJobError(
+                f'Not investors in this SPV: {", ".join(str(investor_id) for investor_id in rejected)}'
+            )
+    else:
+        investor_ids = list(
+            Investment.objects.filter(spv=spv, status__in=INVESTED_STATUSES)
+            .order_by('investor_id').values_list('investor_id', flat=True).distinct()
+        )
+    if not investor_ids:
+        raise GenerationJobError('The SPV has no investors to generate documents for.')
+
+    # Investor fields are filled per investor, so check the rest against any one of them
+    saved_defaults = get_saved_defaults(syndicate.id if syndicate else None, template.id)
+    sample = {**saved_defaults, **field_data, 'investor_id': 0, 'investor_name': '-', 'investor_email': '-',
+              'spv_id': spv.id, 'spv_name': spv.display_name, 'investment_amount': '0'}
+    missing = missing_required_fields(template, sample, saved_defaults)
+    if missing:
+        raise GenerationJobError(f'Missing required fields: {", ".join(missing)}')
+
+    with transaction.atomic():
+        job = DocumentGenerationJob.objects.create(
+            template=template,
+            spv=spv,
+            syndicate=syndicate,
+            created_by=user,
+            field_data=field_data,
+            title=title or '',
+            description=description,
+            enable_digital_signature=enable_digital_signature,
+            total_items=len(investor_ids),
+        )
+        DocumentGenerationJobItem.objects.bulk_create(
+            [DocumentGenerationJobItem(job=job, investor_id=investor_id) for investor_id in investor_ids],
+            batch_size=500,
+        )
+        transaction.on_commit(lambda: dispatch_job(job.id))
+    return job
+
+
+def _render_html(job, compiled, data):
+    if job.title:
+        title = compile_template(job.title).render(data)
+    else:
+        title = f"{job.template.name} - {data.get('investor_name', data.get('spv_name', 'Document'))}"
+    if compiled is None:
+        compiled = compile_template(create_default_template(job.template, data, title), job.template.content_type or 'html')
+    return title, compiled.render(data)
+
+
+def _render_batch(job, items, compiled, saved_defaults):
+    """[(item, field data, title, CachedPDF or exception)] of a batch of items"""
+    renderer = get_backend('html').version
+    amounts = _investment_amounts(job.spv_id, [item.investor_id for item in items])
+    prepared = []
+    for item in items:
+        data = investor_field_data(job, saved_defaults, item.investor, amounts.get(item.investor_id))
+        try:
+            title, html = _render_html(job, compiled, data)
+        except Exception as e:
+            prepared.append((item, data, '', None, e))
+            continue
+        prepared.append((item, data, title, html, None))
+
+    keys = {html: cache_key(renderer, html) for _, _, _, html, error in prepared if error is None}
+    cached = lookup_pdfs(keys.values())
+    pending = [html for html in keys if keys[html] not in cached]
+
+    # The whole batch is in flight on the renderer's workers at once
+    futures = {html: submit('html', html) for html in pending}
+    renders = {}
+    for html, future in futures.items():
+        try:
+            renders[html] = result(future)
+        except Exception as e:
+            renders[html] = e
+
+    for html, pdf in renders.items():
+        if not isinstance(pdf, Exception):
+            cached[keys[html]] = store_pdf(keys[html], renderer, pdf)
+
+    outcomes = []
+    for item, data, title, html, error in prepared:
+        pdf = error if error is not None else cached.get(keys[html]) or renders[html]
+        outcomes.append((item, data, title, pdf))
+    return outcomes
+
+
+def _write_batch(job, outcomes):
+    """Create the batch's documents and settle its items in one transaction"""
+    with transaction.atomic():
+        # Items another run already settled are skipped, so a document is never created twice
+        open_ids = set(
+            DocumentGenerationJobItem.objects.select_for_update()
+            .filter(id__in=[item.id for item, *_ in outcomes], status__in=['pending', 'rendering'])
+            .values_list('id', flat=True)
+        )
+        outcomes = [outcome for outcome in outcomes if outcome[0].id in open_ids]
+        rendered = [outcome for outcome in outcomes if isinstance(outcome[3], CachedPDF)]
+        failed = [outcome for outcome in outcomes if not isinstance(outcome[3], CachedPDF)]
+
+        documents = []
+        generations = []
+        signatories = []
+        for (item, data, title, pdf), document_id in zip(rendered, next_identifiers('document', 'OTH', len(rendered))):
+            document = Document(
+                document_id=document_id,
+                title=title[:255],
+                description=job.description or job.template.description,
+                document_type='other',
+                version='1.0',
+                status='pending_signatures' if job.enable_digital_signature else 'draft',
+                created_by_id=job.created_by_id,
+                spv_id=job.spv_id,
+                syndicate_id=job.syndicate_id,
+                original_filename=f"{title.replace(' ', '_').replace('/', '_')}.pdf"[:255],
+                file=pdf.file.name,
+                file_size=pdf.file_size,
+                mime_type='application/pdf',
+            )
+            documents.append(document)
+            # Referenced by the document and its generation record
+            acquire_pdf(pdf, 2)
+        Document.objects.bulk_create(documents)
+
+        for (item, data, title, pdf), document in zip(rendered, documents):
+            # The generation record points at the same cached PDF as the document
+            generations.append(DocumentGeneration(
+                template_id=job.template_id,
+                generated_document=document,
+                generated_pdf=pdf.file.name,
+                pdf_filename=document.original_filename,
+                pdf_file_size=pdf.file_size,
+                generation_data=data,
+                investor_id=item.investor_id,
+                generated_by_id=job.created_by_id,
+                enable_digital_signature=job.enable_digital_signature,
+            ))
+            if job.enable_digital_signature:
+                signatories.append(DocumentSignatory(
+                    document=document, user_id=item.investor_id, role='Investor', invited_by_id=job.created_by_id,
+                ))
+            item.status = 'generated'
+            item.document = document
+            item.error = None
+        DocumentGeneration.objects.bulk_create(generations)
+        DocumentSignatory.objects.bulk_create(signatories)
+
+        for item, data, title, error in failed:
+            item.status = 'failed'
+            item.error = str(error) or error.__class__.__name__
+        now = timezone.now()
+        for outcome in outcomes:
+            outcome[0].updated_at = now
+        DocumentGenerationJobItem.objects.bulk_update(
+            [outcome[0] for outcome in outcomes], ['status', 'document', 'error', 'updated_at']
+        )
+
+
+def _push_progress(job):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(get_notification_group(job.created_by_id), {
+            'type': 'generation_job_progress',
+            'job': {
+                'id': job.id,
+                'status': job.status,
+                'total_items': job.total_items,
+                'generated_count': job.generated_count,
+                'failed_count': job.failed_count,
+                'progress_percentage': job.progress_percentage,
+            },
+        })
+    except Exception:
+        logger.exception('Progress of generation job %s could not be pushed', job.id)
+
+
+def update_progress(job):
+    """Recount the job's items, finish it when none are left, and push the progress"""
+    counts = dict(job.items.values_list('status').annotate(count=Count('id')).order_by())
+    job.generated_count = counts.get('generated', 0)
+    job.failed_count = counts.get('failed', 0)
+    fields = ['generated_count', 'failed_count', 'updated_at']
+    if not counts.get('pending') and not counts.get('rendering'):
+        job.status = 'completed_with_errors' if job.failed_count else 'completed'
+        job.finished_at = timezone.now()
+        fields += ['status', 'finished_at']
+    job.save(update_fields=fields)
+    _push_progress(job)
+    return job
+
+
+def run_job(job_id):
+    """Generate the documents of a job's pending items, batch by batch"""
+    job = DocumentGenerationJob.objects.select_related('template', 'spv').get(id=job_id)
+    if job.status in FINISHED_STATUSES:
+        return job
+
+    job.status = 'running'
+    job.started_at = job.started_at or timezone.now()
+    job.error = None
+    job.save(update_fields=['status', 'started_at', 'error', 'updated_at'])
+
+    batch_size = getattr(settings, 'DOCUMENT_GENERATION_BATCH_SIZE', 50)
+    try:
+        compiled = get_compiled_template(job.template) if (job.template.template_content or '').strip() else None
+        saved_defaults = get_saved_defaults(job.syndicate_id, job.template_id)
+        while True:
+            items = list(job.items.filter(status='pending').select_related('investor').order_by('id')[:batch_size])
+            if not items:
+                break
+            DocumentGenerationJobItem.objects.filter(id__in=[item.id for item in items]).update(
+                status='rendering', attempts=F('attempts') + 1
+            )
+            _write_batch(job, _render_batch(job, items, compiled, saved_defaults))
+            update_progress(job)
+        return update_progress(job)
+    except Exception as e:
+        logger.exception('Generation job %s failed', job_id)
+        job.status = 'failed'
+        job.error = str(e)
+        job.save(update_fields=['status', 'error', 'updated_at'])
+        _push_progress(job)
+        return job
+
+
+def resume_job(job_id):
+    """Run an interrupted job again; items left rendering by a crash are retried"""
+    DocumentGenerationJobItem.objects.filter(job_id=job_id, status='rendering').update(status='pending')
+    return run_job(job_id)
+
+
+def retry_failed_items(job, dispatch=True):
+    """Queue a job's failed items again (and run it after commit). Returns the number of items retried."""
+    retried = job.items.filter(status='failed').update(status='pending', error=None)
+    if retried:
+        DocumentGenerationJob.objects.filter(id=job.id).update(status='pending', finished_at=None)
+        if dispatch:
+            transaction.on_commit(lambda: dispatch_job(job.id))
+    return retried
+
+
+def _worker():
+    while True:
+        job_id = _queue.get()
+        try:
+            run_job(job_id)
+        except Exception:
+            logger.exception('Generation job %s could not be run', job_id)
+        finally:
+            _queue.task_done()
+
+
+def dispatch_job(job_id):
+    """Run a job according to DOCUMENT_GENERATION_MODE"""
+    global _queue
+    if get_generation_mode() == 'sync':
+        return run_job(job_id)
+    with _lock:
+        if _queue is None:
+            _queue = queue.Queue()
+            threading.Thread(target=_worker, name='document-generation-jobs', daemon=True).start()
+    _queue.put(job_id)
+    return None
+
+
+def wait_for_jobs():
+    """Block until every dispatched job has run"""
+    if _queue is not None:
+        _queue.join()
@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from documents.models import DocumentGeneration
+
+
+class Command(BaseCommand):
+    help = "Fill DocumentGeneration.investor from generation_data['investor_id'] for rows saved before the field existed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per update')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        User = get_user_model()
+
+        pending = DocumentGeneration.objects.filter(investor__isnull=True, generation_data__has_key='investor_id')
+        updated = 0
+        batch = []
+
+        def flush():
+            nonlocal updated
+            existing = set(User.objects.filter(id__in={row.investor_id for row in batch}).values_list('id', flat=True))
+            rows = [row for row in batch if row.investor_id in existing]
+            DocumentGeneration.objects.bulk_update(rows, ['investor'])
+            updated += len(rows)
+            batch.clear()
+
+        for generation in pending.only('id', 'generation_data').order_by('id').iterator(chunk_size=batch_size):
+            generation.investor_id = DocumentGeneration.investor_id_from_data(generation.generation_data)
+            if generation.investor_id:
+                batch.append(generation)
+            if len(batch) == batch_size:
+                flush()
+        flush()
+
+        self.stdout.write(self.style.SUCCESS(f'Linked {updated} document generation(s) to their investor'))
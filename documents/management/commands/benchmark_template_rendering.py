@@ -0,0 +1,71 @@
+import random
+import re
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from documents.models import DocumentTemplate
+from documents.template_utils import clear_template_cache, get_compiled_template
+
+
+def substitute_per_field(content, field_data):
+    """The previous substitution: two regex passes over the whole content per field"""
+    for key, value in field_data.items():
+        value = '' if value is None else str(value)
+        content = re.sub(r'\{\{' + re.escape(key) + r'\}\}', value, content, flags=re.IGNORECASE)
+        content = re.sub(r'\{' + re.escape(key) + r'\}', value, content, flags=re.IGNORECASE)
+    return content
+
+
+class Command(BaseCommand):
+    help = 'Compare per-field regex substitution with compiled template rendering'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fields', type=int, default=200, help='Fields in the template')
+        parser.add_argument('--size', type=int, default=100_000, help='Template size in bytes')
+        parser.add_argument('--renders', type=int, default=50, help='Renders to time')
+
+    def handle(self, *args, **options):
+        fields = [f'field_{i}' for i in range(options['fields'])]
+        field_data = {name: f'Value {i}' for i, name in enumerate(fields)}
+
+        rng = random.Random(0)
+        chunks = []
+        size = 0
+        while size < options['size']:
+            name = rng.choice(fields)
+            placeholder = f'{{{{{name}}}}}' if rng.random() < 0.5 else f'{{{name.upper()}}}'
+            chunk = f'<p>Clause {len(chunks)}: the party named {placeholder} agrees to the terms below.</p>\n'
+            chunks.append(chunk)
+            size += len(chunk)
+        content = ''.join(chunks)
+
+        template = DocumentTemplate(pk=-1, name='Benchmark', template_content=content, content_type='html', updated_at=timezone.now())
+        renders = options['renders']
+        self.stdout.write(f'Template: {len(content):,} bytes, {len(fields)} fields, {len(chunks):,} placeholders')
+
+        began = time.perf_counter()
+        for _ in range(renders):
+            expected = substitute_per_field(content, field_data)
+        per_field = (time.perf_counter() - began) / renders
+
+        clear_template_cache()
+        began = time.perf_counter()
+        compiled = get_compiled_template(template)
+        compile_time = time.perf_counter() - began
+
+        began = time.perf_counter()
+        for _ in range(renders):
+            rendered = get_compiled_template(template).render(field_data)
+        cached = (time.perf_counter() - began) / renders
+        clear_template_cache()
+
+        self.stdout.write(f'Per-field regex:  {per_field * 1000:.2f}ms per render')
+        self.stdout.write(f'Compile (once):   {compile_time * 1000:.2f}ms ({len(compiled.parts):,} parts)')
+        self.stdout.write(f'Compiled render:  {cached * 1000:.2f}ms per render ({per_field / cached:.0f}x)')
+
+        if rendered != expected:
+            self.stdout.write(self.style.ERROR('Compiled output differs from per-field substitution'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Outputs match'))
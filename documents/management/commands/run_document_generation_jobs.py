@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from documents.bulk_generation_utils import resume_job, retry_failed_items
+from documents.models import DocumentGenerationJob
+
+
+class Command(BaseCommand):
+    help = 'Run unfinished bulk document generation jobs (after a restart or crash) in this process'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--job', type=int, action='append', dest='job_ids', help='Only these job ids (repeatable)')
+        parser.add_argument('--retry-failed', action='store_true', help='Also retry the failed investors of finished jobs')
+
+    def handle(self, *args, **options):
+        jobs = DocumentGenerationJob.objects.all()
+        if options['job_ids']:
+            jobs = jobs.filter(id__in=options['job_ids'])
+        if options['retry_failed']:
+            for job in jobs.filter(failed_count__gt=0):
+                retry_failed_items(job, dispatch=False)
+        jobs = jobs.filter(status__in=['pending', 'running', 'failed']).order_by('created_at')
+
+        for job_id in list(jobs.values_list('id', flat=True)):
+            job = resume_job(job_id)
+            self.stdout.write(
+                f'Job {job.id}: {job.get_status_display()} - '
+                f'{job.generated_count} generated, {job.failed_count} failed of {job.total_items}'
+            )
+        self.stdout.write(self.style.SUCCESS('Done'))
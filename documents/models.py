@@ -114,8 +114,9 @@ class Document(models.Model):
     def save(self, *args, **kwargs):
         if not self.document_id:
             # Generate unique document ID
+            from config.identifier_utils import next_identifier
             prefix = self.document_type.upper()[:3] if self.document_type else 'DOC'
-            self.document_id = f"{prefix}-{uuid.uuid4().hex[:6].upper()}"
+            self.document_id = next_identifier('document', prefix)
         
         if self.file:
             if not self.original_filename:
@@ -357,6 +358,16 @@ class DocumentGeneration(models.Model):
         help_text="Field values used during document generation"
     )
     
+    # Investor the document was generated for (generation_data['investor_id'], see save())
+    investor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='investor_document_generations',
+        help_text="Investor the document was generated for"
+    )
+    
     # Generation metadata
     generated_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -376,10 +387,33 @@ class DocumentGeneration(models.Model):
         ordering = ['-generated_at']
         verbose_name = 'document generation'
         verbose_name_plural = 'document generations'
+        indexes = [
+            models.Index(fields=['investor', 'generated_document']),
+        ]
     
     def __str__(self):
         return f"{self.template.name} -> {self.generated_document.document_id}"
     
+    @staticmethod
+    def investor_id_from_data(generation_data):
+        """The investor id stored in generation data (int or digit string), or None"""
+        investor_id = (generation_data or {}).get('investor_id')
+        if isinstance(investor_id, bool):
+            return None
+        if isinstance(investor_id, int):
+            return investor_id
+        if isinstance(investor_id, str) and investor_id.strip().isdigit():
+            return int(investor_id)
+        return None
+    
+    def save(self, *args, **kwargs):
+        if self.investor_id is None:
+            from django.contrib.auth import get_user_model
+            investor_id = self.investor_id_from_data(self.generation_data)
+            if investor_id and get_user_model().objects.filter(id=investor_id).exists():
+                self.investor_id = investor_id
+        super().save(*args, **kwargs)
+    
     @property
     def pdf_file_size_mb(self):
         """Get PDF file size in MB"""
@@ -437,3 +471,133 @@ class SyndicateDocumentDefaults(models.Model):
     
     def __str__(self):
         return f"{self.syndicate} - {self.template.name} defaults"
+
+
+class DocumentGenerationJob(models.Model):
+    """
+    Bulk generation of one document per investor of an SPV from a template.
+    
+    Each investor is a DocumentGenerationJobItem; see documents/bulk_generation_utils.py.
+    """
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('completed_with_errors', 'Completed with Errors'),
+        ('failed', 'Failed'),
+    ]
+    
+    template = models.ForeignKey(
+        DocumentTemplate,
+        on_delete=models.CASCADE,
+        related_name='generation_jobs',
+        help_text="Template the documents are generated from"
+    )
+    spv = models.ForeignKey(
+        'spv.SPV',
+        on_delete=models.CASCADE,
+        related_name='document_generation_jobs',
+        help_text="SPV whose investors get a document"
+    )
+    syndicate = models.ForeignKey(
+        'users.SyndicateProfile',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='document_generation_jobs',
+        help_text="Syndicate whose saved defaults are used"
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='document_generation_jobs',
+        help_text="User who started the job"
+    )
+    
+    # Generation options shared by every investor's document
+    field_data = models.JSONField(default=dict, blank=True, help_text="Field values shared by every document")
+    title = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Document title; may use placeholders such as {investor_name}"
+    )
+    description = models.TextField(blank=True, null=True, help_text="Description of the generated documents")
+    enable_digital_signature = models.BooleanField(
+        default=False,
+        help_text="Add each investor as a signatory and request signatures"
+    )
+    
+    # Progress
+    status = models.CharField(max_length=30, choices=STATUS_CHOICES, default='pending')
+    total_items = models.PositiveIntegerField(default=0)
+    generated_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, null=True, help_text="Error that stopped the job")
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'document generation job'
+        verbose_name_plural = 'document generation jobs'
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.template.name} for {self.spv.display_name} ({self.get_status_display()})"
+    
+    @property
+    def progress_percentage(self):
+        if not self.total_items:
+            return 0
+        return round((self.generated_count + self.failed_count) * 100 / self.total_items, 1)
+
+
+class DocumentGenerationJobItem(models.Model):
+    """One investor's document in a DocumentGenerationJob"""
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('rendering', 'Rendering'),
+        ('generated', 'Generated'),
+        ('failed', 'Failed'),
+    ]
+    
+    job = models.ForeignKey(
+        DocumentGenerationJob,
+        on_delete=models.CASCADE,
+        related_name='items'
+    )
+    investor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='document_generation_job_items'
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    document = models.OneToOneField(
+        Document,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='generation_job_item',
+        help_text="Document generated for the investor"
+    )
+    error = models.TextField(blank=True, null=True, help_text="Error of the last failed attempt")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'document generation job item'
+        verbose_name_plural = 'document generation job items'
+        unique_together = ['job', 'investor']
+        indexes = [
+            models.Index(fields=['job', 'status']),
+        ]
+    
+    def __str__(self):
+        return f"Job {self.job_id} - {self.investor_id} ({self.status})"
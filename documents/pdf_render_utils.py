@@ -0,0 +1,178 @@
+"""
+HTML to PDF rendering for template documents.
+
+render_html_pdf() tries xhtml2pdf, then WeasyPrint, then a plain-text
+ReportLab rendering. HTMLBackend exposes it to the PDF renderer service
+(config/renderer_utils.py) as the 'html' backend, whose warm worker
+processes import these libraries and load their fonts once.
+"""
+
+import logging
+import re
+from io import BytesIO
+
+from config.renderer_utils import PDFBackend
+
+
+logger = logging.getLogger(__name__)
+
+# PDF generation - try multiple libraries for cross-platform support
+# Priority: xhtml2pdf (best for Windows), WeasyPrint (Linux/Mac), ReportLab (fallback)
+WEASYPRINT_AVAILABLE = False
+XHTML2PDF_AVAILABLE = False
+REPORTLAB_AVAILABLE = False
+
+# Try xhtml2pdf first (best for Windows, no external dependencies)
+try:
+    from xhtml2pdf import pisa
+    XHTML2PDF_AVAILABLE = True
+except ImportError:
+    XHTML2PDF_AVAILABLE = False
+
+# Try WeasyPrint (good for Linux/Mac, requires GTK on Windows)
+try:
+    from weasyprint import HTML
+    WEASYPRINT_AVAILABLE = True
+except (ImportError, OSError):
+    WEASYPRINT_AVAILABLE = False
+
+# Fallback to ReportLab (basic text rendering)
+if not XHTML2PDF_AVAILABLE and not WEASYPRINT_AVAILABLE:
+    try:
+        from reportlab.lib.pagesizes import letter, A4
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.lib.units import inch
+        REPORTLAB_AVAILABLE = True
+    except ImportError:
+        REPORTLAB_AVAILABLE = False
+
+# Renderer version (the first library of the fallback chain), part of render cache keys
+if XHTML2PDF_AVAILABLE:
+    import xhtml2pdf
+    HTML_PDF_RENDERER = f'xhtml2pdf-{xhtml2pdf.__version__}'
+elif WEASYPRINT_AVAILABLE:
+    import weasyprint
+    HTML_PDF_RENDERER = f'weasyprint-{weasyprint.__version__}'
+else:
+    HTML_PDF_RENDERER = 'reportlab-text'
+
+
+def render_html_pdf(html_content):
+    """
+    Generate PDF from HTML content using xhtml2pdf (Windows-friendly), WeasyPrint, or ReportLab.
+    
+    Args:
+        html_content: HTML content as string
+        
+    Returns:
+        bytes: PDF content
+    """
+    # Create a complete HTML document if not already complete
+    if '<html' not in html_content.lower():
+        html_content = f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="UTF-8">
+            <style>
+                @page {{
+                    size: A4;
+                    margin: 2cm;
+                }}
+                body {{
+                    font-family: Arial, sans-serif;
+                    margin: 0;
+                    padding: 0;
+                    line-height: 1.6;
+                }}
+                h1, h2, h3 {{
+                    color: #333;
+                }}
+                table {{
+                    border-collapse: collapse;
+                    width: 100%;
+                    margin: 20px 0;
+                }}
+                th, td {{
+                    border: 1px solid #ddd;
+                    padding: 12px;
+                    text-align: left;
+                }}
+                th {{
+                    background-color: #f2f2f2;
+                }}
+            </style>
+        </head>
+        <body>
+            {html_content}
+        </body>
+        </html>
+        """
+    
+    # Try xhtml2pdf first (best for Windows, no external dependencies)
+    if XHTML2PDF_AVAILABLE:
+        try:
+            buffer = BytesIO()
+            result = pisa.CreatePDF(
+                html_content,
+                dest=buffer,
+                encoding='utf-8'
+            )
+            
+            if not result.err:
+                return buffer.getvalue()
+            else:
+                raise Exception(f"xhtml2pdf PDF generation failed: {result.err}")
+        except Exception as e:
+            # If xhtml2pdf fails, try next option
+            logger.warning(f"xhtml2pdf failed, trying alternative: {str(e)}")
+    
+    # Try WeasyPrint (good for Linux/Mac)
+    if WEASYPRINT_AVAILABLE:
+        try:
+            return HTML(string=html_content).write_pdf()
+        except Exception as e:
+            # If WeasyPrint fails, try next option
+            logger.warning(f"WeasyPrint failed, trying alternative: {str(e)}")
+    
+    # Fallback to ReportLab (basic text rendering)
+    if REPORTLAB_AVAILABLE:
+        try:
+            buffer = BytesIO()
+            doc = SimpleDocTemplate(buffer, pagesize=A4)
+            styles = getSampleStyleSheet()
+            story = []
+            
+            # Simple HTML to text conversion for ReportLab
+            # Remove HTML tags and create paragraphs
+            text_content = re.sub(r'<[^>]+>', '', html_content)
+            paragraphs = text_content.split('\n\n')
+            
+            for para in paragraphs:
+                if para.strip():
+                    story.append(Paragraph(para.strip(), styles['Normal']))
+                    story.append(Spacer(1, 0.2*inch))
+            
+            doc.build(story)
+            return buffer.getvalue()
+        except Exception as e:
+            raise Exception(f"ReportLab PDF generation failed: {str(e)}")
+    
+    # No PDF library available - raise error
+    raise ImportError(
+        "No PDF generation library available. Please install xhtml2pdf (recommended for Windows) or WeasyPrint. "
+        "Install with: pip install xhtml2pdf"
+    )
+
+
+class HTMLBackend(PDFBackend):
+    """Renders HTML (template documents) with the xhtml2pdf / WeasyPrint / ReportLab fallback chain"""
+
+    version = HTML_PDF_RENDERER
+
+    def sample(self):
+        return ('<h1>Subscription Agreement</h1><table><tr><th>Investor</th><td>Jane Doe</td></tr></table>',)
+
+    def render(self, html_content):
+        return render_html_pdf(html_content)
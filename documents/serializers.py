@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Document, DocumentSignatory, DocumentTemplate, DocumentGeneration, SyndicateDocumentDefaults
+from .models import Document, DocumentSignatory, DocumentTemplate, DocumentGeneration, SyndicateDocumentDefaults, DocumentGenerationJob, DocumentGenerationJobItem
 from users.models import CustomUser
 
 
@@ -562,3 +562,114 @@ class SyndicateDocumentDefaultsCreateSerializer(serializers.ModelSerializer):
         if not isinstance(value, dict):
             raise serializers.ValidationError("default_values must be a dictionary.")
         return value
+
+
+class DocumentGenerationJobItemSerializer(serializers.ModelSerializer):
+    """Serializer for one investor of a bulk generation job"""
+    
+    investor_detail = serializers.SerializerMethodField()
+    document_id = serializers.CharField(source='document.document_id', read_only=True, default=None)
+    
+    class Meta:
+        model = DocumentGenerationJobItem
+        fields = [
+            'id',
+            'investor',
+            'investor_detail',
+            'status',
+            'document',
+            'document_id',
+            'error',
+            'attempts',
+            'updated_at',
+        ]
+        read_only_fields = fields
+    
+    def get_investor_detail(self, obj):
+        return {
+            'id': obj.investor.id,
+            'username': obj.investor.username,
+            'full_name': obj.investor.get_full_name() or obj.investor.username,
+        }
+
+
+class DocumentGenerationJobSerializer(serializers.ModelSerializer):
+    """Serializer for bulk generation jobs and their progress"""
+    
+    template_name = serializers.CharField(source='template.name', read_only=True)
+    spv_name = serializers.CharField(source='spv.display_name', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    progress_percentage = serializers.FloatField(read_only=True)
+    
+    class Meta:
+        model = DocumentGenerationJob
+        fields = [
+            'id',
+            'template',
+            'template_name',
+            'spv',
+            'spv_name',
+            'title',
+            'description',
+            'field_data',
+            'enable_digital_signature',
+            'status',
+            'status_display',
+            'total_items',
+            'generated_count',
+            'failed_count',
+            'progress_percentage',
+            'error',
+            'created_by',
+            'created_at',
+            'started_at',
+            'finished_at',
+        ]
+        read_only_fields = fields
+
+
+class DocumentGenerationJobCreateSerializer(serializers.Serializer):
+    """
+    Serializer for starting a bulk generation job.
+    
+    {
+        "template_id": 5,
+        "spv_id": 3,
+        "investor_ids": [10, 11],  // Optional - default: every investor of the SPV
+        "field_data": {"closing_date": "2025-01-31"},  // Shared by every document
+        "title": "Subscription Agreement - {investor_name}",  // Optional
+        "enable_digital_signature": true
+    }
+    """
+    
+    template_id = serializers.IntegerField(help_text="ID of the template to use")
+    spv_id = serializers.IntegerField(help_text="SPV whose investors get a document")
+    investor_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        allow_empty=True,
+        help_text="Investor user IDs (default: every investor of the SPV)"
+    )
+    field_data = serializers.JSONField(required=False, default=dict, help_text="Field values shared by every document")
+    title = serializers.CharField(required=False, allow_blank=True, max_length=255)
+    description = serializers.CharField(required=False, allow_blank=True)
+    enable_digital_signature = serializers.BooleanField(default=False)
+    
+    def validate_template_id(self, value):
+        """Validate template exists and is active"""
+        if not DocumentTemplate.objects.filter(id=value, is_active=True).exists():
+            raise serializers.ValidationError("Template not found or is not active.")
+        return value
+    
+    def validate_spv_id(self, value):
+        """Validate SPV exists"""
+        from spv.models import SPV
+        if not SPV.objects.filter(id=value).exists():
+            raise serializers.ValidationError("SPV not found with the given ID.")
+        return value
+    
+    def validate_field_data(self, value):
+        """Validate field data is a dictionary"""
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("field_data must be a dictionary.")
+        return value
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from config.render_cache_utils import release_pdf
+
+from .models import Document, DocumentGeneration
+
+
+@receiver(post_delete, sender=Document)
+def release_document_pdf(sender, instance, **kwargs):
+    """The document no longer references its cached PDF"""
+    release_pdf(instance.file.name)
+
+
+@receiver(post_delete, sender=DocumentGeneration)
+def release_generation_pdf(sender, instance, **kwargs):
+    """The generation record no longer references its cached PDF"""
+    release_pdf(instance.generated_pdf.name)
@@ -0,0 +1,253 @@
+"""
+Compiled document templates.
+
+DocumentTemplate.template_content is parsed once into a list of literal
+strings and placeholders, `{{field}}` or `{field}` (field names match case
+insensitively), and rendering is one pass over that list. Placeholders
+without a value in the field data are left as written.
+
+Markdown templates are converted to HTML at compile time: placeholders are
+swapped for inert markers, the markdown is converted once and the markers are
+turned back into placeholders. Field values are therefore inserted into the
+converted HTML rather than going through markdown themselves.
+
+Compiled templates are kept per process, keyed by template id and
+updated_at, so saving a template recompiles it on next use. At most
+DOCUMENT_TEMPLATE_CACHE_SIZE templates are kept (least recently used first
+out).
+
+create_default_template() builds the HTML used for templates without
+content: a titled table of the field data.
+"""
+
+import re
+import threading
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+PLACEHOLDER = re.compile(r'\{\{([^{}\n]+)\}\}|\{([^{}\n]+)\}')
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+class CompiledTemplate:
+    """Template content split into literal strings and (field name, placeholder text) pairs"""
+
+    __slots__ = ('parts',)
+
+    def __init__(self, parts):
+        self.parts = parts
+
+    @property
+    def fields(self):
+        return {part[0] for part in self.parts if not isinstance(part, str)}
+
+    def render(self, field_data):
+        values = {}
+        for key, value in field_data.items():
+            values.setdefault(str(key).lower(), '' if value is None else str(value))
+        return ''.join(
+            part if isinstance(part, str) else values.get(part[0], part[1])
+            for part in self.parts
+        )
+
+
+def _tokenize(content):
+    parts = []
+    position = 0
+    for match in PLACEHOLDER.finditer(content):
+        if match.start() > position:
+            parts.append(content[position:match.start()])
+        parts.append(((match.group(1) or match.group(2)).lower(), match.group(0)))
+        position = match.end()
+    if position < len(content):
+        parts.append(content[position:])
+    return parts
+
+
+def _compile_markdown(content):
+    try:
+        import markdown
+    except ImportError:
+        # Without markdown the template is shown as plain text
+        return ['<html><body><pre>', *_tokenize(content), '</pre></body></html>']
+
+    placeholders = [part for part in _tokenize(content) if not isinstance(part, str)]
+    marker = f'TPLFIELD{uuid.uuid4().hex}N'
+    numbered = iter(range(len(placeholders)))
+    source = PLACEHOLDER.sub(lambda match: f'{marker}{next(numbered)}E', content)
+    html = markdown.markdown(source)
+
+    parts = []
+    for index, piece in enumerate(re.split(f'{marker}(\\d+)E', html)):
+        if index % 2:
+            parts.append(placeholders[int(piece)])
+        elif piece:
+            parts.append(piece)
+    return parts
+
+
+def compile_template(content, content_type='html'):
+    """CompiledTemplate of template content; markdown is converted to HTML"""
+    if content_type == 'markdown':
+        return CompiledTemplate(_compile_markdown(content))
+    return CompiledTemplate(_tokenize(content))
+
+
+def get_compiled_template(template):
+    """CompiledTemplate of a saved DocumentTemplate's content, from the per-process cache"""
+    content_type = template.content_type or 'html'
+    if template.pk is None:
+        return compile_template(template.template_content or '', content_type)
+
+    key = (template.pk, template.updated_at, content_type)
+    with _lock:
+        compiled = _cache.get(key)
+        if compiled is not None:
+            _cache.move_to_end(key)
+            return compiled
+
+    compiled = compile_template(template.template_content or '', content_type)
+    with _lock:
+        _cache[key] = compiled
+        # Older versions of the same template can no longer be hit
+        for stale in [cached for cached in _cache if cached[0] == template.pk and cached != key]:
+            del _cache[stale]
+        while len(_cache) > getattr(settings, 'DOCUMENT_TEMPLATE_CACHE_SIZE', 256):
+            _cache.popitem(last=False)
+    return compiled
+
+
+def clear_template_cache():
+    with _lock:
+        _cache.clear()
+
+
+def create_default_template(template, field_data, title=None):
+    """
+    Create a default HTML template when template_content is empty.
+    
+    Args:
+        template: DocumentTemplate instance
+        field_data: Dictionary of field values
+        title: Optional title for the document
+        
+    Returns:
+        str: HTML content
+    """
+    from datetime import datetime
+    
+    doc_title = title or template.name
+    
+    # Build fields table HTML
+    fields_html = ""
+    for key, value in field_data.items():
+        # Convert key to readable label
+        label = key.replace('_', ' ').title()
+        fields_html += f"""
+        <tr>
+            <td style="font-weight: bold; padding: 10px; border: 1px solid #ddd; background-color: #f9f9f9;">{label}</td>
+            <td style="padding: 10px; border: 1px solid #ddd;">{value if value else '-'}</td>
+        </tr>
+        """
+    
+    # Create default HTML template
+    html_content = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        <title>{doc_title}</title>
+        <style>
+            @page {{
+                size: A4;
+                margin: 2cm;
+            }}
+            body {{
+                font-family: Arial, sans-serif;
+                line-height: 1.6;
+                color: #333;
+                margin: 0;
+                padding: 20px;
+            }}
+            .header {{
+                text-align: center;
+                border-bottom: 2px solid #2c5f2d;
+                padding-bottom: 20px;
+                margin-bottom: 30px;
+            }}
+            .header h1 {{
+                color: #2c5f2d;
+                margin: 0;
+                font-size: 24px;
+            }}
+            .header p {{
+                color: #666;
+                margin: 5px 0 0 0;
+            }}
+            .section {{
+                margin-bottom: 30px;
+            }}
+            .section-title {{
+                color: #2c5f2d;
+                font-size: 18px;
+                border-bottom: 1px solid #ddd;
+                padding-bottom: 10px;
+                margin-bottom: 15px;
+            }}
+            table {{
+                width: 100%;
+                border-collapse: collapse;
+                margin-bottom: 20px;
+            }}
+            .meta-info {{
+                background-color: #f5f5f5;
+                padding: 15px;
+                border-radius: 5px;
+                margin-bottom: 30px;
+            }}
+            .meta-info p {{
+                margin: 5px 0;
+            }}
+            .footer {{
+                margin-top: 50px;
+                padding-top: 20px;
+                border-top: 1px solid #ddd;
+                text-align: center;
+                font-size: 12px;
+                color: #666;
+            }}
+        </style>
+    </head>
+    <body>
+        <div class="header">
+            <h1>{doc_title}</h1>
+            <p>{template.description or 'Generated Document'}</p>
+        </div>
+        
+        <div class="meta-info">
+            <p><strong>Template:</strong> {template.name} (v{template.version})</p>
+            <p><strong>Category:</strong> {template.get_category_display() if hasattr(template, 'get_category_display') else template.category}</p>
+            <p><strong>Generated:</strong> {datetime.now().strftime('%B %d, %Y at %I:%M %p')}</p>
+        </div>
+        
+        <div class="section">
+            <h2 class="section-title">Document Details</h2>
+            <table>
+                {fields_html}
+            </table>
+        </div>
+        
+        <div class="footer">
+            <p>This document was automatically generated.</p>
+            <p>Document ID will be assigned upon finalization.</p>
+        </div>
+    </body>
+    </html>
+    """
+    
+    return html_content
@@ -1,4 +1,235 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
 
+from config.models import CachedPDF
+from config.render_cache_utils import store_pdf
+from investors.dashboard_models import Investment
+from spv.models import SPV
+from users.models import CustomUser
+from .bulk_generation_utils import _write_batch, resume_job
+from .models import Document, DocumentGeneration, DocumentGenerationJob, DocumentSignatory, DocumentTemplate
+from .pdf_render_utils import HTMLBackend
+from .template_utils import clear_template_cache, get_compiled_template
+
+
+class InvestorDocumentVisibilityTests(TestCase):
+    def setUp(self):
+        self.manager = CustomUser.objects.create_user(username='manager', email='manager@example.com', password='pass')
+        self.investor = CustomUser.objects.create_user(username='lp0', email='lp0@example.com', password='pass', role='investor')
+        self.template = DocumentTemplate.objects.create(
+            name='Subscription', description='Subscription agreement', category='legal', created_by=self.manager,
+        )
+
+    def generate(self, generation_data):
+        document = Document.objects.create(title='Subscription', created_by=self.manager)
+        DocumentGeneration.objects.create(
+            template=self.template, generated_document=document, generation_data=generation_data, generated_by=self.manager,
+        )
+        return document
+
+    def test_investor_sees_documents_generated_for_them(self):
+        mine = self.generate({'investor_id': self.investor.id})
+        self.generate({'investor_id': self.manager.id})
+        self.generate({})
+
+        client = APIClient()
+        client.force_authenticate(self.investor)
+        response = client.get(reverse('document-list'))
+        self.assertEqual([row['id'] for row in response.data['results']], [mine.id])
+
+        client.force_authenticate(self.manager)
+        response = client.get(reverse('document-list'), {'investor_id': self.investor.id})
+        self.assertEqual([row['id'] for row in response.data['results']], [mine.id])
+
+    def test_backfill_links_existing_generations(self):
+        document = self.generate({'investor_id': str(self.investor.id)})
+        missing = self.generate({'investor_id': 999999})
+        DocumentGeneration.objects.update(investor=None)
+
+        call_command('backfill_generation_investors', stdout=io.StringIO())
+        self.assertEqual(DocumentGeneration.objects.get(generated_document=document).investor, self.investor)
+        self.assertIsNone(DocumentGeneration.objects.get(generated_document=missing).investor)
+
+
+class CompiledTemplateTests(TestCase):
+    def setUp(self):
+        clear_template_cache()
+        self.addCleanup(clear_template_cache)
+
+    def template(self, content, content_type='html'):
+        return DocumentTemplate(pk=1, name='T', template_content=content, content_type=content_type, updated_at=timezone.now())
+
+    def test_placeholders_render_in_one_pass(self):
+        template = self.template('<p>{{Investor_Name}} / {investor_name} / {{amount}} / {unknown} / {{ spaced }}</p>')
+        rendered = get_compiled_template(template).render({'investor_name': 'A {amount}', 'amount': None})
+        self.assertEqual(rendered, '<p>A {amount} / A {amount} /  / {unknown} / {{ spaced }}</p>')
+
+    def test_cache_follows_updated_at(self):
+        template = self.template('{{a}}')
+        self.assertIs(get_compiled_template(template), get_compiled_template(template))
+
+        template.template_content = '[{{a}}]'
+        template.updated_at += timedelta(seconds=1)
+        self.assertEqual(get_compiled_template(template).render({'a': 1}), '[1]')
+
+    def test_markdown_is_converted_once(self):
+        template = self.template('# {{title}}\n\nDear *{name}*', content_type='markdown')
+        compiled = get_compiled_template(template)
+        self.assertEqual(compiled.render({'title': 'Notice', 'name': 'Bo'}), '<h1>Notice</h1>\n<p>Dear <em>Bo</em></p>')
+        self.assertEqual(compiled.fields, {'title', 'name'})
+
+
+class FlakyHTMLBackend(HTMLBackend):
+    """Fails to render lp1's documents"""
+
+    def render(self, html_content):
+        if 'lp1' in html_content:
+            raise ValueError('renderer crashed')
+        return super().render(html_content)
+
+
+@override_settings(DOCUMENT_GENERATION_MODE='sync', DOCUMENT_GENERATION_BATCH_SIZE=2, PDF_RENDERER_MODE='inline')
+class BulkGenerationTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.manager = CustomUser.objects.create_user(username='manager', email='manager@example.com', password='pass')
+        self.spv = SPV.objects.create(
+            created_by=self.manager, display_name='Fund I', portfolio_company_name='Co',
+            founder_email='founder@example.com', status='active', allocation=Decimal('100000'),
+        )
+        self.investors = []
+        for i, status in enumerate(['active', 'committed', 'approved', 'cancelled']):
+            investor = CustomUser.objects.create_user(username=f'lp{i}', email=f'lp{i}@example.com', password='pass', role='investor')
+            Investment.objects.create(
+                investor=investor, spv=self.spv, syndicate_name='Fund I', invested_amount=Decimal(1000 * (i + 1)), status=status,
+            )
+            self.investors.append(investor)
+        self.template = DocumentTemplate.objects.create(
+            name='Subscription', description='Subscription agreement', category='legal', created_by=self.manager,
+            template_content='<p>{{investor_name}} subscribes {{investment_amount}} to {spv_name} on {{closing_date}}</p>',
+            required_fields=[{'name': 'closing_date', 'label': 'Closing Date', 'required': True}],
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def start(self, execute=True, **payload):
+        payload = {'template_id': self.template.id, 'spv_id': self.spv.id, **payload}
+        with self.captureOnCommitCallbacks(execute=execute):
+            return self.client.post(reverse('document-generation-job-list'), payload, format='json')
+
+    def test_generates_one_document_per_investor(self):
+        response = self.start()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Closing Date', response.data['error'])
+
+        response = self.start(field_data={'closing_date': '2025-01-31'}, enable_digital_signature=True)
+        self.assertEqual(response.status_code, 202)
+        job = DocumentGenerationJob.objects.get(id=response.data['data']['id'])
+        self.assertEqual((job.status, job.total_items, job.generated_count), ('completed', 3, 3))
+
+        generations = DocumentGeneration.objects.filter(generated_document__generation_job_item__job=job)
+        self.assertEqual(sorted(generations.values_list('investor__username', flat=True)), ['lp0', 'lp1', 'lp2'])
+        lp1 = generations.get(investor=self.investors[1])
+        self.assertEqual(lp1.generation_data['investment_amount'], '2000.00')
+        self.assertEqual(lp1.generated_pdf.name, lp1.generated_document.file.name)
+        self.assertTrue(lp1.generated_document.file.read().startswith(b'%PDF'))
+        self.assertEqual(DocumentSignatory.objects.filter(document__spv=self.spv, role='Investor').count(), 3)
+
+        # A second job for the same investors and fields reuses the cached PDFs
+        self.start(field_data={'closing_date': '2025-01-31'})
+        self.assertEqual(CachedPDF.objects.count(), 3)
+        cached = CachedPDF.objects.get(file=lp1.generated_pdf.name)
+        self.assertEqual((cached.hit_count, cached.render_count, cached.ref_count), (1, 1, 4))
+
+        lp1.generated_document.delete()
+        cached.refresh_from_db()
+        self.assertEqual(cached.ref_count, 2)
+        self.assertEqual(self.client.get(reverse('render-cache-stats')).status_code, 403)
+        self.client.force_authenticate(CustomUser.objects.create_user(username='admin', email='admin@example.com', password='pass', is_staff=True))
+        self.assertEqual(self.client.get(reverse('render-cache-stats')).data['hit_rate'], 0.5)
+        self.assertEqual(self.client.get(reverse('renderer-health')).data['backends']['html']['version'], HTMLBackend.version)
+
+    def test_explicit_investors_must_invest_in_the_spv(self):
+        outsider = CustomUser.objects.create_user(username='outsider', email='outsider@example.com', password='pass', role='investor')
+        response = self.start(
+            investor_ids=[self.investors[0].id, outsider.id, self.manager.id], field_data={'closing_date': '2025-01-31'},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(outsider.id), response.data['error'])
+        self.assertIn(str(self.manager.id), response.data['error'])
+        self.assertFalse(DocumentGenerationJob.objects.exists())
+
+        # A cancelled investment does not count
+        response = self.start(investor_ids=[self.investors[3].id], field_data={'closing_date': '2025-01-31'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(self.investors[3].id), response.data['error'])
+
+        response = self.start(investor_ids=[self.investors[0].id], field_data={'closing_date': '2025-01-31'})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['data']['total_items'], 1)
+
+    def test_single_generation_shares_cached_pdf(self):
+        payload = {'template_id': self.template.id, 'field_data': {'investor_name': 'lp0', 'closing_date': '2025-01-31'}}
+        first = self.client.post('/blockchain-backend/api/documents/generate-from-template/', payload, format='json')
+        again = self.client.post('/blockchain-backend/api/documents/generate-from-template/', payload, format='json')
+        self.assertTrue(first.data['pdf_generated'])
+
+        documents = Document.objects.filter(id__in=[first.data['data']['document']['id'], again.data['data']['document']['id']])
+        generation = DocumentGeneration.objects.get(generated_document_id=first.data['data']['document']['id'])
+        self.assertEqual(len({document.file.name for document in documents} | {generation.generated_pdf.name}), 1)
+        cached = CachedPDF.objects.get()
+        self.assertEqual((cached.render_count, cached.hit_count, cached.ref_count), (1, 1, 4))
+        self.assertEqual(generation.pdf_file_size, cached.file_size)
+
+    def test_single_generation_fails_without_the_renderer_service(self):
+        payload = {'template_id': self.template.id, 'field_data': {'investor_name': 'lp0', 'closing_date': '2025-01-31'}}
+        with override_settings(PDF_RENDERER_MODE='service', PDF_RENDERER_ADDRESS='127.0.0.1:1'):
+            response = self.client.post('/blockchain-backend/api/documents/generate-from-template/', payload, format='json')
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('not reachable', response.data['error'])
+        self.assertFalse(Document.objects.exists())
+
+    def test_failures_are_reported_and_retried(self):
+        with override_settings(PDF_RENDER_BACKENDS={'html': 'documents.tests.FlakyHTMLBackend'}):
+            response = self.start(field_data={'closing_date': '2025-01-31'})
+        job_id = response.data['data']['id']
+        job = DocumentGenerationJob.objects.get(id=job_id)
+        self.assertEqual((job.status, job.generated_count, job.failed_count), ('completed_with_errors', 2, 1))
+
+        failed = self.client.get(reverse('document-generation-job-items', args=[job_id]), {'status': 'failed'}).data['results']
+        self.assertEqual([(item['investor'], item['error']) for item in failed], [(self.investors[1].id, 'renderer crashed')])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('document-generation-job-retry-failed', args=[job_id]))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.generated_count, job.failed_count), ('completed', 3, 0))
+        self.assertEqual(Document.objects.filter(spv=self.spv).count(), 3)
+
+    def test_resume_does_not_duplicate(self):
+        response = self.start(execute=False, field_data={'closing_date': '2025-01-31'})
+        job = DocumentGenerationJob.objects.get(id=response.data['data']['id'])
+        # Crash while the first item was rendering
+        crashed = job.items.order_by('id').first()
+        job.items.filter(id=crashed.id).update(status='rendering')
+
+        self.assertEqual(resume_job(job.id).generated_count, 3)
+
+        # A second runner finishing the same item later must not add a document
+        crashed.refresh_from_db()
+        _write_batch(job, [(crashed, {}, 'late', store_pdf('late', 'test', b'%PDF-late'))])
+        self.assertEqual(Document.objects.filter(spv=self.spv).count(), 3)
+        self.assertEqual(resume_job(job.id).generated_count, 3)
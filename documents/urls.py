@@ -6,8 +6,11 @@ from .views import (
     DocumentTemplateViewSet,
     SyndicateDocumentDefaultsViewSet,
     DocumentGenerationViewSet,
+    DocumentGenerationJobViewSet,
     generate_document_from_template,
     get_generated_documents,
+    get_render_cache_stats,
+    get_renderer_health,
     get_investors_list,
     get_spvs_list,
 )
@@ -18,10 +21,13 @@ router.register(r'document-signatories', DocumentSignatoryViewSet, basename='doc
 router.register(r'document-templates', DocumentTemplateViewSet, basename='document-template')
 router.register(r'syndicate-document-defaults', SyndicateDocumentDefaultsViewSet, basename='syndicate-document-defaults')
 router.register(r'document-generations', DocumentGenerationViewSet, basename='document-generation')
+router.register(r'document-generation-jobs', DocumentGenerationJobViewSet, basename='document-generation-job')
 
 urlpatterns = [
     path('documents/generate-from-template/', generate_document_from_template),
     path('documents/generated-documents/', get_generated_documents),
+    path('documents/render-cache-stats/', get_render_cache_stats, name='render-cache-stats'),
+    path('documents/renderer-health/', get_renderer_health, name='renderer-health'),
     path('documents/investors/', get_investors_list),  # GET list of investors for dropdown
     path('documents/spvs/', get_spvs_list),  # GET list of SPVs for dropdown
     path('', include(router.urls)),
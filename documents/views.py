@@ -6,43 +6,12 @@ from django.http import FileResponse
 from django.conf import settings
 from django.core.files.base import ContentFile
 import os
-import re
-import uuid
-from io import BytesIO
 from users.models import CustomUser
 from spv.models import SPV
-from .models import Document, DocumentSignatory, DocumentTemplate, DocumentGeneration, SyndicateDocumentDefaults
+from .models import Document, DocumentSignatory, DocumentTemplate, DocumentGeneration, SyndicateDocumentDefaults, DocumentGenerationJob
 
-# PDF generation - try multiple libraries for cross-platform support
-# Priority: xhtml2pdf (best for Windows), WeasyPrint (Linux/Mac), ReportLab (fallback)
-WEASYPRINT_AVAILABLE = False
-XHTML2PDF_AVAILABLE = False
-REPORTLAB_AVAILABLE = False
-
-# Try xhtml2pdf first (best for Windows, no external dependencies)
-try:
-    from xhtml2pdf import pisa
-    XHTML2PDF_AVAILABLE = True
-except ImportError:
-    XHTML2PDF_AVAILABLE = False
-
-# Try WeasyPrint (good for Linux/Mac, requires GTK on Windows)
-try:
-    from weasyprint import HTML
-    WEASYPRINT_AVAILABLE = True
-except (ImportError, OSError):
-    WEASYPRINT_AVAILABLE = False
-
-# Fallback to ReportLab (basic text rendering)
-if not XHTML2PDF_AVAILABLE and not WEASYPRINT_AVAILABLE:
-    try:
-        from reportlab.lib.pagesizes import letter, A4
-        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-        from reportlab.lib.styles import getSampleStyleSheet
-        from reportlab.lib.units import inch
-        REPORTLAB_AVAILABLE = True
-    except ImportError:
-        REPORTLAB_AVAILABLE = False
+from config.render_cache_utils import attach_pdf, cache_key, cached_pdf, get_cache_stats
+from config.renderer_utils import RendererUnavailable, get_backend, health_check, render
 from .serializers import (
     DocumentSerializer,
     DocumentListSerializer,
@@ -55,7 +24,12 @@ from .serializers import (
     DocumentGenerationRequestSerializer,
     SyndicateDocumentDefaultsSerializer,
     SyndicateDocumentDefaultsCreateSerializer,
+    DocumentGenerationJobSerializer,
+    DocumentGenerationJobCreateSerializer,
+    DocumentGenerationJobItemSerializer,
 )
+from .bulk_generation_utils import GenerationJobError, create_job, retry_failed_items
+from .template_utils import compile_template, create_default_template, get_compiled_template
 
 
 class IsOwnerOrAdmin(permissions.BasePermission):
@@ -102,30 +76,16 @@ class DocumentViewSet(viewsets.ModelViewSet):
         user = self.request.user
         queryset = Document.objects.all()
         
-        # Helper function to get document IDs for a specific investor (SQLite compatible)
-        def get_investor_document_ids(target_investor_id):
-            """Get document IDs where the investor_id in generation_data matches target_investor_id"""
-            doc_ids = []
-            for gen in DocumentGeneration.objects.all():
-                gen_data = gen.generation_data or {}
-                if gen_data.get('investor_id') == target_investor_id:
-                    doc_ids.append(gen.generated_document_id)
-            return doc_ids
-        
         # Filter by user role
         if not (user.is_staff or user.role == 'admin'):
-            # Get document IDs where this user is the investor (from generation_data)
-            # Using Python filtering for SQLite compatibility
-            investor_doc_ids = get_investor_document_ids(user.id)
-            
             # Users can see:
             # 1. Documents they created
             # 2. Documents they need to sign (signatories)
-            # 3. Documents generated FOR them (investor_id matches their user id)
+            # 3. Documents generated FOR them (DocumentGeneration.investor)
             queryset = queryset.filter(
                 Q(created_by=user) | 
                 Q(signatories__user=user) |
-                Q(id__in=investor_doc_ids)
+                Q(generation_history__investor=user)
             ).distinct()
         
         # Filter by status
@@ -159,9 +119,7 @@ class DocumentViewSet(viewsets.ModelViewSet):
         if investor_id_param:
             try:
                 target_investor_id = int(investor_id_param)
-                # Get document IDs generated for this investor (SQLite compatible)
-                investor_doc_ids = get_investor_document_ids(target_investor_id)
-                queryset = queryset.filter(id__in=investor_doc_ids)
+                queryset = queryset.filter(generation_history__investor_id=target_investor_id).distinct()
             except (ValueError, TypeError):
                 pass  # Invalid investor_id, ignore filter
         
@@ -889,13 +847,15 @@ class SyndicateDocumentDefaultsViewSet(viewsets.ModelViewSet):
         try:
             pdf_file = generate_pdf_from_template(template, merged_field_data, title)
             if pdf_file:
-                # Generate filename with document_id
-                filename = f"{document.document_id}_{uuid.uuid4().hex[:8]}.pdf"
-                # Save PDF file to document
-                document.file.save(filename, pdf_file, save=False)
+                # The document points at the cached PDF
+                attach_pdf(document.file, pdf_file)
                 document.original_filename = original_filename
                 document.mime_type = 'application/pdf'
                 pdf_generated = True
+        except RendererUnavailable as e:
+            # Not a problem with this document: don't store it without its PDF
+            document.delete()
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         except Exception as e:
             # Log error but don't fail the request - document will be created without PDF
             import logging
@@ -914,16 +874,13 @@ class SyndicateDocumentDefaultsViewSet(viewsets.ModelViewSet):
             enable_digital_signature=enable_digital_signature,
         )
         
-        # Also save PDF to generation record
+        # Also save PDF to generation record (the same cached file)
         if pdf_generated:
             try:
-                pdf_file_for_generation = generate_pdf_from_template(template, merged_field_data, title)
-                if pdf_file_for_generation:
-                    gen_filename = f"gen_{document.document_id}_{uuid.uuid4().hex[:8]}.pdf"
-                    generation.generated_pdf.save(gen_filename, pdf_file_for_generation, save=False)
-                    generation.pdf_filename = original_filename
-                    generation.pdf_file_size = pdf_file_for_generation.size if hasattr(pdf_file_for_generation, 'size') else len(pdf_file_for_generation.read())
-                    generation.save()
+                attach_pdf(generation.generated_pdf, pdf_file)
+                generation.pdf_filename = original_filename
+                generation.pdf_file_size = pdf_file.file_size
+                generation.save()
             except Exception as e:
                 import logging
                 logger = logging.getLogger(__name__)
@@ -1184,15 +1141,17 @@ def generate_document_from_template(request):
     try:
         pdf_file = generate_pdf_from_template(template, merged_field_data, title)
         if pdf_file:
-            # Generate filename with document_id
-            filename = f"{document.document_id}_{uuid.uuid4().hex[:8]}.pdf"
             original_filename = f"{title.replace(' ', '_').replace('/', '_')}.pdf"
             
-            # Save PDF file to document
-            document.file.save(filename, pdf_file, save=False)
+            # The document points at the cached PDF
+            attach_pdf(document.file, pdf_file)
             document.original_filename = original_filename
             document.mime_type = 'application/pdf'
             pdf_generated = True
+    except RendererUnavailable as e:
+        # Not a problem with this document: don't store it without its PDF
+        document.delete()
+        return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
     except Exception as e:
         # Log error but don't fail the request - document will be created without PDF
         import logging
@@ -1211,17 +1170,13 @@ def generate_document_from_template(request):
         enable_digital_signature=enable_digital_signature,
     )
     
-    # Also save PDF to generation record
+    # Also save PDF to generation record (the same cached file)
     if pdf_generated and document.file:
         try:
-            # Re-generate PDF for generation record (or copy from document)
-            pdf_file_for_generation = generate_pdf_from_template(template, merged_field_data, title)
-            if pdf_file_for_generation:
-                gen_filename = f"gen_{document.document_id}_{uuid.uuid4().hex[:8]}.pdf"
-                generation.generated_pdf.save(gen_filename, pdf_file_for_generation, save=False)
-                generation.pdf_filename = original_filename
-                generation.pdf_file_size = pdf_file_for_generation.size if hasattr(pdf_file_for_generation, 'size') else len(pdf_file_for_generation.read())
-                generation.save()
+            attach_pdf(generation.generated_pdf, pdf_file)
+            generation.pdf_filename = original_filename
+            generation.pdf_file_size = pdf_file.file_size
+            generation.save()
         except Exception as e:
             import logging
             logger = logging.getLogger(__name__)
@@ -1282,181 +1237,41 @@ def generate_pdf_from_template(template, field_data, title=None):
         title: Optional title for the document
         
     Returns:
-        ContentFile: PDF file content
+        CachedPDF: the rendered PDF, shared with identical renders
     """
-    # Get template content
-    template_content = template.template_content or ''
     content_type = template.content_type or 'html'
     
     # If template_content is empty, create a default template
-    if not template_content.strip():
-        template_content = create_default_template(template, field_data, title)
-    
-    # Replace placeholders in template content
-    # Support both {{field_name}} and {field_name} formats
-    processed_content = template_content
-    
-    # Replace all placeholders with field values
-    for key, value in field_data.items():
-        if value is None:
-            value = ''
-        else:
-            value = str(value)
-        
-        # Replace {{field_name}} format
-        placeholder_pattern = r'\{\{' + re.escape(key) + r'\}\}'
-        processed_content = re.sub(placeholder_pattern, value, processed_content, flags=re.IGNORECASE)
-        
-        # Replace {field_name} format
-        placeholder_pattern2 = r'\{' + re.escape(key) + r'\}'
-        processed_content = re.sub(placeholder_pattern2, value, processed_content, flags=re.IGNORECASE)
-    
-    # Generate PDF based on content type
-    if content_type == 'html' or content_type == 'jsx':
-        return generate_pdf_from_html(processed_content)
-    elif content_type == 'markdown':
-        # Convert markdown to HTML first
-        try:
-            import markdown
-            processed_content = markdown.markdown(processed_content)
-        except ImportError:
-            # If markdown not available, treat as plain text
-            processed_content = f"<html><body><pre>{processed_content}</pre></body></html>"
-        return generate_pdf_from_html(processed_content)
+    if not (template.template_content or '').strip():
+        compiled = compile_template(create_default_template(template, field_data, title), content_type)
     else:
-        # Default to HTML
-        return generate_pdf_from_html(processed_content)
+        compiled = get_compiled_template(template)
+    
+    # Replace {{field_name}} and {field_name} placeholders in one pass
+    # (markdown templates are compiled to HTML already)
+    return get_cached_pdf_from_html(compiled.render(field_data))
 
 
-def create_default_template(template, field_data, title=None):
+def get_cached_pdf_from_html(html_content):
     """
-    Create a default HTML template when template_content is empty.
+    PDF of HTML content from the render cache (config/render_cache_utils.py),
+    rendered with generate_pdf_from_html on a miss.
     
-    Args:
-        template: DocumentTemplate instance
-        field_data: Dictionary of field values
-        title: Optional title for the document
-        
     Returns:
-        str: HTML content
-    """
-    from datetime import datetime
-    
-    doc_title = title or template.name
-    
-    # Build fields table HTML
-    fields_html = ""
-    for key, value in field_data.items():
-        # Convert key to readable label
-        label = key.replace('_', ' ').title()
-        fields_html += f"""
-        <tr>
-            <td style="font-weight: bold; padding: 10px; border: 1px solid #ddd; background-color: #f9f9f9;">{label}</td>
-            <td style="padding: 10px; border: 1px solid #ddd;">{value if value else '-'}</td>
-        </tr>
-        """
-    
-    # Create default HTML template
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <title>{doc_title}</title>
-        <style>
-            @page {{
-                size: A4;
-                margin: 2cm;
-            }}
-            body {{
-                font-family: Arial, sans-serif;
-                line-height: 1.6;
-                color: #333;
-                margin: 0;
-                padding: 20px;
-            }}
-            .header {{
-                text-align: center;
-                border-bottom: 2px solid #2c5f2d;
-                padding-bottom: 20px;
-                margin-bottom: 30px;
-            }}
-            .header h1 {{
-                color: #2c5f2d;
-                margin: 0;
-                font-size: 24px;
-            }}
-            .header p {{
-                color: #666;
-                margin: 5px 0 0 0;
-            }}
-            .section {{
-                margin-bottom: 30px;
-            }}
-            .section-title {{
-                color: #2c5f2d;
-                font-size: 18px;
-                border-bottom: 1px solid #ddd;
-                padding-bottom: 10px;
-                margin-bottom: 15px;
-            }}
-            table {{
-                width: 100%;
-                border-collapse: collapse;
-                margin-bottom: 20px;
-            }}
-            .meta-info {{
-                background-color: #f5f5f5;
-                padding: 15px;
-                border-radius: 5px;
-                margin-bottom: 30px;
-            }}
-            .meta-info p {{
-                margin: 5px 0;
-            }}
-            .footer {{
-                margin-top: 50px;
-                padding-top: 20px;
-                border-top: 1px solid #ddd;
-                text-align: center;
-                font-size: 12px;
-                color: #666;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            <h1>{doc_title}</h1>
-            <p>{template.description or 'Generated Document'}</p>
-        </div>
-        
-        <div class="meta-info">
-            <p><strong>Template:</strong> {template.name} (v{template.version})</p>
-            <p><strong>Category:</strong> {template.get_category_display() if hasattr(template, 'get_category_display') else template.category}</p>
-            <p><strong>Generated:</strong> {datetime.now().strftime('%B %d, %Y at %I:%M %p')}</p>
-        </div>
-        
-        <div class="section">
-            <h2 class="section-title">Document Details</h2>
-            <table>
-                {fields_html}
-            </table>
-        </div>
-        
-        <div class="footer">
-            <p>This document was automatically generated.</p>
-            <p>Document ID will be assigned upon finalization.</p>
-        </div>
-    </body>
-    </html>
+        CachedPDF: cache entry; attach_pdf() points a file field at it
     """
-    
-    return html_content
+    renderer = get_backend('html').version
+    return cached_pdf(
+        cache_key(renderer, html_content),
+        renderer,
+        lambda: generate_pdf_from_html(html_content).read(),
+    )
 
 
 def generate_pdf_from_html(html_content):
     """
-    Generate PDF from HTML content using xhtml2pdf (Windows-friendly), WeasyPrint, or ReportLab.
+    Generate PDF from HTML content on the PDF renderer service (the 'html'
+    backend: xhtml2pdf, WeasyPrint or ReportLab, see documents/pdf_render_utils.py).
     
     Args:
         html_content: HTML content as string
@@ -1464,109 +1279,8 @@ def generate_pdf_from_html(html_content):
     Returns:
         ContentFile: PDF file content
     """
-    # Create a complete HTML document if not already complete
-    if '<html' not in html_content.lower():
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <style>
-                @page {{
-                    size: A4;
-                    margin: 2cm;
-                }}
-                body {{
-                    font-family: Arial, sans-serif;
-                    margin: 0;
-                    padding: 0;
-                    line-height: 1.6;
-                }}
-                h1, h2, h3 {{
-                    color: #333;
-                }}
-                table {{
-                    border-collapse: collapse;
-                    width: 100%;
-                    margin: 20px 0;
-                }}
-                th, td {{
-                    border: 1px solid #ddd;
-                    padding: 12px;
-                    text-align: left;
-                }}
-                th {{
-                    background-color: #f2f2f2;
-                }}
-            </style>
-        </head>
-        <body>
-            {html_content}
-        </body>
-        </html>
-        """
-    
-    # Try xhtml2pdf first (best for Windows, no external dependencies)
-    if XHTML2PDF_AVAILABLE:
-        try:
-            buffer = BytesIO()
-            result = pisa.CreatePDF(
-                html_content,
-                dest=buffer,
-                encoding='utf-8'
-            )
-            
-            if not result.err:
-                buffer.seek(0)
-                return ContentFile(buffer.read(), name='document.pdf')
-            else:
-                raise Exception(f"xhtml2pdf PDF generation failed: {result.err}")
-        except Exception as e:
-            # If xhtml2pdf fails, try next option
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.warning(f"xhtml2pdf failed, trying alternative: {str(e)}")
-    
-    # Try WeasyPrint (good for Linux/Mac)
-    if WEASYPRINT_AVAILABLE:
-        try:
-            pdf_bytes = HTML(string=html_content).write_pdf()
-            return ContentFile(pdf_bytes, name='document.pdf')
-        except Exception as e:
-            # If WeasyPrint fails, try next option
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.warning(f"WeasyPrint failed, trying alternative: {str(e)}")
-    
-    # Fallback to ReportLab (basic text rendering)
-    if REPORTLAB_AVAILABLE:
-        try:
-            buffer = BytesIO()
-            doc = SimpleDocTemplate(buffer, pagesize=A4)
-            styles = getSampleStyleSheet()
-            story = []
-            
-            # Simple HTML to text conversion for ReportLab
-            # Remove HTML tags and create paragraphs
-            text_content = re.sub(r'<[^>]+>', '', html_content)
-            paragraphs = text_content.split('\n\n')
-            
-            for para in paragraphs:
-                if para.strip():
-                    story.append(Paragraph(para.strip(), styles['Normal']))
-                    story.append(Spacer(1, 0.2*inch))
-            
-            doc.build(story)
-            buffer.seek(0)
-            return ContentFile(buffer.read(), name='document.pdf')
-        except Exception as e:
-            raise Exception(f"ReportLab PDF generation failed: {str(e)}")
-    
-    # No PDF library available - raise error
-    raise ImportError(
-        "No PDF generation library available. Please install xhtml2pdf (recommended for Windows) or WeasyPrint. "
-        "Install with: pip install xhtml2pdf"
-    )
+    return ContentFile(render('html', html_content), name='document.pdf')
+
 
 
 # returns a list of all documents that were generated from templates.like an audit log.
@@ -1593,6 +1307,37 @@ def get_generated_documents(request):
     return Response(serializer.data)
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def get_render_cache_stats(request):
+    """
+    PDF render cache size and hit rate, overall and per renderer (admins only)
+    GET /api/documents/render-cache-stats/
+    """
+    if not (request.user.is_staff or request.user.role == 'admin'):
+        return Response({
+            'error': 'Only admins can view render cache statistics'
+        }, status=status.HTTP_403_FORBIDDEN)
+    return Response(get_cache_stats())
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def get_renderer_health(request):
+    """
+    Render a sample with every PDF renderer backend (admins only)
+    GET /api/documents/renderer-health/
+    
+    Returns 200 when every backend rendered, 503 otherwise.
+    """
+    if not (request.user.is_staff or request.user.role == 'admin'):
+        return Response({
+            'error': 'Only admins can check the PDF renderer'
+        }, status=status.HTTP_403_FORBIDDEN)
+    report = health_check()
+    return Response(report, status=status.HTTP_200_OK if report['ok'] else status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def get_investors_list(request):
@@ -1873,4 +1618,90 @@ class DocumentGenerationViewSet(viewsets.ReadOnlyModelViewSet):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-
+class DocumentGenerationJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Bulk document generation for an SPV's investors.
+    POST /api/document-generation-jobs/ - Start a job (SPV manager or admin)
+    GET /api/document-generation-jobs/ - List jobs
+    GET /api/document-generation-jobs/{id}/ - Job progress
+    GET /api/document-generation-jobs/{id}/items/?status=failed - Per-investor results
+    POST /api/document-generation-jobs/{id}/retry_failed/ - Retry failed investors
+    """
+    queryset = DocumentGenerationJob.objects.all()
+    serializer_class = DocumentGenerationJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        """Admins see every job, other users the jobs they started"""
+        user = self.request.user
+        queryset = DocumentGenerationJob.objects.all()
+        if not (user.is_staff or user.role == 'admin'):
+            queryset = queryset.filter(created_by=user)
+        
+        # `status` also filters the items action, so list filters apply to the list only
+        if self.action == 'list':
+            spv_id = self.request.query_params.get('spv_id', None)
+            if spv_id:
+                queryset = queryset.filter(spv_id=spv_id)
+            
+            status_filter = self.request.query_params.get('status', None)
+            if status_filter:
+                queryset = queryset.filter(status=status_filter)
+        
+        return queryset.select_related('template', 'spv')
+    
+    def create(self, request, *args, **kwargs):
+        serializer = DocumentGenerationJobCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+        
+        spv = SPV.objects.get(id=data['spv_id'])
+        if not (request.user.is_staff or request.user.role == 'admin' or spv.created_by_id == request.user.id):
+            return Response({
+                'error': 'Only the SPV manager or an admin can generate documents for its investors'
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        try:
+            job = create_job(
+                template=DocumentTemplate.objects.get(id=data['template_id']),
+                spv=spv,
+                user=request.user,
+                investor_ids=data.get('investor_ids'),
+                field_data=data.get('field_data'),
+                title=data.get('title', ''),
+                description=data.get('description', ''),
+                enable_digital_signature=data.get('enable_digital_signature', False),
+            )
+        except GenerationJobError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'message': f'Generating {job.total_items} document(s)',
+            'data': DocumentGenerationJobSerializer(job).data,
+        }, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=True, methods=['get'])
+    def items(self, request, pk=None):
+        """Per-investor status, document and error of a job"""
+        job = self.get_object()
+        items = job.items.select_related('investor', 'document').order_by('id')
+        status_filter = request.query_params.get('status', None)
+        if status_filter:
+            items = items.filter(status=status_filter)
+        
+        page = self.paginate_queryset(items)
+        if page is not None:
+            return self.get_paginated_response(DocumentGenerationJobItemSerializer(page, many=True).data)
+        return Response(DocumentGenerationJobItemSerializer(items, many=True).data)
+    
+    @action(detail=True, methods=['post'])
+    def retry_failed(self, request, pk=None):
+        """Generate the failed investors' documents again"""
+        job = self.get_object()
+        retried = retry_failed_items(job)
+        job.refresh_from_db()
+        return Response({
+            'message': f'Retrying {retried} document(s)',
+            'data': DocumentGenerationJobSerializer(job).data,
+        })
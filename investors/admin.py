@@ -1,6 +1,6 @@
 from django.contrib import admin
 from .models import InvestorProfile
-from .dashboard_models import Portfolio, Investment, Notification, KYCStatus, Wishlist, PortfolioPerformance, TaxDocument, TaxSummary, InvestorDocument
+from .dashboard_models import Portfolio, Investment, Notification, KYCStatus, Wishlist, PortfolioPerformance, TaxDocument, TaxSummary, InvestorDocument, SPVFundraisingStats, SPVAllocation, SyndicateRanking
 
 # Register your models here.
 
@@ -261,13 +261,14 @@ class PortfolioAdmin(admin.ModelAdmin):
         'updated_at'
     ]
     
-    list_filter = ['created_at', 'updated_at']
+    list_filter = ['is_dirty', 'created_at', 'updated_at']
     search_fields = ['user__username', 'user__email']
     readonly_fields = [
         'created_at',
         'updated_at',
         'last_calculated_at',
-        'portfolio_growth_percentage'
+        'portfolio_growth_percentage',
+        'is_dirty'
     ]
     
     fieldsets = (
@@ -287,6 +288,7 @@ class PortfolioAdmin(admin.ModelAdmin):
             'fields': (
                 'total_investments_count',
                 'active_investments_count',
+                'is_dirty',
             )
         }),
         ('Timestamps', {
@@ -563,6 +565,7 @@ class PortfolioPerformanceAdmin(admin.ModelAdmin):
         'id',
         'portfolio',
         'get_user',
+        'resolution',
         'date',
         'total_invested',
         'current_value',
@@ -570,6 +573,7 @@ class PortfolioPerformanceAdmin(admin.ModelAdmin):
     ]
     
     list_filter = [
+        'resolution',
         'date',
         'created_at',
         'portfolio__user'
@@ -590,6 +594,7 @@ class PortfolioPerformanceAdmin(admin.ModelAdmin):
         }),
         ('Performance Data', {
             'fields': (
+                'resolution',
                 'date',
                 'total_invested',
                 'current_value',
@@ -780,3 +785,43 @@ class InvestorDocumentAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+
+@admin.register(SPVFundraisingStats)
+class SPVFundraisingStatsAdmin(admin.ModelAdmin):
+    """Admin interface for SPV fundraising counters (maintained automatically)"""
+    
+    list_display = ['spv', 'status', 'investment_count', 'total_amount', 'updated_at']
+    
+    list_filter = ['status']
+    
+    search_fields = ['spv__display_name', 'spv__portfolio_company_name']
+    
+    readonly_fields = ['spv', 'status', 'investment_count', 'total_amount', 'updated_at']
+
+
+@admin.register(SPVAllocation)
+class SPVAllocationAdmin(admin.ModelAdmin):
+    """Admin interface for reserved SPV allocation (maintained automatically)"""
+    
+    list_display = ['spv', 'reserved_amount', 'updated_at']
+    
+    search_fields = ['spv__display_name', 'spv__portfolio_company_name']
+    
+    readonly_fields = ['spv', 'reserved_amount', 'updated_at']
+
+
+@admin.register(SyndicateRanking)
+class SyndicateRankingAdmin(admin.ModelAdmin):
+    """Admin interface for the top syndicates leaderboard (maintained automatically)"""
+    
+    list_display = ['lead', 'total_spvs', 'active_spvs', 'total_investors', 'total_raised', 'latest_spv_at', 'is_dirty', 'updated_at']
+    
+    list_filter = ['is_dirty']
+    
+    search_fields = ['lead__username', 'lead__email']
+    
+    readonly_fields = [
+        'lead', 'total_spvs', 'active_spvs', 'total_allocation', 'latest_spv_at',
+        'sectors', 'total_investors', 'total_raised', 'is_dirty', 'updated_at'
+    ]
@@ -0,0 +1,124 @@
+"""
+SPV allocation reservations.
+
+An investment holds allocation while it is in one of RESERVED_STATUSES, and
+SPVAllocation.reserved_amount tracks the total per SPV (maintained by
+Investment.save()). New reservations claim capacity with a conditional
+UPDATE on that row (`reserved_amount <= allocation - amount`) as the first
+statement of the transaction that writes the investment. Concurrent commits
+against one SPV therefore queue on the row instead of all passing a stale
+read: SQLite takes its write lock on the UPDATE, PostgreSQL re-checks the
+condition once the competing transaction commits.
+
+Unpaid `pending_payment` reservations lapse after
+INVESTMENT_RESERVATION_TTL_HOURS and are released (status 'expired') by
+release_expired_reservations(), which reserve_allocation() also runs for
+the SPV before giving up on a full deal.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .dashboard_models import Investment, SPVAllocation
+from .fundraising_utils import RESERVED_STATUSES, get_investment_snapshot
+
+
+class AllocationExceeded(Exception):
+    """Raised when an SPV has not enough allocation left for a reservation"""
+
+    def __init__(self, remaining):
+        self.remaining = remaining
+        super().__init__(f'Amount exceeds remaining allocation (${remaining:,.2f} available)')
+
+
+def get_reservation_ttl():
+    """How long an unpaid pending_payment reservation holds allocation"""
+    return timedelta(hours=getattr(settings, 'INVESTMENT_RESERVATION_TTL_HOURS', 48))
+
+
+def get_reserved_allocation(spv):
+    """Allocation currently held on the SPV (single-row read)"""
+    reserved = SPVAllocation.objects.filter(spv_id=spv.id).values_list('reserved_amount', flat=True).first()
+    return reserved or Decimal('0')
+
+
+def get_remaining_allocation(spv):
+    """Allocation still available on the SPV"""
+    return (spv.allocation or Decimal('0')) - get_reserved_allocation(spv)
+
+
+def claim_allocation(spv, amount):
+    """
+    Claim `amount` more allocation on the SPV or raise AllocationExceeded.
+
+    Must run inside transaction.atomic() before the investment write that
+    consumes the allocation; the claimed row stays locked until commit.
+    """
+    if amount <= 0:
+        return
+
+    capacity = spv.allocation or Decimal('0')
+    for _ in range(2):
+        claimed = SPVAllocation.objects.filter(
+            spv_id=spv.id,
+            reserved_amount__lte=capacity - amount,
+        ).update(updated_at=timezone.now())
+        if claimed:
+            return
+        _, created = SPVAllocation.objects.get_or_create(spv_id=spv.id)
+        if not created:
+            break
+
+    raise AllocationExceeded(get_remaining_allocation(spv))
+
+
+def reserve_allocation(investment, status='pending_payment'):
+    """
+    Move an investment into a reserved status, claiming its invested amount.
+
+    Only the difference is claimed if the investment already holds a
+    reservation. Raises AllocationExceeded (leaving the investment untouched)
+    when the SPV is full even after releasing lapsed reservations.
+    """
+    spv = investment.spv
+    previous = get_investment_snapshot(investment.pk) if investment.pk else None
+    held = previous.amount if previous is not None and previous.status in RESERVED_STATUSES else Decimal('0')
+    amount = Decimal(str(investment.invested_amount or 0)) - held
+
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                claim_allocation(spv, amount)
+                investment.status = status
+                investment.reservation_expires_at = timezone.now() + get_reservation_ttl() if status == 'pending_payment' else None
+                investment.save()
+                return investment
+        except AllocationExceeded:
+            if attempt or not release_expired_reservations(spv_ids=[spv.id]):
+                raise
+
+
+def release_expired_reservations(spv_ids=None, now=None):
+    """
+    Expire unpaid pending_payment investments whose reservation lapsed,
+    returning their allocation to the SPV. Returns the number released.
+    """
+    now = now or timezone.now()
+    queryset = Investment.objects.filter(status='pending_payment', reservation_expires_at__lt=now)
+    if spv_ids is not None:
+        queryset = queryset.filter(spv_id__in=spv_ids)
+
+    released = 0
+    for investment in queryset.iterator():
+        with transaction.atomic():
+            current = get_investment_snapshot(investment.pk)
+            if current is None or current.status != 'pending_payment':
+                continue
+            investment.status = 'expired'
+            investment.save(update_fields=['status', 'updated_at'])
+            released += 1
+    return released
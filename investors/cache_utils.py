@@ -0,0 +1,112 @@
+"""
+Per-user response cache for the investor dashboard cards.
+
+Responses are cached under the user's id, the endpoint name and the query
+string, in the `default` cache (local memory unless CACHE_REDIS_URL is
+set). Each user has a version number that is part of every key;
+invalidate_user_cache() bumps it, so all of that user's cached cards drop
+out at once without tracking keys. Signals on Investment, Notification,
+Portfolio, TaxSummary and KYCStatus (investors.signals) do the bumping.
+
+Hits and misses are counted per endpoint and exposed by
+GET /dashboard/cache_stats/ (staff only).
+"""
+
+import functools
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+
+KEY_PREFIX = 'dashboard-cache'
+
+# Endpoints served through cached_user_response (names used in keys and stats)
+CACHED_ENDPOINTS = []
+
+
+def _version_key(user_id):
+    return f'{KEY_PREFIX}:version:{user_id}'
+
+
+def _stats_key(name, outcome):
+    return f'{KEY_PREFIX}:stats:{name}:{outcome}'
+
+
+def _incr(key):
+    """Atomic increment that creates the counter when missing"""
+    cache.add(key, 0, timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, 1, timeout=None)
+        return 1
+
+
+def get_user_version(user_id):
+    return cache.get(_version_key(user_id), 0)
+
+
+def invalidate_user_cache(*user_ids):
+    """Drop every cached dashboard response of these users"""
+    for user_id in set(user_ids):
+        if user_id:
+            _incr(_version_key(user_id))
+
+
+def get_cache_key(name, request, version):
+    params = urlencode(sorted(request.query_params.lists()), doseq=True)
+    digest = hashlib.md5(params.encode()).hexdigest()
+    return f'{KEY_PREFIX}:{request.user.pk}:{version}:{name}:{digest}'
+
+
+def cached_user_response(name):
+    """
+    Cache a viewset action's successful responses per user and query string.
+    Adds an X-Cache: HIT/MISS header. A response is not stored if the user's
+    data changed while it was being built.
+    """
+    CACHED_ENDPOINTS.append(name)
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(self, request, *args, **kwargs):
+            version = get_user_version(request.user.pk)
+            key = get_cache_key(name, request, version)
+            data = cache.get(key)
+            if data is not None:
+                _incr(_stats_key(name, 'hits'))
+                response = Response(data)
+                response['X-Cache'] = 'HIT'
+                return response
+
+            _incr(_stats_key(name, 'misses'))
+            response = view(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK and get_user_version(request.user.pk) == version:
+                cache.set(key, response.data, settings.DASHBOARD_CACHE_TIMEOUT)
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+def get_cache_stats():
+    """{endpoint: {'hits', 'misses', 'hit_rate'}} for all cached endpoints"""
+    counters = cache.get_many([
+        _stats_key(name, outcome) for name in CACHED_ENDPOINTS for outcome in ('hits', 'misses')
+    ])
+    stats = {}
+    for name in CACHED_ENDPOINTS:
+        hits = counters.get(_stats_key(name, 'hits'), 0)
+        misses = counters.get(_stats_key(name, 'misses'), 0)
+        total = hits + misses
+        stats[name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total * 100, 2) if total else 0.0,
+        }
+    return stats
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from users.models import CustomUser
 from spv.models import SPV
 from decimal import Decimal
@@ -20,6 +20,7 @@ class Portfolio(models.Model):
     # Statistics
     total_investments_count = models.IntegerField(default=0, help_text="Total number of investments")
     active_investments_count = models.IntegerField(default=0, help_text="Number of active investments")
+    is_dirty = models.BooleanField(default=True, db_index=True, help_text="Investments changed since the last recalculation")
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -42,26 +43,36 @@ class Portfolio(models.Model):
             return round(growth, 2)
         return 0.00
     
-    def recalculate(self):
-        """Recalculate portfolio values from investments"""
-        from .models import Investment
+    def recalculate(self, commit=True):
+        """Recalculate portfolio values from investments (single aggregate query)"""
+        from .portfolio_utils import empty_totals, get_portfolio_totals
         
-        investments = Investment.objects.filter(investor=self.user, status='active')
+        totals = get_portfolio_totals([self.user_id]).get(self.user_id, empty_totals())
+        for field, value in totals.items():
+            setattr(self, field, value)
         
-        self.total_invested = sum(inv.invested_amount for inv in investments)
-        self.current_value = sum(inv.current_value for inv in investments)
-        self.unrealized_gain = self.current_value - self.total_invested
-        self.total_investments_count = investments.count()
-        self.active_investments_count = investments.filter(status='active').count()
-        
-        self.save()
+        if commit:
+            self.is_dirty = False
+            self.save()
+    
+    def refresh_totals(self):
+        """Bring a dirty portfolio's figures up to date in memory without writing"""
+        if self.is_dirty:
+            self.recalculate(commit=False)
 
 
 class PortfolioPerformance(models.Model):
     """Model for tracking portfolio value over time for charts"""
     
+    RESOLUTION_CHOICES = [
+        ('daily', 'Daily'),
+        ('weekly', 'Weekly'),  # Keyed by the Monday of the week
+        ('monthly', 'Monthly'),  # Keyed by the first day of the month
+    ]
+    
     portfolio = models.ForeignKey(Portfolio, on_delete=models.CASCADE, related_name='performance_history')
-    date = models.DateField(help_text="Date for this performance record")
+    resolution = models.CharField(max_length=10, choices=RESOLUTION_CHOICES, default='daily')
+    date = models.DateField(help_text="Date for this performance record (start of the period)")
     total_invested = models.DecimalField(max_digits=15, decimal_places=2, default=0.00, help_text="Total invested as of this date")
     current_value = models.DecimalField(max_digits=15, decimal_places=2, default=0.00, help_text="Portfolio value as of this date")
     
@@ -71,7 +82,7 @@ class PortfolioPerformance(models.Model):
     class Meta:
         verbose_name = 'portfolio performance'
         verbose_name_plural = 'portfolio performances'
-        unique_together = ['portfolio', 'date']
+        unique_together = ['portfolio', 'resolution', 'date']
         ordering = ['date']
     
     def __str__(self):
@@ -171,15 +182,52 @@ class Investment(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     invested_at = models.DateTimeField(blank=True, null=True, help_text="Date when investment was made")
     commitment_date = models.DateTimeField(blank=True, null=True, help_text="Date when payment was confirmed")
+    reservation_expires_at = models.DateTimeField(blank=True, null=True, help_text="When an unpaid allocation reservation lapses")
     
     class Meta:
         verbose_name = 'investment'
         verbose_name_plural = 'investments'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['spv', 'status', 'investor']),
+            models.Index(fields=['status', 'reservation_expires_at']),
+        ]
     
     def __str__(self):
         return f"{self.investor.username} - {self.syndicate_name}"
     
+    def save(self, *args, **kwargs):
+        """Save, keeping fundraising counters, portfolio dirty flag and leaderboard in the same transaction"""
+        from .fundraising_utils import get_investment_snapshot, record_investment_change, tracks_fundraising
+        from .leaderboard_utils import mark_rankings_dirty
+        from .portfolio_utils import mark_portfolios_dirty, tracks_portfolio
+        
+        update_fields = kwargs.get('update_fields')
+        if not tracks_fundraising(update_fields) and not tracks_portfolio(update_fields):
+            return super().save(*args, **kwargs)
+        
+        with transaction.atomic():
+            previous = get_investment_snapshot(self.pk) if self.pk else None
+            super().save(*args, **kwargs)
+            record_investment_change(previous, self)
+            mark_portfolios_dirty({self.investor_id, previous.investor_id if previous else None})
+            if tracks_fundraising(update_fields):
+                mark_rankings_dirty({self.spv_id, previous.spv_id if previous else None})
+    
+    def delete(self, *args, **kwargs):
+        """Delete, updating fundraising counters, portfolio dirty flag and leaderboard"""
+        from .fundraising_utils import get_investment_snapshot, record_investment_change
+        from .leaderboard_utils import mark_rankings_dirty
+        from .portfolio_utils import mark_portfolios_dirty
+        
+        with transaction.atomic():
+            previous = get_investment_snapshot(self.pk)
+            result = super().delete(*args, **kwargs)
+            record_investment_change(previous, None)
+            mark_portfolios_dirty({self.investor_id})
+            mark_rankings_dirty({previous.spv_id if previous else None})
+        return result
+    
     @property
     def is_active(self):
         """Check if investment is active"""
@@ -205,12 +253,143 @@ class Investment(models.Model):
         return 0.00
     
     def calculate_ownership(self):
-        """Calculate ownership percentage based on SPV allocation"""
+        """Calculate ownership percentage based on SPV allocation and record it in the ownership ledger"""
+        from transfers.cap_table_utils import record_allocation
+        
         if self.spv and self.spv.allocation and self.spv.allocation > 0:
-            self.ownership_percentage = (self.invested_amount / self.spv.allocation) * 100
-            self.save(update_fields=['ownership_percentage'])
+            ownership_before = self.ownership_percentage
+            self.ownership_percentage = ((self.invested_amount / self.spv.allocation) * 100).quantize(Decimal('0.0001'))
+            with transaction.atomic():
+                self.save(update_fields=['ownership_percentage'])
+                record_allocation(self, ownership_before)
+
+
+
+class SPVFundraisingStats(models.Model):
+    """
+    Denormalized fundraising counters per SPV and investment status.
+    
+    Maintained incrementally by Investment.save()/delete() so deal pages and
+    manager dashboards read a handful of rows instead of aggregating the
+    investments table. Rebuild with `manage.py rebuild_fundraising_stats`.
+    """
+    
+    spv = models.ForeignKey(SPV, on_delete=models.CASCADE, related_name='fundraising_stats')
+    status = models.CharField(max_length=20, choices=Investment.STATUS_CHOICES)
+    
+    # Counters
+    investment_count = models.IntegerField(default=0, help_text="Number of investments in this status")
+    total_amount = models.DecimalField(max_digits=20, decimal_places=2, default=0, help_text="Sum of invested amounts in this status")
+    
+    # Timestamps
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'SPV fundraising stats'
+        verbose_name_plural = 'SPV fundraising stats'
+        unique_together = ['spv', 'status']
+    
+    def __str__(self):
+        return f"{self.spv_id} - {self.status}: {self.investment_count} / {self.total_amount}"
+
+
+class SPVAllocation(models.Model):
+    """
+    Allocation reserved per SPV (sum of investments in reserved statuses).
+    
+    Kept in step with SPVFundraisingStats by Investment.save()/delete(). New
+    reservations claim capacity with a conditional UPDATE on this row, which
+    serializes concurrent commits to the same SPV (see allocation_utils).
+    """
+    
+    spv = models.OneToOneField(SPV, on_delete=models.CASCADE, related_name='allocation_state')
+    reserved_amount = models.DecimalField(max_digits=20, decimal_places=2, default=0, help_text="Allocation held by committed or in-payment investments")
+    
+    # Timestamps
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'SPV allocation'
+        verbose_name_plural = 'SPV allocations'
+    
+    def __str__(self):
+        return f"{self.spv_id}: {self.reserved_amount} reserved"
 
 
+class SyndicateRanking(models.Model):
+    """
+    Materialized top syndicates leaderboard, one row per SPV lead.
+    
+    Refreshed per lead when their SPVs change and flagged dirty when
+    investments in them change (see leaderboard_utils); rebuild with
+    `manage.py rebuild_syndicate_leaderboard`.
+    """
+    
+    lead = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='syndicate_ranking')
+    
+    # SPV statistics
+    total_spvs = models.IntegerField(default=0, help_text="SPVs created by the lead")
+    active_spvs = models.IntegerField(default=0, help_text="SPVs open for investment")
+    total_allocation = models.DecimalField(max_digits=20, decimal_places=2, default=0, help_text="Sum of SPV allocations")
+    latest_spv_at = models.DateTimeField(blank=True, null=True, help_text="Creation time of the lead's newest SPV")
+    sectors = models.JSONField(default=list, blank=True, help_text="Top sectors from the lead's recent SPVs")
+    
+    # Investment statistics
+    total_investors = models.IntegerField(default=0, help_text="Distinct investors across the lead's SPVs")
+    total_raised = models.DecimalField(max_digits=20, decimal_places=2, default=0, help_text="Active investments across the lead's SPVs")
+    is_dirty = models.BooleanField(default=False, db_index=True, help_text="Investments changed since the last refresh")
+    
+    # Timestamps
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'syndicate ranking'
+        verbose_name_plural = 'syndicate rankings'
+        ordering = ['-total_spvs', '-latest_spv_at', '-id']
+        indexes = [
+            models.Index(fields=['-total_spvs', '-latest_spv_at', '-id'], name='syndicate_rank_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.lead.username} - {self.total_spvs} SPVs"
+
+
+class NotificationQuerySet(models.QuerySet):
+    """
+    Set-based state transitions: each runs one UPDATE/DELETE over the
+    queryset and returns the number of notifications affected. The
+    recipients' cached dashboards are invalidated, as the per-row signals
+    don't fire for these.
+    """
+    
+    def _invalidate(self):
+        from .cache_utils import invalidate_user_cache
+        invalidate_user_cache(*self.values_list('user_id', flat=True).distinct().order_by())
+    
+    def _transition(self, **fields):
+        self._invalidate()
+        return self.update(**fields)
+    
+    def mark_read(self):
+        """Mark unread notifications as read"""
+        from django.utils import timezone
+        return self.filter(status='unread')._transition(status='read', read_at=timezone.now())
+    
+    def mark_unread(self):
+        """Mark read notifications as unread"""
+        return self.filter(status='read')._transition(status='unread', read_at=None)
+    
+    def archive(self):
+        """Archive notifications that are not archived yet"""
+        return self.exclude(status='archived')._transition(status='archived')
+    
+    def purge_expired(self, now=None):
+        """Delete notifications whose expires_at has passed"""
+        from django.utils import timezone
+        expired = self.filter(expires_at__lt=now or timezone.now())
+        expired._invalidate()
+        return expired.delete()[0]
+
 
 class Notification(models.Model):
     """Model for user notifications"""
@@ -262,6 +441,8 @@ class Notification(models.Model):
     read_at = models.DateTimeField(blank=True, null=True, help_text="When notification was read")
     expires_at = models.DateTimeField(blank=True, null=True, help_text="When notification expires")
     
+    objects = NotificationQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'notification'
         verbose_name_plural = 'notifications'
@@ -269,6 +450,7 @@ class Notification(models.Model):
         indexes = [
             models.Index(fields=['user', 'status']),
             models.Index(fields=['user', 'notification_type']),
+            models.Index(fields=['expires_at']),
         ]
     
     def __str__(self):
@@ -258,6 +258,7 @@ class PortfolioPerformanceSerializer(serializers.ModelSerializer):
         model = PortfolioPerformance
         fields = [
             'id',
+            'resolution',
             'date',
             'total_invested',
             'current_value',
@@ -4,11 +4,11 @@ from django.db.models import Count, Q, Sum
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 from decimal import Decimal
 from datetime import datetime, timedelta
 
-from .dashboard_models import Portfolio, Investment, Notification, KYCStatus, Wishlist, PortfolioPerformance, TaxDocument, TaxSummary, InvestorDocument
+from .dashboard_models import Portfolio, Investment, Notification, KYCStatus, Wishlist, PortfolioPerformance, TaxDocument, TaxSummary, InvestorDocument, SyndicateRanking
 from .models import InvestorProfile
 from .dashboard_serializers import (
     PortfolioSerializer,
@@ -32,6 +32,18 @@ from .dashboard_serializers import (
     InvestorDocumentUploadSerializer,
 )
 from .models import InvestorProfile
+from .deal_utils import (
+    DEAL_CARD_RELATED,
+    build_deal_card,
+    build_deal_cards,
+    build_invite_card,
+    get_deal_stats,
+)
+from .cache_utils import cached_user_response, get_cache_stats
+from .leaderboard_utils import build_syndicate_card, fill_dirty_rankings
+from .performance_utils import get_performance_series
+from .notification_utils import notify
+from .stats_utils import get_investment_stats
 from spv.models import SPV
 from spv.serializers import SPVSerializer
 
@@ -42,6 +54,13 @@ class StandardResultsSetPagination(PageNumberPagination):
     max_page_size = 100
 
 
+class LeaderboardCursorPagination(CursorPagination):
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-total_spvs', '-latest_spv_at', '-id')
+
+
 class DashboardViewSet(viewsets.ViewSet):
     """
     ViewSet for dashboard overview and statistics
@@ -49,14 +68,14 @@ class DashboardViewSet(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated]
     
     @action(detail=False, methods=['get'])
+    @cached_user_response('dashboard.overview')
     def overview(self, request):
         """Get complete dashboard overview with all cards data for investor"""
         user = request.user
         
-        # Get or create portfolio
+        # Get or create portfolio (figures of a dirty portfolio are filled in without a write)
         portfolio, created = Portfolio.objects.get_or_create(user=user)
-        if not created:
-            portfolio.recalculate()
+        portfolio.refresh_totals()
         
         # Get KYC status
         try:
@@ -121,48 +140,59 @@ class DashboardViewSet(viewsets.ViewSet):
         return Response(data)
     
     @action(detail=False, methods=['get'])
+    @cached_user_response('dashboard.stats')
     def stats(self, request):
         """Get detailed dashboard statistics"""
         user = request.user
         
-        # Investment statistics
-        investments = Investment.objects.filter(investor=user)
+        # Investment statistics (one grouped query)
+        investment_stats = get_investment_stats(Investment.objects.filter(investor=user))
         
         stats = {
-            'total_investments': investments.count(),
-            'active_investments': investments.filter(status='active').count(),
-            'pending_investments': investments.filter(status='pending').count(),
-            'completed_investments': investments.filter(status='completed').count(),
+            'total_investments': investment_stats.count(),
+            'active_investments': investment_stats.count(status='active'),
+            'pending_investments': investment_stats.count(status='pending'),
+            'completed_investments': investment_stats.count(status='completed'),
             
             # By type
             'investments_by_type': {
-                'syndicate_deal': investments.filter(investment_type='syndicate_deal').count(),
-                'top_syndicate': investments.filter(investment_type='top_syndicate').count(),
-                'invite': investments.filter(investment_type='invite').count(),
+                'syndicate_deal': investment_stats.count(investment_type='syndicate_deal'),
+                'top_syndicate': investment_stats.count(investment_type='top_syndicate'),
+                'invite': investment_stats.count(investment_type='invite'),
             },
             
             # By sector
-            'investments_by_sector': dict(
-                investments.values('sector')
-                .annotate(count=Count('id'))
-                .values_list('sector', 'count')
-            ),
+            'investments_by_sector': investment_stats.breakdown('sector'),
             
             # Financial summary
-            'total_allocated': investments.aggregate(Sum('allocated'))['allocated__sum'] or 0,
-            'total_raised': investments.aggregate(Sum('raised'))['raised__sum'] or 0,
-            'total_invested': investments.aggregate(Sum('invested_amount'))['invested_amount__sum'] or 0,
+            'total_allocated': investment_stats.sum('allocated'),
+            'total_raised': investment_stats.sum('raised'),
+            'total_invested': investment_stats.sum('invested_amount'),
         }
         
         return Response(stats)
     
+    @action(detail=False, methods=['get'])
+    def cache_stats(self, request):
+        """Hit/miss counters of the per-user dashboard response cache (staff only)"""
+        if not request.user.is_staff:
+            return Response(
+                {'error': 'Only staff can view cache statistics'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        return Response({
+            'success': True,
+            'endpoints': get_cache_stats(),
+        })
+    
     @action(detail=False, methods=['get'])
     def discover_deals(self, request):
         """Get all available SPVs for discovery"""
         # Get all SPVs that are open for investment
         spvs = SPV.objects.filter(
             status__in=['active', 'approved', 'pending_review']
-        ).order_by('-created_at')
+        ).select_related(*DEAL_CARD_RELATED).order_by('-created_at')
         
         # Apply filters if provided
         sector = request.query_params.get('sector', None)
@@ -182,107 +212,21 @@ class DashboardViewSet(viewsets.ViewSet):
         page = paginator.paginate_queryset(spvs, request)
         
         # Convert to investment-like format for frontend
-        deals = []
-        for spv in page:
-            # Calculate days left from target_closing_date
-            days_left = 22  # Default
-            if spv.target_closing_date:
-                delta = spv.target_closing_date - timezone.now().date()
-                days_left = max(0, delta.days)
-            
-            # Count investors (allocated count)
-            allocated_count = Investment.objects.filter(spv=spv).count()
-            
-            # Sum raised amount
-            raised_amount = Investment.objects.filter(spv=spv, status__in=['active', 'pending']).aggregate(Sum('invested_amount'))['invested_amount__sum'] or 0
-            
-            # Determine status label
-            status_label = 'Raising'
-            if spv.status == 'closed':
-                status_label = 'Closed'
-            elif spv.status == 'pending_review':
-                status_label = 'Pending'
-            elif days_left <= 0:
-                status_label = 'Expired'
-            
-            deals.append({
-                'id': spv.id,
-                'spv_id': spv.id,
-                'syndicate_name': spv.display_name,
-                'company_name': spv.portfolio_company_name,
-                'sector': spv.deal_tags[0] if spv.deal_tags and len(spv.deal_tags) > 0 else 'Technology',
-                'stage': str(spv.company_stage) if spv.company_stage else 'Series B',
-                'tags': spv.deal_tags or [],
-                'allocated': allocated_count,
-                'raised': float(raised_amount),
-                'target': float(spv.round_size) if spv.round_size else 0,
-                'allocation': float(spv.allocation) if spv.allocation else 0,
-                'min_investment': float(spv.minimum_lp_investment) if spv.minimum_lp_investment else 25000,
-                'days_left': days_left,
-                'target_closing_date': str(spv.target_closing_date) if spv.target_closing_date else None,
-                'status': status_label,
-                'status_code': spv.status,
-                'investment_type': 'syndicate_deal',
-                'created_at': spv.created_at.strftime('%d/%m/%Y'),
-                'lead_name': f"{spv.created_by.first_name} {spv.created_by.last_name}".strip() or spv.created_by.username if spv.created_by else 'Unknown',
-            })
+        deals = build_deal_cards(page)
         
         return paginator.get_paginated_response(deals)
     
     @action(detail=False, methods=['get'])
     def top_syndicates(self, request):
-        """Get all syndicates (SPV leads/creators)"""
-        # Get all unique syndicate leads who have created SPVs
-        from django.db.models import Count as DjCount, Max, Avg
-        from users.models import CustomUser
-        
-        # Get syndicate leads with their SPV stats
-        syndicate_leads = CustomUser.objects.filter(
-            created_spvs__isnull=False
-        ).annotate(
-            total_spvs=DjCount('created_spvs'),
-            total_raised=Sum('created_spvs__allocation'),
-            latest_spv_date=Max('created_spvs__created_at')
-        ).order_by('-total_spvs', '-latest_spv_date')
+        """Get all syndicates (SPV leads/creators) ranked from the materialized leaderboard"""
+        rankings = SyndicateRanking.objects.select_related('lead')
         
-        # Paginate results
-        paginator = StandardResultsSetPagination()
-        page = paginator.paginate_queryset(syndicate_leads, request)
+        # Cursor pagination: one indexed query per page, no count
+        paginator = LeaderboardCursorPagination()
+        page = paginator.paginate_queryset(rankings, request)
+        fill_dirty_rankings(page)
         
-        syndicates = []
-        for lead in page:
-            # Get all SPVs for this lead
-            lead_spvs = SPV.objects.filter(created_by=lead)
-            active_spvs = lead_spvs.filter(status__in=['active', 'approved'])
-            
-            # Calculate total investors across all SPVs
-            total_investors = Investment.objects.filter(spv__in=lead_spvs).values('investor').distinct().count()
-            total_raised = Investment.objects.filter(spv__in=lead_spvs, status='active').aggregate(Sum('invested_amount'))['invested_amount__sum'] or 0
-            
-            # Get sectors from deal tags
-            all_tags = []
-            for spv in lead_spvs[:5]:  # Get tags from recent 5 SPVs
-                if spv.deal_tags:
-                    all_tags.extend(spv.deal_tags)
-            unique_sectors = list(set(all_tags))[:3]  # Top 3 unique sectors
-            
-            syndicates.append({
-                'id': lead.id,
-                'syndicate_lead_id': lead.id,
-                'syndicate_name': f"{lead.first_name} {lead.last_name}".strip() or lead.username,
-                'lead_email': lead.email,
-                'total_spvs': lead.total_spvs,
-                'active_spvs': active_spvs.count(),
-                'sectors': unique_sectors if unique_sectors else ['Technology'],
-                'total_investors': total_investors,
-                'total_raised': float(total_raised),
-                'total_allocation': float(lead.total_raised) if lead.total_raised else 0,
-                'min_investment': 50000,  # Default
-                'track_record': '+23.4% IRR',  # Mock - can be calculated from actual performance
-                'status': 'Active' if active_spvs.exists() else 'Inactive',
-                'investment_type': 'top_syndicate',
-                'joined_date': lead.date_joined.strftime('%d/%m/%Y') if lead.date_joined else None,
-            })
+        syndicates = [build_syndicate_card(ranking) for ranking in page]
         
         return paginator.get_paginated_response(syndicates)
     
@@ -296,60 +240,13 @@ class DashboardViewSet(viewsets.ViewSet):
             lp_invite_emails__isnull=True  # Exclude SPVs with no invites
         ).exclude(
             lp_invite_emails=[]  # Exclude SPVs with empty invite list
-        ).order_by('-created_at')
+        ).select_related(*DEAL_CARD_RELATED).order_by('-created_at')
         
         # Paginate results
         paginator = StandardResultsSetPagination()
         page = paginator.paginate_queryset(invited_spvs, request)
         
-        invites = []
-        for spv in page:
-            # Calculate deadline from target_closing_date
-            deadline_days = 7  # Default
-            if spv.target_closing_date:
-                delta = spv.target_closing_date - timezone.now().date()
-                deadline_days = max(0, delta.days)
-            
-            # Count investors (allocated count)
-            allocated_count = Investment.objects.filter(spv=spv).count()
-            
-            # Sum raised amount
-            raised_amount = Investment.objects.filter(spv=spv, status__in=['active', 'pending']).aggregate(Sum('invested_amount'))['invested_amount__sum'] or 0
-            
-            # Determine status based on deadline
-            if deadline_days <= 0:
-                invite_status = 'Expired'
-            else:
-                invite_status = 'Active'
-            
-            invites.append({
-                'id': spv.id,
-                'spv_id': spv.id,
-                'syndicate_name': spv.display_name,
-                'company_name': spv.portfolio_company_name,
-                'led_by': f"{spv.created_by.first_name} {spv.created_by.last_name}".strip() or spv.created_by.username if spv.created_by else 'Unknown',
-                'lead_email': spv.created_by.email if spv.created_by else None,
-                'description': spv.lp_invite_message or f"Invitation to invest in {spv.display_name}",
-                'sector': spv.deal_tags[0] if spv.deal_tags and len(spv.deal_tags) > 0 else 'Technology',
-                'stage': str(spv.company_stage) if spv.company_stage else 'Series B',
-                'tags': spv.deal_tags or [],
-                'allocated': allocated_count,
-                'raised': float(raised_amount),
-                'target': float(spv.round_size) if spv.round_size else 0,
-                'allocation': float(spv.allocation) if spv.allocation else 0,
-                'min_investment': float(spv.minimum_lp_investment) if spv.minimum_lp_investment else 25000,
-                'deadline': deadline_days,
-                'target_closing_date': str(spv.target_closing_date) if spv.target_closing_date else None,
-                'status': invite_status,
-                'status_code': spv.status,
-                'investment_type': 'invite',
-                'invited_at': spv.updated_at.strftime('%d/%m/%Y'),
-                'invited_emails': spv.lp_invite_emails or [],  # List of all invited emails
-                'total_invites': len(spv.lp_invite_emails) if spv.lp_invite_emails else 0,
-                'private_note': spv.invite_private_note,
-                'lead_carry_percentage': float(spv.lead_carry_percentage) if spv.lead_carry_percentage else 0,
-                'investment_visibility': spv.investment_visibility,
-            })
+        invites = build_deal_cards(page, builder=build_invite_card)
         
         return paginator.get_paginated_response(invites)
     
@@ -395,7 +292,7 @@ class DashboardViewSet(viewsets.ViewSet):
         portfolio.recalculate()
         
         # Create notification
-        Notification.objects.create(
+        notify(
             user=request.user,
             notification_type='investment',
             title='Investment Submitted',
@@ -579,59 +476,22 @@ class DashboardViewSet(viewsets.ViewSet):
         user = request.user
         
         # Get all wishlist items for this investor
-        wishlist_items = Wishlist.objects.filter(investor=user).select_related('spv').order_by('-created_at')
+        wishlist_items = Wishlist.objects.filter(investor=user).select_related(
+            *[f'spv__{field}' for field in DEAL_CARD_RELATED]
+        ).order_by('-created_at')
         
         # Paginate results
         paginator = StandardResultsSetPagination()
         page = paginator.paginate_queryset(wishlist_items, request)
         
+        stats = get_deal_stats(item.spv_id for item in page)
+        today = timezone.now().date()
+        
         wishlist_spvs = []
         for item in page:
-            spv = item.spv
-            
-            # Calculate days left from target_closing_date
-            days_left = 22  # Default
-            if spv.target_closing_date:
-                delta = spv.target_closing_date - timezone.now().date()
-                days_left = max(0, delta.days)
-            
-            # Count investors (allocated count)
-            allocated_count = Investment.objects.filter(spv=spv).count()
-            
-            # Sum raised amount
-            raised_amount = Investment.objects.filter(spv=spv, status__in=['active', 'pending']).aggregate(Sum('invested_amount'))['invested_amount__sum'] or 0
-            
-            # Determine status label
-            status_label = 'Raising'
-            if spv.status == 'closed':
-                status_label = 'Closed'
-            elif spv.status == 'pending_review':
-                status_label = 'Pending'
-            elif days_left <= 0:
-                status_label = 'Expired'
-            
-            wishlist_spvs.append({
-                'id': spv.id,
-                'spv_id': spv.id,
-                'syndicate_name': spv.display_name,
-                'company_name': spv.portfolio_company_name,
-                'sector': spv.deal_tags[0] if spv.deal_tags and len(spv.deal_tags) > 0 else 'Technology',
-                'stage': str(spv.company_stage) if spv.company_stage else 'Series B',
-                'tags': spv.deal_tags or [],
-                'allocated': allocated_count,
-                'raised': float(raised_amount),
-                'target': float(spv.round_size) if spv.round_size else 0,
-                'allocation': float(spv.allocation) if spv.allocation else 0,
-                'min_investment': float(spv.minimum_lp_investment) if spv.minimum_lp_investment else 25000,
-                'days_left': days_left,
-                'target_closing_date': str(spv.target_closing_date) if spv.target_closing_date else None,
-                'status': status_label,
-                'status_code': spv.status,
-                'investment_type': 'syndicate_deal',
-                'created_at': spv.created_at.strftime('%d/%m/%Y'),
-                'lead_name': f"{spv.created_by.first_name} {spv.created_by.last_name}".strip() or spv.created_by.username if spv.created_by else 'Unknown',
-                'added_to_wishlist_at': item.created_at.strftime('%d/%m/%Y'),
-            })
+            card = build_deal_card(item.spv, stats, today)
+            card['added_to_wishlist_at'] = item.created_at.strftime('%d/%m/%Y')
+            wishlist_spvs.append(card)
         
         return paginator.get_paginated_response(wishlist_spvs)
     
@@ -888,8 +748,8 @@ class PortfolioViewSet(viewsets.ModelViewSet):
         """Get current user's portfolio"""
         portfolio, created = Portfolio.objects.get_or_create(user=request.user)
         
-        # Recalculate portfolio values
-        portfolio.recalculate()
+        # Bring figures up to date if investments changed (read only)
+        portfolio.refresh_totals()
         
         serializer = self.get_serializer(portfolio)
         return Response(serializer.data)
@@ -910,22 +770,19 @@ class PortfolioViewSet(viewsets.ModelViewSet):
     def snapshot(self, request):
         """Get portfolio snapshot with performance data matching Figma design"""
         portfolio, created = Portfolio.objects.get_or_create(user=request.user)
-        portfolio.recalculate()
+        portfolio.refresh_totals()
         
-        # Generate performance chart data (mock data showing growth)
-        # In production, this would pull from historical portfolio values
-        today = timezone.now().date()
-        performance_history = []
-        
-        # Generate data points for the last 6 months
-        for i in range(6):
-            date = today - timedelta(days=30 * (5 - i))
-            # Simulate growth from invested to current value
-            progress = (i + 1) / 6
-            value = float(portfolio.total_invested) + (float(portfolio.unrealized_gain) * progress)
+        # Monthly closing values for the last 6 months (recorded by snapshot_portfolio_performance)
+        _, rows = get_performance_series(portfolio, 180, resolution='monthly')
+        performance_history = [
+            {'date': row.date.strftime('%Y-%m-%d'), 'value': float(row.current_value)}
+            for row in rows
+        ]
+        if not performance_history:
+            # Nothing recorded yet - show the current value only
             performance_history.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'value': round(value, 2)
+                'date': timezone.now().date().strftime('%Y-%m-%d'),
+                'value': float(portfolio.current_value)
             })
         
         snapshot_data = {
@@ -944,13 +801,13 @@ class PortfolioViewSet(viewsets.ModelViewSet):
         """Get portfolio overview for dashboard cards"""
         user = request.user
         portfolio, created = Portfolio.objects.get_or_create(user=user)
-        portfolio.recalculate()
+        portfolio.refresh_totals()
         
-        # Calculate totals
-        investments = Investment.objects.filter(investor=user)
-        active_count = investments.filter(status='active').count()
-        pending_count = investments.filter(status='pending').count()
-        total_count = investments.count()
+        # Calculate totals (one grouped query)
+        investment_stats = get_investment_stats(Investment.objects.filter(investor=user))
+        active_count = investment_stats.count(status='active')
+        pending_count = investment_stats.count(status='pending')
+        total_count = investment_stats.count()
         
         # Calculate gains
         total_gains = portfolio.current_value - portfolio.total_invested
@@ -981,48 +838,32 @@ class PortfolioViewSet(viewsets.ModelViewSet):
         # Get days parameter (default 90)
         days = int(request.query_params.get('days', 90))
         
-        # Get performance history
+        # Get performance history at the resolution kept for this window
         end_date = timezone.now().date()
         start_date = end_date - timedelta(days=days)
+        resolution, performance_data = get_performance_series(portfolio, days, today=end_date)
+        performance_list = PortfolioPerformanceSerializer(performance_data, many=True).data
         
-        performance_data = PortfolioPerformance.objects.filter(
-            portfolio=portfolio,
-            date__gte=start_date,
-            date__lte=end_date
-        ).order_by('date')
-        
-        # If no historical data, generate mock data based on current values
-        if not performance_data.exists():
-            performance_list = []
-            # Generate data points
-            for i in range(0, days, 7):  # Weekly data points
-                date = start_date + timedelta(days=i)
-                progress = (i + 1) / days
-                invested = float(portfolio.total_invested) * progress
-                value = invested * (1 + (float(portfolio.portfolio_growth_percentage) / 100) * progress)
-                performance_list.append({
-                    'date': date.strftime('%Y-%m-%d'),
-                    'total_invested': round(invested, 2),
-                    'current_value': round(value, 2),
-                })
-            # Add current point
-            performance_list.append({
+        # Nothing recorded yet - return the current values as a single point
+        if not performance_list:
+            portfolio.refresh_totals()
+            performance_list = [{
                 'date': end_date.strftime('%Y-%m-%d'),
                 'total_invested': float(portfolio.total_invested),
                 'current_value': float(portfolio.current_value),
-            })
-        else:
-            performance_list = PortfolioPerformanceSerializer(performance_data, many=True).data
+            }]
         
         return Response({
             'success': True,
             'period_days': days,
+            'resolution': resolution,
             'start_date': start_date.strftime('%Y-%m-%d'),
             'end_date': end_date.strftime('%Y-%m-%d'),
             'data': performance_list,
         })
     
     @action(detail=False, methods=['get'], url_path='by-round')
+    @cached_user_response('portfolio.by_round')
     def by_round(self, request):
         """Get investments aggregated by round/stage for pie chart"""
         user = request.user
@@ -1069,6 +910,7 @@ class PortfolioViewSet(viewsets.ModelViewSet):
         })
     
     @action(detail=False, methods=['get'], url_path='by-sector')
+    @cached_user_response('portfolio.by_sector')
     def by_sector(self, request):
         """Get investments aggregated by sector for pie chart"""
         user = request.user
@@ -1212,19 +1054,15 @@ class InvestmentViewSet(viewsets.ModelViewSet):
         """Get investments grouped by type"""
         user = request.user
         
+        # Read all three groups in one query and split them by type
+        groups = {'syndicate_deal': [], 'top_syndicate': [], 'invite': []}
+        for investment in Investment.objects.filter(investor=user, investment_type__in=list(groups)):
+            groups[investment.investment_type].append(investment)
+        
         data = {
-            'syndicate_deals': InvestmentSerializer(
-                Investment.objects.filter(investor=user, investment_type='syndicate_deal'),
-                many=True
-            ).data,
-            'top_syndicates': InvestmentSerializer(
-                Investment.objects.filter(investor=user, investment_type='top_syndicate'),
-                many=True
-            ).data,
-            'invites': InvestmentSerializer(
-                Investment.objects.filter(investor=user, investment_type='invite'),
-                many=True
-            ).data,
+            'syndicate_deals': InvestmentSerializer(groups['syndicate_deal'], many=True).data,
+            'top_syndicates': InvestmentSerializer(groups['top_syndicate'], many=True).data,
+            'invites': InvestmentSerializer(groups['invite'], many=True).data,
         }
         
         return Response(data)
@@ -1333,11 +1171,7 @@ class NotificationViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
         """Mark all notifications as read"""
-        notifications = Notification.objects.filter(user=request.user, status='unread')
-        count = notifications.count()
-        
-        for notification in notifications:
-            notification.mark_as_read()
+        count = Notification.objects.filter(user=request.user).mark_read()
         
         return Response({
             'message': f'{count} notification(s) marked as read',
@@ -1376,9 +1210,7 @@ class NotificationViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['delete'])
     def clear_all(self, request):
         """Clear all notifications (mark as archived)"""
-        notifications = Notification.objects.filter(user=request.user)
-        count = notifications.count()
-        notifications.update(status='archived')
+        count = Notification.objects.filter(user=request.user).archive()
         
         return Response({
             'message': f'{count} notification(s) archived',
@@ -1393,6 +1225,7 @@ class TaxCenterViewSet(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated]
     
     @action(detail=False, methods=['get'])
+    @cached_user_response('tax.overview')
     def overview(self, request):
         """Get Tax Center overview cards data"""
         user = request.user
@@ -1430,9 +1263,13 @@ class TaxCenterViewSet(viewsets.ViewSet):
             # Estimate deductions (e.g., 18% of gains for expenses)
             estimated_deductions = float(total_gains) * 0.18
             
-            tax_summary.total_income = Decimal(str(total_gains))
-            tax_summary.total_deductions = Decimal(str(estimated_deductions))
-            tax_summary.calculate()
+            total_income = Decimal(str(total_gains))
+            total_deductions = Decimal(str(estimated_deductions))
+            # Only write when the figures changed (keeps this GET read-only for cached cards)
+            if (total_income, total_deductions) != (tax_summary.total_income, tax_summary.total_deductions):
+                tax_summary.total_income = total_income
+                tax_summary.total_deductions = total_deductions
+                tax_summary.calculate()
         
         data = {
             'success': True,
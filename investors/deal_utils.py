@@ -0,0 +1,139 @@
+"""
+Deal card helpers shared by the investor discovery endpoints.
+
+discover_deals, invites and wishlist all render SPVs as deal cards with an
+investor count and a raised amount. Those figures are read for a whole
+page from the SPV fundraising counters with one grouped query, so a page
+costs the same number of queries regardless of its size.
+"""
+
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .dashboard_models import SPVFundraisingStats
+
+
+# Related rows read by every deal card (join them into the page query)
+DEAL_CARD_RELATED = ('created_by', 'company_stage')
+
+# Investment statuses counted towards the "raised" figure on deal cards
+DEAL_RAISED_STATUSES = ['active', 'pending']
+
+
+def get_deal_stats(spv_ids):
+    """
+    Return {spv_id: {'allocated': int, 'raised': Decimal}} for the given SPVs
+    using a single grouped query over the fundraising counters.
+    """
+    spv_ids = list(spv_ids)
+    if not spv_ids:
+        return {}
+
+    rows = SPVFundraisingStats.objects.filter(spv_id__in=spv_ids).values('spv_id').annotate(
+        allocated=Sum('investment_count'),
+        raised=Sum('total_amount', filter=Q(status__in=DEAL_RAISED_STATUSES)),
+    ).order_by()
+
+    return {
+        row['spv_id']: {'allocated': row['allocated'], 'raised': row['raised'] or 0}
+        for row in rows
+    }
+
+
+def get_lead_name(spv):
+    """Display name of the syndicate lead who created the SPV"""
+    return f"{spv.created_by.first_name} {spv.created_by.last_name}".strip() or spv.created_by.username if spv.created_by else 'Unknown'
+
+
+def get_days_left(spv, default, today=None):
+    """Days until the SPV's target closing date (never negative)"""
+    if not spv.target_closing_date:
+        return default
+    today = today or timezone.now().date()
+    return max(0, (spv.target_closing_date - today).days)
+
+
+def _base_card(spv):
+    """Fields shared by deal and invite cards"""
+    return {
+        'id': spv.id,
+        'spv_id': spv.id,
+        'syndicate_name': spv.display_name,
+        'company_name': spv.portfolio_company_name,
+    }
+
+
+def build_deal_card(spv, stats, today=None):
+    """Build a discover/wishlist deal card for an SPV"""
+    days_left = get_days_left(spv, 22, today)
+
+    # Determine status label
+    status_label = 'Raising'
+    if spv.status == 'closed':
+        status_label = 'Closed'
+    elif spv.status == 'pending_review':
+        status_label = 'Pending'
+    elif days_left <= 0:
+        status_label = 'Expired'
+
+    spv_stats = stats.get(spv.id, {})
+    card = _base_card(spv)
+    card.update({
+        'sector': spv.deal_tags[0] if spv.deal_tags and len(spv.deal_tags) > 0 else 'Technology',
+        'stage': str(spv.company_stage) if spv.company_stage else 'Series B',
+        'tags': spv.deal_tags or [],
+        'allocated': spv_stats.get('allocated', 0),
+        'raised': float(spv_stats.get('raised', 0)),
+        'target': float(spv.round_size) if spv.round_size else 0,
+        'allocation': float(spv.allocation) if spv.allocation else 0,
+        'min_investment': float(spv.minimum_lp_investment) if spv.minimum_lp_investment else 25000,
+        'days_left': days_left,
+        'target_closing_date': str(spv.target_closing_date) if spv.target_closing_date else None,
+        'status': status_label,
+        'status_code': spv.status,
+        'investment_type': 'syndicate_deal',
+        'created_at': spv.created_at.strftime('%d/%m/%Y'),
+        'lead_name': get_lead_name(spv),
+    })
+    return card
+
+
+def build_invite_card(spv, stats, today=None):
+    """Build an invite card for an SPV that has sent LP invites"""
+    deadline_days = get_days_left(spv, 7, today)
+
+    spv_stats = stats.get(spv.id, {})
+    card = _base_card(spv)
+    card.update({
+        'led_by': get_lead_name(spv),
+        'lead_email': spv.created_by.email if spv.created_by else None,
+        'description': spv.lp_invite_message or f"Invitation to invest in {spv.display_name}",
+        'sector': spv.deal_tags[0] if spv.deal_tags and len(spv.deal_tags) > 0 else 'Technology',
+        'stage': str(spv.company_stage) if spv.company_stage else 'Series B',
+        'tags': spv.deal_tags or [],
+        'allocated': spv_stats.get('allocated', 0),
+        'raised': float(spv_stats.get('raised', 0)),
+        'target': float(spv.round_size) if spv.round_size else 0,
+        'allocation': float(spv.allocation) if spv.allocation else 0,
+        'min_investment': float(spv.minimum_lp_investment) if spv.minimum_lp_investment else 25000,
+        'deadline': deadline_days,
+        'target_closing_date': str(spv.target_closing_date) if spv.target_closing_date else None,
+        'status': 'Expired' if deadline_days <= 0 else 'Active',
+        'status_code': spv.status,
+        'investment_type': 'invite',
+        'invited_at': spv.updated_at.strftime('%d/%m/%Y'),
+        'invited_emails': spv.lp_invite_emails or [],  # List of all invited emails
+        'total_invites': len(spv.lp_invite_emails) if spv.lp_invite_emails else 0,
+        'private_note': spv.invite_private_note,
+        'lead_carry_percentage': float(spv.lead_carry_percentage) if spv.lead_carry_percentage else 0,
+        'investment_visibility': spv.investment_visibility,
+    })
+    return card
+
+
+def build_deal_cards(spvs, builder=build_deal_card):
+    """Build cards for a page of SPVs with one stats query for the whole page"""
+    spvs = list(spvs)
+    stats = get_deal_stats(spv.id for spv in spvs)
+    today = timezone.now().date()
+    return [builder(spv, stats, today) for spv in spvs]
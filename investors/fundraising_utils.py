@@ -0,0 +1,281 @@
+"""
+SPV fundraising counters.
+
+SPVFundraisingStats keeps one row per (SPV, investment status) with the
+number of investments and the invested amount in that status. Investment.save()/delete() call record_investment_change() inside
+the same transaction, so the counters move together with the investment
+rows (this covers the transfer and Stripe webhook flows, which go through
+save()). Read paths sum the buckets they care about instead of aggregating
+the investments table. The same hook keeps SPVAllocation.reserved_amount
+equal to the RESERVED_STATUSES total, which allocation_utils uses to claim
+capacity.
+
+The buckets do not count investors: per-status counts cannot be summed
+into a distinct count (an approved row plus a pending_payment top-up is one
+LP), so read paths that show how many LPs an SPV has use
+get_investor_counts(), a distinct count over the investments table.
+"""
+
+from collections import namedtuple
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, QuerySet, Sum
+
+from .dashboard_models import Investment, SPVAllocation, SPVFundraisingStats
+
+
+# Statuses that hold funds (payment received)
+COMMITTED_STATUSES = ['committed', 'active', 'completed']
+
+# Statuses that consume allocation (funds received or payment in progress)
+RESERVED_STATUSES = COMMITTED_STATUSES + ['pending_payment', 'payment_processing']
+
+# Statuses counted as "invested" on the syndicate manager dashboards
+INVESTED_STATUSES = ['active', 'committed', 'approved', 'pending_payment', 'payment_processing']
+
+# Investment fields that affect the counters
+FUNDRAISING_FIELDS = {'spv', 'spv_id', 'investor', 'investor_id', 'status', 'invested_amount'}
+
+InvestmentSnapshot = namedtuple('InvestmentSnapshot', ['pk', 'spv_id', 'investor_id', 'status', 'amount'])
+
+
+def get_investment_snapshot(pk):
+    """Read the stored counter-relevant values of an investment"""
+    row = Investment.objects.filter(pk=pk).values_list(
+        'spv_id', 'investor_id', 'status', 'invested_amount'
+    ).first()
+    if row is None:
+        return None
+    spv_id, investor_id, status, amount = row
+    return InvestmentSnapshot(pk, spv_id, investor_id, status, amount or Decimal('0'))
+
+
+def snapshot_investment(investment):
+    """Counter-relevant values of an in-memory investment"""
+    return InvestmentSnapshot(
+        investment.pk,
+        investment.spv_id,
+        investment.investor_id,
+        investment.status,
+        Decimal(str(investment.invested_amount or 0)),
+    )
+
+
+def _bump(snapshot, count, amount):
+    """Apply deltas to a single (spv, status) bucket"""
+    stats, _ = SPVFundraisingStats.objects.get_or_create(spv_id=snapshot.spv_id, status=snapshot.status)
+    SPVFundraisingStats.objects.filter(pk=stats.pk).update(
+        investment_count=F('investment_count') + count,
+        total_amount=F('total_amount') + amount,
+    )
+
+
+def _reserved(snapshot):
+    if snapshot is not None and snapshot.status in RESERVED_STATUSES:
+        return snapshot.amount
+    return Decimal('0')
+
+
+def _bump_reserved(spv_id, amount):
+    """Apply a delta to the SPV's reserved allocation"""
+    if not amount:
+        return
+    allocation, _ = SPVAllocation.objects.get_or_create(spv_id=spv_id)
+    SPVAllocation.objects.filter(pk=allocation.pk).update(reserved_amount=F('reserved_amount') + amount)
+
+
+def record_investment_change(previous, investment):
+    """
+    Move an investment between fundraising buckets.
+
+    `previous` is the snapshot read before the write (None for creates) and
+    `investment` the saved instance (None for deletes). Must run inside the
+    transaction that wrote the investment row.
+    """
+    new = snapshot_investment(investment) if investment is not None else None
+    old = previous if previous is not None and previous.spv_id else None
+    if new is not None and not new.spv_id:
+        new = None
+
+    if old is None and new is None:
+        return
+
+    if old is not None and new is not None and old.spv_id == new.spv_id:
+        _bump_reserved(new.spv_id, _reserved(new) - _reserved(old))
+    else:
+        if old is not None:
+            _bump_reserved(old.spv_id, -_reserved(old))
+        if new is not None:
+            _bump_reserved(new.spv_id, _reserved(new))
+
+    same_bucket = (
+        old is not None and new is not None and
+        (old.spv_id, old.status) == (new.spv_id, new.status)
+    )
+    if same_bucket:
+        if new.amount != old.amount:
+            _bump(new, 0, new.amount - old.amount)
+        return
+
+    if old is not None:
+        _bump(old, -1, -old.amount)
+    if new is not None:
+        _bump(new, 1, new.amount)
+
+
+def tracks_fundraising(update_fields):
+    """Whether a save with these update_fields can change the counters"""
+    return update_fields is None or bool(FUNDRAISING_FIELDS & set(update_fields))
+
+
+def get_fundraising_totals(spv_ids, statuses=None):
+    """
+    Return {spv_id: {'investment_count', 'total_amount'}} summed over
+    `statuses` (all statuses when None) with a single query. For investor
+    counts see get_investor_counts().
+    `spv_ids` may be a list or an id queryset (used as a subquery). SPVs
+    without investments are absent from the result.
+    """
+    if not isinstance(spv_ids, QuerySet):
+        spv_ids = list(spv_ids)
+        if not spv_ids:
+            return {}
+
+    queryset = SPVFundraisingStats.objects.filter(spv_id__in=spv_ids)
+    if statuses is not None:
+        queryset = queryset.filter(status__in=statuses)
+
+    rows = queryset.values('spv_id').annotate(
+        count=Sum('investment_count'),
+        amount=Sum('total_amount'),
+    ).order_by()
+
+    return {
+        row['spv_id']: {
+            'investment_count': row['count'] or 0,
+            'total_amount': row['amount'] or Decimal('0'),
+        }
+        for row in rows
+    }
+
+
+def get_spv_totals(spv_id, statuses=None):
+    """Fundraising totals for a single SPV (zeros when it has no investments)"""
+    return get_fundraising_totals([spv_id], statuses).get(spv_id, {
+        'investment_count': 0,
+        'total_amount': Decimal('0'),
+    })
+
+
+def get_investor_counts(spv_ids, statuses=None):
+    """
+    Return {spv_id: number of distinct investors} with an investment in
+    `statuses` (all statuses when None), in a single query. `spv_ids` may be
+    a list or an id queryset. SPVs without investors are absent.
+    """
+    if not isinstance(spv_ids, QuerySet):
+        spv_ids = list(spv_ids)
+        if not spv_ids:
+            return {}
+
+    queryset = Investment.objects.filter(spv_id__in=spv_ids)
+    if statuses is not None:
+        queryset = queryset.filter(status__in=statuses)
+    return dict(
+        queryset.values('spv_id').annotate(investors=Count('investor', distinct=True)).order_by().values_list('spv_id', 'investors')
+    )
+
+
+def compute_fundraising_stats(spv_ids=None):
+    """Aggregate the buckets from the investments table (source of truth)"""
+    queryset = Investment.objects.filter(spv__isnull=False)
+    if spv_ids is not None:
+        queryset = queryset.filter(spv_id__in=spv_ids)
+
+    rows = queryset.values('spv_id', 'status').annotate(
+        count=Count('id'),
+        amount=Sum('invested_amount'),
+    ).order_by()
+
+    return {
+        (row['spv_id'], row['status']): (row['count'], row['amount'] or Decimal('0'))
+        for row in rows
+    }
+
+
+def _reserved_totals(stats):
+    """{spv_id: reserved amount} from computed buckets"""
+    totals = {}
+    for (spv_id, status), (count, amount) in stats.items():
+        if status in RESERVED_STATUSES:
+            totals[spv_id] = totals.get(spv_id, Decimal('0')) + amount
+    return totals
+
+
+def verify_fundraising_stats(spv_ids=None):
+    """
+    Compare stored buckets against the investments table.
+    Returns a list of (spv_id, status, stored, expected) tuples that differ;
+    reserved allocation drift is reported with status 'reserved'.
+    """
+    expected = compute_fundraising_stats(spv_ids)
+
+    queryset = SPVFundraisingStats.objects.all()
+    if spv_ids is not None:
+        queryset = queryset.filter(spv_id__in=spv_ids)
+    stored = {
+        (row.spv_id, row.status): (row.investment_count, row.total_amount)
+        for row in queryset
+    }
+
+    empty = (0, Decimal('0'))
+    drift = []
+    for key in sorted(set(expected) | set(stored)):
+        if expected.get(key, empty) != stored.get(key, empty):
+            drift.append((key[0], key[1], stored.get(key, empty), expected.get(key, empty)))
+
+    expected_reserved = _reserved_totals(expected)
+    allocations = SPVAllocation.objects.all()
+    if spv_ids is not None:
+        allocations = allocations.filter(spv_id__in=spv_ids)
+    stored_reserved = dict(allocations.values_list('spv_id', 'reserved_amount'))
+    for spv_id in sorted(set(expected_reserved) | set(stored_reserved)):
+        stored_amount = stored_reserved.get(spv_id, Decimal('0'))
+        expected_amount = expected_reserved.get(spv_id, Decimal('0'))
+        if stored_amount != expected_amount:
+            drift.append((spv_id, 'reserved', stored_amount, expected_amount))
+    return drift
+
+
+def rebuild_fundraising_stats(spv_ids=None):
+    """Replace the stored buckets with a fresh aggregate. Returns rows written."""
+    expected = compute_fundraising_stats(spv_ids)
+
+    with transaction.atomic():
+        queryset = SPVFundraisingStats.objects.all()
+        if spv_ids is not None:
+            queryset = queryset.filter(spv_id__in=spv_ids)
+        queryset.delete()
+
+        SPVFundraisingStats.objects.bulk_create([
+            SPVFundraisingStats(
+                spv_id=spv_id,
+                status=status,
+                investment_count=count,
+                total_amount=amount,
+            )
+            for (spv_id, status), (count, amount) in expected.items()
+        ], batch_size=500)
+
+        allocations = SPVAllocation.objects.all()
+        if spv_ids is not None:
+            allocations = allocations.filter(spv_id__in=spv_ids)
+        allocations.delete()
+
+        SPVAllocation.objects.bulk_create([
+            SPVAllocation(spv_id=spv_id, reserved_amount=amount)
+            for spv_id, amount in _reserved_totals(expected).items()
+        ], batch_size=500)
+
+    return len(expected)
@@ -20,6 +20,9 @@ from decimal import Decimal
 from spv.models import SPV
 from users.models import CustomUser
 from .dashboard_models import Investment, Portfolio, Notification, KYCStatus
+from .notification_utils import dispatch_notifications, notify
+from .allocation_utils import AllocationExceeded, claim_allocation, get_remaining_allocation, get_reserved_allocation
+from .fundraising_utils import COMMITTED_STATUSES, RESERVED_STATUSES, get_spv_totals
 from .models import InvestorProfile
 
 
@@ -71,12 +74,9 @@ def spv_investment_details(request, spv_id):
         pass
     
     # Calculate remaining allocation
-    total_invested = Investment.objects.filter(
-        spv=spv,
-        status__in=['committed', 'active', 'completed']
-    ).aggregate(total=models.Sum('invested_amount'))['total'] or Decimal('0')
+    total_invested = get_spv_totals(spv.id, COMMITTED_STATUSES)['total_amount']
     
-    remaining_allocation = (spv.allocation or Decimal('0')) - total_invested
+    remaining_allocation = get_remaining_allocation(spv)
     
     # Check if user already has a pending or active investment
     existing_investment = Investment.objects.filter(
@@ -233,30 +233,40 @@ def initiate_investment(request):
             'error_code': 'BELOW_MINIMUM'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    # Calculate remaining allocation
-    from django.db.models import Sum
-    total_invested = Investment.objects.filter(
+    # Check for existing investment request - update instead of creating new
+    existing_investment = Investment.objects.filter(
+        investor=user,
         spv=spv,
-        status__in=['committed', 'active', 'completed', 'pending_payment', 'payment_processing']
-    ).aggregate(total=Sum('invested_amount'))['total'] or Decimal('0')
+        status__in=['pending_approval', 'approved', 'rejected', 'pending_payment', 'payment_processing']
+    ).first()
+    holds_allocation = existing_investment is not None and existing_investment.status in RESERVED_STATUSES
+    
+    # Calculate remaining allocation (re-checked atomically when allocation is reserved)
+    total_invested = get_reserved_allocation(spv)
     
     remaining_allocation = (spv.allocation or Decimal('0')) - total_invested
     
-    if amount > remaining_allocation:
+    # Reserved allocation already includes what the existing investment holds
+    requested = amount - existing_investment.invested_amount if holds_allocation else amount
+    if requested > remaining_allocation:
         return Response({
             'success': False,
             'error': f'Amount exceeds remaining allocation (${remaining_allocation:,.2f} available)',
             'error_code': 'EXCEEDS_ALLOCATION'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    # Check for existing investment request - update instead of creating new
-    existing_investment = Investment.objects.filter(
-        investor=user,
-        spv=spv,
-        status__in=['pending_approval', 'approved', 'rejected', 'pending_payment', 'payment_processing']
-    ).first()
-    
     with transaction.atomic():
+        if holds_allocation:
+            # The investment already holds allocation - claim only the increase
+            try:
+                claim_allocation(spv, amount - existing_investment.invested_amount)
+            except AllocationExceeded as e:
+                return Response({
+                    'success': False,
+                    'error': str(e),
+                    'error_code': 'EXCEEDS_ALLOCATION'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        
         if existing_investment:
             # Update existing investment request
             existing_investment.invested_amount = amount
@@ -304,21 +314,23 @@ def initiate_investment(request):
             is_new = True
         
         # Create notification for INVESTOR
-        Notification.objects.create(
-            user=user,
-            notification_type='investment',
-            title='Investment Request already sent' if not is_new else 'Investment Request Submitted',
-            message=f'Your investment request of ${amount:,.2f} in {spv.display_name} has been {"updated" if not is_new else "submitted for approval"}.',
-            priority='normal',
-            action_required=False,
-            related_investment=investment,
-            related_spv=spv,
-        )
+        notifications = [
+            Notification(
+                user=user,
+                notification_type='investment',
+                title='Investment Request already sent' if not is_new else 'Investment Request Submitted',
+                message=f'Your investment request of ${amount:,.2f} in {spv.display_name} has been {"updated" if not is_new else "submitted for approval"}.',
+                priority='normal',
+                action_required=False,
+                related_investment=investment,
+                related_spv=spv,
+            ),
+        ]
         
         # Create notification for SYNDICATE MANAGER (only for new or re-submitted)
         if is_new or existing_investment.status == 'pending_approval':
             if spv.created_by:
-                Notification.objects.create(
+                notifications.append(Notification(
                     user=spv.created_by,
                     notification_type='investment',
                     title='Investment Request Updated' if not is_new else 'New Investment Request',
@@ -329,7 +341,9 @@ def initiate_investment(request):
                     action_label='Review Request',
                     related_investment=investment,
                     related_spv=spv,
-                )
+                ))
+        
+        dispatch_notifications(notifications)
     
     return Response({
         'success': True,
@@ -484,7 +498,7 @@ def cancel_investment(request, investment_id):
         investment.save(update_fields=['status', 'updated_at'])
         
         # Create notification
-        Notification.objects.create(
+        notify(
             user=user,
             notification_type='investment',
             title='Investment Cancelled',
@@ -12,6 +12,8 @@ from django.utils import timezone
 
 from investors.models import InvestorProfile
 from investors.dashboard_models import Investment, KYCStatus
+from investors.deal_utils import DEAL_RAISED_STATUSES
+from investors.fundraising_utils import get_investor_counts, get_spv_totals
 from spv.models import SPV
 from users.models import TeamMember, CustomUser
 from documents.models import Document
@@ -507,10 +509,7 @@ def spv_investment_detail(request, spv_id):
     user = request.user
     
     # Calculate funding progress
-    total_investments = Investment.objects.filter(spv=spv)
-    active_investments = total_investments.filter(status__in=['active', 'pending'])
-    
-    raised_amount = active_investments.aggregate(Sum('invested_amount'))['invested_amount__sum'] or 0
+    raised_amount = get_spv_totals(spv.id, DEAL_RAISED_STATUSES)['total_amount']
     target_amount = spv.round_size or spv.allocation or 0
     
     funding_percentage = 0
@@ -524,7 +523,7 @@ def spv_investment_detail(request, spv_id):
         days_left = max(0, delta.days)
     
     # Count total investors
-    total_investors = total_investments.values('investor').distinct().count()
+    total_investors = get_investor_counts([spv.id]).get(spv.id, 0)
     
     # Check if current user has already invested
     user_investment = Investment.objects.filter(investor=user, spv=spv).first()
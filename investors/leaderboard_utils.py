@@ -0,0 +1,201 @@
+"""
+Top syndicates leaderboard.
+
+SyndicateRanking keeps one precomputed row per SPV lead so the leaderboard
+is a single indexed, cursor-paginated query. refresh_syndicate_rankings()
+recomputes rows with a few grouped queries; investors.signals calls it when
+an SPV is created or deleted or changes lead (for the previous lead too),
+since those add, move or remove the SPV in a lead's row.
+
+Other writes only flag the lead's row dirty (one UPDATE): Investment.save()/
+delete(), which only move the investor and raised figures the ranking order
+does not use, and SPV edits. The leaderboard fills in a dirty row's
+investment figures in memory (no write) and refresh_dirty_rankings()
+(`manage.py rebuild_syndicate_leaderboard --dirty`) recomputes the dirty
+rows in batches, SPV figures included.
+"""
+
+from decimal import Decimal
+
+from django.db.models import Count, Max, Q, Sum
+
+from spv.models import SPV
+
+from .dashboard_models import Investment, SyndicateRanking
+
+
+# SPV statuses counted as active on the leaderboard
+ACTIVE_SPV_STATUSES = ['active', 'approved']
+
+# Number of recent SPVs whose deal tags make up a lead's sectors
+SECTOR_SPVS = 5
+MAX_SECTORS = 3
+
+INVESTMENT_FIELDS = ['total_investors', 'total_raised']
+
+STAT_FIELDS = ['total_spvs', 'active_spvs', 'total_allocation', 'latest_spv_at', 'sectors'] + INVESTMENT_FIELDS
+
+
+def mark_rankings_dirty(spv_ids):
+    """Flag the leaderboard rows of these SPVs' leads for a refresh of their investment figures"""
+    spv_ids = [spv_id for spv_id in spv_ids if spv_id]
+    if spv_ids:
+        SyndicateRanking.objects.filter(
+            lead_id__in=SPV.objects.filter(id__in=spv_ids).values('created_by_id'), is_dirty=False
+        ).update(is_dirty=True)
+
+
+def mark_lead_rankings_dirty(lead_ids):
+    """Flag these leads' leaderboard rows for a refresh"""
+    lead_ids = [lead_id for lead_id in lead_ids if lead_id]
+    if lead_ids:
+        SyndicateRanking.objects.filter(lead_id__in=lead_ids, is_dirty=False).update(is_dirty=True)
+
+
+def _get_investment_stats(investments):
+    """{lead_id: {'total_investors', 'total_raised'}} of an investment queryset"""
+    return {
+        row['spv__created_by_id']: {
+            'total_investors': row['total_investors'] or 0,
+            'total_raised': row['total_raised'] or Decimal('0'),
+        }
+        for row in investments.values('spv__created_by_id').annotate(
+            total_investors=Count('investor', distinct=True),
+            total_raised=Sum('invested_amount', filter=Q(status='active')),
+        ).order_by()
+    }
+
+
+def empty_investment_stats():
+    return {'total_investors': 0, 'total_raised': Decimal('0')}
+
+
+def _get_sectors(lead_ids):
+    """{lead_id: up to MAX_SECTORS unique tags from the lead's newest SPVs}"""
+    recent = {}
+    tags = SPV.objects.filter(created_by_id__in=lead_ids).order_by('created_by_id', '-created_at').values_list(
+        'created_by_id', 'deal_tags'
+    )
+    for lead_id, deal_tags in tags:
+        spv_tags = recent.setdefault(lead_id, [])
+        if len(spv_tags) < SECTOR_SPVS:
+            spv_tags.append(deal_tags or [])
+
+    sectors = {}
+    for lead_id, spv_tags in recent.items():
+        unique = []
+        for tag in (tag for deal_tags in spv_tags for tag in deal_tags):
+            if tag not in unique:
+                unique.append(tag)
+        sectors[lead_id] = unique[:MAX_SECTORS]
+    return sectors
+
+
+def refresh_syndicate_rankings(lead_ids=None, clear_dirty=True):
+    """
+    Recompute leaderboard rows for the given leads (every lead when None).
+    Leads without SPVs are removed. Returns the number of rows written.
+    With clear_dirty=False existing rows keep their dirty flag.
+    """
+    spvs = SPV.objects.all()
+    investments = Investment.objects.all()
+    if lead_ids is not None:
+        lead_ids = [lead_id for lead_id in lead_ids if lead_id]
+        if not lead_ids:
+            return 0
+        spvs = spvs.filter(created_by_id__in=lead_ids)
+        investments = investments.filter(spv__created_by_id__in=lead_ids)
+
+    spv_stats = spvs.values('created_by_id').annotate(
+        total_spvs=Count('id'),
+        active_spvs=Count('id', filter=Q(status__in=ACTIVE_SPV_STATUSES)),
+        total_allocation=Sum('allocation'),
+        latest_spv_at=Max('created_at'),
+    ).order_by()
+    investment_stats = _get_investment_stats(investments)
+
+    rows = {row['created_by_id']: row for row in spv_stats}
+    sectors = _get_sectors(list(rows))
+
+    rankings = []
+    for lead_id, row in rows.items():
+        stats = investment_stats.get(lead_id, empty_investment_stats())
+        rankings.append(SyndicateRanking(
+            lead_id=lead_id,
+            total_spvs=row['total_spvs'],
+            active_spvs=row['active_spvs'],
+            total_allocation=row['total_allocation'] or Decimal('0'),
+            latest_spv_at=row['latest_spv_at'],
+            sectors=sectors.get(lead_id, []),
+            total_investors=stats['total_investors'],
+            total_raised=stats['total_raised'],
+            is_dirty=False,
+        ))
+
+    stale = SyndicateRanking.objects.exclude(lead_id__in=list(rows))
+    if lead_ids is not None:
+        stale = stale.filter(lead_id__in=lead_ids)
+    stale.delete()
+
+    SyndicateRanking.objects.bulk_create(
+        rankings,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['lead'],
+        update_fields=STAT_FIELDS + (['is_dirty', 'updated_at'] if clear_dirty else ['updated_at']),
+    )
+    return len(rankings)
+
+
+def fill_dirty_rankings(rankings):
+    """Bring dirty rows' investment figures up to date in memory without writing (one query)"""
+    dirty = [ranking for ranking in rankings if ranking.is_dirty]
+    if not dirty:
+        return
+    stats = _get_investment_stats(Investment.objects.filter(spv__created_by_id__in=[ranking.lead_id for ranking in dirty]))
+    for ranking in dirty:
+        for field, value in stats.get(ranking.lead_id, empty_investment_stats()).items():
+            setattr(ranking, field, value)
+
+
+def refresh_dirty_rankings(batch_size=500):
+    """
+    Recompute dirty rows in batches with refresh_syndicate_rankings(): one
+    set of grouped queries and one bulk upsert per batch. Returns the number
+    of rows written.
+
+    Flags are cleared before aggregating, so an investment written while a
+    batch is in flight marks its row dirty again for the next run.
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        rankings = list(SyndicateRanking.objects.filter(is_dirty=True, id__gt=last_id).order_by('id')[:batch_size])
+        if not rankings:
+            return updated
+        last_id = rankings[-1].id
+
+        SyndicateRanking.objects.filter(id__in=[ranking.id for ranking in rankings]).update(is_dirty=False)
+        updated += refresh_syndicate_rankings([ranking.lead_id for ranking in rankings], clear_dirty=False)
+
+
+def build_syndicate_card(ranking):
+    """Leaderboard card for a SyndicateRanking row (lead must be joined)"""
+    lead = ranking.lead
+    return {
+        'id': lead.id,
+        'syndicate_lead_id': lead.id,
+        'syndicate_name': f"{lead.first_name} {lead.last_name}".strip() or lead.username,
+        'lead_email': lead.email,
+        'total_spvs': ranking.total_spvs,
+        'active_spvs': ranking.active_spvs,
+        'sectors': ranking.sectors or ['Technology'],
+        'total_investors': ranking.total_investors,
+        'total_raised': float(ranking.total_raised),
+        'total_allocation': float(ranking.total_allocation),
+        'min_investment': 50000,  # Default
+        'track_record': '+23.4% IRR',  # Mock - can be calculated from actual performance
+        'status': 'Active' if ranking.active_spvs else 'Inactive',
+        'investment_type': 'top_syndicate',
+        'joined_date': lead.date_joined.strftime('%d/%m/%Y') if lead.date_joined else None,
+    }
@@ -0,0 +1,108 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from investors.allocation_utils import AllocationExceeded, get_reserved_allocation, reserve_allocation
+from investors.dashboard_models import Investment
+from investors.fundraising_utils import verify_fundraising_stats
+from spv.models import SPV
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = 'Fire simultaneous allocation reservations at one SPV and check it is never oversubscribed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300, help='Number of concurrent reservations')
+        parser.add_argument('--amount', type=Decimal, default=Decimal('10000'), help='Amount per reservation')
+        parser.add_argument('--allocation', type=Decimal, help='SPV allocation (default: room for half the requests)')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark SPV and users afterwards')
+
+    def handle(self, *args, **options):
+        total = options['requests']
+        amount = options['amount']
+        allocation = options['allocation'] or amount * (total // 2)
+        tag = uuid.uuid4().hex[:8]
+
+        self.stdout.write(f'Preparing SPV with allocation ${allocation:,.2f} and {total} approved investments...')
+        lead = CustomUser.objects.create_user(username=f'bench-lead-{tag}', email=f'bench-lead-{tag}@example.com')
+        spv = SPV.objects.create(
+            created_by=lead,
+            display_name=f'Allocation benchmark {tag}',
+            portfolio_company_name='Benchmark Co',
+            founder_email=f'bench-founder-{tag}@example.com',
+            status='active',
+            allocation=allocation,
+        )
+        investors = CustomUser.objects.bulk_create([
+            CustomUser(username=f'bench-lp-{tag}-{i}', email=f'bench-lp-{tag}-{i}@example.com')
+            for i in range(total)
+        ])
+        investment_ids = [
+            Investment.objects.create(
+                investor=investor,
+                spv=spv,
+                syndicate_name=spv.display_name,
+                invested_amount=amount,
+                status='approved',
+            ).id
+            for investor in investors
+        ]
+
+        start = threading.Event()
+
+        def reserve(investment_id):
+            try:
+                investment = Investment.objects.select_related('spv').get(pk=investment_id)
+                start.wait()
+                began = time.perf_counter()
+                reserve_allocation(investment)
+                return 'reserved', time.perf_counter() - began
+            except AllocationExceeded:
+                return 'rejected', 0
+            except OperationalError:
+                return 'error', 0
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=total) as pool:
+            futures = [pool.submit(reserve, investment_id) for investment_id in investment_ids]
+            time.sleep(0.5)  # let every worker load its investment and park on the start event
+            began = time.perf_counter()
+            start.set()
+            results = [future.result() for future in futures]
+            elapsed = time.perf_counter() - began
+
+        outcomes = {'reserved': 0, 'rejected': 0, 'error': 0}
+        for outcome, _ in results:
+            outcomes[outcome] += 1
+        latencies = sorted(duration for outcome, duration in results if outcome == 'reserved')
+
+        reserved = get_reserved_allocation(spv)
+        committed = Investment.objects.filter(spv=spv, status='pending_payment').count()
+
+        self.stdout.write(f'Requests:   {total} in {elapsed:.2f}s ({total / elapsed:.0f} req/s)')
+        self.stdout.write(
+            f"Reserved:   {outcomes['reserved']}  Rejected: {outcomes['rejected']}  Errors: {outcomes['error']}"
+        )
+        if latencies:
+            self.stdout.write(
+                f'Latency:    p50 {latencies[len(latencies) // 2] * 1000:.1f}ms  '
+                f'max {latencies[-1] * 1000:.1f}ms'
+            )
+        self.stdout.write(f'Allocation: ${reserved:,.2f} reserved of ${allocation:,.2f} ({committed} investments)')
+
+        if reserved > allocation or committed * amount != reserved or verify_fundraising_stats([spv.id]):
+            self.stdout.write(self.style.ERROR('SPV is oversubscribed or its counters drifted'))
+        else:
+            self.stdout.write(self.style.SUCCESS('No oversubscription'))
+
+        if not options['keep']:
+            spv.delete()
+            CustomUser.objects.filter(username__startswith=f'bench-lp-{tag}-').delete()
+            lead.delete()
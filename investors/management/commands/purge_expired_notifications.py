@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from investors.dashboard_models import Notification
+
+
+class Command(BaseCommand):
+    help = 'Delete notifications whose expires_at has passed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many notifications have expired')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Notifications deleted per statement')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        expired = Notification.objects.filter(expires_at__lt=now)
+        if options['dry_run']:
+            self.stdout.write(f'{expired.count()} expired notification(s)')
+            return
+
+        # Delete page by page of expired ids so each statement (and its lock) stays small
+        deleted = 0
+        last_id = 0
+        while True:
+            ids = list(expired.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            deleted += Notification.objects.filter(id__in=ids).purge_expired(now=now)
+            last_id = ids[-1]
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired notification(s)'))
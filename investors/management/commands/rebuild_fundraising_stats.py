@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from investors.fundraising_utils import rebuild_fundraising_stats, verify_fundraising_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild (or verify) the SPV fundraising counters from the investments table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--spv', type=int, action='append', dest='spv_ids', help='Limit to these SPV ids (repeatable)')
+        parser.add_argument('--verify', action='store_true', help='Only report drift, do not rewrite the counters')
+
+    def handle(self, *args, **options):
+        spv_ids = options['spv_ids']
+
+        if options['verify']:
+            drift = verify_fundraising_stats(spv_ids)
+            for spv_id, status, stored, expected in drift:
+                self.stdout.write(self.style.WARNING(
+                    f'SPV {spv_id} [{status}]: stored {stored}, expected {expected}'
+                ))
+            if drift:
+                self.stdout.write(self.style.ERROR(f'{len(drift)} fundraising bucket(s) out of sync'))
+            else:
+                self.stdout.write(self.style.SUCCESS('Fundraising counters are in sync'))
+            return
+
+        written = rebuild_fundraising_stats(spv_ids)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} fundraising bucket(s)'))
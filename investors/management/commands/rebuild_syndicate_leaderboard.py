@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from investors.leaderboard_utils import refresh_dirty_rankings, refresh_syndicate_rankings
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized top syndicates leaderboard from SPVs and investments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lead', type=int, action='append', dest='lead_ids', help='Limit to these lead user ids (repeatable)')
+        parser.add_argument(
+            '--dirty', action='store_true',
+            help='Only recompute rows flagged by investment and SPV changes (run periodically, e.g. from cron)',
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per recompute batch with --dirty')
+
+    def handle(self, *args, **options):
+        if options['dirty']:
+            written = refresh_dirty_rankings(batch_size=options['batch_size'])
+        else:
+            written = refresh_syndicate_rankings(options['lead_ids'])
+        self.stdout.write(self.style.SUCCESS(f'Refreshed {written} leaderboard row(s)'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from investors.dashboard_models import Portfolio
+from investors.portfolio_utils import recalculate_dirty_portfolios
+
+
+class Command(BaseCommand):
+    help = 'Recalculate portfolios flagged dirty by investment changes (run periodically, e.g. from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Recalculate every portfolio, not only dirty ones')
+        parser.add_argument('--batch-size', type=int, default=500, help='Portfolios per aggregate/bulk_update batch')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            Portfolio.objects.filter(is_dirty=False).update(is_dirty=True)
+
+        updated = recalculate_dirty_portfolios(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Recalculated {updated} portfolio(s)'))
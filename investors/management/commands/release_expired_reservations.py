@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from investors.allocation_utils import get_reservation_ttl, release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = 'Expire unpaid pending_payment investments and return their allocation to the SPV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--spv', type=int, action='append', dest='spv_ids', help='Limit to these SPV ids (repeatable)')
+
+    def handle(self, *args, **options):
+        released = release_expired_reservations(spv_ids=options['spv_ids'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Released {released} reservation(s) older than {get_reservation_ttl()}'
+        ))
@@ -0,0 +1,28 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from investors.performance_utils import capture_performance_snapshots, prune_performance, rollup_performance
+
+
+class Command(BaseCommand):
+    help = 'Record daily portfolio performance (with weekly/monthly rollups) for every portfolio; run once a day'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, help='Snapshot date (YYYY-MM-DD, default: today)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Portfolios per aggregate/bulk insert batch')
+        parser.add_argument('--backfill-rollups', action='store_true', help='Rebuild weekly and monthly rows from existing daily history first')
+        parser.add_argument('--no-prune', action='store_true', help='Keep daily/weekly rows past their retention')
+
+    def handle(self, *args, **options):
+        if options['backfill_rollups']:
+            weekly = rollup_performance('daily', 'weekly', options['batch_size'])
+            monthly = rollup_performance('daily', 'monthly', options['batch_size'])
+            self.stdout.write(f'Backfilled {weekly} weekly and {monthly} monthly row(s)')
+
+        captured = capture_performance_snapshots(date=options['date'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Captured performance for {captured} portfolio(s)'))
+
+        if not options['no_prune']:
+            pruned = prune_performance(today=options['date'])
+            self.stdout.write(f'Pruned {pruned} expired row(s)')
@@ -0,0 +1,151 @@
+"""
+Notification dispatch.
+
+dispatch_notifications() writes a batch of unsaved Notification instances
+with one bulk_create and hands delivery (WebSocket push on the user's
+`notifications_<user_id>` channel group, optional email) to a worker once
+the surrounding transaction commits, so request handlers only pay for the
+insert.
+
+NOTIFICATION_DELIVERY_MODE selects how delivery runs:
+
+    deferred  in-process background worker queue (default)
+    sync      inline after commit (tests, management commands)
+    off       rows are written, nothing is delivered
+"""
+
+import logging
+import queue
+import threading
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import send_mail
+from django.db import transaction
+
+from .cache_utils import invalidate_user_cache
+from .dashboard_models import Notification
+
+
+logger = logging.getLogger(__name__)
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_delivery_mode():
+    return getattr(settings, 'NOTIFICATION_DELIVERY_MODE', 'deferred')
+
+
+def get_notification_group(user_id):
+    """Channel group a user's notifications are pushed to"""
+    return f'notifications_{user_id}'
+
+
+def _build_delivery(notification, email):
+    return {
+        'user_id': notification.user_id,
+        'email': email,
+        'notification': {
+            'id': notification.id,
+            'notification_type': notification.notification_type,
+            'title': notification.title,
+            'message': notification.message,
+            'priority': notification.priority,
+            'action_required': notification.action_required,
+            'action_url': notification.action_url,
+            'action_label': notification.action_label,
+            'created_at': notification.created_at.isoformat() if notification.created_at else None,
+        },
+    }
+
+
+def deliver(deliveries):
+    """Push a batch of notifications and send the requested emails"""
+    channel_layer = get_channel_layer()
+    for delivery in deliveries:
+        payload = delivery['notification']
+        try:
+            if channel_layer is not None:
+                async_to_sync(channel_layer.group_send)(
+                    get_notification_group(delivery['user_id']),
+                    {'type': 'notification', 'notification': payload},
+                )
+            if delivery['email']:
+                send_mail(
+                    payload['title'],
+                    payload['message'],
+                    settings.DEFAULT_FROM_EMAIL,
+                    [delivery['email']],
+                    fail_silently=False,
+                )
+        except Exception:
+            logger.exception('Notification %s could not be delivered', payload['id'])
+
+
+def _worker():
+    while True:
+        deliveries = _queue.get()
+        try:
+            deliver(deliveries)
+        finally:
+            _queue.task_done()
+
+
+def _get_queue():
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = queue.Queue()
+            threading.Thread(target=_worker, name='notification-delivery', daemon=True).start()
+    return _queue
+
+
+def enqueue_delivery(deliveries):
+    """Deliver now or on the background worker, depending on the mode"""
+    mode = get_delivery_mode()
+    if mode == 'off' or not deliveries:
+        return
+    if mode == 'sync':
+        deliver(deliveries)
+    else:
+        _get_queue().put(deliveries)
+
+
+def wait_for_deliveries():
+    """Block until the background worker has drained its queue"""
+    if _queue is not None:
+        _queue.join()
+
+
+def dispatch_notifications(notifications, email=False):
+    """
+    Create unsaved Notification instances in one INSERT and schedule their
+    delivery after commit. `email` also mails each recipient. Returns the
+    created notifications.
+    """
+    notifications = [notification for notification in notifications if notification is not None]
+    if not notifications:
+        return []
+
+    created = Notification.objects.bulk_create(notifications)
+
+    # bulk_create skips post_save, so drop the recipients' cached dashboards here
+    invalidate_user_cache(*{notification.user_id for notification in created})
+
+    # One query for the batch's addresses rather than a user fetch per notification
+    emails = {}
+    if email:
+        emails = dict(
+            get_user_model().objects.filter(id__in={notification.user_id for notification in created}).values_list('id', 'email')
+        )
+    deliveries = [_build_delivery(notification, emails.get(notification.user_id)) for notification in created]
+    transaction.on_commit(lambda: enqueue_delivery(deliveries))
+    return created
+
+
+def notify(email=False, **fields):
+    """Create and dispatch a single notification"""
+    return dispatch_notifications([Notification(**fields)], email=email)[0]
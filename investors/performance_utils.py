@@ -0,0 +1,152 @@
+"""
+Portfolio performance time series.
+
+`manage.py snapshot_portfolio_performance` runs once a day and upserts, for
+every portfolio, the day's row plus the row of the current week and month
+(closing values: the latest snapshot of a period wins). Each resolution is
+therefore complete for the range it is kept for:
+
+    daily    last DAILY_RETENTION_DAYS
+    weekly   last WEEKLY_RETENTION_DAYS
+    monthly  forever
+
+Older daily/weekly rows are pruned. Charts pick the finest resolution that
+covers the requested window and read it with one range scan over the
+(portfolio, resolution, date) unique index, so a ten-year window returns
+~120 monthly points.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .dashboard_models import Portfolio, PortfolioPerformance
+from .portfolio_utils import empty_totals, get_portfolio_totals
+
+
+DAILY_RETENTION_DAYS = 90
+WEEKLY_RETENTION_DAYS = 730
+
+RESOLUTIONS = ['daily', 'weekly', 'monthly']
+
+VALUE_FIELDS = ['total_invested', 'current_value']
+
+
+def period_start(resolution, date):
+    """Date key of the period containing `date` (Monday / first of month)"""
+    if resolution == 'weekly':
+        return date - timedelta(days=date.weekday())
+    if resolution == 'monthly':
+        return date.replace(day=1)
+    return date
+
+
+def choose_resolution(days):
+    """Finest resolution that is kept for a window of `days`"""
+    if days <= DAILY_RETENTION_DAYS:
+        return 'daily'
+    if days <= WEEKLY_RETENTION_DAYS:
+        return 'weekly'
+    return 'monthly'
+
+
+def get_performance_series(portfolio, days, resolution=None, today=None):
+    """
+    Performance rows for the last `days` days at the resolution suited to
+    the window. Returns (resolution, queryset).
+    """
+    today = today or timezone.now().date()
+    resolution = resolution or choose_resolution(days)
+    start_date = period_start(resolution, today - timedelta(days=days))
+    rows = PortfolioPerformance.objects.filter(
+        portfolio=portfolio,
+        resolution=resolution,
+        date__gte=start_date,
+        date__lte=today,
+    ).order_by('date')
+    return resolution, rows
+
+
+def _upsert(rows, batch_size):
+    PortfolioPerformance.objects.bulk_create(
+        rows,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['portfolio', 'resolution', 'date'],
+        update_fields=VALUE_FIELDS,
+    )
+
+
+def capture_performance_snapshots(date=None, batch_size=500):
+    """
+    Record today's values for every portfolio at all resolutions, computed
+    from investments (one aggregate and one bulk upsert per batch).
+    Returns the number of portfolios captured.
+    """
+    date = date or timezone.now().date()
+    captured = 0
+    last_id = 0
+    while True:
+        portfolios = list(
+            Portfolio.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'user_id')[:batch_size]
+        )
+        if not portfolios:
+            return captured
+        last_id = portfolios[-1][0]
+
+        totals = get_portfolio_totals([user_id for _, user_id in portfolios])
+        rows = []
+        for portfolio_id, user_id in portfolios:
+            values = totals.get(user_id, empty_totals())
+            for resolution in RESOLUTIONS:
+                rows.append(PortfolioPerformance(
+                    portfolio_id=portfolio_id,
+                    resolution=resolution,
+                    date=period_start(resolution, date),
+                    total_invested=values['total_invested'],
+                    current_value=values['current_value'],
+                ))
+        _upsert(rows, batch_size)
+        captured += len(portfolios)
+
+
+def rollup_performance(source='daily', target='weekly', batch_size=500):
+    """
+    Build `target` rows from `source` rows (closing value of each period).
+    Used to backfill coarser resolutions from existing history; the daily
+    snapshot keeps them current afterwards. Returns rows written.
+    """
+    rows = PortfolioPerformance.objects.filter(resolution=source).order_by('portfolio_id', 'date').values_list(
+        'portfolio_id', 'date', *VALUE_FIELDS
+    )
+
+    closing = {}
+    for portfolio_id, date, total_invested, current_value in rows.iterator(chunk_size=2000):
+        # Rows are date ordered, so the last one seen is the period's close
+        closing[(portfolio_id, period_start(target, date))] = (total_invested, current_value)
+
+    _upsert([
+        PortfolioPerformance(
+            portfolio_id=portfolio_id,
+            resolution=target,
+            date=date,
+            total_invested=total_invested,
+            current_value=current_value,
+        )
+        for (portfolio_id, date), (total_invested, current_value) in closing.items()
+    ], batch_size)
+    return len(closing)
+
+
+def prune_performance(today=None):
+    """Drop daily and weekly rows past their retention. Returns rows deleted."""
+    today = today or timezone.now().date()
+    with transaction.atomic():
+        daily, _ = PortfolioPerformance.objects.filter(
+            resolution='daily', date__lt=today - timedelta(days=DAILY_RETENTION_DAYS)
+        ).delete()
+        weekly, _ = PortfolioPerformance.objects.filter(
+            resolution='weekly', date__lt=period_start('weekly', today - timedelta(days=WEEKLY_RETENTION_DAYS))
+        ).delete()
+    return daily + weekly
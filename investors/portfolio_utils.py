@@ -0,0 +1,111 @@
+"""
+Portfolio totals.
+
+Portfolio figures are derived from the investor's active investments with a
+single grouped aggregate. Investment.save()/delete() flag the investor's
+portfolio as dirty instead of recalculating it; read endpoints fill in a
+dirty portfolio's figures in memory (no write), and
+recalculate_dirty_portfolios() (`manage.py recalculate_portfolios`) stores
+them in bulk.
+"""
+
+from decimal import Decimal
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .dashboard_models import Investment, Portfolio
+
+
+# Investment fields that affect portfolio figures
+PORTFOLIO_FIELDS = {'investor', 'investor_id', 'status', 'invested_amount', 'current_value'}
+
+# Fields written by a recalculation
+TOTAL_FIELDS = ['total_invested', 'current_value', 'unrealized_gain', 'total_investments_count', 'active_investments_count']
+
+ACTIVE = Q(status='active')
+
+CENTS = Decimal('0.01')
+
+
+def tracks_portfolio(update_fields):
+    """Whether a save with these update_fields can change portfolio figures"""
+    return update_fields is None or bool(PORTFOLIO_FIELDS & set(update_fields))
+
+
+def mark_portfolios_dirty(user_ids):
+    """Flag the portfolios of these investors for recalculation"""
+    user_ids = [user_id for user_id in user_ids if user_id]
+    if user_ids:
+        Portfolio.objects.filter(user_id__in=user_ids, is_dirty=False).update(is_dirty=True)
+
+
+def get_portfolio_totals(user_ids):
+    """
+    Return {user_id: {field: value}} for TOTAL_FIELDS with one grouped query.
+    Investors without investments are absent from the result.
+    """
+    rows = Investment.objects.filter(investor_id__in=user_ids).values('investor_id').annotate(
+        invested=Sum('invested_amount', filter=ACTIVE),
+        value=Sum('current_value', filter=ACTIVE),
+        active=Count('id', filter=ACTIVE),
+    ).order_by()
+
+    totals = {}
+    for row in rows:
+        invested = (row['invested'] or Decimal('0')).quantize(CENTS)
+        value = (row['value'] or Decimal('0')).quantize(CENTS)
+        totals[row['investor_id']] = {
+            'total_invested': invested,
+            'current_value': value,
+            'unrealized_gain': value - invested,
+            # Both counts cover active investments only (unchanged behaviour)
+            'total_investments_count': row['active'],
+            'active_investments_count': row['active'],
+        }
+    return totals
+
+
+def empty_totals():
+    return {
+        'total_invested': Decimal('0.00'),
+        'current_value': Decimal('0.00'),
+        'unrealized_gain': Decimal('0.00'),
+        'total_investments_count': 0,
+        'active_investments_count': 0,
+    }
+
+
+def recalculate_dirty_portfolios(batch_size=500, user_ids=None):
+    """
+    Recalculate dirty portfolios in batches: one aggregate and one
+    bulk_update per batch. Returns the number of portfolios updated.
+
+    Flags are cleared before aggregating, so an investment written while a
+    batch is in flight marks its portfolio dirty again for the next run.
+    """
+    queryset = Portfolio.objects.filter(is_dirty=True)
+    if user_ids is not None:
+        queryset = queryset.filter(user_id__in=user_ids)
+
+    updated = 0
+    last_id = 0
+    while True:
+        portfolios = list(queryset.filter(id__gt=last_id).order_by('id')[:batch_size])
+        if not portfolios:
+            return updated
+        last_id = portfolios[-1].id
+
+        Portfolio.objects.filter(id__in=[portfolio.id for portfolio in portfolios]).update(is_dirty=False)
+        totals = get_portfolio_totals([portfolio.user_id for portfolio in portfolios])
+
+        now = timezone.now()
+        for portfolio in portfolios:
+            for field, value in totals.get(portfolio.user_id, empty_totals()).items():
+                setattr(portfolio, field, value)
+            portfolio.is_dirty = False
+            portfolio.updated_at = now
+            portfolio.last_calculated_at = now
+
+        Portfolio.objects.bulk_update(portfolios, TOTAL_FIELDS + ['updated_at', 'last_calculated_at'])
+        updated += len(portfolios)
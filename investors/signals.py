@@ -0,0 +1,53 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from spv.models import SPV
+
+from .cache_utils import invalidate_user_cache
+from .dashboard_models import Investment, KYCStatus, Notification, Portfolio, TaxSummary
+from .leaderboard_utils import mark_lead_rankings_dirty, refresh_syndicate_rankings
+
+
+@receiver(pre_save, sender=SPV)
+def remember_spv_lead(sender, instance, **kwargs):
+    """Keep the stored lead so a reassignment refreshes both leaderboard rows"""
+    instance._previous_lead_id = (
+        SPV.objects.filter(pk=instance.pk).values_list('created_by_id', flat=True).first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=SPV)
+def refresh_ranking_on_spv_save(sender, instance, created, **kwargs):
+    """Keep the lead's leaderboard row in step with their SPVs"""
+    previous_lead_id = getattr(instance, '_previous_lead_id', None)
+    if created or previous_lead_id != instance.created_by_id:
+        # The SPV joins a lead's row (and leaves the previous lead's)
+        refresh_syndicate_rankings([instance.created_by_id, previous_lead_id])
+    else:
+        mark_lead_rankings_dirty([instance.created_by_id])
+
+
+@receiver(post_delete, sender=SPV)
+def refresh_ranking_on_spv_delete(sender, instance, **kwargs):
+    """Drop or shrink the lead's leaderboard row when an SPV is removed"""
+    refresh_syndicate_rankings([instance.created_by_id])
+
+
+@receiver([post_save, post_delete], sender=Investment)
+def invalidate_cache_on_investment_change(sender, instance, **kwargs):
+    """Investment cards, portfolio charts and tax figures depend on investments"""
+    invalidate_user_cache(instance.investor_id)
+
+
+@receiver([post_save, post_delete], sender=Notification)
+@receiver([post_save, post_delete], sender=Portfolio)
+@receiver([post_save, post_delete], sender=KYCStatus)
+def invalidate_cache_on_user_change(sender, instance, **kwargs):
+    """Dashboard cards read the user's notifications, portfolio and KYC status"""
+    invalidate_user_cache(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=TaxSummary)
+def invalidate_cache_on_tax_summary_change(sender, instance, **kwargs):
+    """Tax Center overview reads the yearly tax summary"""
+    invalidate_user_cache(instance.investor_id)
@@ -0,0 +1,107 @@
+"""
+Grouped statistics.
+
+GroupedStats runs a single GROUP BY over a queryset (count plus sums of the
+requested fields per group) and answers totals, filtered counts/sums and
+per-field breakdowns from those rows in Python. Dashboards that used to
+issue one count/aggregate query per card read everything from one pass; the
+number of groups is bounded by the choices of the grouped fields.
+
+`flags` add conditional counts (Count(filter=Q)) for conditions that are not
+grouped fields, e.g. "pending for more than 7 days". with_time_bucket()
+annotates a day/week bucket that can be grouped on as well, so trend charts
+come out of the same query.
+"""
+
+from decimal import Decimal
+
+from django.db.models import Case, Count, DateField, Sum, When
+from django.db.models.functions import TruncDate, TruncWeek
+
+
+TIME_BUCKETS = {
+    'day': lambda field: TruncDate(field),
+    'week': lambda field: TruncWeek(field, output_field=DateField()),
+}
+
+
+def with_time_bucket(queryset, field, period, since=None):
+    """
+    Annotate `bucket` with the day/week (`period`) of `field`; rows before
+    `since` get no bucket. Raises ValueError for an unknown period.
+    """
+    if period not in TIME_BUCKETS:
+        raise ValueError(f"Invalid bucket '{period}'. Use one of: {', '.join(TIME_BUCKETS)}")
+    bucket = TIME_BUCKETS[period](field)
+    if since is not None:
+        bucket = Case(When(**{f'{field}__gte': since}, then=bucket), default=None, output_field=DateField())
+    return queryset.annotate(bucket=bucket)
+
+
+class GroupedStats:
+    """Counts and sums of a queryset, grouped by `group_by`, from one query"""
+
+    def __init__(self, queryset, group_by, sum_fields=(), flags=None):
+        self.group_by = list(group_by)
+        self.sum_fields = list(sum_fields)
+        self.flags = dict(flags or {})
+
+        annotations = {'_count': Count('pk')}
+        for field in self.sum_fields:
+            annotations[f'_sum_{field}'] = Sum(field)
+        for name, condition in self.flags.items():
+            annotations[f'_flag_{name}'] = Count('pk', filter=condition)
+        self.rows = list(queryset.values(*self.group_by).annotate(**annotations).order_by())
+
+    @staticmethod
+    def _matches(row, filters):
+        for field, value in filters.items():
+            if isinstance(value, (list, tuple, set)):
+                if row[field] not in value:
+                    return False
+            elif row[field] != value:
+                return False
+        return True
+
+    def _select(self, filters):
+        return [row for row in self.rows if self._matches(row, filters)]
+
+    def count(self, flag=None, **filters):
+        """Number of rows matching `filters` (field=value or field=[values]) and `flag`"""
+        key = '_count' if flag is None else f'_flag_{flag}'
+        return sum(row[key] for row in self._select(filters))
+
+    def sum(self, field, **filters):
+        """Sum of `field` over rows matching `filters` (0 when nothing matches)"""
+        values = [row[f'_sum_{field}'] for row in self._select(filters) if row[f'_sum_{field}'] is not None]
+        return sum(values, Decimal('0')) if values else 0
+
+    def breakdown(self, field, sum_field=None, **filters):
+        """{value of `field`: count (or sum of `sum_field`)} over matching rows"""
+        result = {}
+        for row in self._select(filters):
+            amount = row['_count'] if sum_field is None else (row[f'_sum_{sum_field}'] or Decimal('0'))
+            result[row[field]] = result.get(row[field], 0) + amount
+        return result
+
+    def trend(self, **series):
+        """
+        [{'period': bucket, name: count/sum, ...}] ordered by bucket, for a
+        `bucket` grouped by with_time_bucket(). Each series is a dict of
+        breakdown() arguments, e.g. completed={'status': 'completed'}.
+        """
+        columns = {name: self.breakdown('bucket', **options) for name, options in series.items()}
+        periods = sorted({period for values in columns.values() for period in values if period is not None})
+        return [
+            {'period': period, **{name: values.get(period, 0) for name, values in columns.items()}}
+            for period in periods
+        ]
+
+
+def get_investment_stats(queryset):
+    """Investment statistics by status, type and sector with invested/allocated/raised sums"""
+    return GroupedStats(
+        queryset,
+        group_by=['status', 'investment_type', 'sector'],
+        sum_fields=['allocated', 'raised', 'invested_amount'],
+    )
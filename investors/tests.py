@@ -1,3 +1,493 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from users.models import CustomUser
+from spv.models import SPV
+from .allocation_utils import AllocationExceeded, get_remaining_allocation, reserve_allocation
+from .dashboard_models import Investment, KYCStatus, Notification, Portfolio, PortfolioPerformance, SPVFundraisingStats, SyndicateRanking, Wishlist
+from .fundraising_utils import (
+    RESERVED_STATUSES, get_investor_counts, get_spv_totals, rebuild_fundraising_stats, verify_fundraising_stats,
+)
+from .leaderboard_utils import refresh_dirty_rankings
+from .notification_utils import dispatch_notifications, get_notification_group
+from .performance_utils import DAILY_RETENTION_DAYS, capture_performance_snapshots, prune_performance
+from .portfolio_utils import recalculate_dirty_portfolios
+from .stats_utils import get_investment_stats
+
+
+def create_spv(lead, **kwargs):
+    defaults = {
+        'created_by': lead,
+        'display_name': 'Test SPV',
+        'portfolio_company_name': 'Test Co',
+        'founder_email': 'founder@example.com',
+        'status': 'active',
+        'allocation': Decimal('1000000'),
+        'round_size': Decimal('5000000'),
+    }
+    defaults.update(kwargs)
+    return SPV.objects.create(**defaults)
+
+
+def create_investment(investor, spv, amount, status='active', **kwargs):
+    return Investment.objects.create(
+        investor=investor,
+        spv=spv,
+        syndicate_name=spv.display_name,
+        invested_amount=Decimal(amount),
+        status=status,
+        **kwargs
+    )
+
+
+class DealCardQueryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.lead = CustomUser.objects.create_user(username='lead', email='lead@example.com', password='pass')
+        self.investor = CustomUser.objects.create_user(username='lp', email='lp@example.com', password='pass')
+        self.client.force_authenticate(self.investor)
+        self.url = reverse('dashboard-discover-deals')
+
+    def _query_count(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries), response
+
+    def test_discover_deals_query_count_is_constant(self):
+        spv = create_spv(self.lead, lp_invite_emails=['lp@example.com'])
+        create_investment(self.investor, spv, '1000')
+        baseline, _ = self._query_count()
+
+        for i in range(5):
+            spv = create_spv(self.lead, display_name=f'SPV {i}')
+            create_investment(self.investor, spv, '2500')
+            create_investment(self.investor, spv, '500', status='cancelled')
+
+        count, response = self._query_count()
+        self.assertEqual(count, baseline)
+
+        card = response.data['results'][0]
+        self.assertEqual(card['allocated'], 2)
+        self.assertEqual(card['raised'], 2500.0)
+        self.assertEqual(card['lead_name'], 'lead')
+
+    def test_invites_and_wishlist_cards(self):
+        spv = create_spv(self.lead, lp_invite_emails=['lp@example.com'])
+        create_investment(self.investor, spv, '1500')
+        Wishlist.objects.create(investor=self.investor, spv=spv)
+
+        response = self.client.get(reverse('dashboard-invites'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        invite = response.data['results'][0]
+        self.assertEqual(invite['led_by'], 'lead')
+        self.assertEqual(invite['raised'], 1500.0)
+        self.assertEqual(invite['total_invites'], 1)
+
+        response = self.client.get(reverse('dashboard-wishlist'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        item = response.data['results'][0]
+        self.assertEqual(item['allocated'], 1)
+        self.assertIn('added_to_wishlist_at', item)
+
+
+class FundraisingStatsTests(TestCase):
+    def setUp(self):
+        self.lead = CustomUser.objects.create_user(username='lead', email='lead@example.com', password='pass')
+        self.investor = CustomUser.objects.create_user(username='lp', email='lp@example.com', password='pass')
+        self.spv = create_spv(self.lead)
+
+    def test_counters_follow_status_changes(self):
+        investment = create_investment(self.investor, self.spv, '1000', status='pending_payment')
+        create_investment(self.investor, self.spv, '500', status='active')
+
+        totals = get_spv_totals(self.spv.id, RESERVED_STATUSES)
+        self.assertEqual(totals['total_amount'], Decimal('1500'))
+        self.assertEqual(totals['investment_count'], 2)
+
+        investment.status = 'active'
+        investment.invested_amount = Decimal('1200')
+        investment.save(update_fields=['status', 'invested_amount'])
+
+        active = get_spv_totals(self.spv.id, ['active'])
+        self.assertEqual(active['total_amount'], Decimal('1700'))
+        self.assertEqual(active['investment_count'], 2)
+        self.assertEqual(get_spv_totals(self.spv.id, ['pending_payment'])['investment_count'], 0)
+
+        investment.delete()
+        self.assertEqual(get_spv_totals(self.spv.id, ['active'])['total_amount'], Decimal('500'))
+        self.assertEqual(verify_fundraising_stats(), [])
+
+    def test_investor_counted_once_across_statuses(self):
+        create_investment(self.investor, self.spv, '1000', status='approved')
+        create_investment(self.investor, self.spv, '500', status='pending_payment')
+        other = CustomUser.objects.create_user(username='lp2', email='lp2@example.com', password='pass')
+        create_investment(other, self.spv, '700', status='active')
+
+        self.assertEqual(get_investor_counts([self.spv.id], RESERVED_STATUSES + ['approved']), {self.spv.id: 2})
+        self.assertEqual(get_investor_counts([self.spv.id], ['active']), {self.spv.id: 1})
+        self.assertEqual(get_investor_counts([]), {})
+
+    def test_rebuild_repairs_drift(self):
+        create_investment(self.investor, self.spv, '1000')
+        SPVFundraisingStats.objects.update(total_amount=Decimal('0'))
+        self.assertEqual(len(verify_fundraising_stats()), 1)
+
+        rebuild_fundraising_stats()
+        self.assertEqual(verify_fundraising_stats(), [])
+
+
+class AllocationReservationTests(TestCase):
+    def setUp(self):
+        self.lead = CustomUser.objects.create_user(username='lead', email='lead@example.com', password='pass')
+        self.investor = CustomUser.objects.create_user(username='lp', email='lp@example.com', password='pass')
+        self.other = CustomUser.objects.create_user(username='lp2', email='lp2@example.com', password='pass')
+        self.spv = create_spv(self.lead, allocation=Decimal('10000'))
+
+    def test_reservation_rejected_when_allocation_is_full(self):
+        first = create_investment(self.investor, self.spv, '6000', status='approved')
+        second = create_investment(self.other, self.spv, '6000', status='approved')
+
+        reserve_allocation(first)
+        self.assertEqual(first.status, 'pending_payment')
+        self.assertIsNotNone(first.reservation_expires_at)
+        self.assertEqual(get_remaining_allocation(self.spv), Decimal('4000'))
+
+        with self.assertRaises(AllocationExceeded) as ctx:
+            reserve_allocation(second)
+        self.assertEqual(ctx.exception.remaining, Decimal('4000'))
+        second.refresh_from_db()
+        self.assertEqual(second.status, 'approved')
+
+    def test_lapsed_reservation_is_released(self):
+        first = create_investment(self.investor, self.spv, '6000', status='approved')
+        second = create_investment(self.other, self.spv, '6000', status='approved')
+        reserve_allocation(first)
+        Investment.objects.filter(pk=first.pk).update(reservation_expires_at=timezone.now() - timedelta(minutes=1))
+
+        reserve_allocation(second)
+
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'expired')
+        self.assertEqual(get_remaining_allocation(self.spv), Decimal('4000'))
+        self.assertEqual(verify_fundraising_stats(), [])
+
+    def test_increase_of_a_reservation_checks_only_the_difference(self):
+        KYCStatus.objects.create(user=self.investor, status='verified')
+        first = create_investment(self.investor, self.spv, '6000', status='approved')
+        reserve_allocation(first)
+        client = APIClient()
+        client.force_authenticate(self.investor)
+
+        # 4000 is left: raising 6000 to 8000 fits, to 11000 does not
+        response = client.post(reverse('initiate-investment'), {'spv_id': self.spv.id, 'amount': '11000'}, format='json')
+        self.assertEqual(response.data['error_code'], 'EXCEEDS_ALLOCATION')
+        response = client.post(reverse('initiate-investment'), {'spv_id': self.spv.id, 'amount': '8000'}, format='json')
+        self.assertTrue(response.data['success'])
+        self.assertEqual(get_remaining_allocation(self.spv), Decimal('2000'))
+
+
+class PortfolioRecalculationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.lead = CustomUser.objects.create_user(username='lead', email='lead@example.com', password='pass')
+        self.investor = CustomUser.objects.create_user(username='lp', email='lp@example.com', password='pass')
+        self.client.force_authenticate(self.investor)
+        self.spv = create_spv(self.lead)
+        self.portfolio = Portfolio.objects.create(user=self.investor, is_dirty=False)
+
+    def test_investment_changes_flag_portfolio_and_batch_recalculates(self):
+        create_investment(self.investor, self.spv, '1000', current_value=Decimal('1500'))
+        create_investment(self.investor, self.spv, '400', status='pending')
+        self.portfolio.refresh_from_db()
+        self.assertTrue(self.portfolio.is_dirty)
+
+        self.assertEqual(recalculate_dirty_portfolios(), 1)
+        self.portfolio.refresh_from_db()
+        self.assertFalse(self.portfolio.is_dirty)
+        self.assertEqual(self.portfolio.total_invested, Decimal('1000'))
+        self.assertEqual(self.portfolio.unrealized_gain, Decimal('500'))
+        self.assertEqual(self.portfolio.active_investments_count, 1)
+        self.assertEqual(recalculate_dirty_portfolios(), 0)
+
+    def test_snapshot_is_read_only(self):
+        create_investment(self.investor, self.spv, '1000', current_value=Decimal('1200'))
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('portfolio-snapshot'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_invested'], '1000.00')
+
+        writes = [q['sql'] for q in ctx.captured_queries if not q['sql'].lstrip().upper().startswith('SELECT')]
+        self.assertEqual(writes, [])
+
+
+class PortfolioPerformanceTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.lead = CustomUser.objects.create_user(username='lead', email='lead@example.com', password='pass')
+        self.investor = CustomUser.objects.create_user(username='lp', email='lp@example.com', password='pass')
+        self.client.force_authenticate(self.investor)
+        self.portfolio = Portfolio.objects.create(user=self.investor)
+        create_investment(self.investor, create_spv(self.lead), '1000', current_value=Decimal('1100'))
+
+    def test_snapshot_writes_all_resolutions_and_prunes(self):
+        today = date(2026, 6, 17)  # Wednesday
+        capture_performance_snapshots(date=today)
+        capture_performance_snapshots(date=today)  # re-running the day upserts
+
+        rows = PortfolioPerformance.objects.filter(portfolio=self.portfolio)
+        self.assertEqual(
+            sorted(rows.values_list('resolution', 'date')),
+            [('daily', today), ('monthly', date(2026, 6, 1)), ('weekly', date(2026, 6, 15))],
+        )
+        self.assertEqual(rows.get(resolution='weekly').current_value, Decimal('1100'))
+
+        PortfolioPerformance.objects.create(
+            portfolio=self.portfolio, resolution='daily', date=today - timedelta(days=DAILY_RETENTION_DAYS + 1)
+        )
+        self.assertEqual(prune_performance(today=today), 1)
+
+    def test_performance_endpoint_picks_resolution(self):
+        capture_performance_snapshots()
+
+        response = self.client.get(reverse('portfolio-performance'), {'days': 30})
+        self.assertEqual(response.data['resolution'], 'daily')
+        self.assertEqual(len(response.data['data']), 1)
+
+        response = self.client.get(reverse('portfolio-performance'), {'days': 3650})
+        self.assertEqual(response.data['resolution'], 'monthly')
+        self.assertEqual(response.data['data'][0]['current_value'], '1100.00')
+
+
+class TopSyndicatesTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.investor = CustomUser.objects.create_user(username='lp', email='lp@example.com', password='pass')
+        self.client.force_authenticate(self.investor)
+        self.url = reverse('dashboard-top-syndicates')
+
+    def test_leaderboard_follows_spv_and_investment_changes(self):
+        big = CustomUser.objects.create_user(username='big', email='big@example.com', password='pass')
+        small = CustomUser.objects.create_user(username='small', email='small@example.com', password='pass')
+        spv = create_spv(big, deal_tags=['Fintech', 'AI'])
+        create_spv(big, status='closed', deal_tags=['AI'])
+        create_spv(small)
+        create_investment(self.investor, spv, '2500')
+
+        # Investment writes only flag the lead's row; the page fills it in
+        ranking = SyndicateRanking.objects.get(lead=big)
+        self.assertTrue(ranking.is_dirty)
+        self.assertEqual(ranking.total_investors, 0)
+        response = self.client.get(self.url, {'page_size': 1})
+        self.assertEqual(response.data['results'][0]['total_investors'], 1)
+
+        self.assertEqual(refresh_dirty_rankings(), 1)
+        ranking.refresh_from_db()
+        self.assertFalse(ranking.is_dirty)
+        self.assertEqual(ranking.total_raised, Decimal('2500'))
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, {'page_size': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        first = response.data['results'][0]
+        self.assertEqual(first['syndicate_name'], 'big')
+        self.assertEqual(first['total_spvs'], 2)
+        self.assertEqual(first['active_spvs'], 1)
+        self.assertEqual(first['total_investors'], 1)
+        self.assertEqual(first['total_raised'], 2500.0)
+        self.assertEqual(sorted(first['sectors']), ['AI', 'Fintech'])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.data['results'][0]['syndicate_name'], 'small')
+
+        spv.delete()
+        self.assertEqual(SyndicateRanking.objects.get(lead=big).total_spvs, 1)
+        self.assertEqual(SyndicateRanking.objects.get(lead=big).total_investors, 0)
+
+    def test_spv_changes_refresh_both_leads(self):
+        first = CustomUser.objects.create_user(username='first', email='first@example.com', password='pass')
+        second = CustomUser.objects.create_user(username='second', email='second@example.com', password='pass')
+        spv = create_spv(first)
+        create_spv(first)
+        create_spv(second)
+
+        # An edit only flags the row; the dirty refresh recomputes it
+        spv.status = 'closed'
+        spv.save()
+        ranking = SyndicateRanking.objects.get(lead=first)
+        self.assertEqual((ranking.is_dirty, ranking.active_spvs), (True, 2))
+        self.assertEqual(refresh_dirty_rankings(), 1)
+        ranking.refresh_from_db()
+        self.assertEqual((ranking.is_dirty, ranking.active_spvs), (False, 1))
+
+        spv.created_by = second
+        spv.save()
+        self.assertEqual(SyndicateRanking.objects.get(lead=first).total_spvs, 1)
+        self.assertEqual(SyndicateRanking.objects.get(lead=second).total_spvs, 2)
+
+
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.lead = CustomUser.objects.create_user(username='lead', email='lead@example.com', password='pass')
+        self.investor = CustomUser.objects.create_user(username='lp', email='lp@example.com', password='pass')
+        self.client.force_authenticate(self.investor)
+
+    def test_responses_cached_per_user_and_invalidated_on_write(self):
+        url = reverse('dashboard-stats')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data['total_investments'], 0)
+        self.assertEqual(self.client.get(url, {'v': 1})['X-Cache'], 'MISS')
+
+        other = CustomUser.objects.create_user(username='lp2', email='lp2@example.com', password='pass')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+
+        self.client.force_authenticate(self.investor)
+        create_investment(self.investor, create_spv(self.lead), '1000')
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['total_investments'], 1)
+
+    def test_tax_overview_is_cached_and_stats_exposed(self):
+        url = reverse('tax-overview')
+        self.client.get(url)  # first visit creates the tax summary, so it is not stored
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+        staff = CustomUser.objects.create_user(username='staff', email='staff@example.com', password='pass', is_staff=True)
+        self.client.force_authenticate(staff)
+        response = self.client.get(reverse('dashboard-cache-stats'))
+        self.assertEqual(response.data['endpoints']['tax.overview'], {'hits': 1, 'misses': 2, 'hit_rate': 33.33})
+
+
+class InvestmentStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.lead = CustomUser.objects.create_user(username='lead', email='lead@example.com', password='pass')
+        self.investor = CustomUser.objects.create_user(username='lp', email='lp@example.com', password='pass')
+        self.client.force_authenticate(self.investor)
+        spv = create_spv(self.lead)
+        create_investment(self.investor, spv, '1000', investment_type='syndicate_deal', sector='Fintech')
+        create_investment(self.investor, spv, '2000', status='pending', investment_type='invite', sector='Fintech')
+        create_investment(self.investor, spv, '500', status='completed', investment_type='invite', sector='Health')
+
+    def test_stats_from_one_grouped_query(self):
+        stats = get_investment_stats(Investment.objects.filter(investor=self.investor))
+        self.assertEqual(stats.count(), 3)
+        self.assertEqual(stats.count(status=['active', 'pending']), 2)
+        self.assertEqual(stats.count(investment_type='invite'), 2)
+        self.assertEqual(stats.sum('invested_amount'), Decimal('3500'))
+        self.assertEqual(stats.breakdown('sector'), {'Fintech': 2, 'Health': 1})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('dashboard-stats'))
+        investment_queries = [q for q in queries.captured_queries if 'investors_investment' in q['sql']]
+        self.assertEqual(len(investment_queries), 1)
+        self.assertEqual(response.data['pending_investments'], 1)
+        self.assertEqual(response.data['investments_by_type'], {'syndicate_deal': 1, 'top_syndicate': 0, 'invite': 2})
+        self.assertEqual(response.data['investments_by_sector'], {'Fintech': 2, 'Health': 1})
+
+    def test_by_type_reads_investments_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('investment-by-type'))
+        self.assertEqual(len([q for q in queries.captured_queries if 'FROM "investors_investment"' in q['sql']]), 1)
+        groups = ('syndicate_deals', 'top_syndicates', 'invites')
+        self.assertEqual([len(response.data[group]) for group in groups], [1, 0, 2])
+
+
+@override_settings(NOTIFICATION_DELIVERY_MODE='sync')
+class NotificationDispatchTests(TestCase):
+    def setUp(self):
+        self.users = [
+            CustomUser.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='pass')
+            for i in range(3)
+        ]
+
+    def test_batch_written_in_one_insert_and_delivered_after_commit(self):
+        channel_layer = get_channel_layer()
+        channel = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(get_notification_group(self.users[0].id), channel)
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            with CaptureQueriesContext(connection) as queries:
+                created = dispatch_notifications([
+                    Notification(user=user, notification_type='system', title='Hello', message='World')
+                    for user in self.users
+                ], email=True)
+        self.assertEqual(len([q for q in queries.captured_queries if q['sql'].startswith('INSERT')]), 1)
+        self.assertEqual(Notification.objects.filter(title='Hello').count(), 3)
+        self.assertEqual(len(mail.outbox), 0)
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(len(mail.outbox), 3)
+        message = async_to_sync(channel_layer.receive)(channel)
+        self.assertEqual(message['notification']['id'], created[0].id)
+
+    def test_recipient_emails_fetched_in_one_query(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                dispatch_notifications([
+                    Notification(user_id=user.id, notification_type='system', title='Hello', message='World')
+                    for user in self.users
+                ], email=True)
+        user_queries = [q for q in queries.captured_queries if 'FROM "users_customuser"' in q['sql']]
+        self.assertEqual(len(user_queries), 1)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [user.email for user in self.users])
+
+
+class NotificationTransitionTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(username='lp', email='lp@example.com', password='pass')
+        self.client.force_authenticate(self.user)
+        Notification.objects.bulk_create([
+            Notification(user=self.user, notification_type='system', title=f'N{i}', message='m')
+            for i in range(5)
+        ])
+
+    def test_mark_all_read_and_clear_all_run_one_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('notification-mark-all-read'))
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(len([q for q in queries.captured_queries if q['sql'].startswith('UPDATE')]), 1)
+        self.assertEqual(Notification.objects.filter(status='read', read_at__isnull=False).count(), 5)
+
+        self.assertEqual(Notification.objects.filter(user=self.user).mark_unread(), 5)
+        self.assertEqual(self.client.delete(reverse('notification-clear-all')).data['count'], 5)
+        self.assertEqual(Notification.objects.filter(user=self.user).archive(), 0)
+
+    def test_purge_expired(self):
+        now = timezone.now()
+        Notification.objects.filter(title__in=['N0', 'N1']).update(expires_at=now - timedelta(days=1))
+        Notification.objects.filter(title='N2').update(expires_at=now + timedelta(days=1))
+        self.assertEqual(Notification.objects.purge_expired(now=now), 2)
+        self.assertEqual(Notification.objects.count(), 3)
+
+        Notification.objects.filter(title='N2').update(expires_at=now - timedelta(days=1))
+        out = StringIO()
+        call_command('purge_expired_notifications', batch_size=1, stdout=out)
+        self.assertIn('Deleted 1 expired', out.getvalue())
+        self.assertEqual(Notification.objects.count(), 2)
@@ -440,3 +440,70 @@ class ChatConsumer(AsyncWebsocketConsumer):
             return True
         except Message.DoesNotExist:
             return False
+
+
+class NotificationConsumer(AsyncWebsocketConsumer):
+    """
+    WebSocket consumer for a user's server pushes.
+    
+    Joins the user's notification group (and the admin inbox group for
+    admins) and forwards:
+    - New notifications
+    - Agreement document render status
+    - Pending-actions inbox changes
+    - Bulk document generation progress
+    """
+    
+    async def connect(self):
+        """Handle WebSocket connection."""
+        from investors.notification_utils import get_notification_group
+        from transfers.inbox_utils import ADMIN_INBOX_GROUP, is_admin
+        
+        self.user = self.scope["user"]
+        
+        # Reject anonymous users
+        if not self.user.is_authenticated:
+            await self.close()
+            return
+        
+        self.group_names = [get_notification_group(self.user.id)]
+        if is_admin(self.user):
+            self.group_names.append(ADMIN_INBOX_GROUP)
+        
+        for group_name in self.group_names:
+            await self.channel_layer.group_add(group_name, self.channel_name)
+        
+        await self.accept()
+    
+    async def disconnect(self, close_code):
+        """Handle WebSocket disconnection."""
+        for group_name in getattr(self, 'group_names', []):
+            await self.channel_layer.group_discard(group_name, self.channel_name)
+    
+    async def notification(self, event):
+        """Send notification to WebSocket."""
+        await self.send(text_data=json.dumps({
+            'type': 'notification',
+            'notification': event['notification']
+        }))
+    
+    async def document_status(self, event):
+        """Send agreement document render status to WebSocket."""
+        await self.send(text_data=json.dumps({
+            'type': 'document_status',
+            'document': event['document']
+        }))
+    
+    async def inbox_update(self, event):
+        """Send pending-actions inbox changes to WebSocket."""
+        await self.send(text_data=json.dumps({
+            'type': 'inbox_update',
+            'items': event['items']
+        }))
+    
+    async def generation_job_progress(self, event):
+        """Send bulk document generation progress to WebSocket."""
+        await self.send(text_data=json.dumps({
+            'type': 'generation_job_progress',
+            'job': event['job']
+        }))
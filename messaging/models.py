@@ -284,6 +284,18 @@ class MessageAttachment(models.Model):
         return type_mapping.get(self.file_type, 'File')
 
 
+class MessageNotificationQuerySet(models.QuerySet):
+    """Set-based state transitions (one UPDATE, returns rows affected)"""
+    
+    def mark_read(self):
+        """Mark unread notifications as read"""
+        return self.filter(is_read=False).update(is_read=True, read_at=timezone.now())
+    
+    def mark_sent(self):
+        """Mark unsent notifications as sent"""
+        return self.filter(is_sent=False).update(is_sent=True, sent_at=timezone.now())
+
+
 class MessageNotification(models.Model):
     """Track message notifications"""
     
@@ -317,6 +329,8 @@ class MessageNotification(models.Model):
     read_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = MessageNotificationQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'message notification'
         verbose_name_plural = 'message notifications'
@@ -1,6 +1,5 @@
 from django.db import models
 from django.conf import settings
-import uuid
 
 
 class SPVStripeAccount(models.Model):
@@ -268,7 +267,8 @@ class Payment(models.Model):
     
     def save(self, *args, **kwargs):
         if not self.payment_id:
-            self.payment_id = f"PAY-{uuid.uuid4().hex[:8].upper()}"
+            from config.identifier_utils import next_identifier
+            self.payment_id = next_identifier('payment', 'PAY')
         
         # Calculate fees if amount is set
         if self.amount and not self.net_amount:
@@ -22,6 +22,8 @@ from .serializers import (
 )
 from spv.models import SPV
 from investors.dashboard_models import Investment, Portfolio
+from investors.allocation_utils import AllocationExceeded, reserve_allocation
+from investors.stats_utils import GroupedStats
 
 
 # Initialize Stripe
@@ -332,10 +334,16 @@ class PaymentViewSet(viewsets.ModelViewSet):
                 'error': 'Investment not found or not approved for payment. Please wait for syndicate approval.'
             }, status=status.HTTP_404_NOT_FOUND)
         
-        # If status is 'approved', update to 'pending_payment'
+        # If status is 'approved', reserve the allocation and move to 'pending_payment'
         if investment.status == 'approved':
-            investment.status = 'pending_payment'
-            investment.save(update_fields=['status', 'updated_at'])
+            try:
+                reserve_allocation(investment)
+            except AllocationExceeded as e:
+                return Response({
+                    'success': False,
+                    'error': str(e),
+                    'error_code': 'EXCEEDS_ALLOCATION'
+                }, status=status.HTTP_400_BAD_REQUEST)
         
         spv = investment.spv
         if not spv:
@@ -547,18 +555,16 @@ class PaymentViewSet(viewsets.ModelViewSet):
         else:
             payments = Payment.objects.filter(investor=user)
         
-        stats = payments.aggregate(
-            total_amount=Sum('amount'),
-            total_platform_fees=Sum('platform_fee'),
-        )
+        # One grouped query by status
+        stats = GroupedStats(payments, group_by=['status'], sum_fields=['amount', 'platform_fee'])
         
         data = {
-            'total_payments': payments.count(),
-            'total_amount': stats['total_amount'] or 0,
-            'successful_payments': payments.filter(status='succeeded').count(),
-            'pending_payments': payments.filter(status__in=['pending', 'processing']).count(),
-            'failed_payments': payments.filter(status='failed').count(),
-            'total_platform_fees': stats['total_platform_fees'] or 0,
+            'total_payments': stats.count(),
+            'total_amount': stats.sum('amount'),
+            'successful_payments': stats.count(status='succeeded'),
+            'pending_payments': stats.count(status=['pending', 'processing']),
+            'failed_payments': stats.count(status='failed'),
+            'total_platform_fees': stats.sum('platform_fee'),
         }
         
         return Response(PaymentStatisticsSerializer(data).data)
@@ -618,7 +624,7 @@ class StripeWebhookView(APIView):
     
     def _handle_payment_succeeded(self, payment_intent):
         """Handle successful payment - update Investment status and create notification"""
-        from investors.dashboard_models import Notification
+        from investors.notification_utils import notify
         
         try:
             payment = Payment.objects.get(
@@ -645,7 +651,7 @@ class StripeWebhookView(APIView):
                 portfolio.recalculate()
                 
                 # Create notification
-                Notification.objects.create(
+                notify(
                     user=payment.investor,
                     notification_type='investment',
                     title='Investment Confirmed!',
@@ -666,7 +672,7 @@ class StripeWebhookView(APIView):
     
     def _create_investment_from_payment(self, payment):
         """Create an Investment record from a payment (legacy flow)"""
-        from investors.dashboard_models import Notification
+        from investors.notification_utils import notify
         
         try:
             investment = Investment.objects.create(
@@ -700,7 +706,7 @@ class StripeWebhookView(APIView):
             portfolio.recalculate()
             
             # Create notification
-            Notification.objects.create(
+            notify(
                 user=payment.investor,
                 notification_type='investment',
                 title='Investment Confirmed!',
@@ -715,7 +721,7 @@ class StripeWebhookView(APIView):
     
     def _handle_payment_failed(self, payment_intent):
         """Handle failed payment - update Investment status and notify"""
-        from investors.dashboard_models import Notification
+        from investors.notification_utils import notify
         
         try:
             payment = Payment.objects.get(
@@ -734,7 +740,7 @@ class StripeWebhookView(APIView):
                 investment.save(update_fields=['status', 'updated_at'])
                 
                 # Create notification
-                Notification.objects.create(
+                notify(
                     user=payment.investor,
                     notification_type='investment',
                     title='Payment Failed',
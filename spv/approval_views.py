@@ -13,7 +13,8 @@ from rest_framework.response import Response
 from django.utils import timezone
 from django.db.models import Q
 
-from investors.dashboard_models import Investment, Notification
+from investors.dashboard_models import Investment
+from investors.notification_utils import notify
 from spv.models import SPV
 
 
@@ -213,7 +214,7 @@ def approve_investment_request(request, request_id):
     investment.save(update_fields=['status', 'approved_by', 'approved_at', 'updated_at'])
     
     # Create notification for investor
-    Notification.objects.create(
+    notify(
         user=investment.investor,
         notification_type='investment',
         title='Investment Request Approved!',
@@ -281,7 +282,7 @@ def reject_investment_request(request, request_id):
     investment.save(update_fields=['status', 'approved_by', 'approved_at', 'rejection_reason', 'updated_at'])
     
     # Create notification for investor
-    Notification.objects.create(
+    notify(
         user=investment.investor,
         notification_type='investment',
         title='Investment Request Update',
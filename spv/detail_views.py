@@ -756,10 +756,13 @@ def spv_cap_table(request, spv_id):
     - Total raised amount
     - Ownership breakdown
     
+    `?as_of=<date or datetime>` returns the cap table at that point, rebuilt
+    from the ownership ledger.
+    
     Only accessible by SPV owner, syndicate managers, and admins.
     """
     from investors.dashboard_models import Investment
-    from django.db.models import Sum
+    from transfers.cap_table_utils import parse_as_of
     
     spv = get_object_or_404(SPV, id=spv_id)
     
@@ -770,15 +773,27 @@ def spv_cap_table(request, spv_id):
             'error': 'You do not have permission to view this cap table'
         }, status=status.HTTP_403_FORBIDDEN)
     
+    target_allocation = _safe_decimal(spv.allocation)
+    
+    # Point-in-time cap table from the ownership ledger
+    if request.query_params.get('as_of'):
+        try:
+            as_of = parse_as_of(request.query_params['as_of'])
+        except ValueError as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return Response(_ledger_cap_table(spv, target_allocation, as_of))
+    
     # Get all committed/active investments for this SPV
-    investments = Investment.objects.filter(
+    investments = list(Investment.objects.filter(
         spv=spv,
         status__in=['committed', 'active', 'completed']
-    ).select_related('investor', 'payment').order_by('-commitment_date', '-created_at')
+    ).select_related('investor', 'payment').order_by('-commitment_date', '-created_at'))
     
     # Calculate totals
-    total_raised = investments.aggregate(total=Sum('invested_amount'))['total'] or Decimal('0')
-    target_allocation = _safe_decimal(spv.allocation)
+    total_raised = sum((inv.invested_amount for inv in investments), Decimal('0'))
     
     # Build investor list
     investors_list = []
@@ -838,3 +853,53 @@ def spv_cap_table(request, spv_id):
     
     return Response(response_data)
 
+
+def _ledger_cap_table(spv, target_allocation, as_of):
+    """Cap table response for a point in time, from the ownership ledger"""
+    from transfers.cap_table_utils import get_cap_table
+    from users.models import CustomUser
+    
+    cap_table = get_cap_table(spv.id, as_of=as_of)
+    holdings = cap_table['holdings']
+    investors = CustomUser.objects.in_bulk(list(holdings))
+    
+    investors_list = []
+    total_raised = Decimal('0')
+    for investor_id, holding in sorted(holdings.items(), key=lambda item: -item[1]['invested_amount']):
+        investor = investors.get(investor_id)
+        if investor is None:
+            continue
+        total_raised += holding['invested_amount']
+        investors_list.append({
+            'investor_id': investor.id,
+            'investor_name': investor.get_full_name() or investor.username,
+            'investor_email': investor.email,
+            'invested_amount': float(holding['invested_amount']),
+            'ownership_percentage': float(holding['ownership_percentage'].quantize(Decimal('0.01'))),
+            'first_entry_at': holding['first_entry_at'].isoformat() if holding['first_entry_at'] else None,
+            'last_transfer_at': holding['last_transfer_at'].isoformat() if holding['last_transfer_at'] else None,
+        })
+    
+    allocation_used_pct = Decimal('0')
+    if target_allocation > 0:
+        allocation_used_pct = (total_raised / target_allocation) * Decimal('100')
+    
+    return {
+        'success': True,
+        'data': {
+            'spv_id': spv.id,
+            'spv_name': spv.display_name,
+            'spv_status': spv.status,
+            'as_of': as_of.isoformat(),
+            'ledger_version': cap_table['version'],
+            'summary': {
+                'total_investors': len(investors_list),
+                'total_raised': float(total_raised),
+                'target_allocation': float(target_allocation),
+                'remaining_allocation': float(target_allocation - total_raised),
+                'allocation_used_percentage': float(allocation_used_pct.quantize(Decimal('0.1'))),
+            },
+            'investors': investors_list,
+        }
+    }
+
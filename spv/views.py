@@ -730,6 +730,7 @@ def spv_dashboard_summary(request):
     GET /api/spv/dashboard/
     """
     from investors.dashboard_models import Investment
+    from investors.fundraising_utils import INVESTED_STATUSES, get_fundraising_totals, get_investor_counts
     
     user = request.user
     if user.is_staff or getattr(user, 'role', '') == 'admin':
@@ -751,7 +752,7 @@ def spv_dashboard_summary(request):
 
     # Count active investors (those who have actually invested, not just invited)
     # Only count investments with active/committed/approved status
-    invested_statuses = ['active', 'committed', 'approved', 'pending_payment', 'payment_processing']
+    invested_statuses = INVESTED_STATUSES
     try:
         spv_ids = list(queryset.values_list('id', flat=True))
         active_investors = Investment.objects.filter(
@@ -767,6 +768,8 @@ def spv_dashboard_summary(request):
 
     my_spv_cards = []
     total_progress = Decimal('0')
+    fundraising_totals = get_fundraising_totals(queryset.values('id'), invested_statuses)
+    investor_counts = get_investor_counts(queryset.values('id'), invested_statuses)
     
     # Use .values() to avoid SQLite Decimal conversion errors
     try:
@@ -790,17 +793,10 @@ def spv_dashboard_summary(request):
                 my_commitment = Decimal('0')
                 target_amount = Decimal('0')
 
-            # Count actual investors for this SPV (not just invited)
-            spv_investor_count = Investment.objects.filter(
-                spv_id=spv['id'],
-                status__in=invested_statuses
-            ).values('investor').distinct().count()
-            
-            # Get total raised amount from actual investors
-            total_raised = Investment.objects.filter(
-                spv_id=spv['id'],
-                status__in=invested_statuses
-            ).aggregate(total=Sum('invested_amount'))['total'] or Decimal('0')
+            # Count actual investors and raised amount for this SPV (not just invited)
+            spv_totals = fundraising_totals.get(spv['id'], {})
+            spv_investor_count = investor_counts.get(spv['id'], 0)
+            total_raised = spv_totals.get('total_amount', Decimal('0'))
             
             total_raised = _safe_decimal(total_raised)
                 
@@ -960,6 +956,7 @@ def spv_management_overview(request):
     GET /api/spv/management/
     """
     from investors.dashboard_models import Investment
+    from investors.fundraising_utils import INVESTED_STATUSES, get_fundraising_totals, get_investor_counts
     
     user = request.user
     if user.is_staff or getattr(user, 'role', '') == 'admin':
@@ -989,7 +986,7 @@ def spv_management_overview(request):
     spv_count = totals.get('spv_count', 0) or 0
 
     # Count active investors (those who have actually invested, not just invited)
-    invested_statuses = ['active', 'committed', 'approved', 'pending_payment', 'payment_processing']
+    invested_statuses = INVESTED_STATUSES
     try:
         spv_ids = list(base_queryset.values_list('id', flat=True))
         active_investors = Investment.objects.filter(
@@ -1004,6 +1001,8 @@ def spv_management_overview(request):
         success_rate = (total_aum / total_target) * Decimal('100')
 
     spv_cards = []
+    fundraising_totals = get_fundraising_totals(queryset.values('id'), invested_statuses)
+    investor_counts = get_investor_counts(queryset.values('id'), invested_statuses)
     
     # Use .values() to avoid SQLite Decimal conversion errors
     try:
@@ -1032,17 +1031,10 @@ def spv_management_overview(request):
                 target_amount = Decimal('0')
                 min_investment = Decimal('0')
 
-            # Count actual investors for this SPV (not just invited)
-            spv_investor_count = Investment.objects.filter(
-                spv_id=spv['id'],
-                status__in=invested_statuses
-            ).values('investor').distinct().count()
-            
-            # Get total raised amount from actual investors
-            total_raised = Investment.objects.filter(
-                spv_id=spv['id'],
-                status__in=invested_statuses
-            ).aggregate(total=Sum('invested_amount'))['total'] or Decimal('0')
+            # Count actual investors and raised amount for this SPV (not just invited)
+            spv_totals = fundraising_totals.get(spv['id'], {})
+            spv_investor_count = investor_counts.get(spv['id'], 0)
+            total_raised = spv_totals.get('total_amount', Decimal('0'))
             
             total_raised = _safe_decimal(total_raised)
             
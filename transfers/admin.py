@@ -1,6 +1,7 @@
 from django.contrib import admin
+from django.db import transaction
 from django.utils.html import format_html
-from .models import Transfer, TransferDocument, TransferAgreementDocument, TransferHistory, OwnershipLedger
+from .models import Transfer, TransferDocument, TransferAgreementDocument, TransferHistory, OwnershipLedger, CapTableSnapshot, TransferTimelineEvent, ActionInboxItem, TransferSigningState
 
 
 @admin.register(Transfer)
@@ -103,9 +104,20 @@ class TransferAdmin(admin.ModelAdmin):
         return obj.documents.count()
     documents_count_display.short_description = 'Documents'
     
+    def _transition(self, queryset, from_status, **fields):
+        """Bulk status update; update() skips Transfer.save(), so re-derive the inbox rows here"""
+        from .inbox_utils import sync_transfer_inbox
+        
+        with transaction.atomic():
+            transfer_ids = list(queryset.filter(status=from_status).values_list('id', flat=True))
+            updated = Transfer.objects.filter(id__in=transfer_ids, status=from_status).update(**fields)
+            sync_transfer_inbox(Transfer.objects.filter(id__in=transfer_ids))
+        return updated
+    
     def mark_approved(self, request, queryset):
         from django.utils import timezone
-        updated = queryset.filter(status='pending_approval').update(
+        updated = self._transition(
+            queryset, 'pending_approval',
             status='approved',
             approved_by=request.user,
             approved_at=timezone.now()
@@ -115,7 +127,8 @@ class TransferAdmin(admin.ModelAdmin):
     
     def mark_completed(self, request, queryset):
         from django.utils import timezone
-        updated = queryset.filter(status='approved').update(
+        updated = self._transition(
+            queryset, 'approved',
             status='completed',
             completed_at=timezone.now()
         )
@@ -124,7 +137,8 @@ class TransferAdmin(admin.ModelAdmin):
     
     def mark_rejected(self, request, queryset):
         from django.utils import timezone
-        updated = queryset.filter(status='pending_approval').update(
+        updated = self._transition(
+            queryset, 'pending_approval',
             status='rejected',
             rejected_by=request.user,
             rejected_at=timezone.now()
@@ -191,10 +205,12 @@ class TransferAgreementDocumentAdmin(admin.ModelAdmin):
         'requester_signature_status',
         'recipient_signature_status',
         'is_fully_signed_display',
+        'render_status',
         'created_at',
     )
     list_filter = (
         'document_type',
+        'render_status',
         'requester_signature_status',
         'recipient_signature_status',
         'is_latest',
@@ -386,7 +402,7 @@ class OwnershipLedgerAdmin(admin.ModelAdmin):
         'spv__display_name',
         'notes',
     )
-    readonly_fields = ('created_at',)
+    readonly_fields = ('created_at', 'entry_hash')
     autocomplete_fields = ['investor', 'spv', 'investment', 'transfer', 'created_by']
     
     fieldsets = (
@@ -422,6 +438,81 @@ class OwnershipLedgerAdmin(admin.ModelAdmin):
                 'notes',
                 'created_at',
                 'created_by',
+                'entry_hash',
             )
         }),
     )
+
+
+@admin.register(CapTableSnapshot)
+class CapTableSnapshotAdmin(admin.ModelAdmin):
+    list_display = (
+        'spv',
+        'version',
+        'last_entry_id',
+        'as_of',
+        'created_at',
+    )
+    search_fields = (
+        'spv__display_name',
+    )
+    readonly_fields = ('spv', 'version', 'last_entry_id', 'as_of', 'holdings', 'created_at')
+
+
+@admin.register(TransferTimelineEvent)
+class TransferTimelineEventAdmin(admin.ModelAdmin):
+    list_display = (
+        'transfer_ref',
+        'event_label',
+        'source',
+        'spv',
+        'investor',
+        'sequence',
+        'occurred_at',
+    )
+    list_filter = (
+        'source',
+        'event_type',
+    )
+    search_fields = (
+        'transfer_ref',
+        'spv__display_name',
+        'from_username',
+        'to_username',
+    )
+    raw_id_fields = ('ledger_entry', 'history', 'spv', 'investor', 'transfer', 'actor', 'from_user', 'to_user')
+
+
+@admin.register(ActionInboxItem)
+class ActionInboxItemAdmin(admin.ModelAdmin):
+    list_display = (
+        'action_type',
+        'user',
+        'transfer',
+        'request',
+        'created_at',
+    )
+    list_filter = (
+        'action_type',
+    )
+    raw_id_fields = ('user', 'transfer', 'request')
+
+
+@admin.register(TransferSigningState)
+class TransferSigningStateAdmin(admin.ModelAdmin):
+    list_display = (
+        'transfer',
+        'document_count',
+        'all_signed',
+        'all_rendered',
+        'ready_to_approve',
+        'updated_at',
+    )
+    list_filter = (
+        'ready_to_approve',
+        'all_signed',
+    )
+    search_fields = (
+        'transfer__transfer_id',
+    )
+    readonly_fields = ('transfer', 'documents', 'document_count', 'missing_types', 'all_signed', 'all_rendered', 'ready_to_approve', 'updated_at')
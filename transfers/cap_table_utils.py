@@ -0,0 +1,276 @@
+"""
+Cap tables from the ownership ledger.
+
+Every ownership change is an OwnershipLedger entry: confirmed allocations
+(Investment.calculate_ownership) and both legs of a completed transfer. The
+cap table of an SPV is the fold of its entries' ownership/amount deltas per
+investor, and its version is the number of entries folded.
+
+Every CAP_TABLE_CHECKPOINT_INTERVAL entries the folded holdings are stored
+as a CapTableSnapshot. The current or as-of-date cap table is therefore one
+indexed lookup of the latest snapshot at or before that time plus a replay
+of fewer than CAP_TABLE_CHECKPOINT_INTERVAL entries, independent of the SPV's
+history length. `manage.py rebuild_cap_tables` backfills opening entries for
+allocations made before the ledger covered them and rebuilds the snapshots.
+"""
+
+from datetime import datetime, time
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .ledger_utils import lock_ledgers, seal_ledger
+from .models import CapTableSnapshot, OwnershipLedger
+from .timeline_utils import record_ledger_events
+
+
+ZERO = Decimal('0')
+
+ENTRY_FIELDS = ['id', 'investor_id', 'ownership_change', 'amount_change', 'created_at', 'transfer_id']
+
+# Investment statuses that hold (or, once transferred out, held) confirmed ownership
+ALLOCATED_STATUSES = ['committed', 'active', 'completed']
+
+
+def get_checkpoint_interval():
+    return getattr(settings, 'CAP_TABLE_CHECKPOINT_INTERVAL', 50)
+
+
+def parse_as_of(value):
+    """
+    Parse an `as_of` query parameter (ISO date or datetime) into an aware
+    datetime; a date means the end of that day. Raises ValueError.
+    """
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid as_of value: {value}')
+        moment = datetime.combine(day, time.max)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _load_holdings(data):
+    holdings = {}
+    for investor_id, (ownership, amount, first_at, last_transfer_at) in data.items():
+        holdings[int(investor_id)] = [
+            Decimal(ownership),
+            Decimal(amount),
+            parse_datetime(first_at) if first_at else None,
+            parse_datetime(last_transfer_at) if last_transfer_at else None,
+        ]
+    return holdings
+
+
+def _dump_holdings(holdings):
+    return {
+        str(investor_id): [
+            str(ownership),
+            str(amount),
+            first_at.isoformat() if first_at else None,
+            last_transfer_at.isoformat() if last_transfer_at else None,
+        ]
+        for investor_id, (ownership, amount, first_at, last_transfer_at) in holdings.items()
+    }
+
+
+def fold_entries(holdings, rows):
+    """Apply ledger rows (ENTRY_FIELDS tuples) to holdings in place"""
+    for _, investor_id, ownership_change, amount_change, created_at, transfer_id in rows:
+        holding = holdings.setdefault(investor_id, [ZERO, ZERO, created_at, None])
+        holding[0] += ownership_change
+        holding[1] += amount_change
+        if transfer_id:
+            holding[3] = created_at
+    return holdings
+
+
+def _get_snapshot(spv_id, as_of=None):
+    snapshots = CapTableSnapshot.objects.filter(spv_id=spv_id)
+    if as_of is not None:
+        snapshots = snapshots.filter(as_of__lte=as_of)
+    return snapshots.order_by('-as_of', '-version').first()
+
+
+def _replay(spv_id, as_of=None):
+    """(snapshot, holdings, rows replayed on top of it)"""
+    snapshot = _get_snapshot(spv_id, as_of)
+    holdings = _load_holdings(snapshot.holdings) if snapshot else {}
+
+    entries = OwnershipLedger.objects.filter(spv_id=spv_id)
+    if snapshot:
+        entries = entries.filter(id__gt=snapshot.last_entry_id)
+    if as_of is not None:
+        entries = entries.filter(created_at__lte=as_of)
+    rows = list(entries.order_by('id').values_list(*ENTRY_FIELDS))
+
+    return snapshot, fold_entries(holdings, rows), rows
+
+
+def get_cap_table(spv_id, as_of=None):
+    """
+    Cap table of an SPV now or as of a datetime, in two queries:
+
+        {'version': n, 'as_of': datetime or None,
+         'holdings': {investor_id: {'ownership_percentage', 'invested_amount',
+                                    'first_entry_at', 'last_transfer_at'}}}
+
+    Investors whose ownership and amount are both back to zero are left out.
+    """
+    snapshot, holdings, rows = _replay(spv_id, as_of)
+    if rows:
+        last_at = rows[-1][4]
+    else:
+        last_at = snapshot.as_of if snapshot else None
+
+    return {
+        'version': (snapshot.version if snapshot else 0) + len(rows),
+        'as_of': last_at,
+        'holdings': {
+            investor_id: {
+                'ownership_percentage': ownership,
+                'invested_amount': amount,
+                'first_entry_at': first_at,
+                'last_transfer_at': last_transfer_at,
+            }
+            for investor_id, (ownership, amount, first_at, last_transfer_at) in holdings.items()
+            if ownership > 0 or amount > 0
+        },
+    }
+
+
+def _save_snapshot(spv_id, version, holdings, last_row):
+    try:
+        with transaction.atomic():
+            return CapTableSnapshot.objects.create(
+                spv_id=spv_id,
+                version=version,
+                last_entry_id=last_row[0],
+                as_of=last_row[4],
+                holdings=_dump_holdings(holdings),
+            )
+    except IntegrityError:
+        # A concurrent writer stored the same version
+        return None
+
+
+def checkpoint_cap_table(spv_id, force=False):
+    """
+    Store a snapshot once CAP_TABLE_CHECKPOINT_INTERVAL entries have
+    accumulated since the last one (or whenever there are new entries with
+    `force`). Call after writing ledger entries. Returns the new snapshot.
+    """
+    snapshot, holdings, rows = _replay(spv_id)
+    if not rows or (len(rows) < get_checkpoint_interval() and not force):
+        return None
+    version = (snapshot.version if snapshot else 0) + len(rows)
+    return _save_snapshot(spv_id, version, holdings, rows[-1])
+
+
+def rebuild_cap_table(spv_id):
+    """
+    Drop an SPV's snapshots and re-fold its whole ledger, streaming entries
+    and storing a snapshot every CAP_TABLE_CHECKPOINT_INTERVAL entries.
+    Returns the number of snapshots written.
+    """
+    interval = get_checkpoint_interval()
+    CapTableSnapshot.objects.filter(spv_id=spv_id).delete()
+
+    holdings = {}
+    version = 0
+    written = 0
+    batch = []
+    entries = OwnershipLedger.objects.filter(spv_id=spv_id).order_by('id').values_list(*ENTRY_FIELDS)
+    for row in entries.iterator(chunk_size=2000):
+        batch.append(row)
+        if len(batch) == interval:
+            fold_entries(holdings, batch)
+            version += len(batch)
+            written += bool(_save_snapshot(spv_id, version, holdings, batch[-1]))
+            batch = []
+    return written
+
+
+def record_allocation(investment, ownership_before, created_by=None):
+    """
+    Write the ledger entry for a change of an investment's confirmed
+    ownership (opening balance or adjustment) and checkpoint the cap table.
+    """
+    ownership_after = investment.ownership_percentage or ZERO
+    ownership_before = ownership_before or ZERO
+    if ownership_after == ownership_before:
+        return None
+
+    amount = investment.invested_amount or ZERO
+    opening = ownership_before == 0
+    entry = OwnershipLedger.objects.create(
+        investor_id=investment.investor_id,
+        spv_id=investment.spv_id,
+        entry_type='initial_investment' if opening else 'adjustment',
+        investment=investment,
+        ownership_change=ownership_after - ownership_before,
+        ownership_before=ownership_before,
+        ownership_after=ownership_after,
+        amount_change=amount if opening else ZERO,
+        amount_before=ZERO if opening else amount,
+        amount_after=amount,
+        notes='Allocation confirmed' if opening else 'Allocation adjusted',
+        created_by=created_by,
+    )
+    checkpoint_cap_table(investment.spv_id)
+    return entry
+
+
+def backfill_allocation_entries(spv_ids=None):
+    """
+    Write ledger entries for allocations confirmed before the ledger
+    recorded them: whatever part of an investment's ownership and amount its
+    ledger entries don't explain, as an opening entry or, when the investment
+    already has entries, an adjustment continuing from their balance.
+    Entries are dated now. Returns the number written.
+    """
+    from django.db.models import Sum
+    from investors.dashboard_models import Investment
+
+    investments = Investment.objects.filter(status__in=ALLOCATED_STATUSES).exclude(spv_id=None).annotate(
+        ledger_ownership=Sum('ledger_entries__ownership_change'),
+        ledger_amount=Sum('ledger_entries__amount_change'),
+    )
+    if spv_ids is not None:
+        investments = investments.filter(spv_id__in=spv_ids)
+
+    entries = []
+    for investment in investments.iterator(chunk_size=2000):
+        ownership_before = investment.ledger_ownership or ZERO
+        amount_before = investment.ledger_amount or ZERO
+        ownership = (investment.ownership_percentage or ZERO) - ownership_before
+        amount = (investment.invested_amount or ZERO) - amount_before
+        if not ownership:
+            continue
+        opening = not ownership_before
+        entries.append(OwnershipLedger(
+            investor_id=investment.investor_id,
+            spv_id=investment.spv_id,
+            entry_type='initial_investment' if opening else 'adjustment',
+            investment=investment,
+            ownership_change=ownership,
+            ownership_before=ownership_before,
+            ownership_after=ownership_before + ownership,
+            amount_change=amount,
+            amount_before=amount_before,
+            amount_after=amount_before + amount,
+            notes='Opening balance (backfill)' if opening else 'Allocation adjusted (backfill)',
+        ))
+    spv_ids = {entry.spv_id for entry in entries}
+    with transaction.atomic():
+        lock_ledgers(spv_ids)
+        OwnershipLedger.objects.bulk_create(entries, batch_size=1000)
+        record_ledger_events(entries)
+        for spv_id in spv_ids:
+            seal_ledger(spv_id)
+    return len(entries)
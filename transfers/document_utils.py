@@ -8,13 +8,13 @@ This module provides utilities for:
 """
 
 import os
-import uuid
 from io import BytesIO
 from datetime import datetime
-from django.core.files.base import ContentFile
 from django.utils import timezone
 from django.conf import settings
 
+from config.renderer_utils import PDFBackend
+
 # Try to import reportlab for PDF generation
 try:
     from reportlab.lib.pagesizes import letter, A4
@@ -23,10 +23,16 @@ try:
     from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
     from reportlab.lib import colors
     from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
+    from reportlab import Version as REPORTLAB_VERSION
     REPORTLAB_AVAILABLE = True
 except ImportError:
     REPORTLAB_AVAILABLE = False
 
+# Renderer version in PDF render cache keys; bump the layout number when
+# generate_pdf_content's output changes
+PDF_LAYOUT_VERSION = 1
+PDF_RENDERER = f"transfer-agreement-{PDF_LAYOUT_VERSION}/" + (f"reportlab-{REPORTLAB_VERSION}" if REPORTLAB_AVAILABLE else 'text')
+
 
 def generate_transfer_request_document(transfer, requester_signature, signature_ip, signature_type='text'):
     """
@@ -45,9 +51,10 @@ def generate_transfer_request_document(transfer, requester_signature, signature_
         signature_type: 'text' or 'image'
     
     Returns:
-        TransferAgreementDocument instance
+        TransferAgreementDocument instance (render_status 'pending' until the PDF is rendered)
     """
     from .models import TransferAgreementDocument
+    from .render_utils import queue_document
     
     # Generate document data
     document_data = {
@@ -87,13 +94,6 @@ def generate_transfer_request_document(transfer, requester_signature, signature_
         'document_type': 'transfer_request',
     }
     
-    # Generate PDF
-    pdf_content = generate_pdf_content(
-        document_type='transfer_request',
-        document_data=document_data,
-        title=f"Transfer Request - {transfer.transfer_id}"
-    )
-    
     # Create the document record
     agreement_doc = TransferAgreementDocument(
         transfer=transfer,
@@ -112,13 +112,8 @@ def generate_transfer_request_document(transfer, requester_signature, signature_
         can_recipient_download=True,
     )
     
-    # Save PDF file
-    filename = f"transfer_request_{transfer.transfer_id}_{uuid.uuid4().hex[:8]}.pdf"
-    agreement_doc.file.save(filename, ContentFile(pdf_content), save=False)
-    agreement_doc.file_size = len(pdf_content)
-    agreement_doc.save()
-    
-    return agreement_doc
+    # Saved as pending; the PDF is rendered after commit by the render queue
+    return queue_document(agreement_doc)
 
 
 def generate_acceptance_document(transfer, recipient_signature, signature_ip, signature_type='text'):
@@ -137,9 +132,10 @@ def generate_acceptance_document(transfer, recipient_signature, signature_ip, si
         signature_type: 'text' or 'image'
     
     Returns:
-        TransferAgreementDocument instance
+        TransferAgreementDocument instance (render_status 'pending' until the PDF is rendered)
     """
     from .models import TransferAgreementDocument
+    from .render_utils import queue_document
     
     document_data = {
         'transfer_id': transfer.transfer_id,
@@ -178,13 +174,6 @@ def generate_acceptance_document(transfer, recipient_signature, signature_ip, si
         'document_type': 'acceptance',
     }
     
-    # Generate PDF
-    pdf_content = generate_pdf_content(
-        document_type='acceptance',
-        document_data=document_data,
-        title=f"Transfer Acceptance - {transfer.transfer_id}"
-    )
-    
     # Create the document record
     agreement_doc = TransferAgreementDocument(
         transfer=transfer,
@@ -203,13 +192,8 @@ def generate_acceptance_document(transfer, recipient_signature, signature_ip, si
         can_recipient_download=True,
     )
     
-    # Save PDF file
-    filename = f"acceptance_{transfer.transfer_id}_{uuid.uuid4().hex[:8]}.pdf"
-    agreement_doc.file.save(filename, ContentFile(pdf_content), save=False)
-    agreement_doc.file_size = len(pdf_content)
-    agreement_doc.save()
-    
-    return agreement_doc
+    # Saved as pending; the PDF is rendered after commit by the render queue
+    return queue_document(agreement_doc)
 
 
 def generate_final_agreement_document(transfer, requester_signature, requester_signature_ip, 
@@ -233,9 +217,10 @@ def generate_final_agreement_document(transfer, requester_signature, requester_s
         recipient_signature_type: 'text' or 'image'
     
     Returns:
-        TransferAgreementDocument instance
+        TransferAgreementDocument instance (render_status 'pending' until the PDF is rendered)
     """
     from .models import TransferAgreementDocument
+    from .render_utils import queue_document
     
     # Get previous signatures from the transfer request document
     transfer_request_doc = transfer.agreement_documents.filter(
@@ -293,13 +278,6 @@ def generate_final_agreement_document(transfer, requester_signature, requester_s
         'document_type': 'final_agreement',
     }
     
-    # Generate PDF
-    pdf_content = generate_pdf_content(
-        document_type='final_agreement',
-        document_data=document_data,
-        title=f"Transfer Agreement - {transfer.transfer_id}"
-    )
-    
     # Create the document record
     agreement_doc = TransferAgreementDocument(
         transfer=transfer,
@@ -321,13 +299,8 @@ def generate_final_agreement_document(transfer, requester_signature, requester_s
         can_recipient_download=True,
     )
     
-    # Save PDF file
-    filename = f"final_agreement_{transfer.transfer_id}_{uuid.uuid4().hex[:8]}.pdf"
-    agreement_doc.file.save(filename, ContentFile(pdf_content), save=False)
-    agreement_doc.file_size = len(pdf_content)
-    agreement_doc.save()
-    
-    return agreement_doc
+    # Saved as pending; the PDF is rendered after commit by the render queue
+    return queue_document(agreement_doc)
 
 
 def generate_pdf_content(document_type, document_data, title):
@@ -498,6 +471,30 @@ def generate_pdf_content(document_type, document_data, title):
     return pdf_content
 
 
+class TransferAgreementBackend(PDFBackend):
+    """Renders transfer agreement documents with generate_pdf_content (the 'transfer_agreement' backend)"""
+    
+    version = PDF_RENDERER
+    
+    def sample(self):
+        return ('final_agreement', {
+            'transfer_id': 'TXN-00000000',
+            'spv_name': 'Sample SPV',
+            'requester_name': 'Seller',
+            'recipient_name': 'Buyer',
+            'amount': 1000.0,
+            'transfer_fee': 10.0,
+            'net_amount': 990.0,
+            'requester_signature': 'Seller',
+            'requester_signature_type': 'text',
+            'recipient_signature': 'Buyer',
+            'recipient_signature_type': 'text',
+        }, 'Transfer Agreement - TXN-00000000')
+    
+    def render(self, document_type, document_data, title):
+        return generate_pdf_content(document_type, document_data, title)
+
+
 def generate_simple_pdf(document_type, document_data, title):
     """
     Fallback PDF generation without reportlab.
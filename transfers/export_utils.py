@@ -0,0 +1,325 @@
+"""
+Streaming exports of transfers, ledger entries and cap tables.
+
+Rows are read with `.values_list().iterator()` (a server-side cursor on
+PostgreSQL, chunked fetches elsewhere) and encoded as they are produced, so
+a StreamingHttpResponse of any length holds one chunk of rows at a time.
+
+Two encoders:
+
+    csv   one line per row
+    xlsx  a single-sheet workbook written as a stream: the zip container is
+          produced incrementally (data descriptors, no seeking) and cells are
+          inline strings/numbers, so no shared-strings table is kept in
+          memory. Output is flushed every EXPORT_XLSX_CHUNK_ROWS rows.
+
+Text cells starting with a formula character (=, +, -, @, tab, CR) are
+prefixed with an apostrophe, so a username or note can't run as a formula
+when the export is opened in a spreadsheet.
+
+Cap tables are folded from the ownership ledger per SPV (see
+cap_table_utils.py), so their size is bounded by the SPV's investor count.
+"""
+
+import csv
+import re
+import zipfile
+from datetime import date, datetime, time
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .cap_table_utils import get_cap_table
+from .models import OwnershipLedger, Transfer
+
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+CHUNK_SIZE = 2000
+
+TRANSFER_COLUMNS = [
+    ('transfer_id', 'transfer_id'),
+    ('status', 'status'),
+    ('transfer_type', 'transfer_type'),
+    ('spv_id', 'spv_id'),
+    ('spv', 'spv__display_name'),
+    ('requester_id', 'requester_id'),
+    ('requester', 'requester__username'),
+    ('requester_email', 'requester__email'),
+    ('recipient_id', 'recipient_id'),
+    ('recipient', 'recipient__username'),
+    ('recipient_email', 'recipient__email'),
+    ('shares', 'shares'),
+    ('ownership_percentage_transferred', 'ownership_percentage_transferred'),
+    ('amount', 'amount'),
+    ('transfer_fee', 'transfer_fee'),
+    ('net_amount', 'net_amount'),
+    ('requester_ownership_before', 'requester_ownership_before'),
+    ('requester_ownership_after', 'requester_ownership_after'),
+    ('recipient_ownership_before', 'recipient_ownership_before'),
+    ('recipient_ownership_after', 'recipient_ownership_after'),
+    ('requested_at', 'requested_at'),
+    ('approved_at', 'approved_at'),
+    ('completed_at', 'completed_at'),
+]
+
+LEDGER_COLUMNS = [
+    ('entry_id', 'id'),
+    ('created_at', 'created_at'),
+    ('spv_id', 'spv_id'),
+    ('spv', 'spv__display_name'),
+    ('investor_id', 'investor_id'),
+    ('investor', 'investor__username'),
+    ('entry_type', 'entry_type'),
+    ('investment_id', 'investment_id'),
+    ('transfer_id', 'transfer__transfer_id'),
+    ('ownership_change', 'ownership_change'),
+    ('ownership_before', 'ownership_before'),
+    ('ownership_after', 'ownership_after'),
+    ('amount_change', 'amount_change'),
+    ('amount_before', 'amount_before'),
+    ('amount_after', 'amount_after'),
+    ('notes', 'notes'),
+    ('entry_hash', 'entry_hash'),
+]
+
+CAP_TABLE_HEADER = [
+    'spv_id', 'spv', 'investor_id', 'investor', 'investor_email', 'investor_full_name',
+    'ownership_percentage', 'invested_amount', 'first_entry_at', 'last_transfer_at', 'as_of',
+]
+
+
+def parse_date_range(date_from=None, date_to=None):
+    """
+    (start, end) aware datetimes from ISO date/datetime strings; a date means
+    the start (date_from) or end (date_to) of that day. Raises ValueError.
+    """
+    def parse(value, end_of_day):
+        if not value:
+            return None
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError(f'Invalid date: {value}')
+            moment = datetime.combine(day, time.max if end_of_day else time.min)
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return moment
+
+    return parse(date_from, False), parse(date_to, True)
+
+
+def transfer_rows(queryset):
+    """Header and value rows of transfers"""
+    yield [name for name, _ in TRANSFER_COLUMNS]
+    rows = queryset.order_by('requested_at', 'id').values_list(*[field for _, field in TRANSFER_COLUMNS])
+    yield from rows.iterator(chunk_size=CHUNK_SIZE)
+
+
+def ledger_rows(queryset):
+    """Header and value rows of ownership ledger entries"""
+    yield [name for name, _ in LEDGER_COLUMNS]
+    rows = queryset.order_by('id').values_list(*[field for _, field in LEDGER_COLUMNS])
+    yield from rows.iterator(chunk_size=CHUNK_SIZE)
+
+
+def cap_table_rows(spvs, as_of=None):
+    """Header and one row per holder for each SPV in `spvs` ((id, display_name) pairs)"""
+    User = get_user_model()
+    yield CAP_TABLE_HEADER
+    for spv_id, spv_name in spvs:
+        cap_table = get_cap_table(spv_id, as_of=as_of)
+        holdings = {investor_id: holding for investor_id, holding in cap_table['holdings'].items() if holding['ownership_percentage'] > 0}
+        users = User.objects.filter(id__in=list(holdings)).only('id', 'username', 'email', 'first_name', 'last_name').in_bulk()
+        for investor_id, holding in sorted(holdings.items(), key=lambda item: -item[1]['ownership_percentage']):
+            user = users.get(investor_id)
+            yield [
+                spv_id,
+                spv_name,
+                investor_id,
+                user.username if user else '',
+                user.email if user else '',
+                (user.get_full_name() or user.username) if user else '',
+                holding['ownership_percentage'],
+                holding['invested_amount'],
+                holding['first_entry_at'],
+                holding['last_transfer_at'],
+                cap_table['as_of'],
+            ]
+
+
+def filter_transfers(spv_ids=None, start=None, end=None, statuses=None):
+    queryset = Transfer.objects.all()
+    if spv_ids is not None:
+        queryset = queryset.filter(spv_id__in=spv_ids)
+    if start:
+        queryset = queryset.filter(requested_at__gte=start)
+    if end:
+        queryset = queryset.filter(requested_at__lte=end)
+    if statuses:
+        queryset = queryset.filter(status__in=statuses)
+    return queryset
+
+
+def filter_ledger(spv_ids=None, start=None, end=None):
+    queryset = OwnershipLedger.objects.all()
+    if spv_ids is not None:
+        queryset = queryset.filter(spv_id__in=spv_ids)
+    if start:
+        queryset = queryset.filter(created_at__gte=start)
+    if end:
+        queryset = queryset.filter(created_at__lte=end)
+    return queryset
+
+
+# Leading characters that make a spreadsheet read a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        # Text from users (names, notes) is neutralised; numbers are not str and keep their sign
+        return f"'{value}" if value.startswith(FORMULA_PREFIXES) else value
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat() if timezone.is_aware(value) else value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+class _Echo:
+    """File-like object whose write() returns what it was given (csv.writer target)"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    """Encoded CSV lines for an iterable of rows"""
+    writer = csv.writer(_Echo())
+    for row in rows:
+        yield writer.writerow([_text(value) for value in row]).encode('utf-8')
+
+
+class _Buffer:
+    """Write-only, unseekable sink that zipfile streams into"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+# Characters XML 1.0 does not allow
+_INVALID_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_COLUMN_LETTERS = {}
+
+
+def _column(index):
+    """Spreadsheet column letters of a 0-based index (0 -> A)"""
+    if index not in _COLUMN_LETTERS:
+        letters = ''
+        number = index + 1
+        while number:
+            number, remainder = divmod(number - 1, 26)
+            letters = chr(65 + remainder) + letters
+        _COLUMN_LETTERS[index] = letters
+    return _COLUMN_LETTERS[index]
+
+
+def _cell(reference, value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return f'<c r="{reference}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c r="{reference}"><v>{value}</v></c>'
+    text = escape(_INVALID_XML.sub('', _text(value)))
+    return f'<c r="{reference}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+
+def stream_xlsx(rows, sheet_name='Export'):
+    """Bytes of a single-sheet XLSX workbook for an iterable of rows, produced incrementally"""
+    chunk_rows = getattr(settings, 'EXPORT_XLSX_CHUNK_ROWS', 1000)
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as workbook:
+        for name, content in _XLSX_PARTS.items():
+            workbook.writestr(name, content)
+        workbook.writestr('xl/workbook.xml', _WORKBOOK.format(name=escape(sheet_name[:31])))
+        yield buffer.drain()
+
+        with workbook.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            for number, row in enumerate(rows, start=1):
+                cells = ''.join(_cell(f'{_column(index)}{number}', value) for index, value in enumerate(row))
+                sheet.write(f'<row r="{number}">{cells}</row>'.encode('utf-8'))
+                if number % chunk_rows == 0:
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
+
+
+def stream_export(rows, export_format, sheet_name='Export'):
+    """Encoded chunks of `rows` in `export_format` ('csv' or 'xlsx')"""
+    if export_format == 'xlsx':
+        return stream_xlsx(rows, sheet_name=sheet_name)
+    return stream_csv(rows)
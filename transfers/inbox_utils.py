@@ -0,0 +1,153 @@
+"""
+Pending-actions inbox.
+
+ActionInboxItem holds what each user has to do next:
+
+    confirm_transfer  requester, transfer pending requester confirmation
+    accept_transfer   recipient, transfer pending recipient confirmation
+    approve_transfer  SPV manager and the admin queue, transfer pending approval
+    review_request    admin queue, request pending
+
+Transfer.save() and Request.save() re-derive the rows of the saved object
+when its status may have changed; bulk writers (settlement, the admin
+actions) call sync_transfer_inbox()/sync_request_inbox() with the updated
+objects, and saving an SPV re-derives its pending approvals so they follow
+a reassigned manager (transfers.signals). Rows that stay due keep their
+created_at. The admin queue is stored once (user NULL) and read by every
+admin, so adding an admin needs no backfill.
+
+After commit, each affected user's `notifications_<user_id>` channel group
+(and ADMIN_INBOX_GROUP for the admin queue) gets an `inbox_update` message
+listing the added and removed items, so clients keep their inbox current
+without polling. `manage.py rebuild_action_inbox` rebuilds the table.
+"""
+
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models import Q
+
+from investors.notification_utils import get_delivery_mode, get_notification_group
+from .models import ActionInboxItem, Request, Transfer
+
+
+logger = logging.getLogger(__name__)
+
+ADMIN_INBOX_GROUP = 'action_inbox_admins'
+
+ADMIN_QUEUE = None
+
+TRANSFER_ACTIONS = {
+    'pending_requester_confirmation': 'confirm_transfer',
+    'pending_recipient_confirmation': 'accept_transfer',
+    'pending_approval': 'approve_transfer',
+}
+
+
+def is_admin(user):
+    return user.is_staff or getattr(user, 'role', None) == 'admin'
+
+
+def _transfer_assignees(transfer, managers):
+    """[(user_id or ADMIN_QUEUE, action_type)] due on a transfer in its current status"""
+    action_type = TRANSFER_ACTIONS.get(transfer.status)
+    if action_type == 'confirm_transfer':
+        return [(transfer.requester_id, action_type)]
+    if action_type == 'accept_transfer':
+        return [(transfer.recipient_id, action_type)]
+    if action_type == 'approve_transfer':
+        assignees = [(ADMIN_QUEUE, action_type)]
+        if managers.get(transfer.spv_id):
+            assignees.append((managers[transfer.spv_id], action_type))
+        return assignees
+    return []
+
+
+def _request_assignees(request):
+    return [(ADMIN_QUEUE, 'review_request')] if request.status == 'pending' else []
+
+
+def _sync(field, objects, assignees_for, push=True):
+    """Bring the inbox rows of `objects` (Transfers or Requests) in line with their status"""
+    if not objects:
+        return
+    object_ids = [obj.id for obj in objects]
+
+    existing = {}
+    for item_id, user_id, action_type, object_id in ActionInboxItem.objects.filter(
+        **{f'{field}_id__in': object_ids}
+    ).values_list('id', 'user_id', 'action_type', f'{field}_id'):
+        existing[(object_id, user_id, action_type)] = item_id
+
+    wanted = {(obj.id, user_id, action_type) for obj in objects for user_id, action_type in assignees_for(obj)}
+
+    removed = [key for key in existing if key not in wanted]
+    added = [key for key in wanted if key not in existing]
+    if removed:
+        ActionInboxItem.objects.filter(id__in=[existing[key] for key in removed]).delete()
+    if added:
+        ActionInboxItem.objects.bulk_create([
+            ActionInboxItem(user_id=user_id, action_type=action_type, **{f'{field}_id': object_id})
+            for object_id, user_id, action_type in added
+        ])
+
+    if push and (removed or added):
+        changes = [(key, 'added') for key in added] + [(key, 'removed') for key in removed]
+        transaction.on_commit(lambda: push_inbox_changes(field, changes))
+
+
+def sync_transfer_inbox(transfers, push=True):
+    """Update the inbox for saved transfers"""
+    from spv.models import SPV
+
+    transfers = list(transfers)
+    pending = {transfer.spv_id for transfer in transfers if transfer.status == 'pending_approval'}
+    managers = dict(SPV.objects.filter(id__in=pending).values_list('id', 'created_by_id')) if pending else {}
+    _sync('transfer', transfers, lambda transfer: _transfer_assignees(transfer, managers), push)
+
+
+def sync_request_inbox(requests, push=True):
+    """Update the inbox for saved requests"""
+    _sync('request', list(requests), _request_assignees, push)
+
+
+def push_inbox_changes(field, changes):
+    """Send `inbox_update` messages for ((object_id, user_id, action_type), change) pairs"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None or get_delivery_mode() == 'off':
+        return
+
+    by_group = {}
+    for (object_id, user_id, action_type), change in changes:
+        group = ADMIN_INBOX_GROUP if user_id is ADMIN_QUEUE else get_notification_group(user_id)
+        by_group.setdefault(group, []).append({
+            'change': change,
+            'action_type': action_type,
+            field: object_id,
+        })
+    for group, items in by_group.items():
+        try:
+            async_to_sync(channel_layer.group_send)(group, {'type': 'inbox_update', 'items': items})
+        except Exception:
+            logger.exception('Inbox update for %s could not be pushed', group)
+
+
+def get_inbox(user):
+    """The user's inbox items (plus the admin queue for admins), newest first"""
+    owners = Q(user=user)
+    if is_admin(user):
+        owners |= Q(user__isnull=True)
+    return ActionInboxItem.objects.filter(owners).order_by('-created_at')
+
+
+def rebuild_inbox():
+    """Re-derive every open inbox row from the transfers and requests (no pushes). Returns rows written."""
+    transfers = Transfer.objects.filter(status__in=TRANSFER_ACTIONS).only('id', 'status', 'requester_id', 'recipient_id', 'spv_id')
+    requests = Request.objects.filter(status='pending').only('id', 'status')
+    with transaction.atomic():
+        ActionInboxItem.objects.all().delete()
+        sync_transfer_inbox(transfers, push=False)
+        sync_request_inbox(requests, push=False)
+    return ActionInboxItem.objects.count()
@@ -0,0 +1,198 @@
+"""
+Ownership ledger integrity.
+
+Each OwnershipLedger entry carries `entry_hash`, a SHA-256 over the entry's
+fields and the hash of the SPV's previous entry (in id order), so editing,
+deleting or reordering a sealed entry breaks every hash after it. Entries
+are sealed right after they are written (OwnershipLedger.save(), bulk
+writers call seal_ledger()).
+
+Writers and seal_ledger() first lock the SPV row (lock_ledgers()) for the
+rest of their transaction, so one SPV's entries are inserted and sealed one
+transaction at a time: two sealers can't both extend the same chain head,
+and an entry can't commit below an id that is already sealed.
+
+verify_ledger() streams one SPV's entries in id order with a chunked
+server-side iterator, holding only running balances, and reports:
+
+    hash_mismatch    stored hash differs from the recomputed chain
+    unsealed         entry has no hash yet (run seal_ledger)
+    arithmetic       *_before + *_change != *_after
+    chain            *_before differs from the *_after of the investor's
+                     previous entry for the same investment
+    over_allocated   running SPV ownership above 100%
+    drift            replayed balance differs from the Investment row
+
+`manage.py verify_ownership_ledger` runs it for all SPVs, optionally on
+several worker threads.
+"""
+
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.db import connections, transaction
+
+from spv.models import SPV
+
+from .models import OwnershipLedger
+
+
+ZERO = Decimal('0')
+HUNDRED = Decimal('100')
+
+HASH_FIELDS = [
+    'id', 'spv_id', 'investor_id', 'entry_type', 'investment_id', 'transfer_id',
+    'ownership_change', 'ownership_before', 'ownership_after',
+    'amount_change', 'amount_before', 'amount_after',
+    'created_at',
+]
+
+VERIFY_FIELDS = HASH_FIELDS + ['entry_hash']
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def compute_entry_hash(previous_hash, row):
+    """Hash of a ledger row (HASH_FIELDS tuple) chained to the previous hash"""
+    (entry_id, spv_id, investor_id, entry_type, investment_id, transfer_id,
+     ownership_change, ownership_before, ownership_after,
+     amount_change, amount_before, amount_after, created_at) = row
+    payload = '|'.join([
+        previous_hash,
+        str(entry_id), str(spv_id), str(investor_id), entry_type,
+        str(investment_id or ''), str(transfer_id or ''),
+        f'{ownership_change:.4f}', f'{ownership_before:.4f}', f'{ownership_after:.4f}',
+        f'{amount_change:.2f}', f'{amount_before:.2f}', f'{amount_after:.2f}',
+        created_at.isoformat(),
+    ])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def lock_ledgers(spv_ids):
+    """Lock these SPVs' rows (in id order) until the end of the current transaction"""
+    list(SPV.objects.select_for_update().filter(id__in=spv_ids).order_by('id').values_list('id', flat=True))
+
+
+def seal_ledger(spv_id, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Hash the SPV's unsealed entries that follow its last sealed entry,
+    continuing the chain. Returns the number of entries sealed.
+    """
+    with transaction.atomic():
+        # Serialize sealers before reading the chain head
+        lock_ledgers([spv_id])
+        last = OwnershipLedger.objects.filter(spv_id=spv_id).exclude(entry_hash='').order_by('-id').values_list(
+            'id', 'entry_hash'
+        ).first()
+        last_id, previous_hash = last or (0, '')
+
+        pending = OwnershipLedger.objects.filter(spv_id=spv_id, id__gt=last_id, entry_hash='').order_by('id')
+        sealed = []
+        for row in pending.values_list(*HASH_FIELDS).iterator(chunk_size=chunk_size):
+            previous_hash = compute_entry_hash(previous_hash, row)
+            sealed.append(OwnershipLedger(id=row[0], entry_hash=previous_hash))
+        OwnershipLedger.objects.bulk_update(sealed, ['entry_hash'], batch_size=chunk_size)
+    return len(sealed)
+
+
+def verify_ledger(spv_id, chunk_size=DEFAULT_CHUNK_SIZE, max_issues=100):
+    """
+    Verify one SPV's ledger. Returns
+    {'spv_id', 'entries', 'issue_count', 'issues': [...first max_issues]}.
+    """
+    from investors.dashboard_models import Investment
+
+    report = {'spv_id': spv_id, 'entries': 0, 'issue_count': 0, 'issues': []}
+
+    def add_issue(kind, **detail):
+        report['issue_count'] += 1
+        if len(report['issues']) < max_issues:
+            report['issues'].append({'type': kind, **detail})
+
+    previous_hash = ''
+    total_ownership = ZERO
+    balances = {}  # investment_id -> [ownership, amount]
+    last_after = {}  # (investor_id, investment_id) -> (ownership_after, amount_after)
+
+    entries = OwnershipLedger.objects.filter(spv_id=spv_id).order_by('id').values_list(*VERIFY_FIELDS)
+    for row in entries.iterator(chunk_size=chunk_size):
+        report['entries'] += 1
+        entry_id = row[0]
+        investment_id = row[4]
+        ownership_change, ownership_before, ownership_after = row[6:9]
+        amount_change, amount_before, amount_after = row[9:12]
+        stored_hash = row[13]
+
+        expected_hash = compute_entry_hash(previous_hash, row[:13])
+        if not stored_hash:
+            add_issue('unsealed', entry_id=entry_id)
+        elif stored_hash != expected_hash:
+            add_issue('hash_mismatch', entry_id=entry_id)
+        # Continue from the recomputed hash so one bad entry is reported once
+        previous_hash = expected_hash
+
+        if ownership_before + ownership_change != ownership_after or amount_before + amount_change != amount_after:
+            add_issue('arithmetic', entry_id=entry_id)
+
+        # Before/after figures are the holding's: an investor's second investment starts its own chain
+        holding = (row[2], investment_id)
+        previous = last_after.get(holding)
+        if previous is not None and previous != (ownership_before, amount_before):
+            add_issue(
+                'chain',
+                entry_id=entry_id,
+                investor_id=row[2],
+                previous_ownership=str(previous[0]),
+                ownership_before=str(ownership_before),
+                previous_amount=str(previous[1]),
+                amount_before=str(amount_before),
+            )
+        last_after[holding] = (ownership_after, amount_after)
+
+        total_ownership += ownership_change
+        if total_ownership > HUNDRED:
+            add_issue('over_allocated', entry_id=entry_id, total_ownership=str(total_ownership))
+
+        if investment_id:
+            balance = balances.setdefault(investment_id, [ZERO, ZERO])
+            balance[0] += ownership_change
+            balance[1] += amount_change
+
+    investments = Investment.objects.filter(spv_id=spv_id).values_list('id', 'ownership_percentage', 'invested_amount')
+    for investment_id, ownership, amount in investments.iterator(chunk_size=chunk_size):
+        balance = balances.pop(investment_id, None)
+        if balance is None:
+            if ownership:
+                add_issue('drift', investment_id=investment_id, ledger_ownership='0', ownership=str(ownership))
+            continue
+        if balance[0] != ownership or (ownership and balance[1] != amount):
+            add_issue(
+                'drift',
+                investment_id=investment_id,
+                ledger_ownership=str(balance[0]),
+                ownership=str(ownership),
+                ledger_amount=str(balance[1]),
+                amount=str(amount),
+            )
+
+    return report
+
+
+def _verify_in_thread(spv_id, chunk_size, max_issues):
+    try:
+        return verify_ledger(spv_id, chunk_size=chunk_size, max_issues=max_issues)
+    finally:
+        # Each worker thread opened its own connection
+        connections.close_all()
+
+
+def verify_ledgers(spv_ids, workers=1, chunk_size=DEFAULT_CHUNK_SIZE, max_issues=100):
+    """Verify several SPVs' ledgers, on `workers` threads when above 1. Yields reports."""
+    if workers <= 1:
+        for spv_id in spv_ids:
+            yield verify_ledger(spv_id, chunk_size=chunk_size, max_issues=max_issues)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(lambda spv_id: _verify_in_thread(spv_id, chunk_size, max_issues), spv_ids)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from transfers.inbox_utils import rebuild_inbox
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the pending-actions inbox from the current transfer and request statuses'
+
+    def handle(self, *args, **options):
+        written = rebuild_inbox()
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} inbox item(s)'))
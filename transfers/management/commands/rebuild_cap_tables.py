@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from spv.models import SPV
+from transfers.cap_table_utils import backfill_allocation_entries, rebuild_cap_table
+
+
+class Command(BaseCommand):
+    help = 'Backfill opening ownership ledger entries and rebuild cap table snapshots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--spv', type=int, action='append', dest='spv_ids', help='Limit to these SPV ids (repeatable)')
+        parser.add_argument('--skip-backfill', action='store_true', help='Only rebuild snapshots from the existing ledger')
+
+    def handle(self, *args, **options):
+        spv_ids = options['spv_ids']
+
+        if not options['skip_backfill']:
+            written = backfill_allocation_entries(spv_ids=spv_ids)
+            self.stdout.write(f'Backfilled {written} opening ledger entr{"y" if written == 1 else "ies"}')
+
+        if spv_ids is None:
+            spv_ids = list(SPV.objects.filter(ownership_ledger__isnull=False).distinct().values_list('id', flat=True))
+
+        snapshots = sum(rebuild_cap_table(spv_id) for spv_id in spv_ids)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt cap tables of {len(spv_ids)} SPV(s): {snapshots} snapshot(s)'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from transfers.timeline_utils import rebuild_timeline
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the transfer timeline read model from the ownership ledger and transfer history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows read and written per batch')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            written = rebuild_timeline(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} timeline event(s)'))
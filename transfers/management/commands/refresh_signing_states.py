@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from transfers.signing_utils import refresh_all_signing_states
+
+
+class Command(BaseCommand):
+    help = 'Recompute the signing state of every transfer from its latest agreement documents'
+
+    def handle(self, *args, **options):
+        written = refresh_all_signing_states()
+        self.stdout.write(self.style.SUCCESS(f'Refreshed {written} signing state(s)'))
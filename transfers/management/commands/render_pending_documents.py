@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from transfers.models import TransferAgreementDocument
+from transfers.render_utils import render_document
+
+
+class Command(BaseCommand):
+    help = 'Render transfer agreement documents left pending (e.g. by a restart), optionally retrying failed ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=10, help='Only documents untouched for this many minutes (default: 10)')
+        parser.add_argument('--include-failed', action='store_true', help='Also retry documents whose render failed')
+
+    def handle(self, *args, **options):
+        statuses = ['pending', 'rendering']
+        if options['include_failed']:
+            statuses.append('failed')
+
+        cutoff = timezone.now() - timedelta(minutes=options['older_than'])
+        document_ids = list(TransferAgreementDocument.objects.filter(
+            render_status__in=statuses, updated_at__lt=cutoff,
+        ).order_by('id').values_list('id', flat=True))
+
+        failed = 0
+        for document_id in document_ids:
+            document = render_document(document_id)
+            if document.render_status != 'ready':
+                failed += 1
+                self.stdout.write(self.style.WARNING(f'{document.document_number}: {document.render_error}'))
+
+        self.stdout.write(self.style.SUCCESS(f'Rendered {len(document_ids) - failed} of {len(document_ids)} document(s)'))
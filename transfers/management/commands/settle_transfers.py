@@ -0,0 +1,50 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from transfers.models import Transfer
+from transfers.settlement_utils import settle_transfers
+
+
+class Command(BaseCommand):
+    help = 'Complete approved transfers in one transaction (settlement window)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--spv', type=int, action='append', dest='spv_ids', help='Settle all approved transfers of these SPV ids (repeatable)')
+        parser.add_argument('--transfer', type=int, action='append', dest='transfer_ids', help='Settle these transfer ids (repeatable)')
+        parser.add_argument('--completed-by', help='Username recorded as completing the transfers')
+        parser.add_argument('--partial', action='store_true', help='Settle the valid transfers when some fail instead of rolling back')
+        parser.add_argument('--json', action='store_true', help='Print the settlement report as JSON')
+
+    def handle(self, *args, **options):
+        if not options['spv_ids'] and not options['transfer_ids']:
+            raise CommandError('Provide --spv or --transfer')
+
+        user = None
+        if options['completed_by']:
+            try:
+                user = get_user_model().objects.get(username=options['completed_by'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"Unknown user: {options['completed_by']}")
+
+        transfer_ids = list(options['transfer_ids'] or [])
+        if options['spv_ids']:
+            transfer_ids += Transfer.objects.filter(
+                spv_id__in=options['spv_ids'], status='approved'
+            ).exclude(id__in=transfer_ids).order_by('id').values_list('id', flat=True)
+
+        settlement = settle_transfers(transfer_ids, user=user, partial=options['partial'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(settlement, indent=2))
+        else:
+            for result in settlement['results']:
+                line = f"{result['transfer_id'] or result['id']}: {result['status']}"
+                if result.get('error'):
+                    line += f" ({result['error']})"
+                self.stdout.write(line)
+
+        if not settlement['settled'] and settlement['failed']:
+            raise CommandError(f"{settlement['failed']} transfer(s) failed; the batch was rolled back")
+        self.stdout.write(self.style.SUCCESS(f"Completed {settlement['completed']} transfer(s), {settlement['failed']} failed"))
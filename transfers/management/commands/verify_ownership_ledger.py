@@ -0,0 +1,52 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from spv.models import SPV
+from transfers.ledger_utils import DEFAULT_CHUNK_SIZE, seal_ledger, verify_ledgers
+
+
+class Command(BaseCommand):
+    help = 'Verify ownership ledger hash chains, balances and drift against investments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--spv', type=int, action='append', dest='spv_ids', help='Limit to these SPV ids (repeatable)')
+        parser.add_argument('--workers', type=int, default=1, help='Verify SPVs on this many threads')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Ledger rows fetched per round trip')
+        parser.add_argument('--max-issues', type=int, default=100, help='Issues listed per SPV')
+        parser.add_argument('--seal', action='store_true', help='Hash unsealed entries before verifying')
+        parser.add_argument('--json', action='store_true', help='Print one JSON report per SPV')
+
+    def handle(self, *args, **options):
+        spv_ids = options['spv_ids']
+        if spv_ids is None:
+            spv_ids = list(SPV.objects.filter(ownership_ledger__isnull=False).distinct().order_by('id').values_list('id', flat=True))
+
+        if options['seal']:
+            sealed = sum(seal_ledger(spv_id, chunk_size=options['chunk_size']) for spv_id in spv_ids)
+            self.stdout.write(f'Sealed {sealed} entr{"y" if sealed == 1 else "ies"}')
+
+        entries = failed = 0
+        reports = verify_ledgers(
+            spv_ids,
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            max_issues=options['max_issues'],
+        )
+        for report in reports:
+            entries += report['entries']
+            if options['json']:
+                self.stdout.write(json.dumps(report))
+            if not report['issue_count']:
+                continue
+            failed += 1
+            if not options['json']:
+                self.stdout.write(self.style.ERROR(
+                    f"SPV {report['spv_id']}: {report['issue_count']} issue(s) in {report['entries']} entries"
+                ))
+                for issue in report['issues']:
+                    self.stdout.write(f'  {issue}')
+
+        if failed:
+            raise CommandError(f'{failed} of {len(spv_ids)} SPV ledger(s) failed verification')
+        self.stdout.write(self.style.SUCCESS(f'Verified {entries} entries across {len(spv_ids)} SPV(s)'))
@@ -1,8 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.core.validators import MinValueValidator
 from decimal import Decimal
-import uuid
 
 
 def transfer_document_upload_path(instance, filename):
@@ -75,7 +74,7 @@ class Transfer(models.Model):
         max_length=50, 
         unique=True, 
         editable=False, 
-        help_text="Auto-generated transfer ID (e.g., TXN-ABC123)"
+        help_text="Auto-generated transfer ID (e.g., TXN-00000123)"
     )
     
     # Transfer Type
@@ -437,7 +436,8 @@ class Transfer(models.Model):
     def save(self, *args, **kwargs):
         if not self.transfer_id:
             # Generate unique transfer ID
-            self.transfer_id = f"TXN-{uuid.uuid4().hex[:6].upper()}"
+            from config.identifier_utils import next_identifier
+            self.transfer_id = next_identifier('transfer', 'TXN')
         
         # Calculate net amount
         if self.amount:
@@ -445,7 +445,14 @@ class Transfer(models.Model):
                 self.transfer_fee = Decimal('0')
             self.net_amount = self.amount - self.transfer_fee
         
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'status' not in update_fields:
+            return super().save(*args, **kwargs)
+        
+        from .inbox_utils import sync_transfer_inbox
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            sync_transfer_inbox([self])
     
     @property
     def is_urgent(self):
@@ -611,6 +618,16 @@ class TransferHistory(models.Model):
     
     def __str__(self):
         return f"{self.transfer.transfer_id} - {self.get_action_display()}"
+    
+    def save(self, *args, **kwargs):
+        """Save and add new rows to the transfer timeline"""
+        from .timeline_utils import record_history_events
+        
+        if self.pk is not None:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            record_history_events([self])
 
 
 class OwnershipLedger(models.Model):
@@ -716,6 +733,15 @@ class OwnershipLedger(models.Model):
         help_text="User who created this entry"
     )
     
+    # Integrity
+    entry_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        editable=False,
+        help_text="SHA-256 chaining this entry to the previous entry of the SPV (see transfers/ledger_utils.py)"
+    )
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'ownership ledger'
@@ -728,6 +754,151 @@ class OwnershipLedger(models.Model):
     
     def __str__(self):
         return f"{self.investor.username} - {self.spv.display_name} - {self.get_entry_type_display()}"
+    
+    def save(self, *args, **kwargs):
+        """Save, seal the entry into the SPV's hash chain and add it to the timeline"""
+        from .ledger_utils import lock_ledgers, seal_ledger
+        from .timeline_utils import record_ledger_events
+        
+        creating = self.pk is None
+        with transaction.atomic():
+            if creating:
+                lock_ledgers([self.spv_id])
+            super().save(*args, **kwargs)
+            seal_ledger(self.spv_id)
+            if creating:
+                record_ledger_events([self])
+
+
+class CapTableSnapshot(models.Model):
+    """
+    Checkpoint of an SPV's cap table folded from OwnershipLedger.
+    
+    `version` is the number of ledger entries folded in, `last_entry_id` the
+    last of them. A cap table at any point is the latest checkpoint at or
+    before it plus a replay of the (at most CAP_TABLE_CHECKPOINT_INTERVAL)
+    entries after it. See transfers/cap_table_utils.py.
+    """
+    
+    spv = models.ForeignKey(
+        'spv.SPV',
+        on_delete=models.CASCADE,
+        related_name='cap_table_snapshots',
+        help_text="SPV"
+    )
+    version = models.PositiveIntegerField(help_text="Number of ledger entries folded into this snapshot")
+    last_entry_id = models.BigIntegerField(help_text="Last OwnershipLedger entry folded into this snapshot")
+    as_of = models.DateTimeField(help_text="Time of the last folded entry")
+    
+    # {investor_id: [ownership %, amount, first entry at, last transfer at]}
+    holdings = models.JSONField(default=dict, blank=True, help_text="Holdings per investor")
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['spv', '-version']
+        verbose_name = 'cap table snapshot'
+        verbose_name_plural = 'cap table snapshots'
+        unique_together = ['spv', 'version']
+        indexes = [
+            models.Index(fields=['spv', '-as_of', '-version'], name='cap_table_asof_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.spv.display_name} - v{self.version}"
+
+
+class TransferTimelineEvent(models.Model):
+    """
+    Denormalized read model of ownership and transfer events.
+    
+    One row per OwnershipLedger entry (source 'ledger', on the holder's
+    investor-SPV chain, numbered by `sequence`) and per TransferHistory row
+    (source 'history', on the transfer's audit trail), written when the
+    event is. Display names and the transfer reference are copied in so the
+    ownership chain and transfer history pages read one indexed range without
+    joins. See transfers/timeline_utils.py.
+    """
+    
+    SOURCE_CHOICES = [
+        ('ledger', 'Ownership Ledger'),
+        ('history', 'Transfer History'),
+    ]
+    
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES)
+    ledger_entry = models.OneToOneField(
+        OwnershipLedger,
+        on_delete=models.CASCADE,
+        null=True, blank=True,
+        related_name='timeline_event',
+    )
+    history = models.OneToOneField(
+        TransferHistory,
+        on_delete=models.CASCADE,
+        null=True, blank=True,
+        related_name='timeline_event',
+    )
+    
+    # Chain keys
+    spv = models.ForeignKey('spv.SPV', on_delete=models.CASCADE, related_name='timeline_events')
+    investor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True, blank=True,
+        related_name='timeline_events',
+        help_text="Holder whose ownership chain this ledger event belongs to"
+    )
+    sequence = models.PositiveIntegerField(default=0, help_text="Position in the investor's SPV ownership chain")
+    transfer = models.ForeignKey(
+        Transfer,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='timeline_events',
+    )
+    transfer_ref = models.CharField(max_length=20, blank=True, default='', help_text="Transfer.transfer_id")
+    
+    # Event
+    event_type = models.CharField(max_length=30, help_text="Ledger entry type or history action")
+    event_label = models.CharField(max_length=50)
+    occurred_at = models.DateTimeField()
+    
+    # Parties (ids plus display names at event time)
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    actor_username = models.CharField(max_length=150, blank=True, default='')
+    actor_name = models.CharField(max_length=300, blank=True, default='')
+    from_user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    from_username = models.CharField(max_length=150, blank=True, default='')
+    from_name = models.CharField(max_length=300, blank=True, default='')
+    to_user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    to_username = models.CharField(max_length=150, blank=True, default='')
+    to_name = models.CharField(max_length=300, blank=True, default='')
+    
+    # Ledger figures
+    ownership_after = models.DecimalField(max_digits=10, decimal_places=4, null=True, blank=True)
+    amount_after = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True)
+    
+    # History figures
+    percentage_transferred = models.DecimalField(max_digits=10, decimal_places=4, null=True, blank=True)
+    amount_transferred = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True)
+    from_ownership_before = models.DecimalField(max_digits=10, decimal_places=4, null=True, blank=True)
+    from_ownership_after = models.DecimalField(max_digits=10, decimal_places=4, null=True, blank=True)
+    to_ownership_before = models.DecimalField(max_digits=10, decimal_places=4, null=True, blank=True)
+    to_ownership_after = models.DecimalField(max_digits=10, decimal_places=4, null=True, blank=True)
+    ip_address = models.GenericIPAddressField(null=True, blank=True)
+    notes = models.TextField(blank=True, null=True)
+    metadata = models.JSONField(default=dict, blank=True)
+    
+    class Meta:
+        ordering = ['occurred_at', 'id']
+        verbose_name = 'transfer timeline event'
+        verbose_name_plural = 'transfer timeline events'
+        indexes = [
+            models.Index(fields=['investor', 'spv', 'sequence'], name='timeline_chain_idx'),
+            models.Index(fields=['transfer', 'source', '-id'], name='timeline_transfer_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.transfer_ref or self.spv_id} - {self.event_label}"
 
 
 class TransferDocument(models.Model):
@@ -895,9 +1066,18 @@ class Request(models.Model):
     def save(self, *args, **kwargs):
         if not self.request_id:
             # Generate unique request ID
+            from config.identifier_utils import next_identifier
             prefix = self.request_type.upper()[:3] if self.request_type else 'REQ'
-            self.request_id = f"{prefix}-{uuid.uuid4().hex[:6].upper()}"
-        super().save(*args, **kwargs)
+            self.request_id = next_identifier('transfer_request', prefix)
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'status' not in update_fields:
+            return super().save(*args, **kwargs)
+        
+        from .inbox_utils import sync_request_inbox
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            sync_request_inbox([self])
     
     @property
     def is_overdue(self):
@@ -913,6 +1093,58 @@ class Request(models.Model):
         return self.priority in ['high', 'urgent']
 
 
+class ActionInboxItem(models.Model):
+    """
+    Pending action of a user on a transfer or request.
+    
+    Maintained from Transfer/Request status changes (see
+    transfers/inbox_utils.py): one row per user who has to act, and one row
+    with no user for the admin queue (transfer approvals and requests are
+    actionable by every admin). The pending-actions endpoint reads a user's
+    inbox with one indexed query.
+    """
+    
+    ACTION_TYPE_CHOICES = [
+        ('confirm_transfer', 'Confirm Transfer'),
+        ('accept_transfer', 'Accept/Decline Transfer'),
+        ('approve_transfer', 'Approve Transfer'),
+        ('review_request', 'Review Request'),
+    ]
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True, blank=True,
+        related_name='action_inbox',
+        help_text="User who has to act (empty for the admin queue)"
+    )
+    action_type = models.CharField(max_length=30, choices=ACTION_TYPE_CHOICES)
+    transfer = models.ForeignKey(
+        Transfer,
+        on_delete=models.CASCADE,
+        null=True, blank=True,
+        related_name='inbox_items',
+    )
+    request = models.ForeignKey(
+        'Request',
+        on_delete=models.CASCADE,
+        null=True, blank=True,
+        related_name='inbox_items',
+    )
+    created_at = models.DateTimeField(auto_now_add=True, help_text="When the action became due")
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'action inbox item'
+        verbose_name_plural = 'action inbox items'
+        indexes = [
+            models.Index(fields=['user', 'action_type', 'created_at'], name='inbox_user_action_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id or 'admins'} - {self.get_action_type_display()}"
+
+
 class RequestDocument(models.Model):
     """Model for request-related documents"""
     
@@ -983,6 +1215,13 @@ class TransferAgreementDocument(models.Model):
         ('rejected', 'Rejected'),
     ]
     
+    RENDER_STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('rendering', 'Rendering'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+    
     transfer = models.ForeignKey(
         Transfer,
         on_delete=models.CASCADE,
@@ -1001,7 +1240,7 @@ class TransferAgreementDocument(models.Model):
     document_number = models.CharField(
         max_length=50,
         unique=True,
-        help_text="Unique document number (e.g., DOC-TXN-ABC123-001)"
+        help_text="Unique document number (e.g., AGR-TXN-00000123-000045)"
     )
     title = models.CharField(
         max_length=255,
@@ -1015,6 +1254,7 @@ class TransferAgreementDocument(models.Model):
     # Generated PDF
     file = models.FileField(
         upload_to=agreement_document_upload_path,
+        blank=True,
         help_text="Generated PDF document"
     )
     file_size = models.BigIntegerField(
@@ -1022,6 +1262,25 @@ class TransferAgreementDocument(models.Model):
         help_text="File size in bytes"
     )
     
+    # Rendering (see transfers/render_utils.py)
+    render_status = models.CharField(
+        max_length=20,
+        choices=RENDER_STATUS_CHOICES,
+        default='ready',
+        help_text="PDF rendering status"
+    )
+    render_error = models.TextField(
+        blank=True, null=True,
+        help_text="Error of the last failed render"
+    )
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        db_index=True,
+        help_text="SHA-256 of the rendered content (document type and data)"
+    )
+    
     # Investor A (Requester/Seller) Signature
     requester_signature_status = models.CharField(
         max_length=20,
@@ -1107,6 +1366,7 @@ class TransferAgreementDocument(models.Model):
             models.Index(fields=['transfer', 'document_type']),
             models.Index(fields=['document_number']),
             models.Index(fields=['document_type', '-created_at']),
+            models.Index(fields=['render_status', 'updated_at']),
         ]
     
     def __str__(self):
@@ -1120,13 +1380,17 @@ class TransferAgreementDocument(models.Model):
                 'acceptance': 'ACC',
                 'final_agreement': 'AGR',
             }.get(self.document_type, 'DOC')
-            self.document_number = f"{doc_type_prefix}-{self.transfer.transfer_id}-{uuid.uuid4().hex[:4].upper()}"
+            from config.identifier_utils import next_identifier
+            self.document_number = next_identifier('agreement_document', f"{doc_type_prefix}-{self.transfer.transfer_id}")
         
         # Update file size
         if self.file and hasattr(self.file, 'size'):
             self.file_size = self.file.size
         
-        super().save(*args, **kwargs)
+        from .signing_utils import refresh_signing_states
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            refresh_signing_states([self.transfer_id])
     
     @property
     def is_fully_signed(self):
@@ -1151,3 +1415,44 @@ class TransferAgreementDocument(models.Model):
             return f"{self.file_size / 1024:.1f} KB"
         else:
             return f"{self.file_size / (1024 * 1024):.1f} MB"
+
+
+class TransferSigningState(models.Model):
+    """
+    Signing summary of a transfer's latest agreement documents.
+    
+    Recomputed whenever one of its TransferAgreementDocuments is saved
+    (signed, rendered or superseded), so approval checks, serializers and the
+    "ready to approve" queue read this row instead of scanning documents.
+    See transfers/signing_utils.py.
+    """
+    
+    transfer = models.OneToOneField(
+        Transfer,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='signing_state',
+    )
+    
+    # {document_type: {'id', 'document_number', 'signed', 'ready'}} of the latest documents
+    documents = models.JSONField(default=dict, blank=True)
+    document_count = models.PositiveIntegerField(default=0)
+    missing_types = models.JSONField(default=list, blank=True, help_text="Required document types without a latest document")
+    all_signed = models.BooleanField(default=False, help_text="Every latest document is fully signed")
+    all_rendered = models.BooleanField(default=False, help_text="Every latest document has its PDF")
+    ready_to_approve = models.BooleanField(
+        default=False,
+        help_text="All required documents present, fully signed and rendered"
+    )
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'transfer signing state'
+        verbose_name_plural = 'transfer signing states'
+        indexes = [
+            models.Index(fields=['ready_to_approve']),
+        ]
+    
+    def __str__(self):
+        return f"{self.transfer_id} - {'ready' if self.ready_to_approve else 'not ready'}"
@@ -0,0 +1,215 @@
+"""
+Agreement document rendering.
+
+The document generators in document_utils.py create the
+TransferAgreementDocument row right away with render_status 'pending' and a
+content hash, and leave the PDF to this module. Once the transaction
+commits, the ReportLab work (CPU-bound) runs on the PDF renderer service's
+warm worker pool (config/renderer_utils.py, 'transfer_agreement' backend); a
+collector thread in the web process stores the file, marks the document
+'ready' (or 'failed') and pushes a `document_status` message to both parties'
+notification channel groups. Clients poll the document or listen for it.
+
+A generator called again with the same content (document type and data,
+ignoring timestamps) gets the existing document back instead of a second
+render; different content supersedes it as a new version.
+
+PDFs go through the render cache (config/render_cache_utils.py), keyed on
+the renderer version and the full document data: a document whose PDF was
+rendered before points at the cached file and skips the pool.
+
+DOCUMENT_RENDER_MODE selects how rendering runs:
+
+    process  submitted to the renderer service, collected in the background (default)
+    sync     rendered (and waited for) after commit (tests, management commands)
+
+`manage.py render_pending_documents` re-renders documents left pending by a
+restart, and failed ones.
+"""
+
+import hashlib
+import json
+import logging
+import queue
+import threading
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+
+from config.render_cache_utils import attach_pdf, cache_key, cached_pdf, lookup_pdf, store_pdf
+from config.renderer_utils import get_backend, render, result, submit
+from investors.notification_utils import get_notification_group
+from .models import TransferAgreementDocument
+
+
+logger = logging.getLogger(__name__)
+
+# Document data that changes on every call without changing what is signed
+VOLATILE_FIELDS = {'generated_at', 'requester_signed_at', 'recipient_signed_at'}
+
+PDF_TITLES = {
+    'transfer_request': 'Transfer Request',
+    'acceptance': 'Transfer Acceptance',
+    'final_agreement': 'Transfer Agreement',
+}
+
+_collector = None
+_lock = threading.Lock()
+
+
+def get_render_mode():
+    return getattr(settings, 'DOCUMENT_RENDER_MODE', 'process')
+
+
+def compute_content_hash(document_type, document_data):
+    """SHA-256 of a document's type and data, ignoring VOLATILE_FIELDS"""
+    content = {key: value for key, value in document_data.items() if key not in VOLATILE_FIELDS}
+    payload = json.dumps([document_type, content], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def queue_document(document):
+    """
+    Save an unsaved TransferAgreementDocument as pending, superseding the
+    transfer's previous latest document of that type, and schedule its
+    render; or return the latest document if its content hash is the same.
+    """
+    document.content_hash = compute_content_hash(document.document_type, document.document_data)
+    previous = TransferAgreementDocument.objects.filter(
+        transfer_id=document.transfer_id,
+        document_type=document.document_type,
+        is_latest=True,
+    )
+    existing = previous.filter(content_hash=document.content_hash).exclude(render_status='failed').order_by('-created_at').first()
+    if existing is not None:
+        return existing
+
+    latest_version = previous.order_by('-version').values_list('version', flat=True).first()
+    previous.update(is_latest=False)
+    document.version = (latest_version or 0) + 1
+    document.is_latest = True
+    document.render_status = 'pending'
+    document.save()
+    transaction.on_commit(lambda: dispatch_render(document.id))
+    return document
+
+
+def get_pdf_key(document_type, document_data):
+    """Render cache key of a document's PDF (timestamps included: they are printed)"""
+    return cache_key(get_backend('transfer_agreement').version, document_type, document_data)
+
+
+def get_pdf_title(document_type, document_data):
+    return f"{PDF_TITLES.get(document_type, 'Transfer Document')} - {document_data.get('transfer_id')}"
+
+
+def render_pdf(document_type, document_data):
+    """PDF bytes for a document, waiting for the renderer service"""
+    return render('transfer_agreement', document_type, document_data, get_pdf_title(document_type, document_data))
+
+
+def _push_status(document):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    transfer = document.transfer
+    message = {
+        'type': 'document_status',
+        'document': {
+            'id': document.id,
+            'transfer_id': transfer.id,
+            'document_number': document.document_number,
+            'document_type': document.document_type,
+            'render_status': document.render_status,
+        },
+    }
+    for user_id in {transfer.requester_id, transfer.recipient_id}:
+        try:
+            async_to_sync(channel_layer.group_send)(get_notification_group(user_id), message)
+        except Exception:
+            logger.exception('Render status of document %s could not be pushed', document.id)
+
+
+def store_render(document_id, pdf=None, error=None):
+    """Save a finished render (a CachedPDF) or its failure, and push the new status"""
+    document = TransferAgreementDocument.objects.select_related('transfer').get(id=document_id)
+    if error is None:
+        attach_pdf(document.file, pdf)
+        document.file_size = pdf.file_size
+        document.render_status = 'ready'
+        document.render_error = None
+    else:
+        document.render_status = 'failed'
+        document.render_error = str(error)
+    document.save(update_fields=['file', 'file_size', 'render_status', 'render_error', 'updated_at'])
+    _push_status(document)
+    return document
+
+
+def render_document(document_id):
+    """Render a document in this process"""
+    document_type, document_data = TransferAgreementDocument.objects.values_list(
+        'document_type', 'document_data'
+    ).get(id=document_id)
+    try:
+        pdf = cached_pdf(
+            get_pdf_key(document_type, document_data), get_backend('transfer_agreement').version,
+            render_pdf, document_type, document_data,
+        )
+    except Exception as e:
+        logger.exception('Document %s failed to render', document_id)
+        return store_render(document_id, error=e)
+    return store_render(document_id, pdf)
+
+
+def _collect():
+    while True:
+        document_id, key, future = _collector.get()
+        try:
+            store_render(document_id, store_pdf(key, get_backend('transfer_agreement').version, result(future)))
+        except Exception as e:
+            logger.exception('Document %s failed to render', document_id)
+            try:
+                store_render(document_id, error=e)
+            except Exception:
+                logger.exception('Failure of document %s could not be stored', document_id)
+        finally:
+            _collector.task_done()
+
+
+def _get_collector():
+    global _collector
+    with _lock:
+        if _collector is None:
+            _collector = queue.Queue()
+            threading.Thread(target=_collect, name='document-render-collector', daemon=True).start()
+    return _collector
+
+
+def dispatch_render(document_id):
+    """Render a pending document according to DOCUMENT_RENDER_MODE"""
+    if get_render_mode() == 'sync':
+        return render_document(document_id)
+
+    claimed = TransferAgreementDocument.objects.filter(id=document_id, render_status='pending').update(render_status='rendering')
+    if not claimed:
+        return None
+    document_type, document_data = TransferAgreementDocument.objects.values_list(
+        'document_type', 'document_data'
+    ).get(id=document_id)
+    key = get_pdf_key(document_type, document_data)
+    pdf = lookup_pdf(key)
+    if pdf is not None:
+        return store_render(document_id, pdf)
+
+    future = submit('transfer_agreement', document_type, document_data, get_pdf_title(document_type, document_data))
+    _get_collector().put((document_id, key, future))
+    return None
+
+
+def wait_for_renders():
+    """Block until every dispatched render has been stored"""
+    if _collector is not None:
+        _collector.join()
@@ -0,0 +1,20 @@
+"""
+Request metadata.
+
+The client address and user agent recorded on transfers, signatures and
+history entries as their audit trail. Used by the views and by settlement,
+which writes history rows in bulk.
+"""
+
+
+def get_client_ip(request):
+    """Get client IP address from request"""
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return x_forwarded_for.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR')
+
+
+def get_user_agent(request):
+    """Get user agent from request"""
+    return request.META.get('HTTP_USER_AGENT', '')
@@ -1,5 +1,7 @@
 from rest_framework import serializers
-from .models import Transfer, TransferDocument, TransferHistory, OwnershipLedger, Request, RequestDocument, TransferAgreementDocument
+from .models import Transfer, TransferDocument, TransferHistory, OwnershipLedger, Request, RequestDocument, TransferAgreementDocument, TransferTimelineEvent
+from .signing_utils import get_signing_state
+from .timeline_utils import get_transfer_timeline
 from users.models import CustomUser
 from decimal import Decimal
 
@@ -103,6 +105,70 @@ class TransferHistorySerializer(serializers.ModelSerializer):
         return None
 
 
+class TransferTimelineEventSerializer(serializers.ModelSerializer):
+    """
+    History events of the transfer timeline, in the TransferHistorySerializer
+    shape. Names come from the event row, so no user lookups.
+    """
+    
+    id = serializers.IntegerField(source='history_id', read_only=True)
+    transfer = serializers.IntegerField(source='transfer_id', read_only=True)
+    action = serializers.CharField(source='event_type', read_only=True)
+    action_display = serializers.CharField(source='event_label', read_only=True)
+    action_by = serializers.IntegerField(source='actor_id', read_only=True)
+    action_by_detail = serializers.SerializerMethodField()
+    action_at = serializers.DateTimeField(source='occurred_at', read_only=True)
+    from_user = serializers.IntegerField(source='from_user_id', read_only=True)
+    from_user_detail = serializers.SerializerMethodField()
+    to_user = serializers.IntegerField(source='to_user_id', read_only=True)
+    to_user_detail = serializers.SerializerMethodField()
+    from_user_ownership_before = serializers.DecimalField(source='from_ownership_before', max_digits=10, decimal_places=4, read_only=True)
+    from_user_ownership_after = serializers.DecimalField(source='from_ownership_after', max_digits=10, decimal_places=4, read_only=True)
+    to_user_ownership_before = serializers.DecimalField(source='to_ownership_before', max_digits=10, decimal_places=4, read_only=True)
+    to_user_ownership_after = serializers.DecimalField(source='to_ownership_after', max_digits=10, decimal_places=4, read_only=True)
+    
+    class Meta:
+        model = TransferTimelineEvent
+        fields = [
+            'id',
+            'transfer',
+            'action',
+            'action_display',
+            'action_by',
+            'action_by_detail',
+            'action_at',
+            'from_user',
+            'from_user_detail',
+            'to_user',
+            'to_user_detail',
+            'percentage_transferred',
+            'amount_transferred',
+            'from_user_ownership_before',
+            'from_user_ownership_after',
+            'to_user_ownership_before',
+            'to_user_ownership_after',
+            'ip_address',
+            'notes',
+            'metadata',
+        ]
+        read_only_fields = fields
+    
+    @staticmethod
+    def _detail(user_id, username, name):
+        if user_id:
+            return {'id': user_id, 'username': username, 'full_name': name}
+        return None
+    
+    def get_action_by_detail(self, obj):
+        return self._detail(obj.actor_id, obj.actor_username, obj.actor_name)
+    
+    def get_from_user_detail(self, obj):
+        return self._detail(obj.from_user_id, obj.from_username, obj.from_name)
+    
+    def get_to_user_detail(self, obj):
+        return self._detail(obj.to_user_id, obj.to_username, obj.to_name)
+
+
 class OwnershipLedgerSerializer(serializers.ModelSerializer):
     """Serializer for OwnershipLedger model (Cap Table Entry)"""
     
@@ -166,6 +232,8 @@ class TransferListSerializer(serializers.ModelSerializer):
     recipient_detail = serializers.SerializerMethodField()
     spv_detail = serializers.SerializerMethodField()
     documents_count = serializers.SerializerMethodField()
+    all_documents_signed = serializers.SerializerMethodField()
+    ready_to_approve = serializers.SerializerMethodField()
     is_urgent = serializers.BooleanField(read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     transfer_type_display = serializers.CharField(source='get_transfer_type_display', read_only=True)
@@ -197,6 +265,9 @@ class TransferListSerializer(serializers.ModelSerializer):
             # Confirmation status
             'requester_confirmed',
             'recipient_confirmed',
+            # Signing state
+            'all_documents_signed',
+            'ready_to_approve',
         ]
         read_only_fields = ['id', 'transfer_id', 'requested_at']
     
@@ -228,6 +299,14 @@ class TransferListSerializer(serializers.ModelSerializer):
     
     def get_documents_count(self, obj):
         return obj.documents.count() if hasattr(obj, 'documents') else 0
+    
+    def get_all_documents_signed(self, obj):
+        state = getattr(obj, 'signing_state', None)
+        return state.all_signed if state else False
+    
+    def get_ready_to_approve(self, obj):
+        state = getattr(obj, 'signing_state', None)
+        return state.ready_to_approve if state else False
 
 
 class TransferSerializer(serializers.ModelSerializer):
@@ -237,7 +316,7 @@ class TransferSerializer(serializers.ModelSerializer):
     recipient_detail = serializers.SerializerMethodField()
     spv_detail = serializers.SerializerMethodField()
     documents = TransferDocumentSerializer(many=True, read_only=True)
-    history = TransferHistorySerializer(many=True, read_only=True)
+    history = serializers.SerializerMethodField()
     agreement_documents = serializers.SerializerMethodField()  # NEW: Agreement documents
     documents_count = serializers.SerializerMethodField()
     agreement_documents_count = serializers.SerializerMethodField()  # NEW
@@ -437,6 +516,10 @@ class TransferSerializer(serializers.ModelSerializer):
     def get_documents_count(self, obj):
         return obj.documents.count() if hasattr(obj, 'documents') else 0
     
+    def get_history(self, obj):
+        """Audit trail from the transfer timeline (one indexed query)"""
+        return TransferTimelineEventSerializer(get_transfer_timeline(obj.id), many=True).data
+    
     def get_agreement_documents(self, obj):
         """Get agreement documents for this transfer"""
         if hasattr(obj, 'agreement_documents'):
@@ -455,14 +538,8 @@ class TransferSerializer(serializers.ModelSerializer):
         return 0
     
     def get_all_documents_signed(self, obj):
-        """Check if all required agreement documents are signed"""
-        if hasattr(obj, 'agreement_documents'):
-            agreement_docs = obj.agreement_documents.filter(is_latest=True)
-            if agreement_docs.count() == 0:
-                return False
-            # All documents must be fully signed
-            return all(doc.is_fully_signed for doc in agreement_docs)
-        return False
+        """Check if all latest agreement documents are signed (from the signing state)"""
+        return get_signing_state(obj).all_signed
 
 
 class TransferCreateSerializer(serializers.ModelSerializer):
@@ -965,6 +1042,8 @@ class TransferAgreementDocumentSerializer(serializers.ModelSerializer):
             'download_url',
             'file_size',
             'file_size_display',
+            'render_status',
+            'render_error',
             
             # Requester Signature
             'requester_signature_status',
@@ -997,7 +1076,7 @@ class TransferAgreementDocumentSerializer(serializers.ModelSerializer):
             'updated_at',
         ]
         read_only_fields = [
-            'id', 'document_number', 'file_size', 
+            'id', 'document_number', 'file_size', 'render_status', 'render_error',
             'created_at', 'updated_at'
         ]
     
@@ -1040,6 +1119,7 @@ class TransferAgreementDocumentListSerializer(serializers.ModelSerializer):
             'recipient_signature_status',
             'is_fully_signed',
             'file_size_display',
+            'render_status',
             'can_requester_view',
             'can_recipient_view',
             'created_at',
@@ -0,0 +1,409 @@
+"""
+Transfer settlement.
+
+settle_transfers() completes a batch of approved transfers in one
+transaction: it locks the transfers and every investment they touch with a
+single SELECT ... FOR UPDATE each, applies the ownership moves in memory in
+dependency order (A→B before B→C within an SPV, otherwise by approval time)
+and writes the investments, ledger entries, history rows and notifications
+with bulk_update/bulk_create. Fundraising counters get one delta per
+written investment (bulk writes skip Investment.save()); portfolio and
+leaderboard flags, ledger hashes, timeline events and cap table checkpoints
+are refreshed once per batch or affected SPV/investor instead of per save().
+
+A transfer that cannot be settled (not approved, no source investment,
+insufficient ownership) fails the whole batch: nothing is written and every
+transfer is reported. With `partial=True` the failing transfers are skipped
+and the rest are settled; transfers that depended on a skipped one are
+checked against the balances without it.
+
+TransferViewSet.complete settles one transfer through the same path,
+`bulk_complete` and `manage.py settle_transfers` settle batches.
+"""
+
+import heapq
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from investors.cache_utils import invalidate_user_cache
+from investors.dashboard_models import Investment, Notification
+from investors.fundraising_utils import record_investment_change, snapshot_investment
+from investors.leaderboard_utils import mark_rankings_dirty
+from investors.notification_utils import dispatch_notifications
+from investors.portfolio_utils import mark_portfolios_dirty
+from .cap_table_utils import checkpoint_cap_table
+from .inbox_utils import sync_transfer_inbox
+from .ledger_utils import lock_ledgers, seal_ledger
+from .models import OwnershipLedger, Transfer, TransferHistory
+from .request_utils import get_client_ip, get_user_agent
+from .timeline_utils import record_history_events, record_ledger_events
+
+
+ZERO = Decimal('0')
+
+
+class SettlementConflict(Exception):
+    """A transfer cannot be settled against the current balances"""
+
+
+def settlement_order(transfers):
+    """
+    Order transfers so that, within an SPV, a transfer out of an investor
+    comes after the batch's transfers into that investor. Ties (and cycles)
+    go by approval time, then id.
+    """
+    def key(transfer):
+        return (transfer.approved_at or transfer.requested_at, transfer.id)
+
+    incoming = {}
+    for transfer in transfers:
+        incoming.setdefault((transfer.spv_id, transfer.recipient_id), []).append(transfer)
+
+    waiting_on = {}
+    dependents = {}
+    for transfer in transfers:
+        sources = [
+            other for other in incoming.get((transfer.spv_id, transfer.requester_id), [])
+            if other.id != transfer.id
+        ]
+        waiting_on[transfer.id] = len(sources)
+        for other in sources:
+            dependents.setdefault(other.id, []).append(transfer)
+
+    by_id = {transfer.id: transfer for transfer in transfers}
+    ready = [(key(transfer), transfer.id) for transfer in transfers if not waiting_on[transfer.id]]
+    heapq.heapify(ready)
+    ordered = []
+    while len(ordered) < len(transfers):
+        if not ready:
+            # Cycle (A→B and B→A): release its earliest transfer
+            blocked = min((key(by_id[tid]), tid) for tid, count in waiting_on.items() if count > 0)
+            waiting_on[blocked[1]] = 0
+            heapq.heappush(ready, blocked)
+        _, transfer_id = heapq.heappop(ready)
+        if waiting_on[transfer_id] is None:
+            continue
+        waiting_on[transfer_id] = None
+        ordered.append(by_id[transfer_id])
+        for dependent in dependents.get(transfer_id, []):
+            if waiting_on[dependent.id]:
+                waiting_on[dependent.id] -= 1
+                if not waiting_on[dependent.id]:
+                    heapq.heappush(ready, (key(dependent), dependent.id))
+    return ordered
+
+
+class _Book:
+    """Locked investments of a batch, keyed for source/recipient lookups"""
+
+    def __init__(self, transfers):
+        participants = {transfer.requester_id for transfer in transfers} | {transfer.recipient_id for transfer in transfers}
+        source_ids = [transfer.source_investment_id for transfer in transfers if transfer.source_investment_id]
+        locked = Investment.objects.select_for_update().filter(
+            Q(spv_id__in={transfer.spv_id for transfer in transfers}, investor_id__in=participants, status='active')
+            | Q(id__in=source_ids)
+        ).order_by('-updated_at', '-id')
+
+        self.by_id = {}
+        self.active = {}
+        # Stored values, for the fundraising deltas once the moves are written
+        self.previous = {}
+        for investment in locked:
+            self.by_id[investment.id] = investment
+            self.previous[investment.id] = snapshot_investment(investment)
+            if investment.status == 'active':
+                self.active.setdefault((investment.investor_id, investment.spv_id), investment)
+
+    def source_for(self, transfer):
+        if transfer.source_investment_id:
+            return self.by_id.get(transfer.source_investment_id)
+        return self.active.get((transfer.requester_id, transfer.spv_id))
+
+    def recipient_for(self, transfer):
+        return self.active.get((transfer.recipient_id, transfer.spv_id))
+
+
+def _apply(book, transfer, now):
+    """
+    Move one transfer's ownership in memory. Returns its ledger/result data.
+    Raises SettlementConflict before changing anything.
+    """
+    if transfer.status != 'approved':
+        raise SettlementConflict(
+            f'Transfer must be approved before completion. Current status: {transfer.get_status_display()}'
+        )
+
+    source = book.source_for(transfer)
+    if source is None:
+        raise SettlementConflict('Requester does not have an active investment in this SPV.')
+
+    if transfer.transfer_type == 'full':
+        transferred_percentage = source.ownership_percentage
+        transferred_amount = source.invested_amount
+    else:
+        transferred_percentage = transfer.ownership_percentage_transferred
+        transferred_amount = transfer.amount
+
+    if transferred_percentage > source.ownership_percentage:
+        raise SettlementConflict(
+            f'Insufficient ownership. Requester has {source.ownership_percentage}%, trying to transfer {transferred_percentage}%.'
+        )
+
+    requester_before = (source.ownership_percentage, source.invested_amount)
+    source.ownership_percentage -= transferred_percentage
+    source.invested_amount -= transferred_amount
+    source.current_value -= transferred_amount
+    if source.ownership_percentage <= 0:
+        source.status = 'completed'
+        source.ownership_percentage = ZERO
+        source.invested_amount = ZERO
+        source.current_value = ZERO
+        book.active.pop((source.investor_id, source.spv_id), None)
+
+    recipient = book.recipient_for(transfer)
+    if recipient is not None:
+        recipient_before = (recipient.ownership_percentage, recipient.invested_amount)
+        recipient.ownership_percentage += transferred_percentage
+        recipient.invested_amount += transfer.net_amount
+        recipient.current_value += transfer.net_amount
+    else:
+        recipient_before = (ZERO, ZERO)
+        recipient = Investment(
+            investor_id=transfer.recipient_id,
+            spv_id=transfer.spv_id,
+            syndicate_name=transfer.spv.display_name,
+            sector=source.sector,
+            stage=source.stage,
+            investment_type='syndicate_deal',
+            invested_amount=transfer.net_amount,
+            current_value=transfer.net_amount,
+            ownership_percentage=transferred_percentage,
+            status='active',
+            invested_at=now,
+            commitment_date=now,
+        )
+        book.active[(recipient.investor_id, recipient.spv_id)] = recipient
+
+    return {
+        'transfer': transfer,
+        'source': source,
+        'recipient': recipient,
+        'percentage': transferred_percentage,
+        'amount': transferred_amount,
+        'requester_before': requester_before,
+        'recipient_before': recipient_before,
+        'requester_after': (source.ownership_percentage, source.invested_amount),
+        'recipient_after': (recipient.ownership_percentage, recipient.invested_amount),
+    }
+
+
+def _ownership_update(move):
+    return {
+        'requester': {
+            'before': float(move['requester_before'][0]),
+            'after': float(move['requester_after'][0]),
+            'transferred': float(move['percentage']),
+        },
+        'recipient': {
+            'before': float(move['recipient_before'][0]),
+            'after': float(move['recipient_after'][0]),
+            'received': float(move['percentage']),
+        },
+    }
+
+
+def _write(book, moves, user, now, request):
+    """Persist applied moves with bulk writes"""
+    investments = {id(move['source']): move['source'] for move in moves}
+    investments.update({id(move['recipient']): move['recipient'] for move in moves})
+    created = [investment for investment in investments.values() if investment.pk is None]
+    changed = [investment for investment in investments.values() if investment.pk is not None]
+
+    Investment.objects.bulk_create(created)
+    for investment in changed:
+        investment.updated_at = now
+    Investment.objects.bulk_update(
+        changed, ['ownership_percentage', 'invested_amount', 'current_value', 'status', 'updated_at'], batch_size=500
+    )
+
+    ledger = []
+    history = []
+    notifications = []
+    ip_address = get_client_ip(request) if request else None
+    user_agent = get_user_agent(request) if request else None
+    for move in moves:
+        transfer, source, recipient = move['transfer'], move['source'], move['recipient']
+        percentage = move['percentage']
+
+        ledger.append(OwnershipLedger(
+            investor_id=transfer.requester_id,
+            spv_id=transfer.spv_id,
+            entry_type='transfer_out',
+            investment=source,
+            transfer=transfer,
+            ownership_change=-percentage,
+            ownership_before=move['requester_before'][0],
+            ownership_after=move['requester_after'][0],
+            amount_change=-move['amount'],
+            amount_before=move['requester_before'][1],
+            amount_after=move['requester_after'][1],
+            notes=f'Transferred to {transfer.recipient.username}',
+            created_by=user,
+        ))
+        ledger.append(OwnershipLedger(
+            investor_id=transfer.recipient_id,
+            spv_id=transfer.spv_id,
+            entry_type='transfer_in',
+            investment=recipient,
+            transfer=transfer,
+            ownership_change=percentage,
+            ownership_before=move['recipient_before'][0],
+            ownership_after=move['recipient_after'][0],
+            amount_change=transfer.net_amount,
+            amount_before=move['recipient_before'][1],
+            amount_after=move['recipient_after'][1],
+            notes=f'Received from {transfer.requester.username}',
+            created_by=user,
+        ))
+
+        transfer.status = 'completed'
+        transfer.completed_at = now
+        transfer.completed_by = user
+        transfer.source_investment = source
+        transfer.destination_investment = recipient
+        transfer.ownership_percentage_transferred = percentage
+        transfer.requester_ownership_after = move['requester_after'][0]
+        transfer.recipient_ownership_after = move['recipient_after'][0]
+        transfer.updated_at = now
+
+        snapshot = dict(
+            transfer=transfer,
+            action_by=user,
+            from_user_id=transfer.requester_id,
+            to_user_id=transfer.recipient_id,
+            percentage_transferred=percentage,
+            amount_transferred=transfer.amount,
+            from_user_ownership_before=transfer.requester_ownership_before,
+            from_user_ownership_after=transfer.requester_ownership_after,
+            to_user_ownership_before=transfer.recipient_ownership_before,
+            to_user_ownership_after=transfer.recipient_ownership_after,
+            ip_address=ip_address,
+            user_agent=user_agent,
+        )
+        requester_before, requester_after = move['requester_before'][0], move['requester_after'][0]
+        recipient_before, recipient_after = move['recipient_before'][0], move['recipient_after'][0]
+        history.append(TransferHistory(
+            action='completed',
+            notes=f'Transfer completed. {percentage}% ownership transferred.',
+            **snapshot,
+        ))
+        history.append(TransferHistory(
+            action='ownership_updated',
+            notes=f'Ownership updated in database. Requester: {requester_before}% → {requester_after}%, Recipient: {recipient_before}% → {recipient_after}%',
+            metadata={
+                'requester_before': float(requester_before),
+                'requester_after': float(requester_after),
+                'recipient_before': float(recipient_before),
+                'recipient_after': float(recipient_after),
+            },
+            **snapshot,
+        ))
+
+        notifications.append(Notification(
+            user_id=transfer.requester_id,
+            notification_type='transfer',
+            title='Transfer Completed',
+            message=f'Your transfer of {percentage}% ownership to {transfer.recipient.get_full_name()} has been completed. Your new ownership: {requester_after}%',
+            priority='high',
+        ))
+        notifications.append(Notification(
+            user_id=transfer.recipient_id,
+            notification_type='transfer',
+            title='Ownership Received',
+            message=f'You have received {percentage}% ownership in {transfer.spv.display_name} from {transfer.requester.get_full_name()}. Your total ownership: {recipient_after}%',
+            priority='high',
+        ))
+
+    lock_ledgers({entry.spv_id for entry in ledger})
+    OwnershipLedger.objects.bulk_create(ledger, batch_size=500)
+    record_ledger_events(ledger)
+    Transfer.objects.bulk_update([move['transfer'] for move in moves], [
+        'status', 'completed_at', 'completed_by', 'source_investment', 'destination_investment',
+        'ownership_percentage_transferred', 'requester_ownership_after', 'recipient_ownership_after', 'updated_at',
+    ], batch_size=500)
+    sync_transfer_inbox([move['transfer'] for move in moves])
+    TransferHistory.objects.bulk_create(history, batch_size=500)
+    record_history_events(history)
+    dispatch_notifications(notifications)
+
+    # bulk writes skip Investment.save() and its signals
+    spv_ids = {move['transfer'].spv_id for move in moves}
+    investor_ids = {investment.investor_id for investment in investments.values()}
+    for investment in created:
+        record_investment_change(None, investment)
+    for investment in changed:
+        record_investment_change(book.previous[investment.pk], investment)
+    mark_portfolios_dirty(investor_ids)
+    mark_rankings_dirty(spv_ids)
+    invalidate_user_cache(*investor_ids)
+    for spv_id in spv_ids:
+        seal_ledger(spv_id)
+        checkpoint_cap_table(spv_id)
+
+
+def settle_transfers(transfer_ids, user=None, partial=False, request=None):
+    """
+    Complete the given transfers. Returns
+    {'settled': bool, 'completed': n, 'failed': n,
+     'results': [{'id', 'transfer_id', 'status', 'error', 'ownership_update'}, ...]}
+    in settlement order, where status is 'completed', 'failed' or
+    'rolled_back' (valid, but not written because another transfer failed).
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        transfers = list(
+            Transfer.objects.select_for_update().filter(id__in=transfer_ids)
+            .select_related('spv', 'requester', 'recipient')
+        )
+        book = _Book(transfers)
+
+        results = []
+        moves = []
+        for transfer in settlement_order(transfers):
+            try:
+                move = _apply(book, transfer, now)
+            except SettlementConflict as e:
+                results.append({'id': transfer.id, 'transfer_id': transfer.transfer_id, 'status': 'failed', 'error': str(e)})
+                continue
+            moves.append(move)
+            results.append({
+                'id': transfer.id,
+                'transfer_id': transfer.transfer_id,
+                'status': 'completed',
+                'ownership_update': _ownership_update(move),
+            })
+
+        found = {transfer.id for transfer in transfers}
+        for transfer_id in transfer_ids:
+            if transfer_id not in found:
+                results.append({'id': transfer_id, 'transfer_id': None, 'status': 'failed', 'error': 'Transfer not found.'})
+
+        failed = sum(result['status'] == 'failed' for result in results)
+        settled = bool(moves) and (partial or not failed)
+        if settled:
+            _write(book, moves, user, now, request)
+        else:
+            for result in results:
+                if result['status'] == 'completed':
+                    result['status'] = 'rolled_back'
+                    result.pop('ownership_update')
+
+    return {
+        'settled': settled,
+        'completed': len(moves) if settled else 0,
+        'failed': failed,
+        'results': results,
+    }
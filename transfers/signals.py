@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from config.render_cache_utils import release_pdf
+from spv.models import SPV
+
+from .inbox_utils import sync_transfer_inbox
+from .models import Transfer, TransferAgreementDocument
+
+
+@receiver(post_delete, sender=TransferAgreementDocument)
+def release_agreement_pdf(sender, instance, **kwargs):
+    """The agreement document no longer references its cached PDF"""
+    release_pdf(instance.file.name)
+
+
+@receiver(post_save, sender=SPV)
+def sync_inbox_on_spv_save(sender, instance, created, **kwargs):
+    """Move approval items to the SPV's current manager (created_by may be reassigned)"""
+    if not created:
+        sync_transfer_inbox(Transfer.objects.filter(spv=instance, status='pending_approval'))
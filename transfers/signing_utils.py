@@ -0,0 +1,120 @@
+"""
+Transfer signing state.
+
+TransferSigningState summarises a transfer's latest agreement documents:
+which required types are present, whether each is fully signed and
+rendered, and whether the transfer is ready to approve. It is recomputed by
+TransferAgreementDocument.save() (signing, render results) and therefore
+also when queue_document() supersedes a document with a new version.
+
+Approval, the transfer serializers and the `ready_to_approve` list filter
+read the one row instead of loading and inspecting every document.
+`manage.py refresh_signing_states` rebuilds the table.
+"""
+
+from .models import Transfer, TransferAgreementDocument, TransferSigningState
+
+
+REQUIRED_DOCUMENT_TYPES = ('transfer_request', 'acceptance', 'final_agreement')
+
+# Parties whose signature each document type needs (see TransferAgreementDocument.is_fully_signed)
+SIGNERS = {
+    'transfer_request': ('requester_signature_status',),
+    'acceptance': ('recipient_signature_status',),
+    'final_agreement': ('requester_signature_status', 'recipient_signature_status'),
+}
+
+
+def _summarise(documents):
+    """TransferSigningState field values for a transfer's latest documents (dict rows, newest first)"""
+    by_type = {}
+    for document in documents:
+        if document['document_type'] in by_type:
+            continue
+        signers = SIGNERS.get(document['document_type'])
+        by_type[document['document_type']] = {
+            'id': document['id'],
+            'document_number': document['document_number'],
+            'signed': bool(signers) and all(document[field] == 'signed' for field in signers),
+            'ready': document['render_status'] == 'ready',
+        }
+
+    missing_types = [document_type for document_type in REQUIRED_DOCUMENT_TYPES if document_type not in by_type]
+    all_signed = bool(by_type) and all(summary['signed'] for summary in by_type.values())
+    all_rendered = bool(by_type) and all(summary['ready'] for summary in by_type.values())
+    return {
+        'documents': by_type,
+        'document_count': len(by_type),
+        'missing_types': missing_types,
+        'all_signed': all_signed,
+        'all_rendered': all_rendered,
+        'ready_to_approve': not missing_types and all_signed and all_rendered,
+    }
+
+
+def refresh_signing_states(transfer_ids):
+    """Recompute the signing state of the given transfers (one read, one upsert)"""
+    transfer_ids = {transfer_id for transfer_id in transfer_ids if transfer_id}
+    if not transfer_ids:
+        return []
+
+    documents = {transfer_id: [] for transfer_id in transfer_ids}
+    for row in TransferAgreementDocument.objects.filter(transfer_id__in=transfer_ids, is_latest=True).order_by(
+        '-created_at', '-id'
+    ).values(
+        'id', 'transfer_id', 'document_type', 'document_number',
+        'requester_signature_status', 'recipient_signature_status', 'render_status',
+    ):
+        documents[row['transfer_id']].append(row)
+
+    states = [
+        TransferSigningState(transfer_id=transfer_id, **_summarise(rows))
+        for transfer_id, rows in documents.items()
+    ]
+    return TransferSigningState.objects.bulk_create(
+        states,
+        update_conflicts=True,
+        unique_fields=['transfer'],
+        update_fields=['documents', 'document_count', 'missing_types', 'all_signed', 'all_rendered', 'ready_to_approve', 'updated_at'],
+    )
+
+
+def get_signing_state(transfer):
+    """The transfer's signing state, computed on first use"""
+    try:
+        return transfer.signing_state
+    except TransferSigningState.DoesNotExist:
+        refresh_signing_states([transfer.id])
+        return TransferSigningState.objects.get(transfer_id=transfer.id)
+
+
+def approval_blocker(state):
+    """(error, error_code) keeping a transfer from approval, or None"""
+    if not state.document_count:
+        return 'No agreement documents found. Both parties must sign before approval.', 'NO_DOCUMENTS'
+    if state.missing_types:
+        return f'Missing required documents: {", ".join(state.missing_types)}', 'MISSING_DOCUMENTS'
+    if not state.all_rendered:
+        return 'Agreement documents are still being generated. Please try again shortly.', 'DOCUMENTS_RENDERING'
+    if not state.all_signed:
+        labels = dict(TransferAgreementDocument.DOCUMENT_TYPE_CHOICES)
+        for document_type, summary in state.documents.items():
+            if not summary['signed']:
+                return (
+                    f'Document {summary["document_number"]} ({labels.get(document_type, document_type)}) is not fully signed.',
+                    'UNSIGNED_DOCUMENTS',
+                )
+    return None
+
+
+def refresh_all_signing_states(chunk_size=1000):
+    """Recompute every transfer's signing state. Returns states written."""
+    written = 0
+    batch = []
+    for transfer_id in Transfer.objects.order_by('id').values_list('id', flat=True).iterator(chunk_size=chunk_size):
+        batch.append(transfer_id)
+        if len(batch) == chunk_size:
+            written += len(refresh_signing_states(batch))
+            batch = []
+    written += len(refresh_signing_states(batch))
+    return written
@@ -1,3 +1,626 @@
-from django.test import TestCase
+import csv
+import io
+import shutil
+import tempfile
+import threading
+import zipfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from config.models import CachedPDF
+from investors.dashboard_models import Investment
+from investors.fundraising_utils import verify_fundraising_stats
+from investors.notification_utils import get_notification_group
+from spv.models import SPV
+from users.models import CustomUser
+from . import ledger_utils
+from .cap_table_utils import backfill_allocation_entries, get_cap_table, rebuild_cap_table, record_allocation
+from .document_utils import generate_transfer_request_document
+from .inbox_utils import sync_transfer_inbox
+from .ledger_utils import seal_ledger, verify_ledger
+from .render_utils import queue_document, render_document
+from .models import ActionInboxItem, CapTableSnapshot, OwnershipLedger, Request, Transfer, TransferAgreementDocument, TransferHistory, TransferSigningState
+
+
+def create_spv(lead, **kwargs):
+    defaults = {
+        'created_by': lead,
+        'display_name': 'Test SPV',
+        'portfolio_company_name': 'Test Co',
+        'founder_email': 'founder@example.com',
+        'status': 'active',
+        'allocation': Decimal('100000'),
+        'round_size': Decimal('500000'),
+    }
+    defaults.update(kwargs)
+    return SPV.objects.create(**defaults)
+
+
+def create_investment(investor, spv, amount, status='active', **kwargs):
+    return Investment.objects.create(
+        investor=investor,
+        spv=spv,
+        syndicate_name=spv.display_name,
+        invested_amount=Decimal(amount),
+        status=status,
+        **kwargs
+    )
+
+
+@override_settings(CAP_TABLE_CHECKPOINT_INTERVAL=2)
+class CapTableSnapshotTests(TestCase):
+    def setUp(self):
+        self.lead = CustomUser.objects.create_user(username='lead', email='lead@example.com', password='pass', is_staff=True)
+        self.spv = create_spv(self.lead)
+        self.investors = [
+            CustomUser.objects.create_user(username=f'lp{i}', email=f'lp{i}@example.com', password='pass')
+            for i in range(3)
+        ]
+        self.investments = []
+        for investor in self.investors:
+            investment = create_investment(investor, self.spv, '10000')
+            investment.calculate_ownership()
+            self.investments.append(investment)
+
+    def move(self, source, target, percentage, amount, at):
+        for investor, sign in ((source, -1), (target, 1)):
+            entry = OwnershipLedger.objects.create(
+                investor=investor,
+                spv=self.spv,
+                entry_type='transfer_in' if sign > 0 else 'transfer_out',
+                ownership_change=sign * Decimal(percentage),
+                amount_change=sign * Decimal(amount),
+            )
+            OwnershipLedger.objects.filter(id=entry.id).update(created_at=at)
+
+    def test_allocations_are_ledgered_and_checkpointed(self):
+        self.assertEqual(OwnershipLedger.objects.filter(spv=self.spv, entry_type='initial_investment').count(), 3)
+        self.assertEqual(CapTableSnapshot.objects.filter(spv=self.spv).count(), 1)
+
+        cap_table = get_cap_table(self.spv.id)
+        self.assertEqual(cap_table['version'], 3)
+        self.assertEqual(cap_table['holdings'][self.investors[0].id]['ownership_percentage'], Decimal('10'))
+
+    def test_as_of_replays_from_nearest_snapshot(self):
+        before = timezone.now()
+        later = before + timedelta(days=10)
+        self.move(self.investors[0], self.investors[1], '4', '4000', later)
+        rebuild_cap_table(self.spv.id)
+
+        with self.assertNumQueries(2):
+            current = get_cap_table(self.spv.id)
+        self.assertEqual(current['holdings'][self.investors[0].id]['ownership_percentage'], Decimal('6'))
+        self.assertEqual(current['holdings'][self.investors[1].id]['invested_amount'], Decimal('14000'))
+        self.assertEqual(current['holdings'][self.investors[1].id]['last_transfer_at'], None)
+
+        past = get_cap_table(self.spv.id, as_of=before + timedelta(days=1))
+        self.assertEqual(past['version'], 3)
+        self.assertEqual(past['holdings'][self.investors[0].id]['ownership_percentage'], Decimal('10'))
+
+    def test_backfill_opening_entries(self):
+        OwnershipLedger.objects.all().delete()
+        CapTableSnapshot.objects.all().delete()
+        self.assertEqual(backfill_allocation_entries(), 3)
+        self.assertEqual(backfill_allocation_entries(), 0)
+        self.assertEqual(len(get_cap_table(self.spv.id)['holdings']), 3)
+
+        # Ownership confirmed past the ledger balance continues from it
+        Investment.objects.filter(id=self.investments[0].id).update(ownership_percentage=Decimal('12'), invested_amount=Decimal('12000'))
+        self.assertEqual(backfill_allocation_entries(), 1)
+        entry = OwnershipLedger.objects.filter(investment=self.investments[0]).latest('id')
+        self.assertEqual(entry.entry_type, 'adjustment')
+        self.assertEqual((entry.ownership_before, entry.ownership_after), (Decimal('10'), Decimal('12')))
+        self.assertEqual((entry.amount_before, entry.amount_after), (Decimal('10000'), Decimal('12000')))
+        self.assertEqual(verify_ledger(self.spv.id)['issue_count'], 0)
+
+    def test_cap_table_endpoints_run_in_constant_queries(self):
+        client = APIClient()
+        client.force_authenticate(self.lead)
+        url = reverse('spv-cap-table', args=[self.spv.id])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(len(response.data['cap_table']), 3)
+
+        more = CustomUser.objects.create_user(username='lp9', email='lp9@example.com', password='pass')
+        create_investment(more, self.spv, '5000').calculate_ownership()
+        with self.assertNumQueries(len(queries.captured_queries)):
+            client.get(url)
+
+        response = client.get(url, {'as_of': (timezone.now() - timedelta(days=1)).date().isoformat()})
+        self.assertEqual(response.data['cap_table'], [])
+        self.assertEqual(client.get(url, {'as_of': 'yesterday'}).status_code, 400)
+
+
+class LedgerIntegrityTests(TestCase):
+    def setUp(self):
+        self.lead = CustomUser.objects.create_user(username='lead', email='lead@example.com', password='pass')
+        self.spv = create_spv(self.lead)
+        self.investors = [
+            CustomUser.objects.create_user(username=f'lp{i}', email=f'lp{i}@example.com', password='pass')
+            for i in range(3)
+        ]
+        for investor in self.investors:
+            create_investment(investor, self.spv, '20000').calculate_ownership()
+
+    def test_clean_ledger_is_sealed_and_verifies(self):
+        self.assertFalse(OwnershipLedger.objects.filter(entry_hash='').exists())
+        report = verify_ledger(self.spv.id, chunk_size=2)
+        self.assertEqual(report['entries'], 3)
+        self.assertEqual(report['issue_count'], 0)
+
+    def test_tampering_and_drift_are_reported(self):
+        entry = OwnershipLedger.objects.filter(spv=self.spv).order_by('id').first()
+        OwnershipLedger.objects.filter(id=entry.id).update(ownership_change=Decimal('25'), ownership_after=Decimal('25'))
+        Investment.objects.filter(investor=self.investors[2]).update(ownership_percentage=Decimal('30'))
+
+        issues = verify_ledger(self.spv.id)['issues']
+        self.assertIn({'type': 'hash_mismatch', 'entry_id': entry.id}, issues)
+        self.assertEqual({issue['type'] for issue in issues}, {'hash_mismatch', 'drift'})
+        self.assertEqual(len([issue for issue in issues if issue['type'] == 'drift']), 2)
+
+    def test_broken_chain_is_reported(self):
+        investment = Investment.objects.get(investor=self.investors[0])
+        opening = investment.ownership_percentage
+        investment.ownership_percentage = Decimal('15')
+        investment.save()
+        record_allocation(investment, opening)
+        self.assertEqual(verify_ledger(self.spv.id)['issue_count'], 0)
+
+        # The adjustment starts from 25%, the previous entry ended at 15%
+        investment.ownership_percentage = Decimal('12')
+        investment.save()
+        entry = record_allocation(investment, Decimal('25'))
+        chain = [issue for issue in verify_ledger(self.spv.id)['issues'] if issue['type'] == 'chain']
+        self.assertEqual([issue['entry_id'] for issue in chain], [entry.id])
+        self.assertEqual(Decimal(chain[0]['previous_ownership']), Decimal('15'))
+
+    def test_over_allocation_and_unsealed_entries(self):
+        OwnershipLedger.objects.bulk_create([OwnershipLedger(
+            investor=self.investors[0],
+            spv=self.spv,
+            entry_type='adjustment',
+            ownership_change=Decimal('50'),
+            ownership_after=Decimal('50'),
+            amount_change=Decimal('0'),
+        )])
+        kinds = [issue['type'] for issue in verify_ledger(self.spv.id)['issues']]
+        self.assertIn('unsealed', kinds)
+        self.assertIn('over_allocated', kinds)
+
+        self.assertEqual(seal_ledger(self.spv.id), 1)
+        kinds = [issue['type'] for issue in verify_ledger(self.spv.id)['issues']]
+        self.assertNotIn('unsealed', kinds)
+
+    def test_seal_locks_spv_before_reading_chain_head(self):
+        with CaptureQueriesContext(connection) as queries:
+            seal_ledger(self.spv.id)
+        tables = [
+            'spv' if 'FROM "spv_spv"' in q['sql'] else 'ledger'
+            for q in queries.captured_queries
+            if 'FROM "spv_spv"' in q['sql'] or 'FROM "transfers_ownershipledger"' in q['sql']
+        ]
+        self.assertEqual(tables[0], 'spv')
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class LedgerSealConcurrencyTests(TransactionTestCase):
+    """Two transactions writing and sealing one SPV's ledger at the same time"""
+
+    def setUp(self):
+        lead = CustomUser.objects.create_user(username='lead', email='lead@example.com', password='pass')
+        self.spv = create_spv(lead)
+        self.investors = [
+            CustomUser.objects.create_user(username=f'lp{i}', email=f'lp{i}@example.com', password='pass')
+            for i in range(2)
+        ]
+
+    def _write_entry(self, investor):
+        try:
+            OwnershipLedger.objects.create(
+                investor=investor,
+                spv=self.spv,
+                entry_type='adjustment',
+                ownership_change=Decimal('10'),
+                ownership_after=Decimal('10'),
+                amount_change=Decimal('0'),
+            )
+        finally:
+            connection.close()
+
+    def test_interleaved_sealing_keeps_one_chain(self):
+        sealing = threading.Event()
+        release = threading.Event()
+        compute = ledger_utils.compute_entry_hash
+
+        def paused_hash(previous_hash, row):
+            # Hold the first sealer between reading the chain head and writing its hash
+            if not sealing.is_set():
+                sealing.set()
+                release.wait(10)
+            return compute(previous_hash, row)
+
+        with mock.patch.object(ledger_utils, 'compute_entry_hash', paused_hash):
+            first = threading.Thread(target=self._write_entry, args=(self.investors[0],))
+            first.start()
+            self.assertTrue(sealing.wait(10))
+
+            second = threading.Thread(target=self._write_entry, args=(self.investors[1],))
+            second.start()
+            second.join(0.5)
+            # Blocked on the SPV lock until the first transaction commits
+            self.assertTrue(second.is_alive())
+
+            release.set()
+            first.join(10)
+            second.join(10)
+
+        hashes = list(OwnershipLedger.objects.filter(spv=self.spv).order_by('id').values_list('entry_hash', flat=True))
+        self.assertEqual(len(hashes), 2)
+        self.assertTrue(all(hashes))
+        report = verify_ledger(self.spv.id)
+        self.assertNotIn('hash_mismatch', [issue['type'] for issue in report['issues']])
+        self.assertNotIn('unsealed', [issue['type'] for issue in report['issues']])
+
+
+class TransferStatisticsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = CustomUser.objects.create_user(username='admin', email='admin@example.com', password='pass', is_staff=True)
+        self.client.force_authenticate(self.admin)
+        self.requester = CustomUser.objects.create_user(username='lp0', email='lp0@example.com', password='pass')
+        self.recipient = CustomUser.objects.create_user(username='lp1', email='lp1@example.com', password='pass')
+        spv = create_spv(self.admin)
+        for transfer_status, amount, age in [
+            ('completed', '1000', 1), ('completed', '500', 2), ('pending_approval', '300', 10), ('draft', '100', 0),
+        ]:
+            transfer = Transfer.objects.create(
+                requester=self.requester, recipient=self.recipient, spv=spv, amount=Decimal(amount), status=transfer_status,
+            )
+            Transfer.objects.filter(id=transfer.id).update(requested_at=timezone.now() - timedelta(days=age))
+
+    def test_statistics_and_trend_from_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('transfer-statistics'), {'bucket': 'day', 'days': 5})
+        self.assertEqual(len([q for q in queries.captured_queries if 'FROM "transfers_transfer"' in q['sql']]), 1)
+
+        self.assertEqual(response.data['total_transfers'], 4)
+        self.assertEqual(response.data['completed'], 2)
+        self.assertEqual(response.data['urgent_count'], 1)
+        self.assertEqual(Decimal(response.data['transfer_volume']), Decimal('1500'))
+        self.assertEqual([point['requested'] for point in response.data['trend']], [1, 1, 1])
+        self.assertEqual(sum(point['volume'] for point in response.data['trend']), Decimal('1500'))
+
+        self.assertEqual(self.client.get(reverse('transfer-statistics'), {'bucket': 'month'}).status_code, 400)
+
+
+@override_settings(DOCUMENT_RENDER_MODE='sync', PDF_RENDERER_MODE='inline')
+class DocumentRenderTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        lead = CustomUser.objects.create_user(username='lead', email='lead@example.com', password='pass')
+        self.requester = CustomUser.objects.create_user(username='lp0', email='lp0@example.com', password='pass')
+        self.recipient = CustomUser.objects.create_user(username='lp1', email='lp1@example.com', password='pass')
+        self.transfer = Transfer.objects.create(
+            requester=self.requester, recipient=self.recipient, spv=create_spv(lead), amount=Decimal('1000'),
+        )
+
+    def test_render_after_commit_and_dedupe(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            document = generate_transfer_request_document(self.transfer, 'Investor A', '127.0.0.1')
+        self.assertEqual(document.render_status, 'pending')
+        self.assertFalse(document.file)
+
+        for callback in callbacks:
+            callback()
+        document.refresh_from_db()
+        self.assertEqual(document.render_status, 'ready')
+        self.assertTrue(document.file)
+        self.assertGreater(document.file_size, 0)
+
+        again = generate_transfer_request_document(self.transfer, 'Investor A', '127.0.0.1')
+        self.assertEqual(again.id, document.id)
+        self.assertEqual(TransferAgreementDocument.objects.filter(transfer=self.transfer).count(), 1)
+
+        # Rendering the same content again is a render cache hit on the same file
+        rerendered = render_document(document.id)
+        self.assertEqual(rerendered.file.name, document.file.name)
+        cached = CachedPDF.objects.get(file=document.file.name)
+        self.assertEqual((cached.hit_count, cached.render_count, cached.ref_count), (1, 1, 1))
+
+
+@override_settings(NOTIFICATION_DELIVERY_MODE='off', DOCUMENT_RENDER_MODE='sync', PDF_RENDERER_MODE='inline')
+class SigningStateTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        lead = CustomUser.objects.create_user(username='lead', email='lead@example.com', password='pass')
+        self.client.force_authenticate(lead)
+        requester = CustomUser.objects.create_user(username='lp0', email='lp0@example.com', password='pass')
+        recipient = CustomUser.objects.create_user(username='lp1', email='lp1@example.com', password='pass')
+        self.transfer = Transfer.objects.create(
+            requester=requester, recipient=recipient, spv=create_spv(lead), amount=Decimal('1000'), status='pending_approval',
+        )
+        self.documents = {
+            document_type: TransferAgreementDocument.objects.create(
+                transfer=self.transfer, document_type=document_type, title=document_type,
+                requester_signature_status='signed', recipient_signature_status='signed',
+            )
+            for document_type in ('transfer_request', 'final_agreement')
+        }
+
+    def test_state_follows_signing_and_supersede(self):
+        state = TransferSigningState.objects.get(transfer=self.transfer)
+        self.assertEqual(state.missing_types, ['acceptance'])
+        response = self.client.post(reverse('transfer-approve', args=[self.transfer.id]), {'documents_reviewed': True}, format='json')
+        self.assertEqual(response.data['error_code'], 'MISSING_DOCUMENTS')
+
+        acceptance = TransferAgreementDocument.objects.create(transfer=self.transfer, document_type='acceptance', title='acceptance')
+        response = self.client.post(reverse('transfer-approve', args=[self.transfer.id]), {'documents_reviewed': True}, format='json')
+        self.assertEqual(response.data['error_code'], 'UNSIGNED_DOCUMENTS')
+        self.assertIn(acceptance.document_number, response.data['error'])
+
+        acceptance.recipient_signature_status = 'signed'
+        acceptance.save()
+        ready = self.client.get(reverse('transfer-list'), {'ready_to_approve': 'true'}).data['results']
+        self.assertEqual([row['id'] for row in ready], [self.transfer.id])
+        self.assertTrue(ready[0]['all_documents_signed'])
+
+        # A new version of the final agreement replaces the signed one until it is signed itself
+        with self.captureOnCommitCallbacks(execute=False):
+            replacement = queue_document(TransferAgreementDocument(
+                transfer=self.transfer, document_type='final_agreement', title='final_agreement', document_data={'amount': '2000'},
+            ))
+        self.assertEqual(replacement.version, 2)
+        self.documents['final_agreement'].refresh_from_db()
+        self.assertFalse(self.documents['final_agreement'].is_latest)
+
+        state.refresh_from_db()
+        self.assertEqual(state.documents['final_agreement']['id'], replacement.id)
+        self.assertFalse(state.ready_to_approve)
+        self.assertFalse(self.client.get(reverse('transfer-list'), {'ready_to_approve': 'true'}).data['results'])
+
+
+@override_settings(NOTIFICATION_DELIVERY_MODE='off')
+class BulkSettlementTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.lead = CustomUser.objects.create_user(username='lead', email='lead@example.com', password='pass')
+        self.client.force_authenticate(self.lead)
+        self.spv = create_spv(self.lead)
+        self.a, self.b, self.c = [
+            CustomUser.objects.create_user(username=f'lp{i}', email=f'lp{i}@example.com', password='pass')
+            for i in range(3)
+        ]
+        create_investment(self.a, self.spv, '20000').calculate_ownership()
+
+    def approved(self, requester, recipient, percentage, amount):
+        return Transfer.objects.create(
+            requester=requester, recipient=recipient, spv=self.spv, transfer_type='partial', status='approved',
+            ownership_percentage_transferred=Decimal(percentage), amount=Decimal(amount),
+        )
+
+    def test_chain_settles_in_dependency_order(self):
+        # B→C is created first but needs the ownership B receives from A
+        onward = self.approved(self.b, self.c, '5', '5000')
+        first = self.approved(self.a, self.b, '10', '10000')
+
+        response = self.client.post(reverse('transfer-bulk-complete'), {'spv_id': self.spv.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['id'] for result in response.data['results']], [first.id, onward.id])
+        self.assertEqual(response.data['completed'], 2)
+
+        holdings = get_cap_table(self.spv.id)['holdings']
+        self.assertEqual(holdings[self.a.id]['ownership_percentage'], Decimal('10'))
+        self.assertEqual(holdings[self.b.id]['ownership_percentage'], Decimal('5'))
+        self.assertEqual(holdings[self.c.id]['ownership_percentage'], Decimal('5'))
+        self.assertEqual(Investment.objects.get(investor=self.b, spv=self.spv).ownership_percentage, Decimal('5'))
+        self.assertEqual(TransferHistory.objects.filter(transfer__in=[first, onward]).count(), 4)
+        self.assertEqual(verify_ledger(self.spv.id)['issue_count'], 0)
+        self.assertEqual(verify_fundraising_stats([self.spv.id]), [])
+
+    def test_timeline_reads_without_joins(self):
+        first = self.approved(self.a, self.b, '10', '10000')
+        self.approved(self.b, self.c, '5', '5000')
+        self.client.post(reverse('transfer-bulk-complete'), {'spv_id': self.spv.id}, format='json')
+
+        url = reverse('ownership-chain', args=[self.spv.id, self.b.id])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'page_size': 1})
+        self.assertFalse([q for q in queries.captured_queries if 'transfers_transfer"' in q['sql']])
+        [event] = response.data['ownership_chain']
+        self.assertEqual(event['sequence'], 1)
+        self.assertEqual(event['transfer_id'], first.transfer_id)
+        self.assertEqual(event['from_user']['username'], 'lp0')
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual([event['sequence'] for event in response.data['ownership_chain']], [2])
+        self.assertIsNone(response.data['next'])
+
+        history = self.client.get(reverse('transfer-history', args=[first.id])).data['history']
+        self.assertEqual([event['action'] for event in history], ['ownership_updated', 'completed'])
+        self.assertEqual(history[0]['to_user_detail']['username'], 'lp1')
+
+    def test_conflict_rolls_back_batch(self):
+        ok = self.approved(self.a, self.b, '10', '10000')
+        too_much = self.approved(self.b, self.c, '15', '15000')
+        ledger_count = OwnershipLedger.objects.count()
+
+        response = self.client.post(reverse('transfer-bulk-complete'), {'transfer_ids': [ok.id, too_much.id]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        statuses = {result['id']: result['status'] for result in response.data['results']}
+        self.assertEqual(statuses, {ok.id: 'rolled_back', too_much.id: 'failed'})
+        self.assertEqual(OwnershipLedger.objects.count(), ledger_count)
+        self.assertEqual(Transfer.objects.filter(status='approved').count(), 2)
+
+        response = self.client.post(
+            reverse('transfer-bulk-complete'), {'transfer_ids': [ok.id, too_much.id], 'partial': True}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['completed'], 1)
+        self.assertEqual(Transfer.objects.get(id=ok.id).status, 'completed')
+        self.assertEqual(Transfer.objects.get(id=too_much.id).status, 'approved')
+
+    def test_unknown_id_rolls_back_batch(self):
+        ok = self.approved(self.a, self.b, '1', '5000')
+        unknown = ok.id + 1000
+
+        response = self.client.post(reverse('transfer-bulk-complete'), {'transfer_ids': [ok.id, unknown]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['completed'], 0)
+        self.assertEqual([result['id'] for result in response.data['results']], [unknown])
+        self.assertEqual(Transfer.objects.get(id=ok.id).status, 'approved')
+
+        response = self.client.post(
+            reverse('transfer-bulk-complete'), {'transfer_ids': [ok.id, unknown], 'partial': True}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['completed'], response.data['failed']), (1, 1))
+        self.assertEqual(Transfer.objects.get(id=ok.id).status, 'completed')
+
+    def test_transfer_ids_must_be_a_list(self):
+        transfer = self.approved(self.a, self.b, '10', '10000')
+        response = self.client.post(reverse('transfer-bulk-complete'), {'transfer_ids': str(transfer.id)}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Transfer.objects.get(id=transfer.id).status, 'approved')
+
+
+@override_settings(NOTIFICATION_DELIVERY_MODE='sync')
+class ActionInboxTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = CustomUser.objects.create_user(username='admin', email='admin@example.com', password='pass', is_staff=True)
+        self.lead = CustomUser.objects.create_user(username='lead', email='lead@example.com', password='pass')
+        self.requester = CustomUser.objects.create_user(username='lp0', email='lp0@example.com', password='pass')
+        self.recipient = CustomUser.objects.create_user(username='lp1', email='lp1@example.com', password='pass')
+        self.transfer = Transfer.objects.create(
+            requester=self.requester, recipient=self.recipient, spv=create_spv(self.lead), amount=Decimal('1000'),
+            status='pending_recipient_confirmation',
+        )
+
+    def pending(self, user):
+        self.client.force_authenticate(user)
+        return self.client.get(reverse('pending-actions')).data
+
+    def test_inbox_follows_status_transitions(self):
+        self.assertEqual(self.pending(self.recipient)['pending_actions']['need_recipient_accept']['count'], 1)
+
+        self.transfer.status = 'pending_approval'
+        self.transfer.save()
+        self.assertEqual(self.pending(self.recipient)['total_pending'], 0)
+        self.assertEqual(self.pending(self.lead)['pending_actions']['need_approval']['count'], 1)
+
+        Request.objects.create(requester=self.requester, request_type='other', title='Change', description='Please')
+        with CaptureQueriesContext(connection) as queries:
+            data = self.pending(self.admin)
+        self.assertEqual(len([q for q in queries.captured_queries if 'transfers_actioninboxitem' in q['sql']]), 1)
+        self.assertEqual(data['pending_actions']['need_approval']['count'], 1)
+        self.assertEqual(data['pending_actions']['need_request_review']['count'], 1)
+
+        self.transfer.status = 'approved'
+        self.transfer.save()
+        self.assertFalse(ActionInboxItem.objects.filter(transfer=self.transfer).exists())
+
+    def test_admin_actions_and_manager_reassignment_update_inbox(self):
+        Transfer.objects.filter(id=self.transfer.id).update(status='pending_approval')
+        sync_transfer_inbox([Transfer.objects.get(id=self.transfer.id)])
+        self.assertEqual(self.pending(self.lead)['pending_actions']['need_approval']['count'], 1)
+
+        spv = self.transfer.spv
+        successor = CustomUser.objects.create_user(username='lead2', email='lead2@example.com', password='pass')
+        spv.created_by = successor
+        spv.save()
+        self.assertEqual(self.pending(self.lead)['total_pending'], 0)
+        self.assertEqual(self.pending(successor)['pending_actions']['need_approval']['count'], 1)
+
+        superuser = CustomUser.objects.create_superuser(username='root', email='root@example.com', password='pass')
+        self.client.force_login(superuser)
+        response = self.client.post(reverse('admin:transfers_transfer_changelist'), {
+            'action': 'mark_approved', '_selected_action': [self.transfer.id],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Transfer.objects.get(id=self.transfer.id).status, 'approved')
+        self.assertFalse(ActionInboxItem.objects.filter(transfer=self.transfer).exists())
+
+    def test_changes_are_pushed_after_commit(self):
+        channel_layer = get_channel_layer()
+        channel = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(get_notification_group(self.lead.id), channel)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.transfer.status = 'pending_approval'
+            self.transfer.save()
+
+        message = async_to_sync(channel_layer.receive)(channel)
+        self.assertEqual(message['type'], 'inbox_update')
+        self.assertEqual(message['items'], [{'change': 'added', 'action_type': 'approve_transfer', 'transfer': self.transfer.id}])
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.lead = CustomUser.objects.create_user(username='lead', email='lead@example.com', password='pass')
+        self.spv = create_spv(self.lead)
+        self.other_spv = create_spv(CustomUser.objects.create_user(username='other', email='other@example.com', password='pass'))
+        self.a, self.b = [
+            CustomUser.objects.create_user(username=f'lp{i}', email=f'lp{i}@example.com', password='pass')
+            for i in range(2)
+        ]
+        create_investment(self.a, self.spv, '20000').calculate_ownership()
+        create_investment(self.b, self.spv, '10000').calculate_ownership()
+        for spv in (self.spv, self.other_spv):
+            Transfer.objects.create(requester=self.a, recipient=self.b, spv=spv, amount=Decimal('500'))
+        self.client.force_authenticate(self.lead)
+
+    def test_csv_exports_are_scoped_to_managed_spvs(self):
+        response = self.client.get(reverse('export-transfers'), {'date_from': timezone.now().date().isoformat()})
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0][0], 'transfer_id')
+        self.assertEqual(len(rows), 2)
+
+        response = self.client.get(reverse('export-cap-tables'))
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([row['investor'] for row in rows], ['lp0', 'lp1'])
+        self.assertEqual(Decimal(rows[0]['ownership_percentage']), Decimal('20'))
+
+        self.assertEqual(self.client.get(reverse('export-ledger'), {'spv': self.other_spv.id}).status_code, 403)
+        self.assertEqual(self.client.get(reverse('export-ledger'), {'date_to': 'soon'}).status_code, 400)
+
+    @override_settings(EXPORT_XLSX_CHUNK_ROWS=1)
+    def test_xlsx_export_streams_a_workbook(self):
+        response = self.client.get(reverse('export-ledger'), {'export_format': 'xlsx'})
+        chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 2)
+
+        with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as workbook:
+            sheet = workbook.read('xl/worksheets/sheet1.xml').decode()
+            self.assertIn('<workbook', workbook.read('xl/workbook.xml').decode())
+        self.assertEqual(sheet.count('<row '), 3)
+        self.assertIn('initial_investment', sheet)
+
+    def test_formula_text_is_neutralised(self):
+        CustomUser.objects.filter(id=self.a.id).update(username='=HYPERLINK("http://x")')
+        response = self.client.get(reverse('export-cap-tables'))
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0]['investor'], '\'=HYPERLINK("http://x")')
+        self.assertEqual(Decimal(rows[0]['ownership_percentage']), Decimal('20'))
+
+        response = self.client.get(reverse('export-cap-tables'), {'export_format': 'xlsx'})
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as workbook:
+            sheet = workbook.read('xl/worksheets/sheet1.xml').decode()
+        self.assertIn('\'=HYPERLINK(', sheet)
@@ -0,0 +1,159 @@
+"""
+Transfer timeline.
+
+TransferTimelineEvent mirrors OwnershipLedger and TransferHistory rows with
+the display names of the parties and the transfer reference copied in.
+OwnershipLedger.save() and TransferHistory.save() record their event in the
+same transaction; bulk writers (settlement, ledger backfill) call
+record_ledger_events()/record_history_events() with the created rows. Both
+take a batch and cost a fixed handful of queries regardless of its size.
+
+Ledger events are numbered per investor and SPV (`sequence`), so the
+ownership chain is a range scan of timeline_chain_idx and pages with a
+cursor on `sequence`. History events are read per transfer, newest first,
+from timeline_transfer_idx. `manage.py rebuild_transfer_timeline` rebuilds
+the table from the ledger and history.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db.models import Max
+
+from .models import OwnershipLedger, Transfer, TransferHistory, TransferTimelineEvent
+
+
+def _names(user_ids):
+    """{user_id: (username, full name or username)} in one query"""
+    users = get_user_model().objects.filter(id__in={user_id for user_id in user_ids if user_id}).only(
+        'id', 'username', 'first_name', 'last_name'
+    )
+    return {user.id: (user.username, user.get_full_name() or user.username) for user in users}
+
+
+def _party(names, prefix, user_id):
+    """actor/from/to user id and display name columns"""
+    username, name = names.get(user_id, ('', ''))
+    field = prefix if prefix == 'actor' else f'{prefix}_user'
+    return {f'{field}_id': user_id, f'{prefix}_username': username, f'{prefix}_name': name}
+
+
+def record_ledger_events(entries):
+    """Add saved OwnershipLedger entries (in order) to their holders' ownership chains"""
+    entries = list(entries)
+    if not entries:
+        return []
+
+    transfers = {
+        row['id']: row
+        for row in Transfer.objects.filter(id__in={entry.transfer_id for entry in entries if entry.transfer_id}).values(
+            'id', 'transfer_id', 'requester_id', 'recipient_id'
+        )
+    }
+    names = _names(
+        [entry.created_by_id for entry in entries]
+        + [row['requester_id'] for row in transfers.values()]
+        + [row['recipient_id'] for row in transfers.values()]
+    )
+
+    chains = {(entry.investor_id, entry.spv_id) for entry in entries}
+    last = TransferTimelineEvent.objects.filter(
+        source='ledger',
+        investor_id__in={investor_id for investor_id, _ in chains},
+        spv_id__in={spv_id for _, spv_id in chains},
+    ).values('investor_id', 'spv_id').annotate(last=Max('sequence')).order_by()
+    sequences = {(row['investor_id'], row['spv_id']): row['last'] for row in last}
+
+    labels = dict(OwnershipLedger.ENTRY_TYPE_CHOICES)
+    events = []
+    for entry in entries:
+        chain = (entry.investor_id, entry.spv_id)
+        sequences[chain] = sequences.get(chain, 0) + 1
+        transfer = transfers.get(entry.transfer_id)
+        events.append(TransferTimelineEvent(
+            source='ledger',
+            ledger_entry_id=entry.id,
+            spv_id=entry.spv_id,
+            investor_id=entry.investor_id,
+            sequence=sequences[chain],
+            transfer_id=entry.transfer_id,
+            transfer_ref=transfer['transfer_id'] if transfer else '',
+            event_type=entry.entry_type,
+            event_label=labels.get(entry.entry_type, entry.entry_type),
+            occurred_at=entry.created_at,
+            **_party(names, 'actor', entry.created_by_id),
+            **_party(names, 'from', transfer['requester_id'] if transfer else None),
+            **_party(names, 'to', transfer['recipient_id'] if transfer else None),
+            ownership_after=entry.ownership_after,
+            amount_after=entry.amount_after,
+            notes=entry.notes,
+        ))
+    return TransferTimelineEvent.objects.bulk_create(events, batch_size=500)
+
+
+def record_history_events(rows):
+    """Add saved TransferHistory rows to their transfers' timelines"""
+    rows = list(rows)
+    if not rows:
+        return []
+
+    transfers = {
+        row['id']: row
+        for row in Transfer.objects.filter(id__in={row.transfer_id for row in rows}).values('id', 'transfer_id', 'spv_id')
+    }
+    names = _names([row.action_by_id for row in rows] + [row.from_user_id for row in rows] + [row.to_user_id for row in rows])
+
+    labels = dict(TransferHistory.ACTION_CHOICES)
+    events = []
+    for row in rows:
+        transfer = transfers[row.transfer_id]
+        events.append(TransferTimelineEvent(
+            source='history',
+            history_id=row.id,
+            spv_id=transfer['spv_id'],
+            transfer_id=row.transfer_id,
+            transfer_ref=transfer['transfer_id'],
+            event_type=row.action,
+            event_label=labels.get(row.action, row.action),
+            occurred_at=row.action_at,
+            **_party(names, 'actor', row.action_by_id),
+            **_party(names, 'from', row.from_user_id),
+            **_party(names, 'to', row.to_user_id),
+            percentage_transferred=row.percentage_transferred,
+            amount_transferred=row.amount_transferred,
+            from_ownership_before=row.from_user_ownership_before,
+            from_ownership_after=row.from_user_ownership_after,
+            to_ownership_before=row.to_user_ownership_before,
+            to_ownership_after=row.to_user_ownership_after,
+            ip_address=row.ip_address,
+            notes=row.notes,
+            metadata=row.metadata,
+        ))
+    return TransferTimelineEvent.objects.bulk_create(events, batch_size=500)
+
+
+def get_ownership_chain(investor_id, spv_id):
+    """An investor's ledger events in an SPV, in chain order"""
+    return TransferTimelineEvent.objects.filter(source='ledger', investor_id=investor_id, spv_id=spv_id).order_by('sequence')
+
+
+def get_transfer_timeline(transfer_id):
+    """A transfer's history events, newest first"""
+    return TransferTimelineEvent.objects.filter(source='history', transfer_id=transfer_id).order_by('-id')
+
+
+def rebuild_timeline(chunk_size=2000):
+    """Replace the timeline with events for every ledger entry and history row. Returns events written."""
+    TransferTimelineEvent.objects.all().delete()
+
+    written = 0
+    for queryset, record in (
+        (OwnershipLedger.objects.order_by('created_at', 'id'), record_ledger_events),
+        (TransferHistory.objects.order_by('action_at', 'id'), record_history_events),
+    ):
+        batch = []
+        for row in queryset.iterator(chunk_size=chunk_size):
+            batch.append(row)
+            if len(batch) == chunk_size:
+                written += len(record(batch))
+                batch = []
+        written += len(record(batch))
+    return written
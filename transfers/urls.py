@@ -11,6 +11,9 @@ from .views import (
     ownership_chain,
     my_transfers,
     pending_actions,
+    export_transfers,
+    export_ledger,
+    export_cap_tables,
 )
 
 router = DefaultRouter()
@@ -31,5 +34,10 @@ urlpatterns = [
     # User-specific transfer views
     path('my-transfers/', my_transfers, name='my-transfers'),
     path('pending-actions/', pending_actions, name='pending-actions'),
+    
+    # Streaming exports (CSV/XLSX)
+    path('export/transfers/', export_transfers, name='export-transfers'),
+    path('export/ledger/', export_ledger, name='export-ledger'),
+    path('export/cap-tables/', export_cap_tables, name='export-cap-tables'),
 ]
 
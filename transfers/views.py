@@ -12,14 +12,16 @@ This module provides APIs for:
 
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
 from django.db.models import Q, Sum, Count, F
 from django.db import transaction
 from django.utils import timezone
-from django.http import FileResponse
+from django.http import FileResponse, StreamingHttpResponse
+from datetime import timedelta
 from decimal import Decimal
 
-from .models import Transfer, TransferDocument, TransferHistory, OwnershipLedger, Request, RequestDocument, TransferAgreementDocument
+from .models import Transfer, TransferDocument, TransferHistory, OwnershipLedger, Request, RequestDocument, TransferAgreementDocument, ActionInboxItem
 from .serializers import (
     TransferSerializer,
     TransferListSerializer,
@@ -27,6 +29,7 @@ from .serializers import (
     TransferDocumentSerializer,
     TransferStatisticsSerializer,
     TransferHistorySerializer,
+    TransferTimelineEventSerializer,
     OwnershipLedgerSerializer,
     RequesterConfirmationSerializer,
     RecipientConfirmationSerializer,
@@ -43,25 +46,44 @@ from .serializers import (
     TransferAgreementDocumentSerializer,
     TransferAgreementDocumentListSerializer,
 )
+from .cap_table_utils import get_cap_table, parse_as_of
 from .document_utils import (
     generate_transfer_request_document,
     generate_acceptance_document,
     generate_final_agreement_document,
 )
+from .export_utils import (
+    EXPORT_FORMATS,
+    cap_table_rows,
+    filter_ledger,
+    filter_transfers,
+    ledger_rows,
+    parse_date_range,
+    stream_export,
+    transfer_rows,
+)
+from .inbox_utils import get_inbox
+from .request_utils import get_client_ip, get_user_agent
+from .settlement_utils import settle_transfers
+from .signing_utils import approval_blocker, get_signing_state
+from .timeline_utils import get_ownership_chain, get_transfer_timeline
 from investors.dashboard_models import Investment, Notification
+from investors.notification_utils import dispatch_notifications, notify
+from investors.stats_utils import GroupedStats, with_time_bucket
 
 
-def get_client_ip(request):
-    """Get client IP address from request"""
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        return x_forwarded_for.split(',')[0].strip()
-    return request.META.get('REMOTE_ADDR')
+class TransferHistoryCursorPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-id',)
 
 
-def get_user_agent(request):
-    """Get user agent from request"""
-    return request.META.get('HTTP_USER_AGENT', '')
+class OwnershipChainCursorPagination(CursorPagination):
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('sequence',)
 
 
 def create_transfer_history(transfer, action, user, request=None, notes=None, **kwargs):
@@ -155,6 +177,14 @@ class TransferViewSet(viewsets.ModelViewSet):
         if spv_id:
             queryset = queryset.filter(spv_id=spv_id)
         
+        # Filter by signing state (all documents present, rendered and signed)
+        ready_to_approve = self.request.query_params.get('ready_to_approve', None)
+        if ready_to_approve is not None:
+            if ready_to_approve.lower() in ('true', '1'):
+                queryset = queryset.filter(signing_state__ready_to_approve=True)
+            else:
+                queryset = queryset.exclude(signing_state__ready_to_approve=True)
+        
         # Filter by role (requester/recipient)
         role = self.request.query_params.get('role', None)
         if role == 'requester':
@@ -178,7 +208,7 @@ class TransferViewSet(viewsets.ModelViewSet):
         return queryset.select_related(
             'requester', 'recipient', 'spv', 
             'approved_by', 'rejected_by', 'completed_by',
-            'source_investment', 'destination_investment'
+            'source_investment', 'destination_investment', 'signing_state'
         ).prefetch_related('documents', 'history')
     
     def perform_create(self, serializer):
@@ -203,7 +233,7 @@ class TransferViewSet(viewsets.ModelViewSet):
             )
             
             # Notify requester to confirm
-            Notification.objects.create(
+            notify(
                 user=request.user,
                 notification_type='transfer',
                 title='Transfer Request Created',
@@ -300,7 +330,7 @@ class TransferViewSet(viewsets.ModelViewSet):
             )
             
             # Notify recipient
-            Notification.objects.create(
+            notify(
                 user=transfer.recipient,
                 notification_type='transfer',
                 title='Transfer Request Received',
@@ -441,18 +471,18 @@ class TransferViewSet(viewsets.ModelViewSet):
                 }
             )
             
-            # Notify requester
-            Notification.objects.create(
-                user=transfer.requester,
-                notification_type='transfer',
-                title='Transfer Accepted by Recipient',
-                message=f'{transfer.recipient.get_full_name() or transfer.recipient.username} has accepted your transfer request. Waiting for manager approval.',
-                priority='normal'
-            )
-            
-            # Notify Syndicate Manager for approval
+            # Notify requester, and the Syndicate Manager for approval
+            notifications = [
+                Notification(
+                    user=transfer.requester,
+                    notification_type='transfer',
+                    title='Transfer Accepted by Recipient',
+                    message=f'{transfer.recipient.get_full_name() or transfer.recipient.username} has accepted your transfer request. Waiting for manager approval.',
+                    priority='normal'
+                ),
+            ]
             if transfer.spv and transfer.spv.created_by:
-                Notification.objects.create(
+                notifications.append(Notification(
                     user=transfer.spv.created_by,
                     notification_type='transfer',
                     title='Transfer Pending Approval - Documents Ready for Review',
@@ -461,7 +491,8 @@ class TransferViewSet(viewsets.ModelViewSet):
                     action_required=True,
                     action_url=f'/transfers/{transfer.id}/review',
                     action_label='Review Transfer'
-                )
+                ))
+            dispatch_notifications(notifications)
         
         return Response({
             'success': True,
@@ -532,7 +563,7 @@ class TransferViewSet(viewsets.ModelViewSet):
             )
             
             # Notify requester
-            Notification.objects.create(
+            notify(
                 user=transfer.requester,
                 notification_type='transfer',
                 title='Transfer Declined',
@@ -587,35 +618,16 @@ class TransferViewSet(viewsets.ModelViewSet):
                 'error': f'Transfer cannot be approved in current status: {transfer.get_status_display()}'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Verify all documents are signed
-        agreement_docs = transfer.agreement_documents.filter(is_latest=True)
-        if agreement_docs.count() == 0:
-            return Response({
-                'success': False,
-                'error': 'No agreement documents found. Both parties must sign before approval.',
-                'error_code': 'NO_DOCUMENTS'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Check for required document types
-        doc_types = set(agreement_docs.values_list('document_type', flat=True))
-        required_types = {'transfer_request', 'acceptance', 'final_agreement'}
-        missing_types = required_types - doc_types
-        if missing_types:
+        # Required documents must be present, rendered and fully signed
+        blocker = approval_blocker(get_signing_state(transfer))
+        if blocker:
+            error, error_code = blocker
             return Response({
                 'success': False,
-                'error': f'Missing required documents: {", ".join(missing_types)}',
-                'error_code': 'MISSING_DOCUMENTS'
+                'error': error,
+                'error_code': error_code
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Check all documents are fully signed
-        for doc in agreement_docs:
-            if not doc.is_fully_signed:
-                return Response({
-                    'success': False,
-                    'error': f'Document {doc.document_number} ({doc.get_document_type_display()}) is not fully signed.',
-                    'error_code': 'UNSIGNED_DOCUMENTS'
-                }, status=status.HTTP_400_BAD_REQUEST)
-        
         # Verify documents_reviewed flag
         documents_reviewed = request.data.get('documents_reviewed', False)
         if not documents_reviewed:
@@ -654,21 +666,22 @@ class TransferViewSet(viewsets.ModelViewSet):
             )
             
             # Notify both parties
-            Notification.objects.create(
-                user=transfer.requester,
-                notification_type='transfer',
-                title='Transfer Approved',
-                message=f'Your transfer to {transfer.recipient.get_full_name()} has been approved. The transfer will be executed shortly.',
-                priority='high'
-            )
-            
-            Notification.objects.create(
-                user=transfer.recipient,
-                notification_type='transfer',
-                title='Transfer Approved',
-                message=f'The transfer from {transfer.requester.get_full_name()} has been approved. You will receive ownership shortly.',
-                priority='high'
-            )
+            dispatch_notifications([
+                Notification(
+                    user=transfer.requester,
+                    notification_type='transfer',
+                    title='Transfer Approved',
+                    message=f'Your transfer to {transfer.recipient.get_full_name()} has been approved. The transfer will be executed shortly.',
+                    priority='high'
+                ),
+                Notification(
+                    user=transfer.recipient,
+                    notification_type='transfer',
+                    title='Transfer Approved',
+                    message=f'The transfer from {transfer.requester.get_full_name()} has been approved. You will receive ownership shortly.',
+                    priority='high'
+                ),
+            ])
         
         return Response({
             'success': True,
@@ -735,14 +748,16 @@ class TransferViewSet(viewsets.ModelViewSet):
             )
             
             # Notify both parties
-            for notify_user in [transfer.requester, transfer.recipient]:
-                Notification.objects.create(
+            dispatch_notifications([
+                Notification(
                     user=notify_user,
                     notification_type='transfer',
                     title='Transfer Rejected',
                     message=f'The transfer has been rejected. Reason: {transfer.get_rejection_reason_display()}',
                     priority='high'
                 )
+                for notify_user in [transfer.requester, transfer.recipient]
+            ])
         
         return Response({
             'success': True,
@@ -787,192 +802,104 @@ class TransferViewSet(viewsets.ModelViewSet):
                 'error': f'Transfer must be approved before completion. Current status: {transfer.get_status_display()}'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        with transaction.atomic():
-            # Get source investment (requester's current investment)
-            source_investment = transfer.source_investment
-            if not source_investment:
-                source_investment = Investment.objects.filter(
-                    investor=transfer.requester,
-                    spv=transfer.spv,
-                    status='active'
-                ).first()
-            
-            if not source_investment:
+        settlement = settle_transfers([transfer.id], user=user, request=request)
+        result = settlement['results'][0]
+        if not settlement['settled']:
+            return Response({
+                'success': False,
+                'error': result['error']
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        transfer.refresh_from_db()
+        return Response({
+            'success': True,
+            'message': 'Transfer completed successfully. Ownership has been updated.',
+            'data': TransferSerializer(transfer).data,
+            'ownership_update': result['ownership_update']
+        })
+    
+    @action(detail=False, methods=['post'])
+    def bulk_complete(self, request):
+        """
+        Complete a batch of approved transfers in one transaction.
+        
+        POST /api/transfers/bulk_complete/
+        {
+            "transfer_ids": [1, 2, 3],   // or "spv_id": 5 for all approved transfers of the SPV
+            "partial": false             // settle the valid ones when some fail
+        }
+        
+        Transfers are settled in dependency order (A→B before B→C). Without
+        `partial`, one failing transfer rolls back the whole batch.
+        """
+        user = request.user
+        transfer_ids = request.data.get('transfer_ids')
+        spv_id = request.data.get('spv_id')
+        
+        if not transfer_ids and not spv_id:
+            return Response({
+                'success': False,
+                'error': 'Provide transfer_ids or spv_id.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        transfers = Transfer.objects.all()
+        if not (user.is_staff or getattr(user, 'role', None) == 'admin'):
+            transfers = transfers.filter(spv__created_by=user)
+        if transfer_ids:
+            # A string would otherwise be read as one id per character
+            if not isinstance(transfer_ids, list):
                 return Response({
                     'success': False,
-                    'error': 'Requester does not have an active investment in this SPV.'
+                    'error': 'transfer_ids must be a list of ids.'
                 }, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Calculate transferred percentage
-            if transfer.transfer_type == 'full':
-                transferred_percentage = source_investment.ownership_percentage
-                transferred_amount = source_investment.invested_amount
-            else:
-                transferred_percentage = transfer.ownership_percentage_transferred
-                transferred_amount = transfer.amount
-            
-            # Validate sufficient ownership
-            if transferred_percentage > source_investment.ownership_percentage:
+            try:
+                transfer_ids = [int(transfer_id) for transfer_id in transfer_ids]
+            except (TypeError, ValueError):
                 return Response({
                     'success': False,
-                    'error': f'Insufficient ownership. Requester has {source_investment.ownership_percentage}%, trying to transfer {transferred_percentage}%.'
+                    'error': 'transfer_ids must be a list of ids.'
                 }, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Store before values
-            requester_ownership_before = source_investment.ownership_percentage
-            requester_amount_before = source_investment.invested_amount
-            
-            # Update requester's investment (DECREASE)
-            source_investment.ownership_percentage -= transferred_percentage
-            source_investment.invested_amount -= transferred_amount
-            source_investment.current_value -= transferred_amount
-            
-            # If full transfer or zero remaining, mark as completed
-            if source_investment.ownership_percentage <= 0:
-                source_investment.status = 'completed'
-                source_investment.ownership_percentage = Decimal('0')
-                source_investment.invested_amount = Decimal('0')
-                source_investment.current_value = Decimal('0')
-            
-            source_investment.save()
-            
-            # Create ledger entry for requester (outgoing)
-            OwnershipLedger.objects.create(
-                investor=transfer.requester,
-                spv=transfer.spv,
-                entry_type='transfer_out',
-                investment=source_investment,
-                transfer=transfer,
-                ownership_change=-transferred_percentage,
-                ownership_before=requester_ownership_before,
-                ownership_after=source_investment.ownership_percentage,
-                amount_change=-transferred_amount,
-                amount_before=requester_amount_before,
-                amount_after=source_investment.invested_amount,
-                notes=f'Transferred to {transfer.recipient.username}',
-                created_by=user
-            )
-            
-            # Get or create recipient's investment (INCREASE)
-            recipient_investment = Investment.objects.filter(
-                investor=transfer.recipient,
-                spv=transfer.spv,
-                status='active'
-            ).first()
-            
-            recipient_ownership_before = Decimal('0')
-            recipient_amount_before = Decimal('0')
-            
-            if recipient_investment:
-                recipient_ownership_before = recipient_investment.ownership_percentage
-                recipient_amount_before = recipient_investment.invested_amount
-                
-                recipient_investment.ownership_percentage += transferred_percentage
-                recipient_investment.invested_amount += transfer.net_amount
-                recipient_investment.current_value += transfer.net_amount
-                recipient_investment.save()
-            else:
-                # Create new investment for recipient
-                recipient_investment = Investment.objects.create(
-                    investor=transfer.recipient,
-                    spv=transfer.spv,
-                    syndicate_name=transfer.spv.display_name,
-                    sector=source_investment.sector,
-                    stage=source_investment.stage,
-                    investment_type='syndicate_deal',
-                    invested_amount=transfer.net_amount,
-                    current_value=transfer.net_amount,
-                    ownership_percentage=transferred_percentage,
-                    status='active',
-                    invested_at=timezone.now(),
-                    commitment_date=timezone.now(),
-                )
-            
-            # Create ledger entry for recipient (incoming)
-            OwnershipLedger.objects.create(
-                investor=transfer.recipient,
-                spv=transfer.spv,
-                entry_type='transfer_in',
-                investment=recipient_investment,
-                transfer=transfer,
-                ownership_change=transferred_percentage,
-                ownership_before=recipient_ownership_before,
-                ownership_after=recipient_investment.ownership_percentage,
-                amount_change=transfer.net_amount,
-                amount_before=recipient_amount_before,
-                amount_after=recipient_investment.invested_amount,
-                notes=f'Received from {transfer.requester.username}',
-                created_by=user
-            )
-            
-            # Update transfer record
-            transfer.status = 'completed'
-            transfer.completed_at = timezone.now()
-            transfer.completed_by = user
-            transfer.source_investment = source_investment
-            transfer.destination_investment = recipient_investment
-            transfer.ownership_percentage_transferred = transferred_percentage
-            transfer.requester_ownership_after = source_investment.ownership_percentage
-            transfer.recipient_ownership_after = recipient_investment.ownership_percentage
-            transfer.save()
-            
-            # Create history entry
-            create_transfer_history(
-                transfer=transfer,
-                action='completed',
-                user=user,
-                request=request,
-                notes=f'Transfer completed. {transferred_percentage}% ownership transferred.'
-            )
-            
-            # Create ownership_updated history
-            create_transfer_history(
-                transfer=transfer,
-                action='ownership_updated',
-                user=user,
-                request=request,
-                notes=f'Ownership updated in database. Requester: {requester_ownership_before}% → {source_investment.ownership_percentage}%, Recipient: {recipient_ownership_before}% → {recipient_investment.ownership_percentage}%',
-                metadata={
-                    'requester_before': float(requester_ownership_before),
-                    'requester_after': float(source_investment.ownership_percentage),
-                    'recipient_before': float(recipient_ownership_before),
-                    'recipient_after': float(recipient_investment.ownership_percentage),
-                }
-            )
-            
-            # Notify both parties
-            Notification.objects.create(
-                user=transfer.requester,
-                notification_type='transfer',
-                title='Transfer Completed',
-                message=f'Your transfer of {transferred_percentage}% ownership to {transfer.recipient.get_full_name()} has been completed. Your new ownership: {source_investment.ownership_percentage}%',
-                priority='high'
-            )
-            
-            Notification.objects.create(
-                user=transfer.recipient,
-                notification_type='transfer',
-                title='Ownership Received',
-                message=f'You have received {transferred_percentage}% ownership in {transfer.spv.display_name} from {transfer.requester.get_full_name()}. Your total ownership: {recipient_investment.ownership_percentage}%',
-                priority='high'
-            )
+            transfers = transfers.filter(id__in=transfer_ids)
+        else:
+            transfers = transfers.filter(spv_id=spv_id, status='approved')
+        
+        partial = bool(request.data.get('partial'))
+        permitted = set(transfers.values_list('id', flat=True))
+        refused = [{
+            'id': transfer_id,
+            'transfer_id': None,
+            'status': 'failed',
+            'error': 'Transfer not found or you are not a manager of its SPV.'
+        } for transfer_id in dict.fromkeys(transfer_ids or []) if transfer_id not in permitted]
+        
+        if refused and not partial:
+            # Without `partial` the batch is all or nothing: settle none of it
+            return Response({
+                'success': False,
+                'error': f"{len(refused)} transfer(s) could not be completed. No transfers were completed.",
+                'error_code': 'SETTLEMENT_CONFLICT',
+                'settled': False,
+                'completed': 0,
+                'failed': len(refused),
+                'results': refused,
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        settlement = settle_transfers(list(permitted), user=user, partial=partial, request=request)
+        settlement['failed'] += len(refused)
+        settlement['results'].extend(refused)
+        
+        if not settlement['settled'] and settlement['failed']:
+            return Response({
+                'success': False,
+                'error': f"{settlement['failed']} transfer(s) could not be completed. No transfers were completed.",
+                'error_code': 'SETTLEMENT_CONFLICT',
+                **settlement
+            }, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
             'success': True,
-            'message': 'Transfer completed successfully. Ownership has been updated.',
-            'data': TransferSerializer(transfer).data,
-            'ownership_update': {
-                'requester': {
-                    'before': float(requester_ownership_before),
-                    'after': float(source_investment.ownership_percentage),
-                    'transferred': float(transferred_percentage)
-                },
-                'recipient': {
-                    'before': float(recipient_ownership_before),
-                    'after': float(recipient_investment.ownership_percentage),
-                    'received': float(transferred_percentage)
-                }
-            }
+            'message': f"{settlement['completed']} transfer(s) completed.",
+            **settlement
         })
     
     # ==========================================
@@ -1016,7 +943,7 @@ class TransferViewSet(viewsets.ModelViewSet):
             
             # Notify recipient if they were already notified
             if transfer.requester_confirmed:
-                Notification.objects.create(
+                notify(
                     user=transfer.recipient,
                     notification_type='transfer',
                     title='Transfer Cancelled',
@@ -1040,33 +967,56 @@ class TransferViewSet(viewsets.ModelViewSet):
         Get transfer statistics.
         
         GET /api/transfers/statistics/
+        GET /api/transfers/statistics/?bucket=day|week&days=30  (adds a trend series)
         """
         queryset = self.get_queryset()
         
-        stats = {
-            'total_transfers': queryset.count(),
-            'draft': queryset.filter(status='draft').count(),
-            'pending_requester_confirmation': queryset.filter(status='pending_requester_confirmation').count(),
-            'pending_recipient_confirmation': queryset.filter(status='pending_recipient_confirmation').count(),
-            'pending_approval': queryset.filter(status='pending_approval').count(),
-            'approved': queryset.filter(status='approved').count(),
-            'completed': queryset.filter(status='completed').count(),
-            'rejected': queryset.filter(status='rejected').count(),
-            'cancelled': queryset.filter(status='cancelled').count(),
-            'transfer_volume': queryset.filter(status='completed').aggregate(total=Sum('amount'))['total'] or 0,
-            'urgent_count': 0,  # Calculate urgent transfers
-        }
+        group_by = ['status']
+        bucket = request.query_params.get('bucket')
+        if bucket:
+            try:
+                days = int(request.query_params.get('days', 30))
+                queryset = with_time_bucket(queryset, 'requested_at', bucket, since=timezone.now() - timedelta(days=days))
+            except ValueError as e:
+                return Response({
+                    'success': False,
+                    'error': str(e)
+                }, status=status.HTTP_400_BAD_REQUEST)
+            group_by.append('bucket')
         
-        # Count urgent (pending for more than 7 days)
-        from datetime import timedelta
+        # Urgent: pending for more than 7 days
         urgent_date = timezone.now() - timedelta(days=7)
-        stats['urgent_count'] = queryset.filter(
-            status__in=['pending_approval', 'pending_recipient_confirmation'],
-            requested_at__lt=urgent_date
-        ).count()
         
-        serializer = TransferStatisticsSerializer(stats)
-        return Response(serializer.data)
+        # One grouped query for every figure (and the trend)
+        transfer_stats = GroupedStats(
+            queryset,
+            group_by=group_by,
+            sum_fields=['amount'],
+            flags={'urgent': Q(status__in=['pending_approval', 'pending_recipient_confirmation'], requested_at__lt=urgent_date)},
+        )
+        
+        stats = {
+            'total_transfers': transfer_stats.count(),
+            'draft': transfer_stats.count(status='draft'),
+            'pending_requester_confirmation': transfer_stats.count(status='pending_requester_confirmation'),
+            'pending_recipient_confirmation': transfer_stats.count(status='pending_recipient_confirmation'),
+            'pending_approval': transfer_stats.count(status='pending_approval'),
+            'approved': transfer_stats.count(status='approved'),
+            'completed': transfer_stats.count(status='completed'),
+            'rejected': transfer_stats.count(status='rejected'),
+            'cancelled': transfer_stats.count(status='cancelled'),
+            'transfer_volume': transfer_stats.sum('amount', status='completed'),
+            'urgent_count': transfer_stats.count(flag='urgent'),
+        }
+        
+        data = TransferStatisticsSerializer(stats).data
+        if bucket:
+            data['trend'] = transfer_stats.trend(
+                requested={},
+                completed={'status': 'completed'},
+                volume={'sum_field': 'amount', 'status': 'completed'},
+            )
+        return Response(data)
     
     # ==========================================
     # TRANSFER HISTORY
@@ -1077,16 +1027,21 @@ class TransferViewSet(viewsets.ModelViewSet):
         """
         Get transfer history/audit trail.
         
-        GET /api/transfers/{id}/history/
+        GET /api/transfers/{id}/history/?cursor=...&page_size=50
         """
         transfer = self.get_object()
-        history = transfer.history.all().order_by('-action_at')
-        serializer = TransferHistorySerializer(history, many=True)
+        
+        # Newest first from the timeline read model, paged by cursor
+        paginator = TransferHistoryCursorPagination()
+        page = paginator.paginate_queryset(get_transfer_timeline(transfer.id), request)
+        serializer = TransferTimelineEventSerializer(page, many=True)
         
         return Response({
             'success': True,
             'transfer_id': transfer.transfer_id,
-            'history': serializer.data
+            'history': serializer.data,
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link()
         })
     
     # ==========================================
@@ -1144,8 +1099,10 @@ def spv_cap_table(request, spv_id):
     Get cap table (ownership distribution) for an SPV.
     
     GET /api/transfers/cap-table/{spv_id}/
+    GET /api/transfers/cap-table/{spv_id}/?as_of=2025-06-30
     
-    Returns list of all investors and their ownership percentages.
+    Returns list of all investors and their ownership percentages, either
+    current or as of a date/datetime (rebuilt from the ownership ledger).
     """
     from spv.models import SPV
     
@@ -1169,39 +1126,70 @@ def spv_cap_table(request, spv_id):
             'error': 'You do not have permission to view this cap table.'
         }, status=status.HTTP_403_FORBIDDEN)
     
-    # Get all active investments for this SPV
-    investments = Investment.objects.filter(
-        spv=spv,
-        status='active',
-        ownership_percentage__gt=0
-    ).select_related('investor').order_by('-ownership_percentage')
+    # Point-in-time cap table from the ownership ledger
+    as_of = request.query_params.get('as_of')
+    if as_of:
+        try:
+            as_of = parse_as_of(as_of)
+        except ValueError as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+    
+    ledger_cap_table = get_cap_table(spv.id, as_of=as_of or None)
+    holdings = ledger_cap_table['holdings']
     
     cap_table = []
     total_ownership = Decimal('0')
     total_invested = Decimal('0')
     
-    for inv in investments:
-        # Get last transfer date for this investor
-        last_transfer = Transfer.objects.filter(
-            Q(requester=inv.investor) | Q(recipient=inv.investor),
+    if as_of:
+        from users.models import CustomUser
+        investors = CustomUser.objects.in_bulk(list(holdings))
+        
+        for investor_id, holding in sorted(holdings.items(), key=lambda item: -item[1]['ownership_percentage']):
+            investor = investors.get(investor_id)
+            if investor is None or holding['ownership_percentage'] <= 0:
+                continue
+            cap_table.append({
+                'investor_id': investor.id,
+                'investor_username': investor.username,
+                'investor_email': investor.email,
+                'investor_full_name': investor.get_full_name() or investor.username,
+                'ownership_percentage': holding['ownership_percentage'],
+                'invested_amount': holding['invested_amount'],
+                'current_value': None,
+                'investment_date': holding['first_entry_at'],
+                'last_transfer_date': holding['last_transfer_at'],
+            })
+            total_ownership += holding['ownership_percentage']
+            total_invested += holding['invested_amount']
+    else:
+        # Get all active investments for this SPV
+        investments = Investment.objects.filter(
             spv=spv,
-            status='completed'
-        ).order_by('-completed_at').first()
-        
-        cap_table.append({
-            'investor_id': inv.investor.id,
-            'investor_username': inv.investor.username,
-            'investor_email': inv.investor.email,
-            'investor_full_name': inv.investor.get_full_name() or inv.investor.username,
-            'ownership_percentage': inv.ownership_percentage,
-            'invested_amount': inv.invested_amount,
-            'current_value': inv.current_value,
-            'investment_date': inv.created_at,
-            'last_transfer_date': last_transfer.completed_at if last_transfer else None,
-        })
+            status='active',
+            ownership_percentage__gt=0
+        ).select_related('investor').order_by('-ownership_percentage')
         
-        total_ownership += inv.ownership_percentage
-        total_invested += inv.invested_amount
+        for inv in investments:
+            holding = holdings.get(inv.investor_id)
+            
+            cap_table.append({
+                'investor_id': inv.investor.id,
+                'investor_username': inv.investor.username,
+                'investor_email': inv.investor.email,
+                'investor_full_name': inv.investor.get_full_name() or inv.investor.username,
+                'ownership_percentage': inv.ownership_percentage,
+                'invested_amount': inv.invested_amount,
+                'current_value': inv.current_value,
+                'investment_date': inv.created_at,
+                'last_transfer_date': holding['last_transfer_at'] if holding else None,
+            })
+            
+            total_ownership += inv.ownership_percentage
+            total_invested += inv.invested_amount
     
     return Response({
         'success': True,
@@ -1215,6 +1203,8 @@ def spv_cap_table(request, spv_id):
             'total_ownership_allocated': float(total_ownership),
             'total_invested': float(total_invested),
         },
+        'as_of': as_of or None,
+        'ledger_version': ledger_cap_table['version'],
         'cap_table': cap_table
     })
 
@@ -1225,7 +1215,7 @@ def ownership_chain(request, spv_id, investor_id):
     """
     Get ownership chain history for a specific investor in an SPV.
     
-    GET /api/transfers/ownership-chain/{spv_id}/{investor_id}/
+    GET /api/transfers/ownership-chain/{spv_id}/{investor_id}/?cursor=...&page_size=100
     
     Returns complete history of how ownership was acquired/transferred.
     """
@@ -1253,42 +1243,37 @@ def ownership_chain(request, spv_id, investor_id):
             'error': 'You do not have permission to view this ownership chain.'
         }, status=status.HTTP_403_FORBIDDEN)
     
-    # Get ledger entries
-    ledger_entries = OwnershipLedger.objects.filter(
-        investor=investor,
-        spv=spv
-    ).order_by('created_at')
+    # Ledger events from the timeline read model, paged by cursor on sequence
+    paginator = OwnershipChainCursorPagination()
+    events = paginator.paginate_queryset(get_ownership_chain(investor.id, spv.id), request)
     
     chain = []
-    sequence = 1
-    
-    for entry in ledger_entries:
+    for event in events:
         from_user_data = None
         to_user_data = None
         
-        if entry.transfer:
+        if event.transfer_ref:
             from_user_data = {
-                'id': entry.transfer.requester.id,
-                'username': entry.transfer.requester.username,
-                'full_name': entry.transfer.requester.get_full_name() or entry.transfer.requester.username,
+                'id': event.from_user_id,
+                'username': event.from_username,
+                'full_name': event.from_name,
             }
             to_user_data = {
-                'id': entry.transfer.recipient.id,
-                'username': entry.transfer.recipient.username,
-                'full_name': entry.transfer.recipient.get_full_name() or entry.transfer.recipient.username,
+                'id': event.to_user_id,
+                'username': event.to_username,
+                'full_name': event.to_name,
             }
         
         chain.append({
-            'sequence': sequence,
-            'date': entry.created_at,
-            'event_type': entry.get_entry_type_display(),
+            'sequence': event.sequence,
+            'date': event.occurred_at,
+            'event_type': event.event_label,
             'from_user': from_user_data,
             'to_user': to_user_data,
-            'ownership_percentage': entry.ownership_after,
-            'amount': entry.amount_after,
-            'transfer_id': entry.transfer.transfer_id if entry.transfer else None,
+            'ownership_percentage': event.ownership_after,
+            'amount': event.amount_after,
+            'transfer_id': event.transfer_ref or None,
         })
-        sequence += 1
     
     # Get current investment
     current_investment = Investment.objects.filter(
@@ -1312,10 +1297,135 @@ def ownership_chain(request, spv_id, investor_id):
             'percentage': float(current_investment.ownership_percentage) if current_investment else 0,
             'amount': float(current_investment.invested_amount) if current_investment else 0,
         },
-        'ownership_chain': chain
+        'ownership_chain': chain,
+        'next': paginator.get_next_link(),
+        'previous': paginator.get_previous_link()
     })
 
 
+# ==========================================
+# EXPORTS
+# ==========================================
+
+def _export_scope(request):
+    """
+    (spv_ids or None for all, start, end, export_format) for an export
+    request, or an error Response. Admins export any SPV, managers their own.
+    
+    Query params:
+    - spv: SPV id (repeatable)
+    - date_from / date_to: ISO date or datetime
+    - export_format: 'csv' (default) or 'xlsx'
+    """
+    from spv.models import SPV
+    
+    user = request.user
+    export_format = request.query_params.get('export_format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return Response({
+            'success': False,
+            'error': f"Invalid export_format. Use one of: {', '.join(EXPORT_FORMATS)}"
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        start, end = parse_date_range(request.query_params.get('date_from'), request.query_params.get('date_to'))
+        spv_ids = [int(spv_id) for spv_id in request.query_params.getlist('spv')] or None
+    except ValueError as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    if not (user.is_staff or getattr(user, 'role', None) == 'admin'):
+        managed = SPV.objects.filter(created_by=user)
+        if spv_ids is not None:
+            managed = managed.filter(id__in=spv_ids)
+        managed_ids = list(managed.values_list('id', flat=True))
+        if not managed_ids or (spv_ids is not None and len(managed_ids) != len(set(spv_ids))):
+            return Response({
+                'success': False,
+                'error': 'Only managers of these SPVs or admins can export them.'
+            }, status=status.HTTP_403_FORBIDDEN)
+        spv_ids = managed_ids
+    
+    return spv_ids, start, end, export_format
+
+
+def _export_response(chunks, name, export_format):
+    response = StreamingHttpResponse(chunks, content_type=EXPORT_FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{name}_{timezone.now():%Y%m%d}.{export_format}"'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def export_transfers(request):
+    """
+    Stream transfers as CSV or XLSX.
+    
+    GET /api/transfers/export/transfers/?spv=1&date_from=2025-01-01&date_to=2025-12-31&status=completed&export_format=xlsx
+    
+    Filters on requested_at; `status` is repeatable.
+    """
+    scope = _export_scope(request)
+    if isinstance(scope, Response):
+        return scope
+    spv_ids, start, end, export_format = scope
+    
+    queryset = filter_transfers(spv_ids, start, end, request.query_params.getlist('status'))
+    return _export_response(stream_export(transfer_rows(queryset), export_format, 'Transfers'), 'transfers', export_format)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def export_ledger(request):
+    """
+    Stream ownership ledger entries as CSV or XLSX.
+    
+    GET /api/transfers/export/ledger/?spv=1&date_from=2025-01-01&date_to=2025-12-31&export_format=csv
+    """
+    scope = _export_scope(request)
+    if isinstance(scope, Response):
+        return scope
+    spv_ids, start, end, export_format = scope
+    
+    queryset = filter_ledger(spv_ids, start, end)
+    return _export_response(stream_export(ledger_rows(queryset), export_format, 'Ledger'), 'ownership_ledger', export_format)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def export_cap_tables(request):
+    """
+    Stream SPV cap tables (from the ownership ledger) as CSV or XLSX.
+    
+    GET /api/transfers/export/cap-tables/?spv=1&spv=2&as_of=2025-06-30&export_format=xlsx
+    """
+    from spv.models import SPV
+    
+    scope = _export_scope(request)
+    if isinstance(scope, Response):
+        return scope
+    spv_ids, _, _, export_format = scope
+    
+    as_of = request.query_params.get('as_of')
+    if as_of:
+        try:
+            as_of = parse_as_of(as_of)
+        except ValueError as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+    
+    spvs = SPV.objects.filter(ownership_ledger__isnull=False).distinct()
+    if spv_ids is not None:
+        spvs = spvs.filter(id__in=spv_ids)
+    spvs = spvs.order_by('id').values_list('id', 'display_name').iterator(chunk_size=500)
+    rows = cap_table_rows(spvs, as_of=as_of or None)
+    return _export_response(stream_export(rows, export_format, 'Cap Tables'), 'cap_tables', export_format)
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def my_transfers(request):
@@ -1358,7 +1468,7 @@ def my_transfers(request):
 @permission_classes([permissions.IsAuthenticated])
 def pending_actions(request):
     """
-    Get transfers requiring action from current user.
+    Get transfers and requests requiring action from current user.
     
     GET /api/transfers/pending-actions/
     
@@ -1366,58 +1476,39 @@ def pending_actions(request):
     - Confirm (as requester)
     - Accept/Decline (as recipient)
     - Approve (as manager/admin)
+    and, for admins, pending requests to review.
+    
+    Read from the action inbox in one indexed query; changes are pushed to
+    the user's notification channel as `inbox_update` messages.
     """
     user = request.user
     
-    # Transfers needing requester confirmation
-    need_requester_confirm = Transfer.objects.filter(
-        requester=user,
-        status='pending_requester_confirmation'
-    )
+    items = get_inbox(user).select_related(
+        'transfer__requester', 'transfer__recipient', 'transfer__spv',
+        'request__requester', 'request__spv',
+    ).prefetch_related('transfer__documents', 'request__documents')
     
-    # Transfers needing recipient acceptance
-    need_recipient_accept = Transfer.objects.filter(
-        recipient=user,
-        status='pending_recipient_confirmation'
-    )
+    grouped = {action_type: {} for action_type, _ in ActionInboxItem.ACTION_TYPE_CHOICES}
+    for item in items:
+        # Managers who are also admins have approvals in both queues
+        target = item.transfer or item.request
+        grouped[item.action_type].setdefault(target.id, target)
     
-    # Transfers needing manager approval
-    need_approval = Transfer.objects.none()
-    is_admin = user.is_staff or getattr(user, 'role', None) == 'admin'
+    def section(action_type, key, serializer_class):
+        targets = list(grouped[action_type].values())
+        return {'count': len(targets), key: serializer_class(targets, many=True).data}
     
-    if is_admin:
-        need_approval = Transfer.objects.filter(status='pending_approval')
-    else:
-        # Check if user is manager of any SPVs
-        from spv.models import SPV
-        managed_spvs = SPV.objects.filter(created_by=user).values_list('id', flat=True)
-        if managed_spvs:
-            need_approval = Transfer.objects.filter(
-                spv_id__in=managed_spvs,
-                status='pending_approval'
-            )
+    pending = {
+        'need_requester_confirm': section('confirm_transfer', 'transfers', TransferListSerializer),
+        'need_recipient_accept': section('accept_transfer', 'transfers', TransferListSerializer),
+        'need_approval': section('approve_transfer', 'transfers', TransferListSerializer),
+        'need_request_review': section('review_request', 'requests', RequestListSerializer),
+    }
     
     return Response({
         'success': True,
-        'pending_actions': {
-            'need_requester_confirm': {
-                'count': need_requester_confirm.count(),
-                'transfers': TransferListSerializer(need_requester_confirm, many=True).data
-            },
-            'need_recipient_accept': {
-                'count': need_recipient_accept.count(),
-                'transfers': TransferListSerializer(need_recipient_accept, many=True).data
-            },
-            'need_approval': {
-                'count': need_approval.count(),
-                'transfers': TransferListSerializer(need_approval, many=True).data
-            },
-        },
-        'total_pending': (
-            need_requester_confirm.count() + 
-            need_recipient_accept.count() + 
-            need_approval.count()
-        )
+        'pending_actions': pending,
+        'total_pending': sum(group['count'] for group in pending.values())
     })
 
 
@@ -1530,25 +1621,54 @@ class RequestViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def statistics(self, request):
+        """
+        GET /api/requests/statistics/
+        GET /api/requests/statistics/?bucket=day|week&days=30  (adds a trend series)
+        """
         queryset = self.get_queryset()
         
+        group_by = ['status', 'priority']
+        bucket = request.query_params.get('bucket')
+        if bucket:
+            try:
+                days = int(request.query_params.get('days', 30))
+                queryset = with_time_bucket(queryset, 'created_at', bucket, since=timezone.now() - timedelta(days=days))
+            except ValueError as e:
+                return Response({
+                    'success': False,
+                    'error': str(e)
+                }, status=status.HTTP_400_BAD_REQUEST)
+            group_by.append('bucket')
+        
+        now = timezone.now()
+        
+        # One grouped query for every figure (and the trend)
+        request_stats = GroupedStats(
+            queryset,
+            group_by=group_by,
+            flags={
+                'approved_today': Q(status='approved', approved_at__date=now.date()),
+                'overdue': Q(status='pending', due_date__lt=now),
+            },
+        )
+        
         stats = {
-            'total_requests': queryset.count(),
-            'pending': queryset.filter(status='pending').count(),
-            'approved_today': queryset.filter(
-                status='approved',
-                approved_at__date=timezone.now().date()
-            ).count(),
-            'rejected': queryset.filter(status='rejected').count(),
-            'high_priority': queryset.filter(priority__in=['high', 'urgent']).count(),
-            'overdue': queryset.filter(
-                status='pending',
-                due_date__lt=timezone.now()
-            ).count(),
+            'total_requests': request_stats.count(),
+            'pending': request_stats.count(status='pending'),
+            'approved_today': request_stats.count(flag='approved_today'),
+            'rejected': request_stats.count(status='rejected'),
+            'high_priority': request_stats.count(priority=['high', 'urgent']),
+            'overdue': request_stats.count(flag='overdue'),
         }
         
-        serializer = RequestStatisticsSerializer(stats)
-        return Response(serializer.data)
+        data = RequestStatisticsSerializer(stats).data
+        if bucket:
+            data['trend'] = request_stats.trend(
+                created={},
+                approved={'status': 'approved'},
+                rejected={'status': 'rejected'},
+            )
+        return Response(data)
     
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
@@ -1806,6 +1926,14 @@ class TransferAgreementDocumentViewSet(viewsets.ReadOnlyModelViewSet):
                     'error': 'You do not have permission to download this document.'
                 }, status=status.HTTP_403_FORBIDDEN)
         
+        if document.render_status in ('pending', 'rendering'):
+            return Response({
+                'success': False,
+                'error': 'Document is still being generated. Please try again shortly.',
+                'error_code': 'DOCUMENT_RENDERING',
+                'render_status': document.render_status
+            }, status=status.HTTP_409_CONFLICT)
+        
         if not document.file:
             return Response({
                 'success': False,